@@ -69,6 +69,13 @@ export async function DELETE(request: Request) {
       .delete({ count: 'exact' })
       .eq('user_id', userId);
     results.conversation_chunks = chunksError ? chunksError.message : `${chunksCount ?? 0} deleted`;
+
+    // Drop the re-import index too, so the next import re-chunks everything
+    const { error: fingerprintsError, count: fingerprintsCount } = await adminSupabase
+      .from('conversation_fingerprints')
+      .delete({ count: 'exact' })
+      .eq('user_id', userId);
+    results.conversation_fingerprints = fingerprintsError ? fingerprintsError.message : `${fingerprintsCount ?? 0} deleted`;
     
     // 3. Delete raw conversations
     const { error: rawError, count: rawCount } = await adminSupabase
@@ -22,6 +22,7 @@ export async function GET(request: NextRequest) {
       .from('conversation_chunks')
       .select('id, conversation_id, title, content, message_count, created_at, is_recent', { count: 'exact' })
       .eq('user_id', user.id)
+      .is('duplicate_of', null)
       .order('created_at', { ascending: false });
 
     // Add search filter if provided
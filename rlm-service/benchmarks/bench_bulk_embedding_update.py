@@ -0,0 +1,83 @@
+"""
+Benchmark: per-row PATCH vs bulk RPC for writing chunk embeddings
+
+Writes 768-dim vectors for a synthetic 5,000-chunk user through the local
+Supabase stub, once with one PATCH per row (JSON float arrays) and once with
+one update_chunk_embeddings RPC per EMBED_UPDATE_BATCH rows (pgvector text
+literals). Each request pays a fixed simulated round-trip latency.
+
+Run from rlm-service/:
+    python -m benchmarks.bench_bulk_embedding_update
+"""
+
+import asyncio
+import random
+import time
+
+from benchmarks.supabase_stub import SupabaseStub
+from processors import embedding_generator
+
+CHUNKS = 5000
+DIMENSIONS = 768
+ROUND_TRIP = 0.002  # seconds per request (scaled down from ~20-50ms)
+PATCH_CONCURRENCY = 1  # the backfill awaited each PATCH in turn
+
+
+def make_vectors(seed: int = 11):
+    rng = random.Random(seed)
+    vectors = []
+    for _ in range(CHUNKS):
+        v = [rng.gauss(0, 1) for _ in range(DIMENSIONS)]
+        norm = sum(x * x for x in v) ** 0.5
+        vectors.append([x / norm for x in v])  # Titan returns normalized vectors
+    return vectors
+
+
+def make_stub() -> SupabaseStub:
+    rows = [{"id": f"{i:08d}-0000-0000-0000-000000000000", "user_id": "u1", "content": "", "embedding": None}
+            for i in range(CHUNKS)]
+    return SupabaseStub(rows, latency=ROUND_TRIP)
+
+
+async def per_row(ids, vectors) -> SupabaseStub:
+    stub = make_stub()
+    embedding_generator.httpx.AsyncClient = stub.client_factory()
+    for chunk_id, vector in zip(ids, vectors):
+        await embedding_generator.update_chunk_embedding(chunk_id, vector)
+    return stub
+
+
+async def bulk(ids, vectors) -> SupabaseStub:
+    stub = make_stub()
+    embedding_generator.httpx.AsyncClient = stub.client_factory()
+    size = embedding_generator.EMBED_UPDATE_BATCH
+    for i in range(0, len(ids), size):
+        await embedding_generator.update_chunk_embeddings_bulk(ids[i:i + size], vectors[i:i + size])
+    return stub
+
+
+async def main():
+    embedding_generator.SUPABASE_URL = "http://supabase.local"
+    embedding_generator.SUPABASE_SERVICE_KEY = "bench-key"
+    vectors = make_vectors()
+    ids = [f"{i:08d}-0000-0000-0000-000000000000" for i in range(CHUNKS)]
+
+    results = {}
+    for name, run in (("per-row PATCH", per_row), ("bulk RPC", bulk)):
+        start = time.perf_counter()
+        stub = await run(ids, vectors)
+        elapsed = time.perf_counter() - start
+        assert stub.missing_embeddings() == 0
+        results[name] = (stub.requests, stub.request_bytes, elapsed)
+
+    print(f"\nchunks={CHUNKS} dims={DIMENSIONS} batch={embedding_generator.EMBED_UPDATE_BATCH} "
+          f"round_trip={ROUND_TRIP * 1000:.0f}ms")
+    for name, (requests, payload, elapsed) in results.items():
+        print(f"{name:14s} requests={requests:6d} payload={payload / 1e6:7.1f} MB  time={elapsed:6.2f}s")
+    (r_rows, b_rows, t_rows), (r_bulk, b_bulk, t_bulk) = results.values()
+    print(f"round trips /{r_rows / r_bulk:.0f}, payload -{(1 - b_bulk / b_rows) * 100:.0f}%, "
+          f"time /{t_rows / t_bulk:.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+"""
+Benchmark: pre-extraction chunk triage on a labeled sample
+
+Generates chunks of the kinds a ChatGPT export is full of (personal
+planning talk, code help, pasted logs, translations, one-line questions),
+each labeled with how many durable facts it holds; some code and log
+chunks also mention a fact in passing. Reports, for the built-in weights
+and for a classifier trained on half the sample (scored on the other
+half): chunks flagged low value, fact recall (share of facts in chunks
+kept) and the extraction calls each TRIAGE_MODE makes versus no triage.
+
+Run from rlm-service/:
+    python -m benchmarks.bench_chunk_triage
+"""
+
+import asyncio
+import json
+import random
+import re
+from types import SimpleNamespace
+
+from processors import chunk_triage, fact_extractor
+from processors.adaptive_limiter import AdaptiveLimiter
+from processors.chunk_triage import TriageModel, evaluate_triage, fit_triage_model
+
+SAMPLE_SIZE = 2000
+PACK_TOKEN_BUDGET = 4000
+THRESHOLDS = [0.1, 0.2, 0.3]
+
+FACTS = [
+    "I'm building a habit tracker for my startup", "I prefer TypeScript over Python",
+    "my daughter's birthday is in March", "I work at a logistics company", "I decided to move to Lisbon",
+    "I live in Denver and hate the winters", "my team launches the beta next week",
+    "I'm learning Rust on weekends", "my favorite editor is Neovim",
+]
+CODE = ["def load(path):", "    with open(path) as f:", "        return json.load(f)", "const x = items.map(i => i.id);",
+        "for (let i = 0; i < n; i++) {", "}", "import os", "class Cache:", "    return None"]
+LOGS = ["2024-03-02 11:04:55 ERROR db timeout", "2024-03-02 11:04:56 WARN retrying",
+        'File "worker.py", line 88, in run', "Traceback (most recent call last):", "Exception: connection reset"]
+QUESTIONS = ["what is a monad", "explain tcp handshake", "summarize this", "fix this error", "why does this fail",
+             "what does this regex do", "how to reverse a list"]
+
+
+def make_chunk(rng: random.Random):
+    kind = rng.random()
+    if kind < 0.3:
+        facts = rng.sample(FACTS, rng.randint(1, 3))
+        user = " and ".join(facts) + ". Can you help me plan the next steps for it this month?"
+        return f"User: {user}\nAssistant: Sure, here is a plan with a few milestones.", len(facts)
+    if kind < 0.55:
+        facts = 1 if rng.random() < 0.15 else 0
+        user = rng.choice(QUESTIONS) + (f". Context: {rng.choice(FACTS)}" if facts else "")
+        code = "\n".join(rng.choice(CODE) for _ in range(rng.randint(6, 20)))
+        return f"User: {user}\n```\n{code}\n```\nAssistant: The bug is on line 3.\n```\n{code}\n```", facts
+    if kind < 0.75:
+        facts = 1 if rng.random() < 0.1 else 0
+        user = rng.choice(QUESTIONS) + (f" ({rng.choice(FACTS)})" if facts else "")
+        logs = "\n".join(rng.choice(LOGS) for _ in range(rng.randint(5, 15)))
+        return f"User: {user}\n{logs}\nAssistant: The worker ran out of connections.", facts
+    if kind < 0.85:
+        return f"User: translate to french: {rng.choice(QUESTIONS)}\nAssistant: Voilà la traduction.", 0
+    return f"User: {rng.choice(QUESTIONS)}\nAssistant: It is a way to structure the answer.", 0
+
+
+class CountingHaiku:
+    """Counts extraction requests; returns no facts."""
+
+    def __init__(self):
+        self.calls = 0
+        self.messages = self
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        ids = re.findall(r'<conversation id="(\d+)">', kwargs["messages"][0]["content"])
+        body = {i: {} for i in ids} if ids else {}
+        return SimpleNamespace(content=[SimpleNamespace(text=json.dumps(body))])
+
+
+def count_calls(contents, model, threshold: float, mode: str) -> int:
+    chunk_triage._triage_model = model
+    chunk_triage.TRIAGE_THRESHOLD = threshold
+    chunk_triage.TRIAGE_MODE = mode
+    fact_extractor._haiku_limiter = AdaptiveLimiter("haiku-bench", 20, 20)
+    client = CountingHaiku()
+    chunks = [{"content": c} for c in contents]
+    asyncio.run(fact_extractor.extract_facts_stream(chunks, client, pack_token_budget=PACK_TOKEN_BUDGET))
+    return client.calls
+
+
+def report(name: str, model: TriageModel, contents, fact_counts) -> None:
+    baseline = count_calls(contents, model, 0, "pack")
+    print(f"\n{name}: {len(contents)} chunks, {sum(fact_counts)} facts, {baseline} calls without triage")
+    for threshold in THRESHOLDS:
+        stats = evaluate_triage(contents, fact_counts, threshold, model)
+        pack = count_calls(contents, model, threshold, "pack")
+        skip = count_calls(contents, model, threshold, "skip")
+        print(f"  threshold={threshold:.1f}  low value={stats['low_value'] / stats['chunks']:4.0%}  "
+              f"fact recall={stats['fact_recall']:5.1%}  "
+              f"calls pack={pack:4d} ({1 - pack / baseline:4.0%} saved)  "
+              f"skip={skip:4d} ({1 - skip / baseline:4.0%} saved)")
+
+
+def main():
+    rng = random.Random(46)
+    sample = [make_chunk(rng) for _ in range(SAMPLE_SIZE)]
+    contents = [content for content, _ in sample]
+    fact_counts = [facts for _, facts in sample]
+    half = SAMPLE_SIZE // 2
+
+    report("Built-in weights", TriageModel(), contents[half:], fact_counts[half:])
+    trained = fit_triage_model(contents[:half], [1 if n else 0 for n in fact_counts[:half]])
+    report("Trained classifier (held-out half)", trained, contents[half:], fact_counts[half:])
+
+
+if __name__ == "__main__":
+    main()
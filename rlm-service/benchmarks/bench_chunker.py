@@ -0,0 +1,91 @@
+"""
+Benchmark: single-scan chunker vs the old find()-based splitter
+
+Chunks one conversation of 0.25, 1 and 2 MB with both implementations and
+checks they produce identical chunks. The old splitter calls text.find four
+times per sentence, and each call can scan to the end of the text when a
+boundary kind is rare (here: no "? " or "! "), which makes it quadratic
+(expect a few minutes for the old version at 2 MB).
+
+Run from rlm-service/:
+    python -m benchmarks.bench_chunker
+"""
+
+import random
+import time
+
+from processors.conversation_chunker import chunk_conversations, estimate_tokens, format_conversation
+from processors.token_counter import chars_for_tokens
+
+SIZES_MB = [0.25, 1, 2]
+WORDS = ["the", "user", "wants", "to", "deploy", "a", "service", "with", "postgres", "and", "caching", "today"]
+
+
+def old_chunk_text(text: str, target_tokens: int = 2000, overlap_tokens: int = 200) -> list:
+    """The old splitter and concatenating grouper, for comparison."""
+    sentences = []
+    current_pos = 0
+    while current_pos < len(text):
+        next_period = text.find(". ", current_pos)
+        next_question = text.find("? ", current_pos)
+        next_exclaim = text.find("! ", current_pos)
+        next_newline = text.find("\n", current_pos)
+        boundaries = [b for b in [next_period, next_question, next_exclaim, next_newline] if b != -1]
+        if not boundaries:
+            sentences.append(text[current_pos:])
+            break
+        boundary = min(boundaries)
+        sentences.append(text[current_pos:boundary + 1])
+        current_pos = boundary + 1
+
+    chunks = []
+    current_chunk = ""
+    current_chunk_tokens = 0
+    for sentence in sentences:
+        sentence_tokens = estimate_tokens(sentence)
+        if current_chunk_tokens + sentence_tokens > target_tokens and current_chunk:
+            chunks.append(current_chunk)
+            overlap_chars = chars_for_tokens(overlap_tokens, current_chunk)
+            overlap_text = current_chunk[-overlap_chars:] if len(current_chunk) > overlap_chars else current_chunk
+            current_chunk = overlap_text + sentence
+            current_chunk_tokens = estimate_tokens(current_chunk)
+        else:
+            current_chunk += sentence
+            current_chunk_tokens += sentence_tokens
+    if current_chunk:
+        chunks.append(current_chunk)
+    return chunks
+
+
+def make_conversation(megabytes: float, seed: int = 3) -> dict:
+    rng = random.Random(seed)
+    messages = []
+    size = 0
+    while size < megabytes * 1_000_000:
+        sentences = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 20))) for _ in range(rng.randint(3, 40))]
+        content = ". ".join(sentences) + "."
+        messages.append({"role": "user" if len(messages) % 2 == 0 else "assistant", "content": content})
+        size += len(content)
+    return {"id": "big", "title": "Big conversation", "messages": messages, "created_at": "2025-01-01T00:00:00"}
+
+
+def main():
+    print()
+    for megabytes in SIZES_MB:
+        conversation = make_conversation(megabytes)
+
+        start = time.perf_counter()
+        new = [c["content"] for c in chunk_conversations([conversation])]
+        new_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        old = old_chunk_text(format_conversation(conversation))
+        old_s = time.perf_counter() - start
+
+        assert new == old
+        print(f"{megabytes:5.2f} MB -> {len(new):5d} chunks  single-scan {new_s:6.2f}s  "
+              f"find-based {old_s:7.2f}s  speedup x{old_s / new_s:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: sequential vs concurrent chunk embed/insert + fact extraction stages
+
+Runs the full pass enrichment stages on a synthetic 5,000-chunk user with
+mock providers. Titan calls block their worker thread (like boto3 does);
+Supabase inserts and Haiku calls are async sleeps. Latencies are realistic values
+scaled down by SCALE so the run takes seconds, not hours.
+
+Run from rlm-service/:
+    python -m benchmarks.bench_concurrent_stages
+"""
+
+import asyncio
+import tempfile
+import time
+
+from processors import embedding_generator, fact_extractor, full_pass
+from processors.cost_tracker import CostTracker
+from processors.pipeline_checkpoint import PipelineCheckpoint
+
+CHUNKS = 5000
+SCALE = 0.002
+TITAN_LATENCY = 0.080 * SCALE   # per embedding call (blocking)
+INSERT_LATENCY = 0.150 * SCALE  # per 100-row bulk insert (with vectors)
+HAIKU_LATENCY = 3.000 * SCALE   # per extraction call
+
+CHUNK_TEXTS = [f"chunk {i} " + "the user talked about work " * 60 for i in range(CHUNKS)]
+
+
+def mock_embed_text(text, dimensions=768, cost_tracker=None):
+    time.sleep(TITAN_LATENCY)
+    if cost_tracker:
+        cost_tracker.record_embedding(len(text))
+    return [0.0] * dimensions
+
+
+async def mock_save_chunks_batch(user_id, chunks, embeddings=None):
+    await asyncio.sleep(INSERT_LATENCY)
+
+
+async def mock_delete_user_chunks(user_id):
+    await asyncio.sleep(INSERT_LATENCY)
+
+
+async def mock_extract_facts(chunk_content, client, cost_tracker=None):
+    await asyncio.sleep(HAIKU_LATENCY)
+    return {"preferences": [chunk_content[:12]], "projects": [], "dates": [], "beliefs": [], "decisions": []}
+
+
+def install_mocks():
+    embedding_generator.embed_text = mock_embed_text
+    full_pass.save_chunks_batch = mock_save_chunks_batch
+    full_pass.delete_user_chunks = mock_delete_user_chunks
+    fact_extractor.extract_facts_from_chunk = mock_extract_facts
+    fact_extractor.FACT_PACK_TOKEN_BUDGET = 0  # one mocked call per chunk
+
+
+def fresh_checkpoint(tmpdir: str, name: str) -> PipelineCheckpoint:
+    return PipelineCheckpoint("bench-user", name, path=f"{tmpdir}/{name}.db")
+
+
+async def stream(items):
+    for item in items:
+        yield item
+
+
+async def timed(coro) -> float:
+    start = time.perf_counter()
+    await coro
+    return time.perf_counter() - start
+
+
+async def main():
+    install_mocks()
+    chunks = [{"content": text} for text in CHUNK_TEXTS]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        progress = full_pass.StageProgress({"chunks": CHUNKS, "facts": CHUNKS}, report_every=2.0)
+        embed_s = await timed(full_pass._save_chunks_stage(
+            "bench-user", stream(chunks), fresh_checkpoint(tmpdir, "embed"), CostTracker(), progress))
+        facts_s = await timed(full_pass._facts_stage(
+            stream(chunks), None, fresh_checkpoint(tmpdir, "facts"), CostTracker(), progress))
+        concurrent_s = await timed(full_pass.run_enrichment_stages(
+            "bench-user", chunks, None, fresh_checkpoint(tmpdir, "both"), CostTracker()))
+
+    sequential_s = embed_s + facts_s
+    print(f"\nchunks={CHUNKS} embed_concurrency={embedding_generator.EMBED_CONCURRENCY} "
+          f"fact_concurrency={fact_extractor.FACT_EXTRACTION_CONCURRENCY}")
+    print(f"embed+insert alone:     {embed_s:6.2f}s")
+    print(f"fact stage alone:       {facts_s:6.2f}s")
+    print(f"sequential (sum):       {sequential_s:6.2f}s")
+    print(f"concurrent:             {concurrent_s:6.2f}s")
+    print(f"saved {sequential_s - concurrent_s:.2f}s (shorter stage: {min(embed_s, facts_s):.2f}s)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
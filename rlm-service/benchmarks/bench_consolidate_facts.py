@@ -0,0 +1,95 @@
+"""
+Benchmark: hash-indexed consolidate_facts vs the old list-scan version
+
+Builds synthetic per-chunk extraction results totalling 1k, 10k and 100k
+facts (including repeats and upper-case variants) and times both
+implementations. The list-scan version is quadratic, so it only runs at
+100k with --full (expect minutes).
+
+Run from rlm-service/:
+    python -m benchmarks.bench_consolidate_facts [--full]
+"""
+
+import contextlib
+import io
+import random
+import sys
+import time
+
+from processors.fact_extractor import consolidate_facts
+
+SIZES = [1_000, 10_000, 100_000]
+FACTS_PER_CHUNK = 10
+
+
+def quadratic_consolidate(all_facts):
+    out = {"preferences": [], "projects": [], "dates": [], "beliefs": [], "decisions": []}
+    for facts in all_facts:
+        for pref in facts.get("preferences", []):
+            if pref and pref not in out["preferences"]:
+                out["preferences"].append(pref)
+        for proj in facts.get("projects", []):
+            if proj and proj.get("name", "").lower() not in [p.get("name", "").lower() for p in out["projects"]]:
+                out["projects"].append(proj)
+        for d in facts.get("dates", []):
+            if d and d.get("event", "").lower() not in [x.get("event", "").lower() for x in out["dates"]]:
+                out["dates"].append(d)
+        for belief in facts.get("beliefs", []):
+            if belief and belief not in out["beliefs"]:
+                out["beliefs"].append(belief)
+        for dec in facts.get("decisions", []):
+            if dec and dec.get("decision", "").lower() not in [x.get("decision", "").lower() for x in out["decisions"]]:
+                out["decisions"].append(dec)
+    out["total_count"] = sum(len(v) for v in out.values())
+    return out
+
+
+def make_facts(total: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    unique = int(total * 0.66)
+
+    def text(kind: str) -> str:
+        s = f"user {kind} item {rng.randrange(unique)} about their work and tools"
+        return s.upper() if rng.random() < 0.1 else s
+
+    chunks = []
+    for _ in range(total // FACTS_PER_CHUNK):
+        facts = {"preferences": [], "projects": [], "dates": [], "beliefs": [], "decisions": []}
+        for _ in range(FACTS_PER_CHUNK):
+            category = rng.choice(list(facts))
+            if category in ("preferences", "beliefs"):
+                facts[category].append(text(category))
+            elif category == "projects":
+                facts[category].append({"name": text("project"), "description": "d", "details": "x"})
+            elif category == "dates":
+                facts[category].append({"event": text("event"), "date": "2025-01-01"})
+            else:
+                facts[category].append({"decision": text("decision"), "context": "c"})
+        chunks.append(facts)
+    return chunks
+
+
+def timed(fn, facts):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = fn(facts)
+        return result, time.perf_counter() - start
+
+
+def main():
+    full = "--full" in sys.argv
+    print()
+    for size in SIZES:
+        facts = make_facts(size)
+        new, new_s = timed(consolidate_facts, facts)
+        if size < 100_000 or full:
+            old, old_s = timed(quadratic_consolidate, facts)
+            assert old == new
+            old_col = f"list-scan {old_s:8.3f}s  speedup x{old_s / new_s:,.0f}"
+        else:
+            old_col = "list-scan   (skipped, pass --full)"
+        print(f"facts={size:7,d} unique={new['total_count']:7,d}  hash-indexed {new_s:7.3f}s  {old_col}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark: ConversationStore vs list-of-dicts memory per message
+
+Builds a synthetic export shaped like a parsed ChatGPT history and measures
+the heap cost of holding it as dicts versus a ConversationStore.
+
+Run from rlm-service/:
+    python -m benchmarks.bench_conversation_store
+"""
+
+import random
+import tracemalloc
+
+from processors.conversation_store import ConversationStore
+
+CONVERSATIONS = 2000
+MEAN_MESSAGES = 24
+WORDS = "the user asked about deploying a next app with supabase auth and vector search on render".split()
+
+
+def make_conversations(seed: int = 7) -> list:
+    rng = random.Random(seed)
+    conversations = []
+    for i in range(CONVERSATIONS):
+        messages = []
+        for j in range(max(2, int(rng.expovariate(1 / MEAN_MESSAGES)))):
+            # Short user turns, longer assistant turns
+            length = rng.randint(5, 60) if j % 2 == 0 else rng.randint(40, 400)
+            messages.append({
+                "role": "user" if j % 2 == 0 else "assistant",
+                "content": " ".join(rng.choices(WORDS, k=length)),
+                "create_time": 1.7e9 + i * 3600 + j,
+            })
+        conversations.append({
+            "id": f"conv-{i:05d}",
+            "title": f"Conversation {i}",
+            "createdAt": "2025-06-01T12:00:00+00:00",
+            "messages": messages,
+        })
+    return conversations
+
+
+def measure(build) -> int:
+    tracemalloc.start()
+    obj = build()
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return current
+
+
+def main():
+    template = make_conversations()
+    message_count = sum(len(c["messages"]) for c in template)
+    text_bytes = sum(len(m["content"].encode()) for c in template for m in c["messages"])
+
+    dict_bytes = measure(lambda: make_conversations())
+    store_bytes = measure(lambda: ConversationStore.from_conversations(template))
+
+    print(f"conversations={CONVERSATIONS} messages={message_count} text={text_bytes / 1e6:.1f} MB")
+    print(f"list-of-dicts:     {dict_bytes / 1e6:8.1f} MB  ({dict_bytes / message_count:7.1f} B/msg)")
+    print(f"ConversationStore: {store_bytes / 1e6:8.1f} MB  ({store_bytes / message_count:7.1f} B/msg)")
+    overhead_dicts = (dict_bytes - text_bytes) / message_count
+    overhead_store = (store_bytes - text_bytes) / message_count
+    print(f"per-message overhead beyond text: {overhead_dicts:.1f} B -> {overhead_store:.1f} B "
+          f"({overhead_dicts / max(overhead_store, 1):.1f}x)")
+    print(f"total reduction: {dict_bytes / store_bytes:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark: near-duplicate collapsing ahead of hierarchical_reduce
+
+Generates consolidated facts where each underlying fact appears under
+several phrasings (as happens when the same preference comes up across many
+conversations), then reports the collapse ratio, runtime and the Haiku
+reduction calls and input tokens avoided at the full pass threshold.
+
+Run from rlm-service/:
+    python -m benchmarks.bench_fact_dedup
+"""
+
+import random
+import time
+
+from processors.fact_dedup import collapse_near_duplicates
+from processors.full_pass import REDUCE_MAX_TOKENS
+
+SIZES = [10_000, 50_000, 150_000]
+PHRASINGS = [
+    "{s} {o}", "User {s} {o}", "The user {s} {o}", "{s} using {o}", "User really {s} {o}",
+]
+SUBJECTS = ["prefers", "likes", "uses", "values", "avoids", "is learning", "works with"]
+OBJECTS = ["TypeScript", "Rust", "dark mode", "Postgres", "tabs", "Next.js", "Tailwind", "vim", "Supabase",
+           "long walks", "async standups", "pair programming", "strict typing", "TDD", "Figma", "Linear"]
+
+
+def make_facts(total: int, seed: int = 9) -> dict:
+    rng = random.Random(seed)
+    base = [(s, f"{o} for {rng.choice(OBJECTS).lower()} work {i}")
+            for i in range(total // 3) for s in [rng.choice(SUBJECTS)] for o in [rng.choice(OBJECTS)]]
+    preferences, beliefs = [], []
+    seen = set()
+    while len(preferences) + len(beliefs) < total:
+        s, o = rng.choice(base)
+        text = rng.choice(PHRASINGS).format(s=s, o=o)
+        if text in seen:  # consolidate_facts already removed exact repeats
+            continue
+        seen.add(text)
+        (preferences if rng.random() < 0.7 else beliefs).append(text)
+    return {"preferences": preferences, "projects": [], "dates": [], "beliefs": beliefs, "decisions": [],
+            "total_count": len(preferences) + len(beliefs)}
+
+
+def main():
+    print()
+    for size in SIZES:
+        facts = make_facts(size)
+        start = time.perf_counter()
+        _, stats = collapse_near_duplicates(facts, reduce_max_tokens=REDUCE_MAX_TOKENS)
+        elapsed = time.perf_counter() - start
+        print(f"facts={size:7,d} -> {stats['facts_after']:7,d} ({stats['collapsed'] / size:4.0%} collapsed) "
+              f"in {elapsed:5.2f}s  reduction calls avoided={stats['reduce_calls_avoided']:3d} "
+              f"input tokens avoided={stats['reduce_tokens_avoided']:,d}")
+
+
+if __name__ == "__main__":
+    main()
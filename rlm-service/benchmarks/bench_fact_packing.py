@@ -0,0 +1,88 @@
+"""
+Benchmark: Haiku calls and input tokens with and without request packing
+
+Chunks synthetic histories with the real chunker and runs
+extract_facts_parallel against a mock client that counts requests and input
+tokens (chars // 4, prompt included). Three size mixes: mostly one-exchange
+chats, a typical mix, and mostly long working sessions.
+
+Run from rlm-service/:
+    python -m benchmarks.bench_fact_packing
+"""
+
+import asyncio
+import json
+import random
+import re
+from types import SimpleNamespace
+
+from processors import chunk_triage, fact_extractor
+from processors.conversation_chunker import chunk_conversations
+
+CONVERSATIONS = 1500
+WORDS = "the user asked about deploying a next app with supabase auth and vector search on render".split()
+# (share of conversations, mean exchanges) per mix
+MIXES = {
+    "short-heavy": [(0.75, 1), (0.2, 4), (0.05, 20)],
+    "typical":     [(0.45, 1), (0.4, 5), (0.15, 25)],
+    "long-heavy":  [(0.15, 1), (0.45, 8), (0.4, 40)],
+}
+PACKED_IDS = re.compile(r'<conversation id="(\d+)">')
+
+
+class CountingHaiku:
+    def __init__(self):
+        self.calls = 0
+        self.input_tokens = 0
+        self.messages = self
+
+    async def create(self, **kwargs):
+        prompt = kwargs["messages"][0]["content"]
+        self.calls += 1
+        self.input_tokens += len(prompt) // 4
+        ids = PACKED_IDS.findall(prompt)
+        empty = {"preferences": [], "projects": [], "dates": [], "beliefs": [], "decisions": []}
+        body = {i: empty for i in ids} if ids else empty
+        return SimpleNamespace(content=[SimpleNamespace(text=json.dumps(body))])
+
+
+def make_conversations(mix, seed: int = 3) -> list:
+    rng = random.Random(seed)
+    weights = [share for share, _ in mix]
+    conversations = []
+    for i in range(CONVERSATIONS):
+        _, mean = rng.choices(mix, weights=weights)[0]
+        messages = []
+        for j in range(max(1, int(rng.expovariate(1 / mean))) * 2):
+            length = int(rng.lognormvariate(3.0, 0.8)) if j % 2 == 0 else int(rng.lognormvariate(4.6, 0.7))
+            messages.append({
+                "role": "user" if j % 2 == 0 else "assistant",
+                "content": " ".join(rng.choices(WORDS, k=max(1, length))),
+            })
+        conversations.append({"id": f"conv-{i}", "title": f"Conversation {i}", "messages": messages})
+    return conversations
+
+
+async def run(chunks, budget):
+    client = CountingHaiku()
+    await fact_extractor.extract_facts_parallel(chunks, client, pack_token_budget=budget)
+    return client.calls, client.input_tokens
+
+
+async def main():
+    chunk_triage.TRIAGE_THRESHOLD = 0  # packing alone; see bench_chunk_triage
+    budget = fact_extractor.FACT_PACK_TOKEN_BUDGET or 4000
+    print(f"\nconversations={CONVERSATIONS} pack_budget={budget} max_chunks={fact_extractor.FACT_PACK_MAX_CHUNKS}")
+    for name, mix in MIXES.items():
+        chunks = chunk_conversations(make_conversations(mix))
+        small = sum(1 for c in chunks if c["token_count"] < 500)
+        base_calls, base_tokens = await run(chunks, 0)
+        packed_calls, packed_tokens = await run(chunks, budget)
+        print(f"{name:12s} chunks={len(chunks):5d} (<500 tok: {small / len(chunks):4.0%})  "
+              f"calls {base_calls:5d} -> {packed_calls:5d} ({1 - packed_calls / base_calls:4.0%} fewer)  "
+              f"input tokens {base_tokens / 1e6:5.2f}M -> {packed_tokens / 1e6:5.2f}M "
+              f"({1 - packed_tokens / base_tokens:4.0%} fewer)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
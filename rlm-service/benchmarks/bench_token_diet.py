@@ -0,0 +1,58 @@
+"""
+Benchmark: fact-extraction input tokens with and without the diet rendering
+
+Chunks synthetic histories (short user turns, long assistant answers, some
+with code blocks) with the real chunker and reports the medium-chunk tokens
+sent to extraction in full and with render_for_extraction, plus render time.
+
+Run from rlm-service/:
+    python -m benchmarks.bench_token_diet
+"""
+
+import random
+import time
+
+from processors.conversation_chunker import chunk_conversations
+from processors.token_counter import count_tokens
+from processors.token_diet import render_for_extraction
+
+CONVERSATIONS = 1000
+WORDS = "the user asked about deploying a next app with supabase auth and vector search on render".split()
+CODE = ["def handler(event):", "    rows = db.query(sql)", "    return rows", "const app = express();",
+        "app.get('/', (req, res) => res.send('ok'));", "SELECT id FROM chunks WHERE user_id = $1;"]
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choices(WORDS, k=words)).capitalize() + "."
+
+
+def make_conversations(seed: int = 47) -> list:
+    rng = random.Random(seed)
+    conversations = []
+    for i in range(CONVERSATIONS):
+        messages = []
+        for _ in range(max(1, int(rng.expovariate(1 / 6)))):
+            messages.append({"role": "user", "content": " ".join(sentence(rng, rng.randint(6, 20))
+                                                                 for _ in range(rng.randint(1, 3)))})
+            answer = [sentence(rng, rng.randint(8, 25)) for _ in range(rng.randint(3, 15))]
+            if rng.random() < 0.4:
+                code = "\n".join(rng.choice(CODE) for _ in range(rng.randint(5, 40)))
+                answer.insert(rng.randint(1, len(answer)), f"\n```python\n{code}\n```\n")
+            messages.append({"role": "assistant", "content": " ".join(answer)})
+        conversations.append({"id": f"conv-{i}", "title": f"Conversation {i}", "messages": messages})
+    return conversations
+
+
+def main():
+    chunks = chunk_conversations(make_conversations())
+    before = sum(count_tokens(c["content"]) for c in chunks)
+    start = time.perf_counter()
+    rendered = [render_for_extraction(c["content"]) for c in chunks]
+    elapsed = time.perf_counter() - start
+    after = sum(count_tokens(text) for text in rendered)
+    print(f"\nchunks={len(chunks)}  extraction input tokens {before / 1e6:5.2f}M -> {after / 1e6:5.2f}M "
+          f"({1 - after / before:4.0%} fewer)  render time {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
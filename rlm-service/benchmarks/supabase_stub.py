@@ -0,0 +1,92 @@
+"""
+In-memory stand-in for the conversation_chunks PostgREST endpoints
+
+Served through httpx.MockTransport so the real request code runs unchanged.
+Counts round trips and request payload bytes, and can add a fixed latency
+per request to model the network.
+
+Handles:
+    GET   /rest/v1/conversation_chunks   (user_id, embedding=is.null, id=gt., order=id.asc,
+                                          select, limit, offset)
+    HEAD  /rest/v1/conversation_chunks   (Prefer: count=exact -> Content-Range)
+    PATCH /rest/v1/conversation_chunks?id=eq.<id>
+    POST  /rest/v1/rpc/update_chunk_embeddings
+"""
+
+import asyncio
+import json
+from typing import Dict, List, Optional
+
+import httpx
+
+# Captured at import: callers patch httpx.AsyncClient itself with client_factory()
+_AsyncClient = httpx.AsyncClient
+
+
+class SupabaseStub:
+    """Fake conversation_chunks table behind an httpx transport."""
+
+    def __init__(self, rows: Optional[List[Dict]] = None, latency: float = 0.0):
+        # id -> {"id", "user_id", "content", "embedding"}
+        self.rows: Dict[str, Dict] = {r["id"]: dict(r) for r in rows or []}
+        self.latency = latency
+        self.requests = 0
+        self.request_bytes = 0
+
+    def client_factory(self):
+        """Drop-in replacement for httpx.AsyncClient (patch module.httpx.AsyncClient)."""
+        transport = httpx.MockTransport(self.handle)
+        return lambda *args, **kwargs: _AsyncClient(transport=transport)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        self.request_bytes += len(request.content) + len(str(request.url))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        path = request.url.path
+        params = request.url.params
+        if path == "/rest/v1/rpc/update_chunk_embeddings" and request.method == "POST":
+            body = json.loads(request.content)
+            updated = 0
+            for chunk_id, literal in zip(body["chunk_ids"], body["embeddings"]):
+                if chunk_id in self.rows:
+                    self.rows[chunk_id]["embedding"] = json.loads(literal)
+                    updated += 1
+            return httpx.Response(200, json=updated)
+
+        if path == "/rest/v1/conversation_chunks" and request.method == "PATCH":
+            chunk_id = params["id"].removeprefix("eq.")
+            self.rows[chunk_id]["embedding"] = json.loads(request.content)["embedding"]
+            return httpx.Response(204)
+
+        if path == "/rest/v1/conversation_chunks" and request.method == "GET":
+            return httpx.Response(200, json=self.select(params))
+
+        if path == "/rest/v1/conversation_chunks" and request.method == "HEAD":
+            count = len(self.filter(params))
+            return httpx.Response(200, headers={"Content-Range": f"*/{count}"})
+
+        return httpx.Response(404)
+
+    def filter(self, params) -> List[Dict]:
+        # Rows come back in id order (what order=id.asc asks for; offset paging has no order)
+        rows = sorted(self.rows.values(), key=lambda r: r["id"])
+        if "user_id" in params:
+            rows = [r for r in rows if r["user_id"] == params["user_id"].removeprefix("eq.")]
+        if params.get("embedding") == "is.null":
+            rows = [r for r in rows if r["embedding"] is None]
+        if params.get("id", "").startswith("gt."):
+            after = params["id"].removeprefix("gt.")
+            rows = [r for r in rows if r["id"] > after]
+        return rows
+
+    def select(self, params) -> List[Dict]:
+        rows = self.filter(params)
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", len(rows)))
+        columns = params.get("select", "id,content").split(",")
+        return [{c: r[c] for c in columns} for r in rows[offset:offset + limit]]
+
+    def missing_embeddings(self) -> int:
+        return sum(1 for r in self.rows.values() if r["embedding"] is None)
@@ -7,6 +7,7 @@ import json
 import httpx
 import asyncio
 import gzip
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from typing import Optional, List
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Response
@@ -20,7 +21,18 @@ from prompt_builder import PromptBuilder
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="SoulPrint RLM Service")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the job queue for the lifetime of the app (see start_job_queue)."""
+    await start_job_queue()
+    try:
+        yield
+    finally:
+        await stop_job_queue()
+
+
+app = FastAPI(title="SoulPrint RLM Service", lifespan=lifespan)
 
 # CORS for Next.js
 app.add_middleware(
@@ -36,6 +48,10 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 ALERT_WEBHOOK = os.getenv("ALERT_WEBHOOK")  # Optional: for failure alerts
+# /query input budget: retrieved conversation context gets what the profile,
+# history and message leave of QUERY_PROMPT_TOKENS, capped at QUERY_CONTEXT_TOKENS
+QUERY_PROMPT_TOKENS = int(os.getenv("QUERY_PROMPT_TOKENS", "16000"))
+QUERY_CONTEXT_TOKENS = int(os.getenv("QUERY_CONTEXT_TOKENS", "4000"))
 
 
 class QueryRequest(BaseModel):
@@ -84,6 +100,8 @@ async def get_conversation_chunks(user_id: str, recent_only: bool = True) -> Lis
         query = f"{SUPABASE_URL}/rest/v1/conversation_chunks"
         params = {
             "user_id": f"eq.{user_id}",
+            "chunk_tier": "eq.medium",  # micro/macro tiers overlap the medium chunks
+            "duplicate_of": "is.null",  # repeated content points at an earlier chunk
             "select": "conversation_id,title,content,message_count,created_at",
             "order": "created_at.desc",
             "limit": "100",
@@ -106,11 +124,13 @@ async def get_conversation_chunks(user_id: str, recent_only: bool = True) -> Lis
         return response.json()
 
 
-async def search_chunks_semantic(user_id: str, query: str, match_count: int = 8, threshold: float = 0.3) -> List[dict]:
+async def search_chunks_semantic(user_id: str, query: str, match_count: int = 8, threshold: float = 0.3,
+                                 tier: Optional[str] = None) -> List[dict]:
     """Search conversation chunks by semantic similarity using Titan Embed v2 embeddings.
 
     Uses the embed_text() function from embedding_generator to create a query embedding,
-    then calls the match_conversation_chunks Supabase RPC function for cosine similarity search.
+    then calls the match_conversation_chunks Supabase RPC function for cosine similarity search
+    (match_conversation_chunks_by_tier when a tier is given).
 
     Falls back to get_conversation_chunks() (timestamp sort) if embedding or RPC fails.
     """
@@ -120,16 +140,22 @@ async def search_chunks_semantic(user_id: str, query: str, match_count: int = 8,
         # Generate query embedding (768-dim Titan Embed v2)
         query_embedding = embed_text(query)
 
+        params = {
+            "query_embedding": query_embedding,
+            "match_user_id": user_id,
+            "match_count": match_count,
+            "match_threshold": threshold,
+        }
+        rpc = "match_conversation_chunks"
+        if tier:
+            rpc = "match_conversation_chunks_by_tier"
+            params["match_tier"] = tier
+
         # Call Supabase RPC for vector similarity search
         async with httpx.AsyncClient() as client:
             response = await client.post(
-                f"{SUPABASE_URL}/rest/v1/rpc/match_conversation_chunks",
-                json={
-                    "query_embedding": query_embedding,
-                    "match_user_id": user_id,
-                    "match_count": match_count,
-                    "match_threshold": threshold,
-                },
+                f"{SUPABASE_URL}/rest/v1/rpc/{rpc}",
+                json=params,
                 headers={
                     "apikey": SUPABASE_SERVICE_KEY,
                     "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
@@ -144,7 +170,7 @@ async def search_chunks_semantic(user_id: str, query: str, match_count: int = 8,
                 return await get_conversation_chunks(user_id, recent_only=True)
 
             chunks = response.json()
-            print(f"[SemanticSearch] Found {len(chunks)} relevant chunks for user {user_id}")
+            print(f"[SemanticSearch] Found {len(chunks)} relevant {tier or 'medium'} chunks for user {user_id}")
             return chunks
 
     except Exception as e:
@@ -152,6 +178,56 @@ async def search_chunks_semantic(user_id: str, query: str, match_count: int = 8,
         return await get_conversation_chunks(user_id, recent_only=True)
 
 
+async def search_chunks_for_budget(user_id: str, query: str, token_budget: int, max_matches: int = 8,
+                                   threshold: float = 0.3) -> List[dict]:
+    """Semantic search in the smallest chunk tier that returns enough matches (see chunk_tier_plan).
+
+    Falls through to larger tiers when a tier has too few matches, e.g. imports
+    from before micro/macro tiers existed, which only have medium chunks.
+    """
+    from processors.conversation_chunker import MIN_TIER_MATCHES, chunk_tier_plan
+
+    best = []
+    for tier, match_count in chunk_tier_plan(token_budget, max_matches):
+        chunks = await search_chunks_semantic(user_id, query, match_count, threshold, tier=tier)
+        if len(chunks) >= min(MIN_TIER_MATCHES, match_count):
+            return chunks
+        best = best or chunks
+    return best
+
+
+def query_context_budget(request: "QueryRequest") -> int:
+    """Tokens left for retrieved conversation context once the rest of the /query prompt is counted."""
+    from processors.token_counter import count_tokens
+    fixed_parts = [request.message, request.soulprint_text or "", request.web_search_context or ""]
+    fixed_parts += [str(v) for v in (request.sections or {}).values()]
+    fixed_parts += [str(h.get("content", "")) for h in (request.history or [])[-10:]]
+    return max(0, min(QUERY_CONTEXT_TOKENS, QUERY_PROMPT_TOKENS - sum(count_tokens(p) for p in fixed_parts)))
+
+
+def format_chunk_context(chunks: List[dict], token_budget: int) -> str:
+    """Render retrieved chunks for the prompt, truncating to token_budget in total."""
+    from processors.token_counter import chars_for_tokens, count_tokens
+
+    conversation_context = ""
+    remaining = token_budget
+    for chunk in chunks:
+        title = chunk.get('title', 'Untitled')
+        similarity = chunk.get('similarity', 0)
+        content = chunk.get('content', '')
+        header = f"\n---\n**{title}** (relevance: {similarity:.2f})\n"
+        remaining -= count_tokens(header)
+        if remaining <= 0:
+            break
+        content_tokens = count_tokens(content)
+        if content_tokens > remaining:
+            content = content[:chars_for_tokens(remaining, content)]
+            content_tokens = remaining
+        conversation_context += header + content
+        remaining -= content_tokens
+    return conversation_context
+
+
 async def alert_failure(error: str, user_id: str, message: str):
     """Alert Drew about failures"""
     if not ALERT_WEBHOOK:
@@ -636,32 +712,60 @@ async def process_full(request: ProcessFullRequest, background_tasks: Background
     }
 
 
+async def start_job_queue():
+    """Register background job handlers and start the persistent job queue.
+
+    Jobs left running by a previous process (deploy, crash) are re-enqueued.
+    Full pass checkpoints must outlive the process too, so /retry-full-pass
+    can resume after a deploy, and so must the embedding cache, which exists
+    for exactly those re-imports and retries.
+    """
+    from processors.embedding_cache import EMBED_CACHE_PATH
+    from processors.job_queue import get_job_queue, require_persistent_path
+    from processors.pipeline_checkpoint import CHECKPOINT_DB_PATH
+    from processors.streaming_import import process_import_streaming, trigger_full_pass
+
+    require_persistent_path(CHECKPOINT_DB_PATH, "CHECKPOINT_DB_PATH")
+    if EMBED_CACHE_PATH:
+        require_persistent_path(EMBED_CACHE_PATH, "EMBED_CACHE_PATH")
+    queue = get_job_queue()
+    queue.register("import", process_import_streaming)
+    queue.register("full_pass", trigger_full_pass)
+    await queue.start()
+
+
+async def stop_job_queue():
+    """Stop job workers. Running jobs are re-enqueued on next startup."""
+    from processors.job_queue import get_job_queue
+    await get_job_queue().stop()
+
+
 @app.post("/import-full")
 async def import_full(request: ImportFullRequest):
     """
     Accept streaming import job, return 202 Accepted immediately.
-    Processing happens in background via asyncio.create_task.
+    Processing happens in background on the persistent job queue
+    (bounded worker slots, survives restarts). Poll /jobs/{job_id} for status.
 
-    DO NOT use BackgroundTasks for long jobs (>60s) -- fire asyncio task instead.
     The streaming import pipeline downloads from Supabase Storage, parses with
     ijson (constant memory), and generates a quick pass soulprint.
     """
-    from processors.streaming_import import process_import_streaming
+    from processors.job_queue import get_job_queue
 
-    # Fire-and-forget long-running job
-    asyncio.create_task(process_import_streaming(
-        user_id=request.user_id,
-        storage_path=request.storage_path,
-        file_type=request.file_type,
-    ))
+    job_id = get_job_queue().enqueue("import", {
+        "user_id": request.user_id,
+        "storage_path": request.storage_path,
+        "file_type": request.file_type,
+    })
 
-    print(f"[import-full] Accepted import job for user {request.user_id}: {request.storage_path}")
+    print(f"[import-full] Accepted import job {job_id} for user {request.user_id}: {request.storage_path}")
 
     return JSONResponse(
         status_code=202,
         content={
             "status": "accepted",
             "message": "Import processing started",
+            "job_id": job_id,
         },
     )
 
@@ -669,8 +773,8 @@ async def import_full(request: ImportFullRequest):
 @app.post("/retry-full-pass")
 async def retry_full_pass(request: RetryFullPassRequest):
     """Re-trigger a failed full pass using the original storage path.
-    Returns 202 Accepted immediately -- processing happens in background."""
-    from processors.streaming_import import trigger_full_pass
+    Returns 202 Accepted immediately -- processing happens on the job queue."""
+    from processors.job_queue import get_job_queue
 
     # Reset status
     await update_user_profile(request.user_id, {
@@ -678,22 +782,54 @@ async def retry_full_pass(request: RetryFullPassRequest):
         "full_pass_error": None,
     })
 
-    # Fire-and-forget
-    asyncio.create_task(trigger_full_pass(
-        user_id=request.user_id,
-        storage_path=request.storage_path,
-        conversation_count=0,  # Unknown on retry, full_pass will re-download and count
-        file_type=request.file_type,
-    ))
+    job_id = get_job_queue().enqueue("full_pass", {
+        "user_id": request.user_id,
+        "storage_path": request.storage_path,
+        "conversation_count": 0,  # Unknown on retry, full_pass will re-download and count
+        "file_type": request.file_type,
+    })
 
-    print(f"[retry-full-pass] Accepted retry for user {request.user_id}")
+    print(f"[retry-full-pass] Accepted retry job {job_id} for user {request.user_id}")
 
     return JSONResponse(
         status_code=202,
-        content={"status": "accepted", "message": "Full pass retry started"},
+        content={"status": "accepted", "message": "Full pass retry started", "job_id": job_id},
     )
 
 
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Background job state, progress, queue wait and run time."""
+    from processors.job_queue import get_job_queue
+
+    status = get_job_queue().status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job. Running jobs stop at their next await."""
+    from processors.job_queue import get_job_queue
+
+    queue = get_job_queue()
+    if queue.status(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not queue.cancel(job_id):
+        raise HTTPException(status_code=409, detail="Job is not queued or running")
+    return {"status": "cancelling", "job_id": job_id}
+
+
+@app.get("/limiters")
+async def limiter_stats():
+    """Current AIMD concurrency limit, throughput and throttle counts per provider."""
+    from processors.embedding_generator import get_embed_limiter
+    from processors.fact_extractor import get_haiku_limiter
+
+    return {"haiku": get_haiku_limiter().stats(), "titan": get_embed_limiter().stats()}
+
+
 @app.get("/health")
 async def health():
     """Health check endpoint"""
@@ -707,16 +843,14 @@ async def query(request: QueryRequest):
     start = time.time()
     
     try:
-        # Fetch conversation chunks via semantic search
-        chunks = await search_chunks_semantic(request.user_id, request.message, match_count=8, threshold=0.3)
+        # Retrieved context gets the input budget the rest of the prompt leaves
+        context_budget = query_context_budget(request)
+
+        # Fetch conversation chunks via semantic search, in the tier that fits the budget
+        chunks = await search_chunks_for_budget(request.user_id, request.message, context_budget, max_matches=8, threshold=0.3)
 
         # Build context from semantically-matched chunks
-        conversation_context = ""
-        for chunk in chunks[:10]:  # Top 10 most relevant
-            title = chunk.get('title', 'Untitled')
-            similarity = chunk.get('similarity', 0)
-            content = chunk.get('content', '')[:2000]  # Truncate long chunks
-            conversation_context += f"\n---\n**{title}** (relevance: {similarity:.2f})\n{content}"
+        conversation_context = format_chunk_context(chunks, context_budget)
 
         # Resolve AI name
         ai_name = request.ai_name or "SoulPrint"
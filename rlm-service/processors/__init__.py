@@ -4,6 +4,7 @@ Background processing modules for full pass pipeline
 """
 
 from .sample import sample_conversations, format_conversations_for_prompt
+from .conversation_store import ConversationStore
 from .quick_pass import generate_quick_pass, QUICK_PASS_SYSTEM_PROMPT
 
 __all__ = [
@@ -11,4 +12,5 @@ __all__ = [
     'format_conversations_for_prompt',
     'generate_quick_pass',
     'QUICK_PASS_SYSTEM_PROMPT',
+    'ConversationStore',
 ]
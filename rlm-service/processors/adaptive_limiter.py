@@ -0,0 +1,210 @@
+"""
+Adaptive Limiter
+AIMD (additive-increase, multiplicative-decrease) concurrency control for provider calls.
+
+The limit grows by about one slot per window of successful calls (+1/limit per
+success) and is cut by `decrease_factor` when the provider throttles. Only one
+cut is applied per window: throttles from calls that started before the last
+cut are ignored, so a burst of 429s from one window halves the limit once,
+not ten times. A retry-after hint pauses new acquisitions until it expires.
+With a latency tolerance set, successes only grow the limit while their
+latency stays within tolerance x the running average, so the limit stops
+climbing once the provider starts queueing requests.
+
+The limiter is shared process-wide and may be used from several event loops
+(e.g. a sync wrapper running asyncio.run in a worker thread), so its state is
+guarded by a threading.Lock and waiters are woken through their own loop.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+SUCCESS = "success"
+THROTTLED = "throttled"
+ERROR = "error"
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limiter with throughput and effective-concurrency stats."""
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int,
+        max_limit: int,
+        min_limit: int = 1,
+        decrease_factor: float = 0.5,
+        latency_tolerance: Optional[float] = None,
+    ):
+        """
+        Args:
+            name: Label used in log lines (e.g. "titan", "haiku")
+            initial_limit: Concurrency to start with
+            max_limit: Ceiling the additive increase never exceeds
+            min_limit: Floor the multiplicative decrease never goes below
+            decrease_factor: Multiplier applied to the limit on throttle (default 0.5)
+            latency_tolerance: If set, a success only increases the limit when its
+                latency is at most this multiple of the average success latency
+        """
+        self.name = name
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self._latency_avg: Optional[float] = None  # EWMA of success latency (seconds)
+        self._limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self._lock = threading.Lock()
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._epoch = 0
+        self._pause_until = 0.0
+
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.successes = 0
+        self.throttles = 0
+        self.errors = 0
+        self._first_acquire: Optional[float] = None
+        self._last_change = 0.0
+        self._busy_integral = 0.0  # sum of in_flight * dt while active
+
+    @property
+    def limit(self) -> int:
+        """Current concurrency limit (whole slots)."""
+        return int(self._limit)
+
+    def _account(self, now: float) -> None:
+        # Called with the lock held before in_flight changes
+        if self._first_acquire is None:
+            self._first_acquire = now
+        else:
+            self._busy_integral += self.in_flight * (now - self._last_change)
+        self._last_change = now
+
+    async def acquire(self) -> int:
+        """
+        Wait for a slot.
+
+        Returns:
+            Epoch token to pass back to release()
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            delay = self._pause_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            with self._lock:
+                if self.in_flight < self.limit:
+                    self._account(time.monotonic())
+                    self.in_flight += 1
+                    self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+                    return self._epoch
+                waiter = loop.create_future()
+                self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._lock:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+                    else:
+                        # Woken but cancelled: hand the wakeup to the next waiter
+                        self._wake()
+                raise
+
+    def release(
+        self,
+        epoch: int,
+        outcome: str = SUCCESS,
+        retry_after: Optional[float] = None,
+        latency: Optional[float] = None,
+    ) -> None:
+        """
+        Return a slot and feed the outcome into the controller.
+
+        Args:
+            epoch: Token returned by acquire()
+            outcome: SUCCESS, THROTTLED or ERROR (errors don't change the limit)
+            retry_after: Seconds the provider asked us to wait (throttles only)
+            latency: Call duration in seconds (successes; used with latency_tolerance)
+        """
+        with self._lock:
+            self._account(time.monotonic())
+            self.in_flight -= 1
+            if outcome == SUCCESS:
+                self.successes += 1
+                stable = True
+                if latency is not None:
+                    if self._latency_avg is None:
+                        self._latency_avg = latency
+                    if self.latency_tolerance is not None:
+                        stable = latency <= self._latency_avg * self.latency_tolerance
+                    self._latency_avg = 0.9 * self._latency_avg + 0.1 * latency
+                if stable:
+                    self._limit = min(float(self.max_limit), self._limit + 1.0 / self._limit)
+            elif outcome == THROTTLED:
+                self.throttles += 1
+                if epoch == self._epoch:
+                    self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+                    self._epoch += 1
+                    print(f"[AdaptiveLimiter] {self.name}: throttled, limit -> {self.limit}")
+                if retry_after:
+                    self._pause_until = max(self._pause_until, time.monotonic() + retry_after)
+            else:
+                self.errors += 1
+            self._wake()
+
+    def _wake(self) -> None:
+        # Called with the lock held: wake as many waiters as there are free slots
+        free = self.limit - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            waiter.get_loop().call_soon_threadsafe(_resolve, waiter)
+            free -= 1
+
+    def stats(self, since: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Snapshot of controller state.
+
+        Args:
+            since: An earlier stats() snapshot; counts and rates then cover
+                only the interval since it (e.g. one import), not the
+                lifetime of the shared limiter
+
+        Returns:
+            Dict with limit, in_flight, peak_in_flight, successes, throttles,
+            errors, throughput_per_s, effective_concurrency (time-averaged
+            in-flight calls), avg_latency_s, and the busy_s / elapsed_s
+            totals the rates are computed from
+        """
+        with self._lock:
+            now = time.monotonic()
+            busy = self._busy_integral + self.in_flight * (now - self._last_change)
+            elapsed = (now - self._first_acquire) if self._first_acquire is not None else 0.0
+            counts = {"successes": self.successes, "throttles": self.throttles, "errors": self.errors}
+            limit, in_flight, peak, latency = self.limit, self.in_flight, self.peak_in_flight, self._latency_avg
+        if since:
+            counts = {key: value - since[key] for key, value in counts.items()}
+            busy -= since["busy_s"]
+            elapsed -= since["elapsed_s"]
+        return {
+            "name": self.name,
+            "limit": limit,
+            "in_flight": in_flight,
+            "peak_in_flight": peak,
+            **counts,
+            "throughput_per_s": counts["successes"] / elapsed if elapsed > 0 else 0.0,
+            "effective_concurrency": busy / elapsed if elapsed > 0 else 0.0,
+            "avg_latency_s": latency,
+            "busy_s": busy,
+            "elapsed_s": elapsed,
+        }
+
+
+def _resolve(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
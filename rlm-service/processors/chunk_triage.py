@@ -0,0 +1,210 @@
+"""
+Chunk Triage
+Local, CPU-only scoring of a chunk's expected fact yield before extraction.
+
+Code dumps, pasted logs, translation requests and one-line "fix this error"
+exchanges rarely contain durable facts about the user. Each chunk is turned
+into a handful of text features and scored with a logistic model: built-in
+hand-set weights by default, or a tiny classifier trained on labeled chunks
+(fit_triage_model) and loaded from TRIAGE_MODEL_PATH. extract_facts_stream
+packs low-scoring chunks into large shared requests (TRIAGE_MODE=pack) or
+skips them (TRIAGE_MODE=skip).
+"""
+import json
+import math
+import os
+import re
+from typing import Dict, List, Optional, Sequence
+
+# Chunks scoring below this are low value (0 disables triage)
+TRIAGE_THRESHOLD = float(os.getenv("TRIAGE_THRESHOLD", "0.2"))
+# pack: low-value chunks share large extraction requests; skip: not extracted
+TRIAGE_MODE = os.getenv("TRIAGE_MODE", "pack")
+TRIAGE_PACK_TOKEN_BUDGET = int(os.getenv("TRIAGE_PACK_TOKEN_BUDGET", "12000"))
+TRIAGE_PACK_MAX_CHUNKS = 16
+# Optional JSON weights written by TriageModel.save()
+TRIAGE_MODEL_PATH = os.getenv("TRIAGE_MODEL_PATH", "")
+
+FEATURES = [
+    "user_share",      # share of the text written by the user
+    "first_person",    # first-person statements in user turns
+    "fact_cues",       # preference / project / life-event wording in user turns
+    "code_share",      # lines that look like code
+    "log_share",       # lines that look like logs or stack traces
+    "translate",       # translation request
+    "short_user",      # user turns are one-liners
+    "error_request",   # user is asking to fix an error
+]
+
+# Hand-set weights: personal wording raises the score, pasted material lowers it
+DEFAULT_WEIGHTS = {
+    "user_share": 1.0,
+    "first_person": 2.5,
+    "fact_cues": 3.0,
+    "code_share": -2.0,
+    "log_share": -2.5,
+    "translate": -2.0,
+    "short_user": -1.5,
+    "error_request": -1.0,
+}
+DEFAULT_BIAS = -0.5
+
+_FIRST_PERSON = re.compile(r"\b(?:i|i'm|i've|i'd|my|me|mine|we|our)\b", re.I)
+_FACT_CUES = re.compile(
+    r"\b(?:prefer\w*|love|hate|favou?rite|enjoy|building|working on|my (?:project|startup|company|job|team|wife|"
+    r"husband|partner|kids?|son|daughter|dog|cat)|decided|birthday|anniversary|deadline|launch\w*|moving|"
+    r"i (?:work|live|am|studied|grew up)|i'm (?:a|an|learning|building|planning))\b",
+    re.I,
+)
+_CODE_LINE = re.compile(r"^\s*(?:```|[{}\[\]();]+$|(?:def|class|import|from|return|const|let|var|function|if|for|"
+                        r"while|public|private|#include)\b|.*[;{}]\s*$|.*=>|\s{4,}\S)")
+_LOG_LINE = re.compile(r"\d{4}-\d\d-\d\d[ T]\d\d:\d\d|\b(?:ERROR|WARN(?:ING)?|INFO|DEBUG|FATAL)\b|Traceback|"
+                       r"^\s*at \S+\(.*:\d+\)|File \".*\", line \d+|Exception:|\bexit code\b")
+_TRANSLATE = re.compile(r"\btranslat\w*\b|\b(?:in|into|to) (?:english|spanish|french|german|chinese|japanese|"
+                        r"italian|portuguese)\b", re.I)
+_ERROR_REQUEST = re.compile(r"\b(?:fix|error|bug|broken|crash\w*|doesn't work|not working|fails?|failing)\b", re.I)
+_WORD = re.compile(r"\w+")
+
+
+def chunk_features(content: str) -> Dict[str, float]:
+    """
+    Triage features of one formatted chunk ("User: ..." / "Assistant: ..." lines).
+
+    Args:
+        content: Chunk text
+
+    Returns:
+        Dict of feature name -> value (each roughly in [0, 1])
+    """
+    lines = content.split("\n")
+    user_turns = []
+    role = None
+    for line in lines:
+        if line.startswith("User: "):
+            role = "user"
+            user_turns.append(line[6:])
+        elif line.startswith("Assistant: "):
+            role = "assistant"
+        elif role == "user":
+            user_turns[-1] += "\n" + line
+    user_text = "\n".join(user_turns)
+    user_words = len(_WORD.findall(user_text))
+    line_count = max(1, len(lines))
+
+    return {
+        "user_share": len(user_text) / max(1, len(content)),
+        "first_person": min(1.0, len(_FIRST_PERSON.findall(user_text)) / max(10.0, user_words / 10)),
+        "fact_cues": min(1.0, len(_FACT_CUES.findall(user_text)) / 3),
+        "code_share": sum(1 for line in lines if _CODE_LINE.match(line)) / line_count,
+        "log_share": sum(1 for line in lines if _LOG_LINE.search(line)) / line_count,
+        "translate": 1.0 if _TRANSLATE.search(user_text) else 0.0,
+        "short_user": 1.0 if user_turns and user_words / len(user_turns) < 12 else 0.0,
+        "error_request": 1.0 if _ERROR_REQUEST.search(user_text) else 0.0,
+    }
+
+
+def _sigmoid(x: float) -> float:
+    if x < -60:
+        return 0.0
+    return 1.0 / (1.0 + math.exp(-x))
+
+
+class TriageModel:
+    """Logistic model over FEATURES: P(chunk yields durable facts)."""
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None, bias: float = DEFAULT_BIAS):
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+        self.bias = bias
+
+    def score_features(self, features: Dict[str, float]) -> float:
+        return _sigmoid(self.bias + sum(self.weights.get(name, 0.0) * value for name, value in features.items()))
+
+    def score(self, content: str) -> float:
+        """Expected fact yield of a chunk in [0, 1]."""
+        return self.score_features(chunk_features(content))
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump({"weights": self.weights, "bias": self.bias}, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "TriageModel":
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["weights"], data["bias"])
+
+
+def fit_triage_model(contents: Sequence[str], labels: Sequence[int], epochs: int = 300,
+                     learning_rate: float = 0.5, l2: float = 0.001) -> TriageModel:
+    """
+    Train a triage classifier (logistic regression, batch gradient descent).
+
+    Args:
+        contents: Chunk texts
+        labels: 1 if the chunk yielded durable facts, else 0
+        epochs: Gradient steps
+        learning_rate: Step size
+        l2: L2 regularization strength
+
+    Returns:
+        Trained TriageModel
+    """
+    rows = [chunk_features(content) for content in contents]
+    weights = {name: 0.0 for name in FEATURES}
+    bias = 0.0
+    n = max(1, len(rows))
+    for _ in range(epochs):
+        grad = {name: 0.0 for name in FEATURES}
+        grad_bias = 0.0
+        for features, label in zip(rows, labels):
+            error = _sigmoid(bias + sum(weights[k] * features[k] for k in FEATURES)) - label
+            for k in FEATURES:
+                grad[k] += error * features[k]
+            grad_bias += error
+        for k in FEATURES:
+            weights[k] -= learning_rate * (grad[k] / n + l2 * weights[k])
+        bias -= learning_rate * grad_bias / n
+    return TriageModel(weights, bias)
+
+
+# Lazy-init shared model (TRIAGE_MODEL_PATH if set, else built-in weights)
+_triage_model: Optional[TriageModel] = None
+
+
+def get_triage_model() -> TriageModel:
+    global _triage_model
+    if _triage_model is None:
+        if TRIAGE_MODEL_PATH and os.path.exists(TRIAGE_MODEL_PATH):
+            _triage_model = TriageModel.load(TRIAGE_MODEL_PATH)
+            print(f"[ChunkTriage] Loaded classifier from {TRIAGE_MODEL_PATH}")
+        else:
+            _triage_model = TriageModel()
+    return _triage_model
+
+
+def evaluate_triage(contents: Sequence[str], fact_counts: Sequence[int], threshold: float,
+                    model: Optional[TriageModel] = None) -> Dict[str, float]:
+    """
+    Score a labeled sample: how many chunks triage flags and how many facts they hold.
+
+    Args:
+        contents: Chunk texts
+        fact_counts: Durable facts each chunk actually yields
+        threshold: Triage threshold
+        model: Model to evaluate (default: shared model)
+
+    Returns:
+        Dict with chunks, low_value (chunks under threshold), fact_recall
+        (share of facts in chunks at or above threshold) and
+        fact_bearing_recall (share of fact-bearing chunks kept)
+    """
+    model = model or get_triage_model()
+    kept: List[bool] = [model.score(content) >= threshold for content in contents]
+    total_facts = sum(fact_counts)
+    bearing = [keep for keep, count in zip(kept, fact_counts) if count > 0]
+    return {
+        "chunks": len(contents),
+        "low_value": sum(1 for keep in kept if not keep),
+        "fact_recall": sum(c for keep, c in zip(kept, fact_counts) if keep) / total_facts if total_facts else 1.0,
+        "fact_bearing_recall": sum(bearing) / len(bearing) if bearing else 1.0,
+    }
@@ -1,17 +1,44 @@
 """
 Conversation Chunker
-Splits conversations into ~2000 token segments with overlap for fact extraction and RAG
+Splits conversations into ~2000 token segments with overlap for fact extraction and RAG,
+plus optional finer (micro) and coarser (macro overview) retrieval tiers
 """
+import hashlib
+import os
+import re
 from datetime import datetime
-from typing import List, Dict
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
 from .dag_parser import extract_active_path
+from .token_counter import chars_for_tokens, raw_count_tokens
+
+# Chunk tiers (conversation_chunks.chunk_tier). The full pass stores every
+# tier in CHUNK_TIERS and /query picks among the same tiers; facts are
+# extracted from medium chunks only
+CHUNK_TIERS = [t for t in os.getenv("CHUNK_TIERS", "micro,medium,macro").split(",") if t]
+MICRO_TOKENS = 300
+MICRO_OVERLAP_TOKENS = 30
+MACRO_TOKENS = 1000
+# Nominal chunk size per tier, used to pick a tier for a retrieval budget
+TIER_TOKENS = {"micro": MICRO_TOKENS, "medium": 2000, "macro": MACRO_TOKENS}
+# A tier is only searched when at least this many of its chunks fit the budget
+MIN_TIER_MATCHES = 2
+
+# Cross-conversation content dedup in the full pass (see ContentDeduper).
+# Messages shorter than DEDUP_MIN_MESSAGE_CHARS ("thanks!", "continue") are
+# never replaced
+CONTENT_DEDUP = os.getenv("CONTENT_DEDUP", "true").lower() != "false"
+DEDUP_MIN_MESSAGE_CHARS = int(os.getenv("DEDUP_MIN_MESSAGE_CHARS", "500"))
 
 
 def estimate_tokens(text: str) -> int:
     """
-    Simple token estimator for chunking purposes.
-    Approximates tokens as len(text) // 4 (chars per token).
+    Token estimator for chunking purposes (shared token counter, uncalibrated).
+
+    Chunk boundaries must not depend on calibration learned from earlier
+    API calls in this process: a retry in a fresh process has to produce
+    the same chunks, or their checkpointed fact results (keyed by content)
+    are lost.
 
     Args:
         text: Input text string
@@ -19,16 +46,179 @@ def estimate_tokens(text: str) -> int:
     Returns:
         Estimated token count
     """
-    return len(text) // 4
+    return raw_count_tokens(text)
+
+
+# Sentence boundary: the punctuation mark of ". ", "? " or "! ", or a newline
+# (the boundary character ends the sentence; a following space starts the next)
+_SENTENCE_END = re.compile(r"[.?!](?= )|\n")
+
+
+def _sentence_ends(text: str) -> List[int]:
+    """End offsets of each sentence in one regex pass (the last one is len(text))."""
+    ends = [match.end() for match in _SENTENCE_END.finditer(text)]
+    if len(text) > (ends[-1] if ends else 0):
+        ends.append(len(text))
+    return ends
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split text at sentence boundaries (". ", "? ", "! ", newline).
 
+    Args:
+        text: Input text
 
-def format_conversation(conversation: dict) -> str:
+    Returns:
+        Contiguous sentences; joined they reproduce text exactly
+    """
+    sentences = []
+    start = 0
+    for end in _sentence_ends(text):
+        sentences.append(text[start:end])
+        start = end
+    return sentences
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def content_hash(text: str) -> str:
+    """Hash of text with whitespace runs collapsed (re-pasted copies hash the same)."""
+    normalized = _WHITESPACE.sub(" ", text).strip()
+    return hashlib.sha256(normalized.encode("utf-8", "surrogatepass")).hexdigest()[:32]
+
+
+class ContentDeduper:
+    """Content seen earlier in one import, at message and chunk level.
+
+    Users paste the same documents, prompts and logs into many
+    conversations. The first copy is processed normally; later copies of a
+    long message are replaced in the formatted text by a one-line
+    reference, and a chunk whose text repeats an earlier chunk of the same
+    tier becomes a lightweight reference row (duplicate_of = the original's
+    content_hash) that is neither embedded nor sent to fact extraction. A
+    conversation whose messages all repeat an earlier one (same title) is
+    emitted as references to that conversation's chunks. depends_on()
+    lists, per conversation, the earlier conversations its references
+    point at.
+    """
+
+    def __init__(self, min_message_chars: int = DEDUP_MIN_MESSAGE_CHARS):
+        self.min_message_chars = min_message_chars
+        self._messages: Dict[str, Tuple[str, str]] = {}  # hash -> first (conversation_id, title)
+        self._chunks: Dict[Tuple[str, str], Tuple[str, int]] = {}  # (tier, hash) -> first (conversation_id, chunk_index)
+        # Conversation fingerprint -> (conversation_id, tier -> chunk content hashes)
+        self._conversations: Dict[str, Tuple[str, Dict[str, List[str]]]] = {}
+        self._current: Optional[Tuple[str, Dict[str, List[str]]]] = None
+        self._message_hashes: List[str] = []
+        self._conversation_id = ""
+        self._dependencies: Dict[str, Set[str]] = {}
+        self.message_chars = 0
+        self.duplicate_messages = 0
+        self.duplicate_message_chars = 0
+        self.chunks = 0
+        self.duplicate_chunks = 0
+
+    def begin(self, conversation_id: str) -> None:
+        """Start a conversation (call before formatting it)."""
+        self._conversation_id = conversation_id
+        self._message_hashes = []
+
+    def _depend(self, conversation_id: str) -> None:
+        if conversation_id != self._conversation_id:
+            self._dependencies.setdefault(self._conversation_id, set()).add(conversation_id)
+
+    def depends_on(self) -> Dict[str, List[str]]:
+        """conversation_id -> conversations its references point at (only those with references)."""
+        return {cid: sorted(deps) for cid, deps in self._dependencies.items()}
+
+    def message(self, content: str, title: str) -> str:
+        """Return content, or a reference if a long copy of it was seen before."""
+        self.message_chars += len(content)
+        key = content_hash(content)
+        self._message_hashes.append(key)
+        if len(content) < self.min_message_chars:
+            return content
+        first = self._messages.get(key)
+        if first is None:
+            self._messages[key] = (self._conversation_id, title)
+            return content
+        self._depend(first[0])
+        self.duplicate_messages += 1
+        self.duplicate_message_chars += len(content)
+        return f'[Repeated content ({len(content)} chars), first seen in "{first[1]}"]'
+
+    def conversation(self, title: str) -> Optional[Tuple[str, Dict[str, List[str]]]]:
+        """
+        Close the conversation whose messages were just formatted.
+
+        Returns:
+            (conversation_id, tier -> chunk content hashes) of the earlier
+            copy if this conversation repeats one, else None (its chunks
+            are then recorded for later copies)
+        """
+        key = content_hash(title + "\n" + " ".join(self._message_hashes))
+        self._message_hashes = []
+        first = self._conversations.get(key)
+        if first is not None:
+            self._depend(first[0])
+            self._current = None
+            return first
+        self._current = self._conversations[key] = (self._conversation_id, {})
+        return None
+
+    def chunk(self, chunk: Dict) -> Dict:
+        """Add content_hash and duplicate_of to a chunk; a repeated chunk's content becomes a reference."""
+        key = content_hash(chunk["content"])
+        self.chunks += 1
+        if self._current is not None:
+            self._current[1].setdefault(chunk["chunk_tier"], []).append(key)
+        first = self._chunks.get((chunk["chunk_tier"], key))
+        if first is None:
+            self._chunks[(chunk["chunk_tier"], key)] = (chunk["conversation_id"], chunk["chunk_index"])
+            chunk["content_hash"] = key
+            chunk["duplicate_of"] = None
+            return chunk
+        self._depend(first[0])
+        self.duplicate_chunks += 1
+        return self._reference(chunk, first[0], first[1], key)
+
+    def repeated_chunk(self, chunk: Dict, conversation_id: str, chunk_index: int, key: str) -> Dict:
+        """Reference chunk for a repeated conversation (see conversation())."""
+        self.chunks += 1
+        self.duplicate_chunks += 1
+        return self._reference(chunk, conversation_id, chunk_index, key)
+
+    def _reference(self, chunk: Dict, conversation_id: str, chunk_index: int, key: str) -> Dict:
+        chunk["content_hash"] = key
+        chunk["duplicate_of"] = key
+        chunk["content"] = f"[Same content as chunk {chunk_index} of conversation {conversation_id}]"
+        chunk["token_count"] = estimate_tokens(chunk["content"])
+        return chunk
+
+    def stats(self) -> Dict[str, float]:
+        """Dedup counts for the import so far; dedup_ratio = duplicate chunks / chunks."""
+        return {
+            "chunks": self.chunks,
+            "duplicate_chunks": self.duplicate_chunks,
+            "dedup_ratio": self.duplicate_chunks / self.chunks if self.chunks else 0.0,
+            "duplicate_messages": self.duplicate_messages,
+            "message_dedup_ratio": (
+                self.duplicate_message_chars / self.message_chars if self.message_chars else 0.0
+            ),
+        }
+
+
+def format_conversation(conversation: dict, deduper: Optional[ContentDeduper] = None) -> str:
     """
     Format a conversation dict into a readable text string.
     Handles both ChatGPT export format (with mapping) and simplified format (with messages).
 
     Args:
         conversation: Dict with either {"title": str, "mapping": dict} or {"title": str, "messages": list}
+        deduper: Optional ContentDeduper; long messages seen in an earlier
+            conversation are replaced by a reference
 
     Returns:
         Formatted conversation string with User/Assistant exchanges
@@ -48,6 +238,9 @@ def format_conversation(conversation: dict) -> str:
             if role == "system":
                 continue
 
+            if deduper:
+                content = deduper.message(content, title)
+
             # Truncate very long messages
             if len(content) > 5000:
                 content = content[:5000] + "... [truncated]"
@@ -71,6 +264,9 @@ def format_conversation(conversation: dict) -> str:
         role = msg.get("role", "unknown")
         content = msg.get("content", "")
 
+        if deduper:
+            content = deduper.message(content, title)
+
         # Truncate very long messages
         if len(content) > 5000:
             content = content[:5000] + "... [truncated]"
@@ -83,27 +279,102 @@ def format_conversation(conversation: dict) -> str:
     return "\n".join(formatted_lines)
 
 
-def chunk_conversations(
-    conversations: list,
-    target_tokens: int = 2000,
-    overlap_tokens: int = 200
-) -> List[Dict]:
+def _split_text(text: str, target_tokens: int, overlap_tokens: int) -> List[str]:
     """
-    Chunk conversations into segments for fact extraction and storage.
+    Split formatted conversation text at sentence boundaries with overlap.
 
-    Each conversation is formatted and split at sentence boundaries with overlap.
-    Small conversations (under target_tokens) remain as single chunks.
+    Sentences are contiguous and each chunk's overlap is the tail of the
+    previous chunk, so every chunk is a single slice text[start:end].
+    """
+    if estimate_tokens(text) <= target_tokens:
+        return [text]
+
+    chunks = []
+    start = end = 0
+    current_chunk_tokens = 0
+
+    for sentence_end in _sentence_ends(text):
+        sentence_tokens = estimate_tokens(text[end:sentence_end])
+
+        # If adding this sentence exceeds target, finalize current chunk
+        if current_chunk_tokens + sentence_tokens > target_tokens and end > start:
+            current_chunk = text[start:end]
+            chunks.append(current_chunk)
+
+            # Start new chunk with overlap from end of previous chunk
+            overlap_chars = chars_for_tokens(overlap_tokens, current_chunk, calibrated=False) if overlap_tokens > 0 else 0
+            start = max(start, end - overlap_chars)
+            end = sentence_end
+            current_chunk_tokens = estimate_tokens(text[start:end])
+        else:
+            end = sentence_end
+            current_chunk_tokens += sentence_tokens
+
+    # Add final chunk
+    if end > start:
+        chunks.append(text[start:end])
+    return chunks
+
+
+def summarize_conversation(formatted_text: str, max_tokens: int = MACRO_TOKENS) -> str:
+    """
+    Extractive overview of a conversation for the macro tier (no LLM call).
+
+    Keeps the title line and the first sentence of every message, in
+    order, until max_tokens is reached.
 
     Args:
-        conversations: List of conversation dicts
-        target_tokens: Target size for each chunk (default 2000)
-        overlap_tokens: Token overlap between chunks for context continuity (default 200)
+        formatted_text: Output of format_conversation
+        max_tokens: Token budget for the overview
 
     Returns:
-        List of chunk dicts with conversation_id, title, content, token_count, chunk_index, etc.
+        Overview text
     """
-    all_chunks = []
+    lines = formatted_text.split("\n")
+    messages = [line for line in lines if line.startswith(("User: ", "Assistant: "))]
+    overview = [lines[0], f"[Overview of a {len(messages)}-message conversation]"]
+    used = estimate_tokens("\n".join(overview))
+    for line in messages:
+        first = split_sentences(line)[0].rstrip()
+        tokens = estimate_tokens(first)
+        if used + tokens > max_tokens:
+            break
+        overview.append(first)
+        used += tokens
+    return "\n".join(overview)
+
+
+def iter_chunks(
+    conversations: Iterable[dict],
+    target_tokens: int = 2000,
+    overlap_tokens: int = 200,
+    tiers: Sequence[str] = ("medium",),
+    deduper: Optional[ContentDeduper] = None,
+) -> Iterator[Dict]:
+    """
+    Yield chunks conversation by conversation (see chunk_conversations).
+
+    Lets the full pass start embedding and fact extraction on the first
+    chunks while later conversations are still being chunked.
 
+    Tiers (each chunk's chunk_tier):
+    - micro: ~MICRO_TOKENS slices for precise retrieval (skipped when the
+      whole conversation fits in one)
+    - medium: ~target_tokens slices; the tier facts are extracted from
+    - macro: one extractive overview per conversation that spans several
+      medium chunks
+
+    Args:
+        conversations: Iterable of conversation dicts
+        target_tokens: Target size for each medium chunk (default 2000)
+        overlap_tokens: Token overlap between medium chunks for context continuity (default 200)
+        tiers: Tiers to emit (default medium only)
+        deduper: Optional ContentDeduper shared across the import; chunks then
+            carry content_hash and duplicate_of
+
+    Yields:
+        Chunk dicts with conversation_id, title, content, token_count, chunk_index, etc.
+    """
     for conv_idx, conversation in enumerate(conversations):
         # Get conversation metadata
         title = conversation.get("title", "Untitled")
@@ -117,84 +388,112 @@ def chunk_conversations(
         elif not created_at:
             created_at = datetime.utcnow().isoformat()
 
-        # Format conversation as text
-        formatted_text = format_conversation(conversation)
-        total_tokens = estimate_tokens(formatted_text)
-
-        # If conversation fits in single chunk, don't split
-        if total_tokens <= target_tokens:
-            all_chunks.append({
+        def make_chunk(tier: str, chunk_idx: int, total: int, chunk_content: str) -> Dict:
+            return {
                 "conversation_id": str(conversation_id),
                 "title": title,
-                "content": formatted_text,
-                "token_count": total_tokens,
-                "chunk_index": 0,
-                "total_chunks": 1,
-                "chunk_tier": "medium",
+                "content": chunk_content,
+                "token_count": estimate_tokens(chunk_content),
+                "chunk_index": chunk_idx,
+                "total_chunks": total,
+                "chunk_tier": tier,
                 "created_at": created_at,
-            })
+            }
+
+        # Format conversation as text
+        if deduper:
+            deduper.begin(str(conversation_id))
+        formatted_text = format_conversation(conversation, deduper)
+
+        repeat = deduper.conversation(title) if deduper else None
+        if repeat:
+            # Same conversation imported twice: every chunk points at the first copy's
+            first_id, tier_hashes = repeat
+            for tier in tiers:
+                hashes = tier_hashes.get(tier, [])
+                for chunk_idx, key in enumerate(hashes):
+                    yield deduper.repeated_chunk(make_chunk(tier, chunk_idx, len(hashes), ""), first_id, chunk_idx, key)
             continue
 
-        # Split at sentence boundaries with overlap
-        # Split on common sentence endings: `. `, `? `, `! `, `\n`
-        sentences = []
-        current_pos = 0
-        text = formatted_text
-
-        while current_pos < len(text):
-            # Find next sentence boundary
-            next_period = text.find(". ", current_pos)
-            next_question = text.find("? ", current_pos)
-            next_exclaim = text.find("! ", current_pos)
-            next_newline = text.find("\n", current_pos)
-
-            # Get the earliest boundary
-            boundaries = [b for b in [next_period, next_question, next_exclaim, next_newline] if b != -1]
-            if not boundaries:
-                # No more boundaries, take rest of text
-                sentences.append(text[current_pos:])
-                break
-
-            boundary = min(boundaries)
-            sentences.append(text[current_pos:boundary + 1])
-            current_pos = boundary + 1
-
-        # Group sentences into chunks
-        chunks_for_conv = []
-        current_chunk = ""
-        current_chunk_tokens = 0
-
-        for sentence in sentences:
-            sentence_tokens = estimate_tokens(sentence)
-
-            # If adding this sentence exceeds target, finalize current chunk
-            if current_chunk_tokens + sentence_tokens > target_tokens and current_chunk:
-                chunks_for_conv.append(current_chunk)
-
-                # Start new chunk with overlap from end of previous chunk
-                overlap_text = current_chunk[-overlap_tokens * 4:] if len(current_chunk) > overlap_tokens * 4 else current_chunk
-                current_chunk = overlap_text + sentence
-                current_chunk_tokens = estimate_tokens(current_chunk)
+        total_tokens = estimate_tokens(formatted_text)
+
+        for tier in tiers:
+            if tier == "medium":
+                pieces = _split_text(formatted_text, target_tokens, overlap_tokens)
+            elif tier == "micro":
+                if total_tokens <= MICRO_TOKENS:
+                    continue
+                pieces = _split_text(formatted_text, MICRO_TOKENS, MICRO_OVERLAP_TOKENS)
+            elif tier == "macro":
+                if total_tokens <= target_tokens:
+                    continue
+                pieces = [summarize_conversation(formatted_text)]
             else:
-                current_chunk += sentence
-                current_chunk_tokens += sentence_tokens
+                raise ValueError(f"Unknown chunk tier: {tier}")
 
-        # Add final chunk
-        if current_chunk:
-            chunks_for_conv.append(current_chunk)
+            # Convert to chunk dicts
+            for chunk_idx, chunk_content in enumerate(pieces):
+                chunk = make_chunk(tier, chunk_idx, len(pieces), chunk_content)
+                yield deduper.chunk(chunk) if deduper else chunk
 
-        # Convert to chunk dicts
-        total_chunks = len(chunks_for_conv)
-        for chunk_idx, chunk_content in enumerate(chunks_for_conv):
-            all_chunks.append({
-                "conversation_id": str(conversation_id),
-                "title": title,
-                "content": chunk_content,
-                "token_count": estimate_tokens(chunk_content),
-                "chunk_index": chunk_idx,
-                "total_chunks": total_chunks,
-                "chunk_tier": "medium",
-                "created_at": created_at,
-            })
 
-    return all_chunks
+def chunk_tier_plan(
+    token_budget: int,
+    max_matches: int = 8,
+    tiers: Optional[Sequence[str]] = None,
+) -> List[Tuple[str, int]]:
+    """
+    Order the retrieval tiers to try for a context token budget.
+
+    Tiers come smallest chunks first, each with the number of its chunks
+    that fit in token_budget (at most max_matches); tiers of which fewer
+    than MIN_TIER_MATCHES fit are left out, except the smallest when no
+    tier fits. The caller searches them in order and keeps the first that
+    returns enough matches, so the prompt gets the least text that still
+    covers several conversations. medium always comes last, since imports
+    from before the tiers existed only have medium chunks.
+
+    Args:
+        token_budget: Tokens available for retrieved conversation context
+        max_matches: Most chunks to retrieve
+        tiers: Stored tiers to choose from (default CHUNK_TIERS)
+
+    Returns:
+        [(tier, match_count), ...] in search order
+    """
+    by_size = sorted(set(tiers or CHUNK_TIERS) - {"medium"}, key=lambda t: TIER_TOKENS[t])
+    plan = []
+    for tier in by_size:
+        fits = token_budget // TIER_TOKENS[tier]
+        if fits >= MIN_TIER_MATCHES:
+            plan.append((tier, min(max_matches, fits)))
+    if not plan and by_size:
+        plan.append((by_size[0], max(1, min(max_matches, token_budget // TIER_TOKENS[by_size[0]]))))
+    plan.append(("medium", max(1, min(max_matches, token_budget // TIER_TOKENS["medium"]))))
+    return plan
+
+
+def chunk_conversations(
+    conversations: list,
+    target_tokens: int = 2000,
+    overlap_tokens: int = 200,
+    tiers: Sequence[str] = ("medium",),
+    deduper: Optional[ContentDeduper] = None,
+) -> List[Dict]:
+    """
+    Chunk conversations into segments for fact extraction and storage.
+
+    Each conversation is formatted and split at sentence boundaries with overlap.
+    Small conversations (under target_tokens) remain as single chunks.
+
+    Args:
+        conversations: List of conversation dicts
+        target_tokens: Target size for each chunk (default 2000)
+        overlap_tokens: Token overlap between chunks for context continuity (default 200)
+        tiers: Tiers to emit (default medium only; see iter_chunks)
+        deduper: Optional ContentDeduper (see iter_chunks)
+
+    Returns:
+        List of chunk dicts with conversation_id, title, content, token_count, chunk_index, etc.
+    """
+    return list(iter_chunks(conversations, target_tokens, overlap_tokens, tiers, deduper))
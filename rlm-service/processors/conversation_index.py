@@ -0,0 +1,211 @@
+"""
+Conversation Index
+Per-user fingerprints of imported conversations, for incremental re-import.
+
+Each row (conversation_fingerprints table) holds a conversation's
+fingerprint (hash of its title and active-path messages), the facts
+extracted from it, and the conversations its dedup references point at.
+On re-import, plan_import compares the export against the index so the
+full pass only chunks, embeds and extracts new or changed conversations,
+removes chunks of deleted ones and reuses stored facts for the rest.
+"""
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+
+from .conversation_chunker import content_hash
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
+
+# Rows per page when loading, per upsert when saving, ids per delete filter
+INDEX_PAGE_SIZE = 1000
+INDEX_WRITE_BATCH = 200
+INDEX_DELETE_BATCH = 100
+
+
+def _headers() -> Dict[str, str]:
+    return {
+        "apikey": SUPABASE_SERVICE_KEY,
+        "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
+    }
+
+
+def conversation_fingerprint(title: str, messages: List[Dict]) -> str:
+    """
+    Fingerprint of a conversation's content.
+
+    Args:
+        title: Conversation title
+        messages: Active-path messages (extract_active_path)
+
+    Returns:
+        Hash that changes when the title or any message role/content changes
+    """
+    parts = [title or ""]
+    for msg in messages:
+        parts.append(f"{msg.get('role', '')}:{content_hash(msg.get('content') or '')}")
+    return content_hash("\n".join(parts))
+
+
+def fallback_conversation_id(conversation: Dict, messages: List[Dict]) -> str:
+    """
+    Id for a conversation the export gave none, derived from content that
+    doesn't move when other conversations are added or removed.
+
+    Args:
+        conversation: Raw export conversation (title, create_time/createdAt)
+        messages: Its active-path messages (extract_active_path)
+
+    Returns:
+        "conv_" plus a hash of the title, creation time and first message
+    """
+    first = messages[0] if messages else {}
+    created = conversation.get("create_time") or conversation.get("createdAt") or ""
+    key = "\n".join([conversation.get("title") or "", str(created),
+                     f"{first.get('role', '')}:{first.get('content') or ''}"])
+    return f"conv_{content_hash(key)[:16]}"
+
+
+def in_filter(values: Iterable[str]) -> str:
+    """PostgREST in.() filter with each value quoted (ids may contain commas)."""
+    quoted = ",".join('"' + str(v).replace("\\", "\\\\").replace('"', '\\"') + '"' for v in values)
+    return f"in.({quoted})"
+
+
+def plan_import(fingerprints: Dict[str, str], index: Dict[str, Dict]) -> Dict[str, object]:
+    """
+    Decide which conversations of an export need processing.
+
+    Args:
+        fingerprints: conversation_id -> fingerprint for the new export (in export order)
+        index: conversation_id -> stored row (fingerprint, depends_on, facts)
+
+    Returns:
+        Dict with full (True when there is no index: replace everything),
+        process (new, changed, and unchanged ones whose dedup references
+        point into a changed or deleted conversation), unchanged and
+        deleted conversation ids
+    """
+    if not index:
+        return {"full": True, "process": list(fingerprints), "unchanged": [], "deleted": []}
+
+    changed = {cid for cid, fp in fingerprints.items() if index.get(cid, {}).get("fingerprint") != fp}
+    deleted = [cid for cid in index if cid not in fingerprints]
+    gone = changed | set(deleted)
+    # Their stored chunks and facts omit content that only lived in a conversation being replaced
+    dependents = {
+        cid for cid in fingerprints
+        if cid not in changed and gone.intersection(index[cid].get("depends_on") or ())
+    }
+    process = changed | dependents
+    return {
+        "full": False,
+        "process": [cid for cid in fingerprints if cid in process],
+        "unchanged": [cid for cid in fingerprints if cid not in process],
+        "deleted": deleted,
+    }
+
+
+async def load_conversation_index(user_id: str) -> Dict[str, Dict]:
+    """
+    Load a user's conversation index.
+
+    Args:
+        user_id: User ID
+
+    Returns:
+        conversation_id -> row dict (fingerprint, depends_on, facts)
+
+    Raises:
+        RuntimeError: If a page fails to load
+    """
+    index: Dict[str, Dict] = {}
+    after: Optional[str] = None
+    async with httpx.AsyncClient() as client:
+        while True:
+            params = {
+                "user_id": f"eq.{user_id}",
+                "select": "conversation_id,fingerprint,depends_on,facts",
+                "order": "conversation_id.asc",
+                "limit": str(INDEX_PAGE_SIZE),
+            }
+            if after is not None:
+                params["conversation_id"] = f"gt.{after}"
+            response = await client.get(
+                f"{SUPABASE_URL}/rest/v1/conversation_fingerprints",
+                params=params,
+                headers=_headers(),
+                timeout=30.0,
+            )
+            if response.status_code != 200:
+                raise RuntimeError(f"Failed to load conversation index ({response.status_code}): {response.text[:200]}")
+            rows = response.json()
+            for row in rows:
+                index[row["conversation_id"]] = row
+            if len(rows) < INDEX_PAGE_SIZE:
+                break
+            after = rows[-1]["conversation_id"]
+    print(f"[ConversationIndex] Loaded {len(index)} fingerprints for user {user_id}")
+    return index
+
+
+async def save_conversation_index(
+    user_id: str,
+    fingerprints: Dict[str, str],
+    facts: Dict[str, dict],
+    depends_on: Dict[str, List[str]],
+    deleted: List[str],
+) -> None:
+    """
+    Upsert index rows for processed conversations and drop deleted ones.
+
+    Args:
+        user_id: User ID
+        fingerprints: conversation_id -> fingerprint of each processed conversation
+        facts: conversation_id -> consolidated facts extracted from it
+        depends_on: conversation_id -> conversations its dedup references point at
+        deleted: Conversation ids no longer in the export
+
+    Raises:
+        RuntimeError: If a write fails
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    rows = [
+        {
+            "user_id": user_id,
+            "conversation_id": cid,
+            "fingerprint": fingerprint,
+            "depends_on": depends_on.get(cid, []),
+            "facts": facts.get(cid, {}),
+            "updated_at": now,
+        }
+        for cid, fingerprint in fingerprints.items()
+    ]
+    async with httpx.AsyncClient() as client:
+        for start in range(0, len(rows), INDEX_WRITE_BATCH):
+            response = await client.post(
+                f"{SUPABASE_URL}/rest/v1/conversation_fingerprints",
+                params={"on_conflict": "user_id,conversation_id"},
+                json=rows[start:start + INDEX_WRITE_BATCH],
+                headers={
+                    **_headers(),
+                    "Content-Type": "application/json",
+                    "Prefer": "resolution=merge-duplicates,return=minimal",
+                },
+                timeout=60.0,
+            )
+            if response.status_code not in (200, 201, 204):
+                raise RuntimeError(f"Failed to save conversation index ({response.status_code}): {response.text[:200]}")
+        for start in range(0, len(deleted), INDEX_DELETE_BATCH):
+            response = await client.delete(
+                f"{SUPABASE_URL}/rest/v1/conversation_fingerprints",
+                params={"user_id": f"eq.{user_id}", "conversation_id": in_filter(deleted[start:start + INDEX_DELETE_BATCH])},
+                headers=_headers(),
+                timeout=30.0,
+            )
+            if response.status_code not in (200, 204):
+                raise RuntimeError(f"Failed to delete conversation index rows ({response.status_code}): {response.text[:200]}")
+    print(f"[ConversationIndex] Saved {len(rows)} fingerprints, removed {len(deleted)} for user {user_id}")
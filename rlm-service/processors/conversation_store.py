@@ -0,0 +1,287 @@
+"""
+Conversation Store
+
+Compact, array-backed storage for parsed conversations. A list of dicts
+costs several hundred bytes of object overhead per message (the dict, the
+role string, a float and the content string). The store keeps:
+
+  - roles interned in a small table, one code per message in array('H')
+  - timestamps in array('d') (NaN encodes a missing create_time)
+  - all message text in one contiguous UTF-8 bytearray with array('Q') offsets
+
+Conversations and messages are read through __slots__ views that expose the
+same dict-style read API (.get, [], in) the processors already use, so
+sample.py, conversation_chunker.py and v2_regenerator.py work unchanged.
+"""
+
+import math
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+_MISSING = object()
+
+CONVERSATION_KEYS = ("id", "title", "createdAt", "messages")
+MESSAGE_KEYS = ("role", "content", "create_time")
+
+
+class ConversationStore:
+    """Append-only store of parsed conversations ({id, title, createdAt, messages})."""
+
+    __slots__ = (
+        "_role_names",
+        "_role_codes",
+        "_msg_roles",
+        "_msg_times",
+        "_text",
+        "_text_offsets",
+        "_conv_offsets",
+        "_conv_ids",
+        "_conv_titles",
+        "_conv_created",
+    )
+
+    def __init__(self):
+        """Initialize an empty store."""
+        self._role_names: List[str] = []
+        self._role_codes: Dict[str, int] = {}
+        self._msg_roles = array("H")
+        self._msg_times = array("d")
+        self._text = bytearray()
+        self._text_offsets = array("Q", [0])
+        self._conv_offsets = array("Q", [0])
+        self._conv_ids: List[Any] = []
+        self._conv_titles: List[Any] = []
+        self._conv_created: List[Any] = []
+
+    @classmethod
+    def from_conversations(cls, conversations: Iterable[dict], max_messages: Optional[int] = None) -> "ConversationStore":
+        """
+        Build a store from parsed conversation dicts.
+
+        Args:
+            conversations: Iterable of {id, title, createdAt, messages} dicts
+            max_messages: Keep only the first N messages of each conversation (default: all)
+
+        Returns:
+            Populated ConversationStore
+        """
+        store = cls()
+        for conversation in conversations:
+            store.append(conversation, max_messages=max_messages)
+        store.compact()
+        return store
+
+    def append(self, conversation: dict, max_messages: Optional[int] = None) -> None:
+        """
+        Copy one parsed conversation into the store.
+
+        Keys absent from the source dict stay absent on the view, so
+        .get(key, default) behaves exactly as it did on the original dict.
+
+        Args:
+            conversation: Dict with id, title, createdAt and a messages list
+            max_messages: Keep only the first N messages (default: all)
+        """
+        messages = conversation.get("messages") or []
+        if max_messages is not None:
+            messages = messages[:max_messages]
+
+        for msg in messages:
+            role = msg.get("role", "unknown")
+            code = self._role_codes.get(role)
+            if code is None:
+                code = len(self._role_names)
+                self._role_names.append(sys.intern(role) if isinstance(role, str) else role)
+                self._role_codes[role] = code
+            self._msg_roles.append(code)
+
+            create_time = msg.get("create_time")
+            self._msg_times.append(float(create_time) if isinstance(create_time, (int, float)) else math.nan)
+
+            self._text += (msg.get("content") or "").encode("utf-8", "surrogatepass")
+            self._text_offsets.append(len(self._text))
+
+        self._conv_offsets.append(len(self._msg_roles))
+        self._conv_ids.append(conversation.get("id", _MISSING))
+        self._conv_titles.append(conversation.get("title", _MISSING))
+        self._conv_created.append(conversation.get("createdAt", _MISSING))
+
+    def compact(self) -> None:
+        """Release growth headroom in the text buffer and arrays once loading is done."""
+        self._text = bytearray(bytes(self._text))
+        for name in ("_msg_roles", "_msg_times", "_text_offsets", "_conv_offsets"):
+            arr = getattr(self, name)
+            setattr(self, name, array(arr.typecode, arr))
+
+    def __len__(self) -> int:
+        return len(self._conv_ids)
+
+    def __iter__(self) -> Iterator["ConversationView"]:
+        for index in range(len(self._conv_ids)):
+            yield ConversationView(self, index)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union["ConversationView", List["ConversationView"]]:
+        if isinstance(index, slice):
+            return [ConversationView(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("conversation index out of range")
+        return ConversationView(self, index)
+
+    @property
+    def message_count(self) -> int:
+        """Total number of messages across all conversations."""
+        return len(self._msg_roles)
+
+    def nbytes(self) -> int:
+        """
+        Approximate memory held by the store (containers plus metadata strings).
+
+        Returns:
+            Size in bytes
+        """
+        size = sys.getsizeof(self._text)
+        for arr in (self._msg_roles, self._msg_times, self._text_offsets, self._conv_offsets):
+            size += sys.getsizeof(arr)
+        for column in (self._conv_ids, self._conv_titles, self._conv_created, self._role_names):
+            size += sys.getsizeof(column)
+            size += sum(sys.getsizeof(v) for v in column if v is not _MISSING and v is not None)
+        return size
+
+    def to_dicts(self) -> List[dict]:
+        """Materialize every conversation back into plain dicts (for JSON serialization)."""
+        return [view.to_dict() for view in self]
+
+    # -- internal accessors used by the views --------------------------------
+
+    def _message_text(self, msg_index: int) -> str:
+        start = self._text_offsets[msg_index]
+        end = self._text_offsets[msg_index + 1]
+        return self._text[start:end].decode("utf-8", "surrogatepass")
+
+    def _message_time(self, msg_index: int) -> Optional[float]:
+        value = self._msg_times[msg_index]
+        return None if math.isnan(value) else value
+
+
+class ConversationView:
+    """Read-only dict-like view of one stored conversation."""
+
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store: ConversationStore, index: int):
+        self._store = store
+        self._index = index
+
+    def _lookup(self, key: str) -> Any:
+        store = self._store
+        if key == "messages":
+            return MessageList(store, store._conv_offsets[self._index], store._conv_offsets[self._index + 1])
+        if key == "id":
+            return store._conv_ids[self._index]
+        if key == "title":
+            return store._conv_titles[self._index]
+        if key == "createdAt":
+            return store._conv_created[self._index]
+        return _MISSING
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def __getitem__(self, key: str) -> Any:
+        value = self._lookup(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._lookup(key) is not _MISSING
+
+    def keys(self) -> List[str]:
+        return [k for k in CONVERSATION_KEYS if k in self]
+
+    def to_dict(self) -> dict:
+        result = {k: self[k] for k in self.keys()}
+        result["messages"] = [m.to_dict() for m in result["messages"]]
+        return result
+
+    def __repr__(self) -> str:
+        return f"ConversationView(id={self.get('id')!r}, title={self.get('title')!r}, messages={len(self['messages'])})"
+
+
+class MessageList:
+    """Sequence view over a contiguous run of stored messages."""
+
+    __slots__ = ("_store", "_start", "_stop")
+
+    def __init__(self, store: ConversationStore, start: int, stop: int):
+        self._store = store
+        self._start = start
+        self._stop = stop
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def __iter__(self) -> Iterator["MessageView"]:
+        for msg_index in range(self._start, self._stop):
+            yield MessageView(self._store, msg_index)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union["MessageView", "MessageList", List["MessageView"]]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return MessageList(self._store, self._start + start, self._start + max(start, stop))
+            return [MessageView(self._store, self._start + i) for i in range(start, stop, step)]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("message index out of range")
+        return MessageView(self._store, self._start + index)
+
+    def __repr__(self) -> str:
+        return f"MessageList({len(self)} messages)"
+
+
+class MessageView:
+    """Read-only dict-like view of one stored message ({role, content, create_time})."""
+
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store: ConversationStore, index: int):
+        self._store = store
+        self._index = index
+
+    def _lookup(self, key: str) -> Any:
+        store = self._store
+        if key == "role":
+            return store._role_names[store._msg_roles[self._index]]
+        if key == "content":
+            return store._message_text(self._index)
+        if key == "create_time":
+            return store._message_time(self._index)
+        return _MISSING
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def __getitem__(self, key: str) -> Any:
+        value = self._lookup(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        return key in MESSAGE_KEYS
+
+    def keys(self) -> List[str]:
+        return list(MESSAGE_KEYS)
+
+    def to_dict(self) -> dict:
+        return {k: self[k] for k in MESSAGE_KEYS}
+
+    def __repr__(self) -> str:
+        return f"MessageView(role={self['role']!r}, content={self['content'][:40]!r})"
@@ -2,7 +2,8 @@
 Cost Tracker
 Accumulates token usage and computes dollar costs during a full pass pipeline.
 """
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, List
 
 
 class CostTracker:
@@ -21,6 +22,28 @@ class CostTracker:
         self.llm_call_count: int = 0
         self.embedding_input_tokens: int = 0
         self.embedding_call_count: int = 0
+        # Titan engine stats (see embed_batch_async)
+        self.embedding_wall_seconds: float = 0.0
+        self.embedding_busy_seconds: float = 0.0
+        self.embedding_throttle_count: int = 0
+        self.embedding_concurrency_limit: int = 0
+        self.embedding_cache_hits: int = 0
+        # Local near-duplicate collapsing (see fact_dedup)
+        self.facts_collapsed: int = 0
+        self.reduce_calls_avoided: int = 0
+        self.reduce_tokens_avoided: int = 0
+        # Pre-extraction triage (see chunk_triage)
+        self.chunks_low_value: int = 0
+        self.chunks_skipped: int = 0
+        self.triage_calls_saved: int = 0
+        # Cross-conversation content dedup (see ContentDeduper)
+        self.duplicate_chunks: int = 0
+        self.duplicate_messages: int = 0
+        self.content_dedup_ratio: float = 0.0
+        # Diet-rendered prompts (see token_diet): stage -> [tokens before, tokens after]
+        self.token_diet: Dict[str, List[int]] = {}
+        # Embeddings are recorded from worker threads
+        self._lock = threading.Lock()
 
     def record_llm_call(self, response: Any) -> None:
         """
@@ -41,8 +64,84 @@ class CostTracker:
         Args:
             text_length: Character length of embedded text (tokens estimated as length // 4)
         """
-        self.embedding_input_tokens += text_length // 4
-        self.embedding_call_count += 1
+        with self._lock:
+            self.embedding_input_tokens += text_length // 4
+            self.embedding_call_count += 1
+
+    def record_embedding_cache_hits(self, count: int) -> None:
+        """
+        Record embeddings served from the cache (no Titan call, no cost).
+
+        Args:
+            count: Number of cache hits
+        """
+        with self._lock:
+            self.embedding_cache_hits += count
+
+    def record_fact_dedup(self, stats: Dict[str, int]) -> None:
+        """
+        Record what near-duplicate collapsing saved.
+
+        Args:
+            stats: Stats dict returned by collapse_near_duplicates
+        """
+        self.facts_collapsed += stats["collapsed"]
+        self.reduce_calls_avoided += stats["reduce_calls_avoided"]
+        self.reduce_tokens_avoided += stats["reduce_tokens_avoided"]
+
+    def record_triage(self, low_value: int, skipped: int, calls_saved: int) -> None:
+        """
+        Record what pre-extraction triage saved.
+
+        Args:
+            low_value: Chunks scored below the triage threshold
+            skipped: Low-value chunks not sent for extraction at all
+            calls_saved: Extraction requests saved versus packing without triage
+        """
+        self.chunks_low_value += low_value
+        self.chunks_skipped += skipped
+        self.triage_calls_saved += calls_saved
+
+    def record_content_dedup(self, stats: Dict[str, float]) -> None:
+        """
+        Record what content dedup removed from this import.
+
+        Args:
+            stats: Stats dict returned by ContentDeduper.stats
+        """
+        self.duplicate_chunks = stats["duplicate_chunks"]
+        self.duplicate_messages = stats["duplicate_messages"]
+        self.content_dedup_ratio = stats["dedup_ratio"]
+
+    def record_token_diet(self, stage: str, tokens_before: int, tokens_after: int) -> None:
+        """
+        Record input tokens a stage saved with the diet rendering.
+
+        Args:
+            stage: Stage name ("facts", "quick_pass", "v2_regen")
+            tokens_before: Estimated tokens of the full text
+            tokens_after: Estimated tokens of the rendered text
+        """
+        totals = self.token_diet.setdefault(stage, [0, 0])
+        totals[0] += tokens_before
+        totals[1] += tokens_after
+
+    def record_embedding_run(self, calls: int, seconds: float, throttles: int, busy_seconds: float, limit: int) -> None:
+        """
+        Record throughput and rate-control stats for one parallel embedding batch.
+
+        Args:
+            calls: Texts embedded in the batch
+            seconds: Wall-clock duration of the batch
+            throttles: Throttle/timeout events seen (each was retried)
+            busy_seconds: Sum of individual call durations (busy / wall = effective concurrency)
+            limit: AIMD concurrency limit when the batch finished
+        """
+        with self._lock:
+            self.embedding_wall_seconds += seconds
+            self.embedding_busy_seconds += busy_seconds
+            self.embedding_throttle_count += throttles
+            self.embedding_concurrency_limit = limit
 
     def get_summary(self) -> Dict[str, Any]:
         """
@@ -68,6 +167,28 @@ class CostTracker:
             "llm_call_count": self.llm_call_count,
             "embedding_input_tokens": self.embedding_input_tokens,
             "embedding_call_count": self.embedding_call_count,
+            "embedding_throughput_per_s": (
+                self.embedding_call_count / self.embedding_wall_seconds if self.embedding_wall_seconds else 0.0
+            ),
+            "embedding_throttle_count": self.embedding_throttle_count,
+            "embedding_effective_concurrency": (
+                self.embedding_busy_seconds / self.embedding_wall_seconds if self.embedding_wall_seconds else 0.0
+            ),
+            "embedding_concurrency_limit": self.embedding_concurrency_limit,
+            "embedding_cache_hits": self.embedding_cache_hits,
+            "facts_collapsed": self.facts_collapsed,
+            "reduce_calls_avoided": self.reduce_calls_avoided,
+            "reduce_tokens_avoided": self.reduce_tokens_avoided,
+            "chunks_low_value": self.chunks_low_value,
+            "chunks_skipped": self.chunks_skipped,
+            "triage_calls_saved": self.triage_calls_saved,
+            "duplicate_chunks": self.duplicate_chunks,
+            "duplicate_messages": self.duplicate_messages,
+            "content_dedup_ratio": self.content_dedup_ratio,
+            "token_diet": {
+                stage: {"tokens_before": before, "tokens_after": after, "tokens_saved": before - after}
+                for stage, (before, after) in self.token_diet.items()
+            },
             "llm_cost_usd": llm_cost_usd,
             "embedding_cost_usd": embedding_cost_usd,
             "total_cost_usd": total_cost_usd,
@@ -0,0 +1,164 @@
+"""
+Embedding Cache
+Content-addressed, persistent cache of Titan embeddings.
+
+Retries, re-imports and /retry-full-pass embed the same chunk text again.
+Vectors are stored in a local SQLite database as float32 blobs, keyed by
+sha256(model, dimensions, input text), so a hit is only possible for the
+exact request Titan would have received. The cache is bounded by size:
+once it exceeds max_bytes the least recently used entries are evicted down
+to 90% of the bound.
+"""
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from array import array
+from typing import List, Optional, Sequence
+
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join(tempfile.gettempdir(), "soulprint_embeddings.sqlite3"))
+EMBED_CACHE_MAX_MB = int(os.getenv("EMBED_CACHE_MAX_MB", "256"))
+
+# SQLite limits bound parameters per statement; look keys up in chunks
+_LOOKUP_BATCH = 500
+
+
+def cache_key(model_id: str, dimensions: int, text: str) -> str:
+    """Content address of an embedding request."""
+    digest = hashlib.sha256()
+    digest.update(f"{model_id}\0{dimensions}\0".encode("utf-8"))
+    digest.update(text.encode("utf-8", "surrogatepass"))
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed LRU cache of float32 embedding vectors."""
+
+    def __init__(self, path: str = EMBED_CACHE_PATH, max_bytes: int = EMBED_CACHE_MAX_MB * 1024 * 1024):
+        """
+        Open (or create) the cache.
+
+        Args:
+            path: SQLite file path
+            max_bytes: Size bound for stored vectors and keys
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def get(self, model_id: str, dimensions: int, text: str) -> Optional[List[float]]:
+        """Cached vector for one text, or None."""
+        return self.get_many(model_id, dimensions, [text])[0]
+
+    def get_many(self, model_id: str, dimensions: int, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """
+        Look up several texts at once.
+
+        Args:
+            model_id: Bedrock model ID
+            dimensions: Output dimensions
+            texts: Exact input texts sent to the model
+
+        Returns:
+            Vectors in input order, None where not cached
+        """
+        keys = [cache_key(model_id, dimensions, t) for t in texts]
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), _LOOKUP_BATCH):
+                batch = keys[i:i + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                for key, blob in self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ):
+                    found[key] = blob
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found]
+                )
+            self.hits += sum(1 for k in keys if k in found)
+            self.misses += sum(1 for k in keys if k not in found)
+
+        results: List[Optional[List[float]]] = []
+        for key in keys:
+            blob = found.get(key)
+            if blob is None:
+                results.append(None)
+            else:
+                vector = array("f")
+                vector.frombytes(blob)
+                results.append(vector.tolist())
+        return results
+
+    def put(self, model_id: str, dimensions: int, text: str, vector: Sequence[float]) -> None:
+        """Store one vector (as float32), evicting LRU entries if over the size bound."""
+        key = cache_key(model_id, dimensions, text)
+        blob = array("f", vector).tobytes()
+        size = len(blob) + len(key)
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM embeddings WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_id, dimensions, blob, size, time.time()),
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict(int(self.max_bytes * 0.9))
+
+    def _evict(self, target_bytes: int) -> None:
+        # Called with the lock held
+        evicted = 0
+        while self._total_bytes > target_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM embeddings ORDER BY last_used LIMIT 256"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            for key, size in rows:
+                if self._total_bytes <= target_bytes:
+                    break
+                self._conn.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+                self._total_bytes -= size
+                evicted += 1
+        print(f"[EmbeddingCache] Evicted {evicted} entries ({self._total_bytes // 1024} KB kept)")
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+# Lazy-init process-wide cache
+_embedding_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Shared cache, or None when disabled (EMBED_CACHE_PATH set to an empty string)."""
+    global _embedding_cache
+    if not EMBED_CACHE_PATH:
+        return None
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache(EMBED_CACHE_PATH)
+    return _embedding_cache
@@ -4,15 +4,42 @@ Generates Titan Embed v2 embeddings (768 dims) for conversation chunks via AWS B
 """
 import os
 import json
+import time
+import random
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
 import boto3
 import httpx
-from typing import List, Dict, Optional
+from botocore.config import Config
+from typing import Callable, List, Dict, Optional
+
+from .adaptive_limiter import AdaptiveLimiter, SUCCESS, THROTTLED, ERROR
+from .embedding_cache import get_embedding_cache
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 
+TITAN_MODEL_ID = 'amazon.titan-embed-text-v2:0'
+TITAN_MAX_INPUT_CHARS = 8000  # Titan v2 max input is ~8192 tokens
+
+# Titan concurrency: AIMD starts at EMBED_CONCURRENCY and never exceeds EMBED_MAX_CONCURRENCY
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "16"))
+EMBED_CALL_TIMEOUT_SECONDS = float(os.getenv("EMBED_CALL_TIMEOUT_SECONDS", "30"))
+EMBED_MAX_ATTEMPTS = int(os.getenv("EMBED_MAX_ATTEMPTS", "6"))
+
+# Chunks per update_chunk_embeddings RPC call (one round trip per batch)
+EMBED_UPDATE_BATCH = int(os.getenv("EMBED_UPDATE_BATCH", "500"))
+
+# Bedrock error codes that mean "slow down" rather than "this request is bad"
+THROTTLE_ERROR_CODES = {"ThrottlingException", "TooManyRequestsException", "ServiceUnavailableException"}
+
 # Lazy-init Bedrock client
 _bedrock_client = None
+# Lazy-init shared Titan limiter (one AIMD state per process)
+_embed_limiter: Optional[AdaptiveLimiter] = None
+# Lazy-init Titan worker threads: one per limiter slot, so a call never waits for a thread
+_embed_executor: Optional[ThreadPoolExecutor] = None
 
 
 def get_bedrock_client():
@@ -23,13 +50,45 @@ def get_bedrock_client():
             region_name=os.environ.get('AWS_REGION', 'us-east-1'),
             aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
             aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
+            config=Config(
+                read_timeout=EMBED_CALL_TIMEOUT_SECONDS,
+                connect_timeout=10,
+                # Throttles surface immediately so the AIMD limiter sees them
+                retries={'total_max_attempts': 1},
+                max_pool_connections=EMBED_MAX_CONCURRENCY,
+            ),
         )
     return _bedrock_client
 
 
+def get_embed_limiter() -> AdaptiveLimiter:
+    global _embed_limiter
+    if _embed_limiter is None:
+        _embed_limiter = AdaptiveLimiter("titan", initial_limit=EMBED_CONCURRENCY, max_limit=EMBED_MAX_CONCURRENCY)
+    return _embed_limiter
+
+
+def get_embed_executor() -> ThreadPoolExecutor:
+    global _embed_executor
+    if _embed_executor is None:
+        _embed_executor = ThreadPoolExecutor(max_workers=EMBED_MAX_CONCURRENCY, thread_name_prefix="titan")
+    return _embed_executor
+
+
+def _is_throttle(error: Exception) -> bool:
+    """True for botocore ClientErrors that signal rate limiting."""
+    response = getattr(error, "response", None)
+    if not isinstance(response, dict):
+        return False
+    return response.get("Error", {}).get("Code") in THROTTLE_ERROR_CODES
+
+
 def embed_text(text: str, dimensions: int = 768, cost_tracker: Optional['CostTracker'] = None) -> List[float]:
     """Generate a single embedding using Titan Embed v2.
 
+    Consults the persistent embedding cache first; a miss calls Titan and
+    stores the result.
+
     Args:
         text: Input text (will be truncated to 8000 chars for safety)
         dimensions: Output dimensions (768 default, Titan v2 supports 256-1024)
@@ -38,11 +97,19 @@ def embed_text(text: str, dimensions: int = 768, cost_tracker: Optional['CostTra
     Returns:
         List of floats representing the embedding vector
     """
-    client = get_bedrock_client()
-    truncated = text[:8000]  # Titan v2 max input is ~8192 tokens
+    truncated = text[:TITAN_MAX_INPUT_CHARS]
+
+    cache = get_embedding_cache()
+    if cache is not None:
+        cached = cache.get(TITAN_MODEL_ID, dimensions, truncated)
+        if cached is not None:
+            if cost_tracker:
+                cost_tracker.record_embedding_cache_hits(1)
+            return cached
 
+    client = get_bedrock_client()
     response = client.invoke_model(
-        modelId='amazon.titan-embed-text-v2:0',
+        modelId=TITAN_MODEL_ID,
         contentType='application/json',
         accept='application/json',
         body=json.dumps({
@@ -58,15 +125,19 @@ def embed_text(text: str, dimensions: int = 768, cost_tracker: Optional['CostTra
     if cost_tracker:
         cost_tracker.record_embedding(len(truncated))
 
+    if cache is not None:
+        cache.put(TITAN_MODEL_ID, dimensions, truncated, result['embedding'])
+
     return result['embedding']
 
 
 def embed_batch(texts: List[str], dimensions: int = 768, cost_tracker: Optional['CostTracker'] = None) -> List[List[float]]:
-    """Generate embeddings for a batch of texts.
+    """Generate embeddings for a batch of texts (sync wrapper).
 
-    Titan Embed v2 does NOT support native batching — each text
-    is a separate API call. We process sequentially to avoid
-    rate limits (consistent with the concurrency=5 decision from Phase 1).
+    Titan Embed v2 does NOT support native batching — each text is a
+    separate API call. This runs embed_batch_async, which issues the calls
+    in parallel under the shared AIMD limiter. Must not be called from a
+    running event loop (await embed_batch_async there instead).
 
     Args:
         texts: List of input texts
@@ -76,11 +147,7 @@ def embed_batch(texts: List[str], dimensions: int = 768, cost_tracker: Optional[
     Returns:
         List of embedding vectors (same order as input)
     """
-    embeddings = []
-    for text in texts:
-        embedding = embed_text(text, dimensions, cost_tracker)
-        embeddings.append(embedding)
-    return embeddings
+    return asyncio.run(embed_batch_async(texts, dimensions, cost_tracker))
 
 
 async def update_chunk_embedding(chunk_id: str, embedding: List[float]):
@@ -105,62 +172,331 @@ async def update_chunk_embedding(chunk_id: str, embedding: List[float]):
             raise RuntimeError(f"Failed to update embedding for chunk {chunk_id}: {response.status_code}")
 
 
-async def generate_embeddings_for_chunks(user_id: str, batch_size: int = 50, cost_tracker: Optional['CostTracker'] = None):
-    """Generate embeddings for all conversation_chunks that don't have one yet.
+def vector_literal(embedding: List[float]) -> str:
+    """Format a vector as a compact pgvector text literal, e.g. '[0.1,-0.25]'.
+
+    pgvector stores float4, so 7 significant digits keep full precision
+    while dropping the long float64 tails JSON would send.
+    """
+    return "[" + ",".join(format(x, ".7g") for x in embedding) + "]"
 
-    Fetches chunks without embeddings, generates Titan Embed v2 embeddings,
-    and PATCHes them back to the database. Processes in batches to limit memory.
+
+async def update_chunk_embeddings_bulk(
+    chunk_ids: List[str],
+    embeddings: List[List[float]],
+    client: Optional[httpx.AsyncClient] = None,
+) -> int:
+    """Write vectors for many conversation_chunks rows in one RPC call.
+
+    Calls the update_chunk_embeddings SQL function (see
+    supabase/migrations/20260212_bulk_chunk_embeddings.sql) with parallel
+    arrays of IDs and pgvector text literals.
 
     Args:
-        user_id: User ID whose chunks need embeddings
-        batch_size: Number of chunks to process per batch (default 50)
-        cost_tracker: Optional CostTracker instance to record token usage
+        chunk_ids: Row IDs
+        embeddings: Vectors in the same order as chunk_ids
+        client: Optional shared httpx.AsyncClient
 
     Returns:
-        Number of chunks embedded
+        Number of rows updated
     """
-    total_embedded = 0
-    offset = 0
-
-    while True:
-        # Fetch chunks without embeddings
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{SUPABASE_URL}/rest/v1/conversation_chunks",
-                params={
-                    "user_id": f"eq.{user_id}",
-                    "embedding": "is.null",
-                    "select": "id,content",
-                    "limit": str(batch_size),
-                    "offset": str(offset),
-                },
-                headers={
-                    "apikey": SUPABASE_SERVICE_KEY,
-                    "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
-                },
-                timeout=30.0,
+    if not chunk_ids:
+        return 0
+
+    async def call(http: httpx.AsyncClient) -> int:
+        response = await http.post(
+            f"{SUPABASE_URL}/rest/v1/rpc/update_chunk_embeddings",
+            json={"chunk_ids": chunk_ids, "embeddings": [vector_literal(e) for e in embeddings]},
+            headers={
+                "apikey": SUPABASE_SERVICE_KEY,
+                "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
+                "Content-Type": "application/json",
+            },
+            timeout=60.0,
+        )
+        if response.status_code != 200:
+            raise RuntimeError(
+                f"Failed to update embeddings for {len(chunk_ids)} chunks: {response.status_code} {response.text[:200]}"
+            )
+        return response.json()
+
+    if client is not None:
+        return await call(client)
+    async with httpx.AsyncClient() as http:
+        return await call(http)
+
+
+def _call_outcome(future: Future, timing: Dict[str, float]) -> str:
+    """Limiter outcome of a finished Titan call (a call that outran the timeout counts as throttled)."""
+    if future.cancelled():
+        return ERROR
+    error = future.exception()
+    if error is not None:
+        return THROTTLED if _is_throttle(error) else ERROR
+    return THROTTLED if timing.get("elapsed", 0.0) > EMBED_CALL_TIMEOUT_SECONDS else SUCCESS
+
+
+async def _embed_one(
+    text: str,
+    dimensions: int,
+    cost_tracker: Optional['CostTracker'],
+    limiter: AdaptiveLimiter,
+    counters: Dict[str, float],
+) -> List[float]:
+    """
+    Embed one text under the limiter, retrying throttles and timeouts with backoff.
+
+    The call runs on the dedicated Titan executor. Its timeout starts when
+    the thread starts executing it, so waiting for a thread is never taken
+    for a slow provider. The limiter slot is released by the thread itself
+    when the call returns: a timed-out or cancelled call keeps its slot
+    until it really finishes, so in-flight calls never exceed the limit.
+    """
+    loop = asyncio.get_running_loop()
+    for attempt in range(EMBED_MAX_ATTEMPTS):
+        epoch = await limiter.acquire()
+        began = asyncio.Event()
+        timing: Dict[str, float] = {}
+
+        def call() -> List[float]:
+            timing["started"] = time.monotonic()
+            try:
+                loop.call_soon_threadsafe(began.set)
+            except RuntimeError:
+                pass  # loop already closed (batch abandoned); the call still runs to release its slot
+            try:
+                return embed_text(text, dimensions, cost_tracker)
+            finally:
+                timing["elapsed"] = time.monotonic() - timing["started"]
+
+        def release(done: Future, epoch: int = epoch, timing: Dict[str, float] = timing) -> None:
+            limiter.release(epoch, _call_outcome(done, timing), latency=timing.get("elapsed"))
+
+        future = get_embed_executor().submit(call)
+        future.add_done_callback(release)
+        result = asyncio.wrap_future(future)
+        # A result that arrives after the timeout is dropped; don't warn about it
+        result.add_done_callback(lambda f: f.cancelled() or f.exception())
+        try:
+            await began.wait()
+            remaining = EMBED_CALL_TIMEOUT_SECONDS - (time.monotonic() - timing["started"])
+            return await asyncio.wait_for(asyncio.shield(result), timeout=max(0.0, remaining))
+        except asyncio.TimeoutError:
+            # A hung call is an overload signal too
+            counters["throttles"] += 1
+            error = f"timed out after {EMBED_CALL_TIMEOUT_SECONDS:g}s"
+        except asyncio.CancelledError:
+            future.cancel()  # only succeeds if the thread never picked it up
+            raise
+        except Exception as e:
+            if not _is_throttle(e):
+                raise
+            counters["throttles"] += 1
+            error = str(e)
+        finally:
+            if "started" in timing:
+                counters["busy_seconds"] += timing.get("elapsed", time.monotonic() - timing["started"])
+
+        if attempt < EMBED_MAX_ATTEMPTS - 1:
+            wait = min(8.0, 0.5 * (2 ** attempt)) + random.random() * 0.25
+            print(f"[Embeddings] Titan throttled ({error}), retry {attempt + 1}/{EMBED_MAX_ATTEMPTS - 1} in {wait:.1f}s")
+            await asyncio.sleep(wait)
+    raise RuntimeError(f"Titan embedding failed after {EMBED_MAX_ATTEMPTS} throttled attempts: {error}")
+
+
+async def embed_batch_async(
+    texts: List[str],
+    dimensions: int = 768,
+    cost_tracker: Optional['CostTracker'] = None,
+    limiter: Optional[AdaptiveLimiter] = None,
+) -> List[List[float]]:
+    """Embed texts in parallel without blocking the event loop.
+
+    Texts already in the persistent embedding cache are served from it.
+    Each Titan call runs on the dedicated Titan executor under an AIMD limiter (shared
+    process-wide by default): concurrency ramps up toward
+    EMBED_MAX_CONCURRENCY while calls succeed and halves on
+    ThrottlingException. Each call has a timeout; throttled or timed-out
+    calls are retried with backoff. Any other error fails the batch.
+
+    Args:
+        texts: List of input texts
+        dimensions: Output dimensions (768 default)
+        cost_tracker: Optional CostTracker to record token usage, throughput,
+            throttle events and effective concurrency
+        limiter: AdaptiveLimiter to use (default: shared Titan limiter)
+
+    Returns:
+        List of embedding vectors (same order as input)
+    """
+    if not texts:
+        return []
+
+    # Cached vectors first (one lookup for the whole batch); only misses go to Titan
+    embeddings: List[Optional[List[float]]] = [None] * len(texts)
+    cache = get_embedding_cache()
+    if cache is not None:
+        embeddings = await asyncio.to_thread(
+            cache.get_many, TITAN_MODEL_ID, dimensions, [t[:TITAN_MAX_INPUT_CHARS] for t in texts]
+        )
+    missing = [i for i, e in enumerate(embeddings) if e is None]
+    if cost_tracker and len(missing) < len(texts):
+        cost_tracker.record_embedding_cache_hits(len(texts) - len(missing))
+    if not missing:
+        return embeddings
+
+    limiter = limiter or get_embed_limiter()
+    counters = {"busy_seconds": 0.0, "throttles": 0}
+    started = time.monotonic()
+
+    tasks = [asyncio.create_task(_embed_one(texts[i], dimensions, cost_tracker, limiter, counters)) for i in missing]
+    try:
+        for i, embedding in zip(missing, await asyncio.gather(*tasks)):
+            embeddings[i] = embedding
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    finally:
+        if cost_tracker:
+            cost_tracker.record_embedding_run(
+                calls=len(missing),
+                seconds=time.monotonic() - started,
+                throttles=counters["throttles"],
+                busy_seconds=counters["busy_seconds"],
+                limit=limiter.limit,
             )
-            if response.status_code != 200:
-                print(f"[Embeddings] Failed to fetch chunks: {response.status_code}")
-                break
+    return embeddings
 
-            chunks = response.json()
 
-        if not chunks:
-            break  # No more chunks to process
+def _supabase_headers() -> Dict[str, str]:
+    return {
+        "apikey": SUPABASE_SERVICE_KEY,
+        "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
+    }
 
-        print(f"[Embeddings] Processing batch of {len(chunks)} chunks (offset={offset})")
 
-        # Generate embeddings for this batch
-        texts = [chunk["content"] for chunk in chunks]
-        embeddings = embed_batch(texts, cost_tracker=cost_tracker)  # Sequential Titan v2 calls
+async def count_chunks_missing_embeddings(user_id: str, client: Optional[httpx.AsyncClient] = None) -> int:
+    """Count a user's conversation_chunks rows that have no vector yet (reference rows excluded).
+
+    Uses a HEAD request with `Prefer: count=exact`; PostgREST returns the
+    total in the Content-Range header (e.g. "*/42").
+    """
+    async def call(http: httpx.AsyncClient) -> int:
+        response = await http.head(
+            f"{SUPABASE_URL}/rest/v1/conversation_chunks",
+            params={"user_id": f"eq.{user_id}", "embedding": "is.null", "duplicate_of": "is.null", "select": "id"},
+            headers={**_supabase_headers(), "Prefer": "count=exact"},
+            timeout=30.0,
+        )
+        if response.status_code not in (200, 206):
+            raise RuntimeError(f"Failed to count chunks missing embeddings: {response.status_code}")
+        return int(response.headers.get("content-range", "*/0").rsplit("/", 1)[1])
+
+    if client is not None:
+        return await call(client)
+    async with httpx.AsyncClient() as http:
+        return await call(http)
+
+
+async def _fetch_chunks_missing_embeddings(
+    client: httpx.AsyncClient,
+    user_id: str,
+    after_id: Optional[str],
+    limit: int,
+) -> Optional[List[Dict]]:
+    """One keyset page of chunks without vectors, ordered by id. None on failure."""
+    params = {
+        "user_id": f"eq.{user_id}",
+        "embedding": "is.null",
+        "duplicate_of": "is.null",  # reference rows (see ContentDeduper) are never embedded
+        "select": "id,content",
+        "order": "id.asc",
+        "limit": str(limit),
+    }
+    if after_id is not None:
+        params["id"] = f"gt.{after_id}"
+    response = await client.get(
+        f"{SUPABASE_URL}/rest/v1/conversation_chunks",
+        params=params,
+        headers=_supabase_headers(),
+        timeout=30.0,
+    )
+    if response.status_code != 200:
+        print(f"[Embeddings] Failed to fetch chunks: {response.status_code}")
+        return None
+    return response.json()
+
+
+async def generate_embeddings_for_chunks(
+    user_id: str,
+    batch_size: int = EMBED_UPDATE_BATCH,
+    cost_tracker: Optional['CostTracker'] = None,
+    on_progress: Optional[Callable[[int], None]] = None,
+) -> Dict[str, int]:
+    """Repair path: embed conversation_chunks rows that are missing a vector.
+
+    The full pass embeds chunks before inserting them (see save_chunks_batch),
+    so this only runs when some embeddings failed at insert time or for rows
+    written by older imports. Streams chunks without embeddings in id order
+    (keyset pagination: each page starts after the last id seen, so rows
+    that drop out of the `embedding is null` filter never shift later
+    pages), prefetching the next page while the current one is embedded,
+    and writes each page back with a single update_chunk_embeddings RPC call.
+    When the loop ends it re-counts the rows still missing vectors.
 
-        # Update each chunk with its embedding
-        for chunk, embedding in zip(chunks, embeddings):
-            await update_chunk_embedding(chunk["id"], embedding)
+    Args:
+        user_id: User ID whose chunks need embeddings
+        batch_size: Number of chunks to process per batch (default EMBED_UPDATE_BATCH)
+        cost_tracker: Optional CostTracker instance to record token usage
+        on_progress: Optional callback(count) after each batch is written
 
-        total_embedded += len(chunks)
-        offset += batch_size
+    Returns:
+        Dict with embedded (rows written), remaining (rows still missing a
+        vector) and complete (1 if remaining is 0, else 0)
+    """
+    total_embedded = 0
 
-    print(f"[Embeddings] Generated {total_embedded} embeddings for user {user_id}")
-    return total_embedded
+    async with httpx.AsyncClient() as client:
+        pending = await count_chunks_missing_embeddings(user_id, client)
+        print(f"[Embeddings] {pending} chunks missing embeddings for user {user_id}")
+
+        next_page = asyncio.create_task(_fetch_chunks_missing_embeddings(client, user_id, None, batch_size))
+        try:
+            while next_page is not None:
+                chunks = await next_page
+                next_page = None
+                if not chunks:
+                    break  # Done, or the fetch failed (the final count tells which)
+
+                # Prefetch the next page while this one is embedded and written
+                if len(chunks) == batch_size:
+                    next_page = asyncio.create_task(
+                        _fetch_chunks_missing_embeddings(client, user_id, chunks[-1]["id"], batch_size)
+                    )
+
+                print(f"[Embeddings] Processing batch of {len(chunks)} chunks "
+                      f"({total_embedded + len(chunks)}/{pending})")
+
+                # Generate embeddings for this batch (parallel Titan calls under the AIMD limiter)
+                texts = [chunk["content"] for chunk in chunks]
+                embeddings = await embed_batch_async(texts, cost_tracker=cost_tracker)
+
+                # One round trip writes the whole batch
+                await update_chunk_embeddings_bulk([chunk["id"] for chunk in chunks], embeddings, client)
+
+                total_embedded += len(chunks)
+                if on_progress:
+                    on_progress(len(chunks))
+        finally:
+            if next_page is not None:
+                next_page.cancel()
+
+        remaining = await count_chunks_missing_embeddings(user_id, client)
+
+    if remaining:
+        print(f"[Embeddings] Generated {total_embedded} embeddings for user {user_id}, "
+              f"{remaining} chunks still missing vectors")
+    else:
+        print(f"[Embeddings] Generated {total_embedded} embeddings for user {user_id}, all chunks embedded")
+    return {"embedded": total_embedded, "remaining": remaining, "complete": int(remaining == 0)}
@@ -0,0 +1,209 @@
+"""
+Fact Dedup
+Local near-duplicate collapsing of consolidated facts (MinHash + LSH).
+
+consolidate_facts only drops exact repeats, so paraphrases such as
+"Prefers TypeScript" and "User prefers using TypeScript" both survive and
+push the total over the hierarchical_reduce threshold. This stage
+normalizes each fact to its content words plus ordered word bigrams (so
+"Postgres over MySQL" and "MySQL over Postgres" differ), buckets MinHash
+signatures with LSH to find candidates, and merges a fact into an earlier
+cluster when their Jaccard similarity reaches the threshold. Negation and
+polarity words ("not", "never", "avoids", "hates", ...) are kept, and facts
+of opposite polarity never merge, so contradicting facts both survive.
+No API calls; runs in roughly linear time. The full pass only runs it when
+the facts are over the reduce budget.
+"""
+import hashlib
+import os
+import re
+from collections import Counter, deque
+from typing import Deque, Dict, FrozenSet, List, Tuple
+
+from .fact_extractor import FACT_CATEGORIES, estimate_reduction_cost
+
+# Shingle-set (words + bigrams) Jaccard similarity at which two facts count as the same (0 disables)
+FACT_DEDUP_THRESHOLD = float(os.getenv("FACT_DEDUP_THRESHOLD", "0.75"))
+
+# 8 bands x 4 rows: pairs above ~0.6 similarity almost always share a band
+NUM_PERM = 32
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+# Bound work per fact when many facts share vocabulary: each LSH bucket keeps
+# its most recent clusters, and only the candidates sharing the most bands
+# are verified
+BUCKET_CAP = 64
+MAX_CANDIDATES = 16
+
+_MERSENNE = (1 << 61) - 1
+_PERMS = [
+    (int.from_bytes(hashlib.sha256(f"a{i}".encode()).digest()[:8], "big") % _MERSENNE | 1,
+     int.from_bytes(hashlib.sha256(f"b{i}".encode()).digest()[:8], "big") % _MERSENNE)
+    for i in range(NUM_PERM)
+]
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9+#.\-]*[a-z0-9+#]|[a-z0-9]")
+STOPWORDS = frozenset("""
+a an the and or but of to in on at for with from by as is are was were be been being it its this that
+these those they them their he she his her we our you your i me my user users user's uses use using used
+likes like really very always usually often also just more most some any all about into over than then
+has have had do does did so such can could would should will
+""".split())
+# Words that flip a fact's polarity ("Is vegetarian" / "Is not vegetarian")
+_NEGATION = re.compile(r"^(?:not|no|never|nor|neither|none|nothing|without|against|anymore|"
+                       r"dislik\w*|hat(?:e|es|ed|ing)|avoid\w*|stop(?:s|ped|ping)?|quit\w*)$")
+
+# Which fields identify a dict fact (name first, then supporting detail)
+_DICT_FIELDS = {
+    "projects": ("name", "description"),
+    "dates": ("event", "date"),
+    "decisions": ("decision",),
+}
+
+
+def _stem(word: str) -> str:
+    # Crude suffix folding so "prefers"/"prefer"/"preferred" compare equal
+    for suffix in ("ing", "ed", "es", "s"):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[: -len(suffix)]
+    return word
+
+
+def fact_text(category: str, item) -> str:
+    """Text a fact is compared on."""
+    if isinstance(item, dict):
+        fields = _DICT_FIELDS.get(category, ())
+        return " ".join(str(item.get(f, "")) for f in fields) if fields else str(item)
+    return str(item)
+
+
+def _words(text: str) -> List[str]:
+    text = text.lower().replace("cannot", "can not").replace("n't", " not").replace("n’t", " not")
+    return [w for w in _WORD.findall(text) if w not in STOPWORDS]
+
+
+def shingles(text: str) -> FrozenSet[str]:
+    """Normalized content words of a fact plus their ordered bigrams."""
+    words = [_stem(w) for w in _words(text)]
+    return frozenset(words) | frozenset(f"{a} {b}" for a, b in zip(words, words[1:]))
+
+
+def polarity(text: str) -> int:
+    """1 if a fact is negated (odd number of negation words), else 0."""
+    return sum(1 for w in _words(text) if _NEGATION.match(w)) % 2
+
+
+class _MinHasher:
+    """MinHash signatures with per-word hash vectors memoized (fact vocabularies repeat a lot)."""
+
+    def __init__(self):
+        self._word_hashes: Dict[str, Tuple[int, ...]] = {}
+
+    def _hashes(self, word: str) -> Tuple[int, ...]:
+        cached = self._word_hashes.get(word)
+        if cached is None:
+            x = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "big")
+            cached = tuple((a * x + b) % _MERSENNE for a, b in _PERMS)
+            self._word_hashes[word] = cached
+        return cached
+
+    def signature(self, words: FrozenSet[str]) -> Tuple[int, ...]:
+        return tuple(map(min, zip(*(self._hashes(w) for w in words))))
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    return len(a & b) / len(a | b)
+
+
+def _collapse_items(category: str, items: list, threshold: float, hasher: _MinHasher) -> list:
+    """Greedy clustering in input order; each cluster keeps its most detailed member at its first position."""
+    clusters: List[List[int]] = []  # member indices, first = leader
+    leader_words: List[FrozenSet[str]] = []
+    leader_polarity: List[int] = []
+    buckets: Dict[Tuple[int, Tuple[int, ...]], Deque[int]] = {}  # (band, rows) -> recent cluster ids
+
+    for index, item in enumerate(items):
+        text = fact_text(category, item)
+        words = shingles(text)
+        negated = polarity(text)
+        if not words:
+            clusters.append([index])
+            leader_words.append(words)
+            leader_polarity.append(negated)
+            continue
+
+        signature = hasher.signature(words)
+        keys = [(band, signature[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+        shared_bands = Counter()
+        for key in keys:
+            shared_bands.update(buckets.get(key, ()))
+        match = None
+        for cluster_id, _ in shared_bands.most_common(MAX_CANDIDATES):
+            if leader_polarity[cluster_id] == negated and _jaccard(words, leader_words[cluster_id]) >= threshold:
+                match = cluster_id
+                break
+
+        if match is not None:
+            clusters[match].append(index)
+        else:
+            cluster_id = len(clusters)
+            clusters.append([index])
+            leader_words.append(words)
+            leader_polarity.append(negated)
+            for key in keys:
+                bucket = buckets.get(key)
+                if bucket is None:
+                    bucket = buckets[key] = deque(maxlen=BUCKET_CAP)
+                bucket.append(cluster_id)
+
+    collapsed = []
+    for members in clusters:
+        # Longest text wins (more detail); ties keep the earliest
+        best = max(members, key=lambda i: (len(fact_text(category, items[i])), -i))
+        collapsed.append(items[best])
+    return collapsed
+
+
+def collapse_near_duplicates(
+    consolidated_facts: dict,
+    threshold: float = None,
+    reduce_max_tokens: int = 200000,
+) -> Tuple[dict, Dict[str, int]]:
+    """
+    Merge paraphrased facts within each category.
+
+    Args:
+        consolidated_facts: Output of consolidate_facts
+        threshold: Shingle-set Jaccard similarity to merge at (default FACT_DEDUP_THRESHOLD; 0 disables)
+        reduce_max_tokens: hierarchical_reduce threshold, used to report the
+            reduction calls and tokens the collapse avoids
+
+    Returns:
+        (collapsed facts dict with total_count, stats dict with facts_before,
+        facts_after, collapsed, reduce_calls_avoided, reduce_tokens_avoided)
+    """
+    threshold = FACT_DEDUP_THRESHOLD if threshold is None else threshold
+    facts_before = consolidated_facts.get("total_count", sum(len(consolidated_facts.get(c, [])) for c in FACT_CATEGORIES))
+    if threshold <= 0:
+        return consolidated_facts, {
+            "facts_before": facts_before, "facts_after": facts_before, "collapsed": 0,
+            "reduce_calls_avoided": 0, "reduce_tokens_avoided": 0,
+        }
+
+    hasher = _MinHasher()
+    collapsed = {c: _collapse_items(c, consolidated_facts.get(c, []), threshold, hasher) for c in FACT_CATEGORIES}
+    collapsed["total_count"] = sum(len(collapsed[c]) for c in FACT_CATEGORIES)
+
+    cost_before = estimate_reduction_cost(consolidated_facts, reduce_max_tokens)
+    cost_after = estimate_reduction_cost(collapsed, reduce_max_tokens)
+    stats = {
+        "facts_before": facts_before,
+        "facts_after": collapsed["total_count"],
+        "collapsed": facts_before - collapsed["total_count"],
+        "reduce_calls_avoided": cost_before["calls"] - cost_after["calls"],
+        "reduce_tokens_avoided": cost_before["input_tokens"] - cost_after["input_tokens"],
+    }
+    print(f"[FactDedup] Collapsed {stats['collapsed']} near-duplicate facts "
+          f"({stats['facts_before']} -> {stats['facts_after']}), avoiding ~{stats['reduce_calls_avoided']} "
+          f"reduction calls / ~{stats['reduce_tokens_avoided']} input tokens")
+    return collapsed, stats
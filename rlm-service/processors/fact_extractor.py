@@ -2,11 +2,106 @@
 Fact Extractor
 Parallel extraction of durable facts from conversation chunks using Claude Haiku 4.5
 """
+import os
 import json
+import time
 import asyncio
 import random
 import anthropic
-from typing import List, Dict, Optional
+from collections import deque
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, Iterable, List, Optional, Union
+
+from . import chunk_triage
+from .adaptive_limiter import AdaptiveLimiter, SUCCESS, THROTTLED, ERROR
+from .token_counter import chars_for_tokens, count_tokens, get_token_counter
+from .token_diet import format_savings, render_for_extraction, uses_token_diet
+
+# Haiku concurrency (independent of the embedding limit): AIMD starts at
+# FACT_EXTRACTION_CONCURRENCY and never exceeds HAIKU_MAX_CONCURRENCY
+FACT_EXTRACTION_CONCURRENCY = int(os.getenv("FACT_EXTRACTION_CONCURRENCY", "5"))
+HAIKU_MAX_CONCURRENCY = int(os.getenv("HAIKU_MAX_CONCURRENCY", "20"))
+# Grow the limit only while success latency stays within this multiple of its average
+HAIKU_LATENCY_TOLERANCE = float(os.getenv("HAIKU_LATENCY_TOLERANCE", "2.0"))
+
+# Packing: small chunks share one extraction request up to this many content
+# tokens (0 disables packing; every chunk gets its own request)
+FACT_PACK_TOKEN_BUDGET = int(os.getenv("FACT_PACK_TOKEN_BUDGET", "4000"))
+FACT_PACK_MAX_CHUNKS = int(os.getenv("FACT_PACK_MAX_CHUNKS", "8"))
+
+FACT_CATEGORIES = ["preferences", "projects", "dates", "beliefs", "decisions"]
+
+# Lazy-init shared Haiku limiter (one AIMD state per process)
+_haiku_limiter: Optional[AdaptiveLimiter] = None
+
+
+def get_haiku_limiter() -> AdaptiveLimiter:
+    global _haiku_limiter
+    if _haiku_limiter is None:
+        _haiku_limiter = AdaptiveLimiter(
+            "haiku",
+            initial_limit=FACT_EXTRACTION_CONCURRENCY,
+            max_limit=HAIKU_MAX_CONCURRENCY,
+            latency_tolerance=HAIKU_LATENCY_TOLERANCE,
+        )
+    return _haiku_limiter
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds from a retry-after header on an Anthropic error, if any."""
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _calibrate_token_counter(kwargs: dict, response) -> None:
+    """Feed the API-reported input_tokens for a prompt back into the token counter."""
+    input_tokens = getattr(getattr(response, "usage", None), "input_tokens", None)
+    if not isinstance(input_tokens, int):
+        return
+    parts = [kwargs.get("system")] + [m.get("content") for m in kwargs.get("messages", [])]
+    prompt = "\n".join(p for p in parts if isinstance(p, str))
+    if prompt:
+        get_token_counter().observe(prompt, input_tokens)
+
+
+async def haiku_call(anthropic_client, limiter: Optional[AdaptiveLimiter] = None, **kwargs):
+    """
+    Make one messages.create call under the shared Haiku AIMD limiter.
+
+    Rate limits (429) and overloads (529) halve the limit and honour the
+    retry-after header; successes grow it while latency is stable. Errors
+    are re-raised for the caller's retry logic. Reported input_tokens
+    calibrate the shared token counter.
+
+    Args:
+        anthropic_client: AsyncAnthropic client instance
+        limiter: AdaptiveLimiter to use (default: shared Haiku limiter)
+        **kwargs: Arguments for messages.create
+
+    Returns:
+        The API response
+    """
+    limiter = limiter or get_haiku_limiter()
+    epoch = await limiter.acquire()
+    started = time.monotonic()
+    outcome = ERROR
+    retry_after = None
+    try:
+        response = await anthropic_client.messages.create(**kwargs)
+        outcome = SUCCESS
+        _calibrate_token_counter(kwargs, response)
+        return response
+    except anthropic.APIStatusError as e:
+        # 529 raises OverloadedError, which is not an InternalServerError
+        if e.status_code in (429, 529):
+            outcome = THROTTLED
+            retry_after = _retry_after(e)
+        raise
+    finally:
+        limiter.release(epoch, outcome, retry_after, latency=time.monotonic() - started)
 
 
 FACT_EXTRACTION_PROMPT = """Extract ONLY factual, durable information from the conversation segment provided inside <conversation> XML tags. Focus on:
@@ -37,6 +132,59 @@ RULES:
 """
 
 
+PACKED_EXTRACTION_INSTRUCTIONS = """
+MULTIPLE CONVERSATIONS: This request contains several independent conversation segments, each inside its own <conversation id="..."> tags. Analyze each one separately and never attribute a fact to a conversation it did not come from.
+
+Return ONE JSON object whose keys are the conversation ids and whose values are the JSON object described above for that conversation alone, e.g.:
+{
+  "0": {"preferences": [], "projects": [], "dates": [], "beliefs": [], "decisions": []},
+  "1": {"preferences": ["fact1"], "projects": [], "dates": [], "beliefs": [], "decisions": []}
+}
+Include every id, with empty arrays when a conversation has no facts.
+"""
+
+
+def _empty_facts() -> dict:
+    return {category: [] for category in FACT_CATEGORIES}
+
+
+def _chunk_tokens(chunk: dict) -> int:
+    """Token estimate for a chunk (chunker's token_count when present)."""
+    return chunk.get("token_count") or count_tokens(chunk["content"])
+
+
+def pack_chunks(chunks: List[dict], token_budget: int, max_chunks: int = FACT_PACK_MAX_CHUNKS) -> List[List[int]]:
+    """
+    Group chunk indices into extraction requests.
+
+    Chunks are taken in order and added to the open request while its
+    content stays within token_budget and it holds fewer than max_chunks;
+    otherwise a new request is started. A chunk larger than the budget gets
+    a request of its own.
+
+    Args:
+        chunks: Chunk dicts (each has 'content', optionally 'token_count')
+        token_budget: Max content tokens per packed request
+        max_chunks: Max chunks per packed request
+
+    Returns:
+        List of index groups covering every chunk once, in order
+    """
+    groups: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for i, chunk in enumerate(chunks):
+        tokens = _chunk_tokens(chunk)
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_chunks):
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
 def strip_markdown_fences(text: str) -> str:
     """Strip markdown code fences from LLM response text."""
     text = text.strip()
@@ -74,7 +222,8 @@ async def extract_facts_from_chunk(chunk_content: str, anthropic_client, cost_tr
         # Call Haiku 4.5 for fact extraction
         # Wrap content in XML tags so model analyzes instead of continuing
         user_content = FACT_EXTRACTION_PROMPT + "\n<conversation>\n" + chunk_content + "\n</conversation>\n\nAnalyze the conversation above and output ONLY the JSON object. No other text."
-        response = await anthropic_client.messages.create(
+        response = await haiku_call(
+            anthropic_client,
             model="claude-haiku-4-5-20251001",
             max_tokens=2048,
             temperature=0.3,  # Low temperature for factual extraction
@@ -122,8 +271,77 @@ async def extract_facts_from_chunk(chunk_content: str, anthropic_client, cost_tr
         return empty_facts
 
 
-async def _extract_with_retry(chunk_content: str, anthropic_client, cost_tracker: Optional['CostTracker'] = None, max_retries: int = 3) -> dict:
-    """Extract facts with exponential backoff retry on API errors."""
+async def extract_facts_from_packed(chunk_contents: List[str], anthropic_client, cost_tracker: Optional['CostTracker'] = None) -> List[Optional[dict]]:
+    """
+    Extract facts from several small chunks in one Haiku 4.5 request.
+
+    Each chunk is wrapped in <conversation id="N"> tags (N = position in
+    chunk_contents) and the model returns one facts object per id, so the
+    ~500-token extraction prompt is paid once per request instead of once
+    per chunk.
+
+    Args:
+        chunk_contents: Text content of each chunk
+        anthropic_client: AsyncAnthropic client instance
+        cost_tracker: Optional CostTracker instance to record token usage
+
+    Returns:
+        Facts dict per chunk (same order); None for chunks whose result was
+        missing or unparseable, so the caller can extract them on their own.
+        API errors are re-raised for the retry wrapper.
+    """
+    parts = [FACT_EXTRACTION_PROMPT, PACKED_EXTRACTION_INSTRUCTIONS]
+    for i, content in enumerate(chunk_contents):
+        parts.append(f'<conversation id="{i}">\n{content}\n</conversation>')
+    parts.append("Analyze each conversation above separately and output ONLY the JSON object keyed by conversation id. No other text.")
+
+    response = await haiku_call(
+        anthropic_client,
+        model="claude-haiku-4-5-20251001",
+        max_tokens=min(16384, 1024 + 1024 * len(chunk_contents)),
+        temperature=0.3,  # Low temperature for factual extraction
+        messages=[{
+            "role": "user",
+            "content": "\n\n".join(parts)
+        }]
+    )
+
+    # Record token usage
+    if cost_tracker:
+        cost_tracker.record_llm_call(response)
+
+    if not response.content:
+        print(f"[FactExtractor] Empty response from Haiku for packed request")
+        return [None] * len(chunk_contents)
+
+    response_text = response.content[0].text
+    try:
+        parsed = _try_repair_json(strip_markdown_fences(response_text))
+    except json.JSONDecodeError as e:
+        print(f"[FactExtractor] JSON parse error in packed response: {e}")
+        print(f"[FactExtractor] Response text: {response_text[:200]}...")
+        return [None] * len(chunk_contents)
+    if not isinstance(parsed, dict):
+        return [None] * len(chunk_contents)
+
+    results: List[Optional[dict]] = []
+    for i in range(len(chunk_contents)):
+        facts = parsed.get(str(i))
+        if isinstance(facts, dict):
+            for key in FACT_CATEGORIES:
+                facts.setdefault(key, [])
+            results.append(facts)
+        else:
+            results.append(None)
+    return results
+
+
+async def _extract_with_retry(chunk_content: str, anthropic_client, cost_tracker: Optional['CostTracker'] = None, max_retries: int = 3, raise_on_failure: bool = False) -> dict:
+    """Extract facts with exponential backoff retry on API errors.
+
+    Returns empty facts once retries are exhausted, or re-raises the last
+    error if raise_on_failure is set (so callers can tell failure from "no facts").
+    """
     empty_facts = {"preferences": [], "projects": [], "dates": [], "beliefs": [], "decisions": []}
     last_error = None
     for attempt in range(max_retries):
@@ -136,66 +354,261 @@ async def _extract_with_retry(chunk_content: str, anthropic_client, cost_tracker
                 print(f"[FactExtractor] Retry {attempt+1}/{max_retries} after {wait:.1f}s: {e}")
                 await asyncio.sleep(wait)
     print(f"[FactExtractor] All {max_retries} retries failed: {last_error}")
+    if raise_on_failure:
+        raise last_error
     return empty_facts
 
 
+async def _extract_group_with_retry(chunk_contents: List[str], anthropic_client, cost_tracker: Optional['CostTracker'] = None, max_retries: int = 3, raise_on_failure: bool = False) -> List[dict]:
+    """Extract facts for one request group (a single chunk or a packed group).
+
+    Packed requests are retried like single ones; chunks whose result is
+    missing from the packed response are extracted on their own.
+    """
+    if len(chunk_contents) == 1:
+        return [await _extract_with_retry(chunk_contents[0], anthropic_client, cost_tracker, max_retries, raise_on_failure)]
+
+    last_error = None
+    for attempt in range(max_retries):
+        try:
+            results = await extract_facts_from_packed(chunk_contents, anthropic_client, cost_tracker)
+            break
+        except Exception as e:
+            last_error = e
+            if attempt < max_retries - 1:
+                wait = (2 ** attempt) + (random.random() * 0.5)
+                print(f"[FactExtractor] Packed retry {attempt+1}/{max_retries} after {wait:.1f}s: {e}")
+                await asyncio.sleep(wait)
+    else:
+        print(f"[FactExtractor] All {max_retries} retries failed for packed request of {len(chunk_contents)} chunks: {last_error}")
+        if raise_on_failure:
+            raise last_error
+        return [_empty_facts() for _ in chunk_contents]
+
+    missing = [j for j, facts in enumerate(results) if facts is None]
+    if missing:
+        print(f"[FactExtractor] Packed response missing {len(missing)}/{len(chunk_contents)} results, extracting them individually")
+        for j in missing:
+            results[j] = await _extract_with_retry(chunk_contents[j], anthropic_client, cost_tracker, max_retries, raise_on_failure)
+    return results
+
+
+async def extract_facts_stream(
+    chunks: Union[Iterable[dict], AsyncIterable[dict]],
+    anthropic_client,
+    cost_tracker: Optional['CostTracker'] = None,
+    on_result: Optional[Callable[[int, dict], None]] = None,
+    pack_token_budget: Optional[int] = None,
+) -> List[dict]:
+    """
+    Extract facts from chunks as they arrive.
+
+    Chunks are packed greedily in arrival order (same grouping as
+    pack_chunks) and handed to a fixed pool of workers through a bounded
+    queue, so extraction starts on the first chunks while the source is
+    still producing, and the number of pending coroutines stays constant
+    however many chunks there are. Every Haiku call goes through the
+    shared AIMD limiter (see haiku_call).
+
+    Prompts use the token_diet rendering when the "facts" stage is in
+    TOKEN_DIET_STAGES. Chunks that chunk_triage scores below TRIAGE_THRESHOLD are packed
+    separately into large requests (TRIAGE_MODE=pack) or get empty facts
+    without a call (TRIAGE_MODE=skip).
+
+    Args:
+        chunks: Chunk dicts (each has 'content'), sync or async iterable
+        anthropic_client: AsyncAnthropic client instance
+        cost_tracker: Optional CostTracker instance to record token usage
+        on_result: Optional callback(chunk_index, facts), called as each chunk
+            finishes (used to checkpoint results before the whole batch is done)
+        pack_token_budget: Max content tokens per packed request
+            (default FACT_PACK_TOKEN_BUDGET; 0 = one request per chunk)
+
+    Returns:
+        List of fact dicts (one per chunk, in arrival order)
+    """
+    budget = FACT_PACK_TOKEN_BUDGET if pack_token_budget is None else pack_token_budget
+    limiter = get_haiku_limiter()
+    limiter_start = limiter.stats()
+    # The limiter caps calls in flight; spare workers keep it saturated while others sleep in retry backoff
+    workers = max(1, 2 * HAIKU_MAX_CONCURRENCY)
+    groups: asyncio.Queue = asyncio.Queue(maxsize=workers)
+    results: List[Optional[dict]] = []
+    request_count = 0
+    # Triage routes low-value chunks to their own lane (big shared requests) or skips them;
+    # packing lanes only make sense while packing is on
+    skip_low_value = chunk_triage.TRIAGE_MODE == "skip"
+    triage = chunk_triage.TRIAGE_THRESHOLD > 0 and (skip_low_value or budget > 0)
+    triage_model = chunk_triage.get_triage_model() if triage else None
+    triage_stats = {"low_value": 0, "skipped": 0, "untriaged_requests": 0}
+    # Prompts carry the diet rendering (see token_diet); triage still scores the full chunk
+    diet = uses_token_diet("facts")
+    diet_tokens = {"before": 0, "after": 0}
+
+    async def produce() -> None:
+        nonlocal request_count
+        # Each lane packs its own open request
+        lanes = {
+            "normal": {"group": [], "contents": [], "tokens": 0, "budget": budget, "max_chunks": FACT_PACK_MAX_CHUNKS},
+            "low": {"group": [], "contents": [], "tokens": 0,
+                    "budget": max(budget, chunk_triage.TRIAGE_PACK_TOKEN_BUDGET),
+                    "max_chunks": chunk_triage.TRIAGE_PACK_MAX_CHUNKS},
+        }
+        # What greedy packing without triage would have sent: (chunks, tokens) of its open request
+        shadow = [0, 0]
+
+        async def flush(lane: dict) -> None:
+            nonlocal request_count
+            await groups.put((lane["group"], lane["contents"]))
+            request_count += 1
+            lane.update(group=[], contents=[], tokens=0)
+
+        async for chunk in _aiter(chunks):
+            index = len(results)
+            results.append(None)
+            content = chunk["content"]
+            tokens = _chunk_tokens(chunk) if budget > 0 or diet else 0
+            if diet:
+                rendered = render_for_extraction(content)
+                diet_tokens["before"] += tokens
+                if rendered != content:
+                    content = rendered
+                    tokens = count_tokens(rendered)
+                diet_tokens["after"] += tokens
+            if shadow[0] and (budget <= 0 or shadow[1] + tokens > budget or shadow[0] >= FACT_PACK_MAX_CHUNKS):
+                triage_stats["untriaged_requests"] += 1
+                shadow[0], shadow[1] = 0, 0
+            shadow[0] += 1
+            shadow[1] += tokens
+
+            lane = lanes["normal"]
+            if triage and triage_model.score(chunk["content"]) < chunk_triage.TRIAGE_THRESHOLD:
+                triage_stats["low_value"] += 1
+                if skip_low_value:
+                    triage_stats["skipped"] += 1
+                    results[index] = _empty_facts()
+                    if on_result:
+                        on_result(index, results[index])
+                    continue
+                lane = lanes["low"]
+            if lane["group"] and (lane["budget"] <= 0 or lane["tokens"] + tokens > lane["budget"]
+                                  or len(lane["group"]) >= lane["max_chunks"]):
+                await flush(lane)
+            lane["group"].append(index)
+            lane["contents"].append(content)
+            lane["tokens"] += tokens
+        for lane in lanes.values():
+            if lane["group"]:
+                await flush(lane)
+        if shadow[0]:
+            triage_stats["untriaged_requests"] += 1
+        for _ in range(workers):
+            await groups.put(None)
+
+    async def worker() -> None:
+        while True:
+            item = await groups.get()
+            if item is None:
+                return
+            group, contents = item
+            try:
+                # With a callback, failures raise (-> empty facts) so they are never reported as results
+                group_results = await _extract_group_with_retry(
+                    contents, anthropic_client, cost_tracker, raise_on_failure=on_result is not None,
+                )
+            except Exception as e:
+                print(f"[FactExtractor] Chunks {group} failed: {e}")
+                group_results = [_empty_facts() for _ in group]
+            else:
+                if on_result:
+                    for index, facts in zip(group, group_results):
+                        on_result(index, facts)
+            for index, facts in zip(group, group_results):
+                results[index] = facts
+
+    print(f"[FactExtractor] Starting streaming extraction with {workers} workers (concurrency limit: {limiter.limit})")
+    worker_tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+    try:
+        await produce()
+        await asyncio.gather(*worker_tasks)
+    except BaseException:
+        for task in worker_tasks:
+            task.cancel()
+        raise
+
+    stats = limiter.stats(since=limiter_start)
+    print(f"[FactExtractor] Extraction complete: {len(results)} chunks in {request_count} requests "
+          f"(Haiku limit {stats['limit']}, {stats['throughput_per_s']:.1f} calls/s, {stats['throttles']} throttles)")
+    if diet:
+        print(format_savings("facts", diet_tokens["before"], diet_tokens["after"]))
+        if cost_tracker:
+            cost_tracker.record_token_diet("facts", diet_tokens["before"], diet_tokens["after"])
+    if triage:
+        calls_saved = triage_stats["untriaged_requests"] - request_count
+        print(f"[FactExtractor] Triage: {triage_stats['low_value']} low-value chunks "
+              f"({triage_stats['skipped']} skipped), {calls_saved} extraction calls saved")
+        if cost_tracker:
+            cost_tracker.record_triage(triage_stats["low_value"], triage_stats["skipped"], calls_saved)
+    return results
+
+
+async def _aiter(items: Union[Iterable, AsyncIterable]) -> AsyncIterator:
+    """Iterate a sync or async iterable asynchronously."""
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
 async def extract_facts_parallel(
     chunks: List[dict],
     anthropic_client,
     cost_tracker: Optional['CostTracker'] = None,
-    concurrency: int = 5
+    on_result: Optional[Callable[[int, dict], None]] = None,
+    pack_token_budget: Optional[int] = None,
 ) -> List[dict]:
     """
-    Extract facts from multiple chunks in parallel with concurrency limit.
+    Extract facts from multiple chunks in parallel.
+
+    Small chunks are packed into shared requests (see pack_chunks) and the
+    per-id results are split back out, so results and callbacks are still
+    per chunk. See extract_facts_stream for concurrency.
 
     Args:
         chunks: List of chunk dicts (each has 'content' field)
         anthropic_client: AsyncAnthropic client instance
         cost_tracker: Optional CostTracker instance to record token usage
-        concurrency: Max number of parallel API calls (default 5)
+        on_result: Optional callback(chunk_index, facts), called as each chunk finishes
+        pack_token_budget: Max content tokens per packed request
+            (default FACT_PACK_TOKEN_BUDGET; 0 = one request per chunk)
 
     Returns:
         List of fact dicts (one per chunk, in same order)
     """
-    print(f"[FactExtractor] Starting parallel extraction for {len(chunks)} chunks (concurrency: {concurrency})")
-
-    # Create semaphore for concurrency control
-    semaphore = asyncio.Semaphore(concurrency)
-
-    async def extract_with_limit(chunk: dict) -> dict:
-        """Extract facts with semaphore limit and retry"""
-        async with semaphore:
-            return await _extract_with_retry(chunk["content"], anthropic_client, cost_tracker)
-
-    # Create tasks for all chunks
-    tasks = [extract_with_limit(chunk) for chunk in chunks]
-
-    # Execute in parallel with exception handling
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-
-    # Convert exceptions to empty facts
-    final_results = []
-    for i, result in enumerate(results):
-        if isinstance(result, Exception):
-            print(f"[FactExtractor] Chunk {i} failed: {result}")
-            final_results.append({
-                "preferences": [],
-                "projects": [],
-                "dates": [],
-                "beliefs": [],
-                "decisions": []
-            })
-        else:
-            final_results.append(result)
+    return await extract_facts_stream(chunks, anthropic_client, cost_tracker, on_result, pack_token_budget)
 
-    print(f"[FactExtractor] Parallel extraction complete: {len(final_results)} results")
-    return final_results
+
+def _fact_key(item) -> object:
+    """Hashable identity for a string fact (exact match, like list membership)."""
+    try:
+        hash(item)
+        return item
+    except TypeError:
+        # Unhashable (the model returned an object/list instead of a string)
+        return ("json", json.dumps(item, sort_keys=True, default=str))
 
 
 def consolidate_facts(all_facts: List[dict]) -> dict:
     """
     Merge all fact dicts into one consolidated dict with deduplication.
 
+    Linear time: each category keeps a set of the keys already seen
+    (exact text for preferences/beliefs, lowercased name/event/decision for
+    projects/dates/decisions), so every fact is checked in O(1). Output
+    order is first-occurrence order.
+
     Args:
         all_facts: List of fact dicts from parallel extraction
 
@@ -210,42 +623,42 @@ def consolidate_facts(all_facts: List[dict]) -> dict:
         "beliefs": [],
         "decisions": []
     }
+    seen = {category: set() for category in consolidated}
+
+    def add_text(category: str, item) -> None:
+        key = _fact_key(item)
+        if item and key not in seen[category]:
+            seen[category].add(key)
+            consolidated[category].append(item)
+
+    def add_named(category: str, item: dict, field: str) -> None:
+        if item:
+            key = item.get(field, "").lower()
+            if key not in seen[category]:
+                seen[category].add(key)
+                consolidated[category].append(item)
 
     # Merge all facts
     for facts in all_facts:
         # Preferences (simple strings)
         for pref in facts.get("preferences", []):
-            if pref and pref not in consolidated["preferences"]:
-                consolidated["preferences"].append(pref)
+            add_text("preferences", pref)
 
-        # Projects (dicts)
+        # Projects (dicts), dedup by project name
         for proj in facts.get("projects", []):
-            if proj:
-                # Simple dedup: check if project name already exists
-                existing_names = [p.get("name", "").lower() for p in consolidated["projects"]]
-                if proj.get("name", "").lower() not in existing_names:
-                    consolidated["projects"].append(proj)
+            add_named("projects", proj, "name")
 
-        # Dates (dicts)
+        # Dates (dicts), dedup by event name
         for date_entry in facts.get("dates", []):
-            if date_entry:
-                # Dedup by event name
-                existing_events = [d.get("event", "").lower() for d in consolidated["dates"]]
-                if date_entry.get("event", "").lower() not in existing_events:
-                    consolidated["dates"].append(date_entry)
+            add_named("dates", date_entry, "event")
 
         # Beliefs (simple strings)
         for belief in facts.get("beliefs", []):
-            if belief and belief not in consolidated["beliefs"]:
-                consolidated["beliefs"].append(belief)
+            add_text("beliefs", belief)
 
-        # Decisions (dicts)
+        # Decisions (dicts), dedup by decision text
         for decision in facts.get("decisions", []):
-            if decision:
-                # Dedup by decision text
-                existing_decisions = [d.get("decision", "").lower() for d in consolidated["decisions"]]
-                if decision.get("decision", "").lower() not in existing_decisions:
-                    consolidated["decisions"].append(decision)
+            add_named("decisions", decision, "decision")
 
     # Count total facts
     total_count = (
@@ -333,6 +746,60 @@ def _try_repair_json(text: str) -> object:
     raise json.JSONDecodeError("Could not repair JSON", text, 0)
 
 
+# Facts per Haiku reduction call (~20K tokens) so responses fit in max_tokens
+REDUCE_BATCH_TOKENS = 20000
+# Reduction circuit breaker: stop dispatching once this many of the last
+# REDUCE_BREAKER_WINDOW batches failed
+REDUCE_BREAKER_FAILURES = 5
+REDUCE_BREAKER_WINDOW = 10
+
+
+def split_into_batches(items: list, batch_chars: int) -> List[list]:
+    """Split items into batches by character count"""
+    batches = []
+    current_batch = []
+    current_size = 0
+
+    for item in items:
+        item_size = len(json.dumps(item))
+        if current_size + item_size > batch_chars and current_batch:
+            batches.append(current_batch)
+            current_batch = [item]
+            current_size = item_size
+        else:
+            current_batch.append(item)
+            current_size += item_size
+
+    if current_batch:
+        batches.append(current_batch)
+
+    return batches
+
+
+def estimate_reduction_cost(consolidated_facts: dict, max_tokens: int) -> Dict[str, int]:
+    """
+    Haiku calls and input tokens the first hierarchical_reduce round would spend.
+
+    Args:
+        consolidated_facts: Dict with all consolidated facts
+        max_tokens: Reduction threshold passed to hierarchical_reduce
+
+    Returns:
+        Dict with calls and input_tokens (both 0 when under the threshold)
+    """
+    facts_json = json.dumps(consolidated_facts, indent=2)
+    if count_tokens(facts_json) <= max_tokens:
+        return {"calls": 0, "input_tokens": 0}
+    batch_chars = chars_for_tokens(REDUCE_BATCH_TOKENS, facts_json)
+    calls = 0
+    input_tokens = 0
+    for category in FACT_CATEGORIES:
+        for batch in split_into_batches(consolidated_facts.get(category, []), batch_chars):
+            calls += 1
+            input_tokens += count_tokens(json.dumps(batch, indent=2))
+    return {"calls": calls, "input_tokens": input_tokens}
+
+
 async def hierarchical_reduce(
     consolidated_facts: dict,
     anthropic_client,
@@ -345,7 +812,9 @@ async def hierarchical_reduce(
     Recursively reduce facts if they exceed token limit.
 
     If consolidated facts are under max_tokens, return as-is.
-    Otherwise, split into batches and reduce each batch via Haiku 4.5.
+    Otherwise, split every category into batches and reduce all batches
+    concurrently via Haiku 4.5 under the shared limiter. Failed batches keep
+    their original facts; results are reassembled in category/batch order.
 
     Args:
         consolidated_facts: Dict with all consolidated facts
@@ -360,7 +829,7 @@ async def hierarchical_reduce(
     """
     # Estimate tokens in facts JSON
     facts_json = json.dumps(consolidated_facts, indent=2)
-    estimated_tokens = len(facts_json) // 4
+    estimated_tokens = count_tokens(facts_json)
 
     print(f"[FactExtractor] Consolidated facts: ~{estimated_tokens} tokens (depth={_depth})")
 
@@ -371,9 +840,7 @@ async def hierarchical_reduce(
     if _depth >= _max_depth:
         print(f"[FactExtractor] WARNING: Max recursion depth ({_max_depth}) reached with ~{estimated_tokens} tokens. Truncating categories to fit.")
         # Hard truncate: keep most important facts from each category proportionally
-        target_chars = max_tokens * 4
-        total_chars = len(facts_json)
-        ratio = target_chars / total_chars
+        ratio = max_tokens / estimated_tokens
         for category in ["preferences", "projects", "dates", "beliefs", "decisions"]:
             items = consolidated_facts.get(category, [])
             keep = max(1, int(len(items) * ratio))
@@ -387,122 +854,104 @@ async def hierarchical_reduce(
     print(f"[FactExtractor] Over {max_tokens} tokens, starting hierarchical reduction (depth={_depth})")
 
     # Use smaller batches (~20K tokens) so responses fit in max_tokens
-    batch_size_tokens = 20000
-    batch_size_chars = batch_size_tokens * 4
-
-    # Split each category
-    def split_into_batches(items: list, batch_chars: int) -> List[list]:
-        """Split items into batches by character count"""
-        batches = []
-        current_batch = []
-        current_size = 0
-
-        for item in items:
-            item_size = len(json.dumps(item))
-            if current_size + item_size > batch_chars and current_batch:
-                batches.append(current_batch)
-                current_batch = [item]
-                current_size = item_size
-            else:
-                current_batch.append(item)
-                current_size += item_size
-
-        if current_batch:
-            batches.append(current_batch)
-
-        return batches
-
-    # Reduce each category separately
-    reduced_facts = {
-        "preferences": [],
-        "projects": [],
-        "dates": [],
-        "beliefs": [],
-        "decisions": []
-    }
-
-    total_reduced = 0
-    total_kept_original = 0
-    consecutive_failures = 0
-    MAX_CONSECUTIVE_FAILURES = 5  # Circuit breaker: stop if 5 batches fail in a row
+    batch_size_chars = chars_for_tokens(REDUCE_BATCH_TOKENS, facts_json)
 
-    for category in ["preferences", "projects", "dates", "beliefs", "decisions"]:
+    # Batches from all categories are reduced concurrently (each call waits on
+    # the shared Haiku limiter), then reassembled in category/batch order
+    jobs = []  # (category, batch_idx, batch)
+    for category in FACT_CATEGORIES:
         items = consolidated_facts.get(category, [])
         if not items:
             continue
-
-        # Circuit breaker: if too many consecutive failures, skip remaining categories
-        if consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
-            print(f"[FactExtractor] CIRCUIT BREAKER: {consecutive_failures} consecutive failures, skipping {category} (keeping originals)")
-            reduced_facts[category].extend(items)
-            total_kept_original += len(items)
-            continue
-
         batches = split_into_batches(items, batch_size_chars)
         print(f"[FactExtractor] Reducing {category}: {len(items)} items in {len(batches)} batches")
+        jobs.extend((category, batch_idx, batch) for batch_idx, batch in enumerate(batches))
 
-        for batch_idx, batch in enumerate(batches):
-            # Circuit breaker check inside batch loop too
-            if consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
-                print(f"[FactExtractor] CIRCUIT BREAKER: skipping remaining batches of {category}")
-                reduced_facts[category].extend(batch)
-                total_kept_original += len(batch)
-                continue
+    # Circuit breaker: once REDUCE_BREAKER_FAILURES of the last
+    # REDUCE_BREAKER_WINDOW finished batches failed, batches not yet
+    # dispatched keep their originals
+    recent_outcomes = deque(maxlen=REDUCE_BREAKER_WINDOW)
+    breaker = {"open": False}
+    results: List[Optional[list]] = [None] * len(jobs)
 
-            try:
-                # Call Haiku to consolidate batch — ask for aggressive reduction
-                reduction_prompt = f"""Consolidate and deduplicate these {category} facts. Remove redundancies, merge related items, keep most recent when contradictions exist. AGGRESSIVELY reduce: aim for at most 50% of the original count.
+    async def reduce_batch(category: str, batch_idx: int, batch: list) -> Optional[list]:
+        """Reduce one batch via Haiku; None means keep the originals."""
+        try:
+            # Call Haiku to consolidate batch — ask for aggressive reduction
+            reduction_prompt = f"""Consolidate and deduplicate these {category} facts. Remove redundancies, merge related items, keep most recent when contradictions exist. AGGRESSIVELY reduce: aim for at most 50% of the original count.
 
 Facts:
 {json.dumps(batch, indent=2)}
 
 Return ONLY a valid JSON array (no explanation, no markdown fences). Keep the same item structure but with fewer items:"""
 
-                response = await anthropic_client.messages.create(
-                    model="claude-haiku-4-5-20251001",
-                    max_tokens=16384,
-                    temperature=0.3,
-                    messages=[{
-                        "role": "user",
-                        "content": reduction_prompt
-                    }]
-                )
+            response = await haiku_call(
+                anthropic_client,
+                model="claude-haiku-4-5-20251001",
+                max_tokens=16384,
+                temperature=0.3,
+                messages=[{
+                    "role": "user",
+                    "content": reduction_prompt
+                }]
+            )
 
-                # Record token usage
-                if cost_tracker:
-                    cost_tracker.record_llm_call(response)
+            # Record token usage
+            if cost_tracker:
+                cost_tracker.record_llm_call(response)
 
-                response_text = response.content[0].text
-                json_str = strip_markdown_fences(response_text)
+            response_text = response.content[0].text
+            json_str = strip_markdown_fences(response_text)
 
-                # Try parsing, with repair for truncated responses
-                try:
-                    reduced_batch = json.loads(json_str)
-                except json.JSONDecodeError:
-                    print(f"[FactExtractor] Attempting JSON repair for batch {batch_idx} of {category}")
-                    reduced_batch = _try_repair_json(json_str)
-
-                # Add to category
-                if isinstance(reduced_batch, list):
-                    reduced_facts[category].extend(reduced_batch)
-                    total_reduced += len(batch) - len(reduced_batch)
-                    consecutive_failures = 0  # Reset on success
-                elif isinstance(reduced_batch, dict) and category in reduced_batch:
-                    reduced_facts[category].extend(reduced_batch[category])
-                    total_reduced += len(batch) - len(reduced_batch[category])
-                    consecutive_failures = 0  # Reset on success
-                else:
-                    # Unexpected format, keep originals
-                    reduced_facts[category].extend(batch)
-                    total_kept_original += len(batch)
-                    consecutive_failures += 1
+            # Try parsing, with repair for truncated responses
+            try:
+                reduced_batch = json.loads(json_str)
+            except json.JSONDecodeError:
+                print(f"[FactExtractor] Attempting JSON repair for batch {batch_idx} of {category}")
+                reduced_batch = _try_repair_json(json_str)
+
+            if isinstance(reduced_batch, list):
+                return reduced_batch
+            if isinstance(reduced_batch, dict) and category in reduced_batch:
+                return reduced_batch[category]
+            # Unexpected format, keep originals
+            return None
 
-            except Exception as e:
-                print(f"[FactExtractor] Error reducing batch {batch_idx} of {category}: {e}")
-                # Keep original batch on error
-                reduced_facts[category].extend(batch)
-                total_kept_original += len(batch)
-                consecutive_failures += 1
+        except Exception as e:
+            print(f"[FactExtractor] Error reducing batch {batch_idx} of {category}: {e}")
+            # Keep original batch on error
+            return None
+
+    pending = deque(range(len(jobs)))
+
+    async def worker() -> None:
+        while pending:
+            index = pending.popleft()
+            category, batch_idx, batch = jobs[index]
+            if breaker["open"]:
+                print(f"[FactExtractor] CIRCUIT BREAKER: skipping batch {batch_idx} of {category} (keeping originals)")
+                continue
+            results[index] = await reduce_batch(category, batch_idx, batch)
+            recent_outcomes.append(results[index] is not None)
+            failures = sum(1 for ok in recent_outcomes if not ok)
+            if failures >= REDUCE_BREAKER_FAILURES and not breaker["open"]:
+                breaker["open"] = True
+                print(f"[FactExtractor] CIRCUIT BREAKER: {failures} of the last {len(recent_outcomes)} batches failed, "
+                      f"skipping remaining batches")
+
+    # Enough workers to saturate the limiter; the breaker is checked as each batch is dispatched
+    await asyncio.gather(*(worker() for _ in range(min(len(jobs), HAIKU_MAX_CONCURRENCY))))
+
+    reduced_facts = {category: [] for category in FACT_CATEGORIES}
+    total_reduced = 0
+    total_kept_original = 0
+    for (category, _, batch), reduced_batch in zip(jobs, results):
+        if reduced_batch is None:
+            reduced_facts[category].extend(batch)
+            total_kept_original += len(batch)
+        else:
+            reduced_facts[category].extend(reduced_batch)
+            total_reduced += len(batch) - len(reduced_batch)
 
     # Recalculate total
     reduced_facts["total_count"] = sum(
@@ -513,17 +962,15 @@ Return ONLY a valid JSON array (no explanation, no markdown fences). Keep the sa
     print(f"[FactExtractor] After reduction: {reduced_facts['total_count']} facts (was {original_count}, reduced {total_reduced}, kept-as-is {total_kept_original})")
 
     # Only recurse if we actually made progress (reduced something)
-    reduced_json = json.dumps(reduced_facts, indent=2)
-    if len(reduced_json) // 4 > max_tokens:
+    reduced_tokens = count_tokens(json.dumps(reduced_facts, indent=2))
+    if reduced_tokens > max_tokens:
         if reduced_facts["total_count"] < original_count:
             print(f"[FactExtractor] Still over limit but made progress, recursing (depth={_depth + 1})")
             return await hierarchical_reduce(reduced_facts, anthropic_client, max_tokens, cost_tracker, _depth + 1, _max_depth)
         else:
             print(f"[FactExtractor] Still over limit and NO progress made. Hard truncating.")
             # No progress — hard truncate to prevent infinite loop
-            target_chars = max_tokens * 4
-            total_chars = len(reduced_json)
-            ratio = target_chars / total_chars
+            ratio = max_tokens / reduced_tokens
             for category in ["preferences", "projects", "dates", "beliefs", "decisions"]:
                 items = reduced_facts.get(category, [])
                 keep = max(1, int(len(items) * ratio))
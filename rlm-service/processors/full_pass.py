@@ -4,16 +4,31 @@ Downloads conversations, chunks them, extracts facts, generates MEMORY section
 """
 import os
 import json
+import asyncio
 import httpx
 import anthropic
-from datetime import datetime, timedelta
-from typing import List, Dict
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
 
 
 # Supabase config from environment
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 
+# Consolidated facts above this many tokens go through Haiku hierarchical reduction
+REDUCE_MAX_TOKENS = 200000
+
+# Chunks buffered between the chunker and each enrichment stage; the chunker
+# waits when a stage falls this far behind
+CHUNK_QUEUE_SIZE = int(os.getenv("CHUNK_QUEUE_SIZE", "1000"))
+
+
+def _iso_from_timestamp(create_time) -> Optional[str]:
+    """Convert a ChatGPT export Unix timestamp to ISO format (None if missing)."""
+    if isinstance(create_time, (int, float)) and create_time > 0:
+        return datetime.fromtimestamp(create_time, tz=timezone.utc).isoformat()
+    return None
+
 
 async def delete_user_chunks(user_id: str):
     """
@@ -41,13 +56,51 @@ async def delete_user_chunks(user_id: str):
         print(f"[FullPass] Deleted existing chunks for user {user_id}")
 
 
-async def save_chunks_batch(user_id: str, chunks: List[dict]):
+async def delete_conversation_chunks(user_id: str, conversation_ids: List[str]):
+    """
+    Delete the chunks of specific conversations (incremental re-import).
+
+    Args:
+        user_id: User ID the chunks belong to
+        conversation_ids: Conversations whose chunks are replaced or removed
+
+    Raises:
+        RuntimeError: If delete fails (errors propagate to caller)
+    """
+    from processors.conversation_index import INDEX_DELETE_BATCH, in_filter
+
+    async with httpx.AsyncClient() as client:
+        for start in range(0, len(conversation_ids), INDEX_DELETE_BATCH):
+            response = await client.delete(
+                f"{SUPABASE_URL}/rest/v1/conversation_chunks",
+                params={
+                    "user_id": f"eq.{user_id}",
+                    "conversation_id": in_filter(conversation_ids[start:start + INDEX_DELETE_BATCH]),
+                },
+                headers={
+                    "apikey": SUPABASE_SERVICE_KEY,
+                    "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
+                },
+                timeout=30.0,
+            )
+
+            if response.status_code not in (200, 204):
+                raise RuntimeError(f"Failed to delete conversation chunks ({response.status_code}): {response.text[:200]}")
+
+    print(f"[FullPass] Deleted chunks of {len(conversation_ids)} changed/removed conversations for user {user_id}")
+
+
+async def save_chunks_batch(user_id: str, chunks: List[dict], embeddings: Optional[List[Optional[List[float]]]] = None):
     """
     Save a batch of conversation chunks to the database.
 
+    Rows are built as new dicts, so the caller's chunk dicts are left untouched.
+
     Args:
         user_id: User ID to associate chunks with
         chunks: List of chunk dicts (conversation_id, title, content, etc.)
+        embeddings: Optional vectors (same order as chunks) written in the same
+            insert; None entries are left NULL for the repair backfill
 
     Raises:
         RuntimeError: If chunk save fails (errors propagate to caller)
@@ -59,42 +112,46 @@ async def save_chunks_batch(user_id: str, chunks: List[dict]):
     VALID_COLUMNS = {
         "user_id", "conversation_id", "title", "content",
         "chunk_tier", "is_recent", "created_at",
-        "message_count",
+        "message_count", "embedding", "content_hash", "duplicate_of",
     }
 
-    for chunk in chunks:
-        chunk["user_id"] = user_id
-
-        # Remove fields not in the DB schema (e.g. chunk_index, total_chunks)
-        extra_keys = [k for k in chunk if k not in VALID_COLUMNS]
-        for k in extra_keys:
-            del chunk[k]
+    rows = []
+    for index, chunk in enumerate(chunks):
+        # Drop fields not in the DB schema (e.g. chunk_index, total_chunks)
+        row = {k: v for k, v in chunk.items() if k in VALID_COLUMNS}
+        row["user_id"] = user_id
 
         # Set is_recent based on created_at
-        created_at = chunk.get("created_at")
+        created_at = row.get("created_at")
         if created_at:
             try:
                 # Parse ISO timestamp
                 created_dt = datetime.fromisoformat(created_at.replace("Z", "+00:00"))
-                chunk["is_recent"] = created_dt > six_months_ago
+                row["is_recent"] = created_dt > six_months_ago
             except Exception:
-                chunk["is_recent"] = False
+                row["is_recent"] = False
         else:
-            chunk["is_recent"] = False
+            row["is_recent"] = False
 
         # Ensure chunk_tier is set
-        if "chunk_tier" not in chunk:
-            chunk["chunk_tier"] = "medium"
+        if "chunk_tier" not in row:
+            row["chunk_tier"] = "medium"
 
         # Set message_count from chunk (not used yet, but schema requires it)
-        if "message_count" not in chunk:
-            chunk["message_count"] = 0
+        if "message_count" not in row:
+            row["message_count"] = 0
+
+        # PostgREST bulk inserts need identical keys on every row
+        if embeddings is not None:
+            row["embedding"] = embeddings[index]
+
+        rows.append(row)
 
     # POST batch to Supabase
     async with httpx.AsyncClient() as client:
         response = await client.post(
             f"{SUPABASE_URL}/rest/v1/conversation_chunks",
-            json=chunks,
+            json=rows,
             headers={
                 "apikey": SUPABASE_SERVICE_KEY,
                 "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
@@ -107,8 +164,360 @@ async def save_chunks_batch(user_id: str, chunks: List[dict]):
         if response.status_code not in (200, 201):
             raise RuntimeError(f"Failed to save chunk batch ({response.status_code}): {response.text[:200]}")
 
-        print(f"[FullPass] Saved batch of {len(chunks)} chunks")
+        print(f"[FullPass] Saved batch of {len(rows)} chunks")
+
+class StageProgress:
+    """Combined progress of pipeline stages that run concurrently.
 
+    Logs and reports to the running job (if any) each time overall
+    completion crosses another `report_every` fraction. While work items
+    are still being added (streamed chunking), totals are not final and
+    nothing is reported until seal().
+    """
+
+    def __init__(self, totals: Dict[str, int], report_every: float = 0.1, sealed: bool = True):
+        """
+        Args:
+            totals: Stage name -> number of work items
+            report_every: Fraction of overall progress between reports (default 10%)
+            sealed: False if totals will still grow via add_items()
+        """
+        self.totals = dict(totals)
+        self.done = {name: 0 for name in totals}
+        self.report_every = report_every
+        self.sealed = sealed
+        self._last_bucket = 0
+
+    @property
+    def fraction(self) -> float:
+        total = sum(self.totals.values())
+        if total == 0:
+            return 1.0
+        return sum(min(self.done[n], self.totals[n]) for n in self.totals) / total
+
+    def summary(self) -> str:
+        return ", ".join(f"{name} {min(self.done[name], self.totals[name])}/{self.totals[name]}" for name in self.totals)
+
+    def add_items(self, stage: str, count: int = 1) -> None:
+        """Add work items to a stage whose total is still growing."""
+        self.totals[stage] += count
+
+    def seal(self) -> None:
+        """Mark totals final and report progress made so far."""
+        self.sealed = True
+        self.advance(next(iter(self.totals)), 0)
+
+    def advance(self, stage: str, count: int = 1) -> None:
+        self.done[stage] += count
+        if not self.sealed:
+            return
+        bucket = int(self.fraction / self.report_every)
+        if bucket > self._last_bucket:
+            self._last_bucket = bucket
+            print(f"[FullPass] Progress {self.fraction:.0%}: {self.summary()}")
+            from processors.job_queue import report_progress
+            report_progress(int(self.fraction * 100), f"Full pass: {self.summary()}")
+
+    def complete(self, stage: str) -> None:
+        """Mark a stage finished (e.g. skipped via checkpoint, or fewer items than estimated)."""
+        remaining = self.totals[stage] - self.done[stage]
+        if remaining > 0:
+            self.advance(stage, remaining)
+
+
+async def _drain(chunks: AsyncIterable[dict]) -> int:
+    """Consume a chunk stream a resumed stage does not need; returns its length."""
+    count = 0
+    async for _ in chunks:
+        count += 1
+    return count
+
+
+async def _save_chunks_stage(
+    user_id: str,
+    chunks: AsyncIterable[dict],
+    checkpoint,
+    tracker,
+    progress: StageProgress,
+    replace_conversations: Optional[List[str]] = None,
+) -> None:
+    """
+    Embed each batch of chunks in memory and insert it with its vectors.
+
+    Existing chunks are deleted first: all of the user's, or only those of
+    replace_conversations on an incremental re-import. Batches are saved as chunks stream in. A batch whose embeddings fail is
+    inserted without them (non-fatal); generate_embeddings_for_chunks then
+    repairs those rows once all batches are saved. Insert failures
+    propagate and fail the pipeline.
+    """
+    from processors import pipeline_checkpoint as cp
+    from processors.embedding_generator import embed_batch_async, generate_embeddings_for_chunks
+
+    needs_repair = False
+    if checkpoint.completed(cp.CHUNKS_SAVED):
+        print(f"[FullPass] Resuming: {await _drain(chunks)} chunks already saved")
+        needs_repair = not checkpoint.completed(cp.EMBEDDINGS_DONE)
+    else:
+        # Save chunks to database (in batches to avoid request size limits)
+        batch_size = 100
+        saved = 0
+
+        async def delete_existing() -> None:
+            if replace_conversations is None:
+                await delete_user_chunks(user_id)
+            elif replace_conversations:
+                await delete_conversation_chunks(user_id, replace_conversations)
+
+        async def save_batch(batch: List[dict]) -> bool:
+            """Embed and insert one batch; returns False if it went in without vectors."""
+            # Delete existing chunks on first batch
+            if saved == 0:
+                await delete_existing()
+
+            # Reference rows for repeated content (duplicate_of) are stored without a vector
+            originals = [i for i, c in enumerate(batch) if not c.get("duplicate_of")]
+            try:
+                vectors = await embed_batch_async([batch[i]["content"] for i in originals], cost_tracker=tracker) if originals else []
+            except Exception as e:
+                print(f"[FullPass] WARNING: Embedding failed for batch at {saved}, inserting without vectors: {e}")
+                embeddings = None
+            else:
+                embeddings = [None] * len(batch)
+                for i, vector in zip(originals, vectors):
+                    embeddings[i] = vector
+
+            await save_chunks_batch(user_id, batch, embeddings)
+            progress.advance("chunks", len(batch))
+            return embeddings is not None
+
+        batch = []
+        async for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) == batch_size:
+                needs_repair |= not await save_batch(batch)
+                saved += len(batch)
+                batch = []
+        if batch:
+            needs_repair |= not await save_batch(batch)
+            saved += len(batch)
+        if saved == 0 and replace_conversations:
+            await delete_existing()  # only deletions in this re-import
+
+        print(f"[FullPass] Saved {saved} chunks with embeddings to database")
+        checkpoint.mark(cp.CHUNKS_SAVED)
+
+    if needs_repair:
+        # Non-fatal: embeddings can be regenerated later, don't fail the pipeline
+        # (left unmarked so a retry runs the repair again)
+        try:
+            result = await generate_embeddings_for_chunks(user_id, cost_tracker=tracker)
+            print(f"[FullPass] Repaired embeddings for {result['embedded']} chunks")
+        except Exception as e:
+            print(f"[FullPass] WARNING: Embedding repair failed: {e}")
+            progress.complete("chunks")
+            return
+        if result["remaining"]:
+            print(f"[FullPass] WARNING: {result['remaining']} chunks still missing embeddings after repair")
+            progress.complete("chunks")
+            return
+
+    checkpoint.mark(cp.EMBEDDINGS_DONE)
+    progress.complete("chunks")
+
+
+async def _facts_stage(
+    chunks: AsyncIterable[dict],
+    client,
+    checkpoint,
+    tracker,
+    progress: StageProgress,
+    reused_facts: Optional[List[dict]] = None,
+) -> dict:
+    """
+    Extract, consolidate and reduce facts as chunks stream in, reusing checkpointed results.
+
+    Facts of conversations left unchanged by a re-import (reused_facts) are
+    consolidated with the new ones; per-conversation facts of the new
+    chunks are checkpointed as "conversation_facts" for the conversation
+    index. Returns reduced facts.
+    """
+    from processors import pipeline_checkpoint as cp
+    from processors.fact_extractor import (
+        extract_facts_stream,
+        consolidate_facts,
+        estimate_reduction_cost,
+        hierarchical_reduce
+    )
+    from processors.fact_dedup import collapse_near_duplicates
+
+    if checkpoint.completed(cp.FACTS_REDUCED):
+        await _drain(chunks)
+        reduced = checkpoint.load("reduced_facts")
+        print(f"[FullPass] Resuming: {reduced.get('total_count', 0)} reduced facts from checkpoint")
+        progress.complete("facts")
+        return reduced
+
+    if checkpoint.completed(cp.FACTS_CONSOLIDATED):
+        await _drain(chunks)
+        consolidated = checkpoint.load("consolidated_facts")
+        print(f"[FullPass] Resuming: {consolidated['total_count']} consolidated facts from checkpoint")
+        progress.complete("facts")
+    else:
+        # Reuse per-chunk results from earlier attempts, extract only the rest
+        keys: List[str] = []
+        conversation_ids: List[Optional[str]] = []
+        pending_keys: List[str] = []
+        done = checkpoint.load_chunk_facts()
+
+        async def pending_chunks() -> AsyncIterator[dict]:
+            async for chunk in chunks:
+                key = cp.chunk_key(chunk["content"])
+                keys.append(key)
+                conversation_ids.append(chunk.get("conversation_id"))
+                if key in done:
+                    progress.advance("facts")
+                    continue
+                pending_keys.append(key)
+                yield chunk
+
+        def on_result(j: int, facts: dict) -> None:
+            checkpoint.save_chunk_facts(pending_keys[j], facts)
+            progress.advance("facts")
+
+        new_facts = await extract_facts_stream(
+            pending_chunks(),
+            client,
+            cost_tracker=tracker,
+            on_result=on_result,
+        )
+        if len(pending_keys) < len(keys):
+            print(f"[FullPass] Resumed: reused facts for {len(keys) - len(pending_keys)} chunks, extracted {len(pending_keys)}")
+        for key, facts in zip(pending_keys, new_facts):
+            done.setdefault(key, facts)
+        all_facts = [done[key] for key in keys]
+        progress.complete("facts")
+        print(f"[FullPass] Extracted facts from {len(keys)} chunks")
+
+        by_conversation: Dict[str, List[dict]] = {}
+        for conversation_id, facts in zip(conversation_ids, all_facts):
+            if conversation_id is not None:
+                by_conversation.setdefault(conversation_id, []).append(facts)
+        checkpoint.save("conversation_facts", {cid: consolidate_facts(f) for cid, f in by_conversation.items()})
+        del by_conversation
+        if reused_facts:
+            print(f"[FullPass] Reusing stored facts of {len(reused_facts)} unchanged conversations")
+            all_facts.extend(reused_facts)
+
+        # Step 5: Consolidate facts; over the reduce budget, merge paraphrases locally before any Haiku reduction
+        consolidated = consolidate_facts(all_facts)
+        print(f"[FullPass] Consolidated {consolidated['total_count']} unique facts")
+        if estimate_reduction_cost(consolidated, REDUCE_MAX_TOKENS)["calls"]:
+            consolidated, dedup_stats = collapse_near_duplicates(consolidated, reduce_max_tokens=REDUCE_MAX_TOKENS)
+            tracker.record_fact_dedup(dedup_stats)
+        checkpoint.save("consolidated_facts", consolidated)
+        checkpoint.mark(cp.FACTS_CONSOLIDATED)
+        del all_facts
+
+    # Step 6: Reduce if too large (over 200K tokens)
+    reduced = await hierarchical_reduce(consolidated, client, max_tokens=REDUCE_MAX_TOKENS, cost_tracker=tracker)
+    checkpoint.save("reduced_facts", reduced)
+    checkpoint.mark(cp.FACTS_REDUCED)
+    return reduced
+
+
+async def _queue_items(queue: asyncio.Queue) -> AsyncIterator[dict]:
+    """Yield chunks from a stage queue until the end-of-stream sentinel (None)."""
+    while True:
+        chunk = await queue.get()
+        if chunk is None:
+            return
+        yield chunk
+
+
+def _extracts_facts(chunk: dict) -> bool:
+    """Facts come from medium chunks only (micro/macro tiers are retrieval-only), and once per repeated content."""
+    return chunk.get("chunk_tier", "medium") == "medium" and not chunk.get("duplicate_of")
+
+
+async def _produce_chunks(
+    chunks: Iterable[dict],
+    routes: List[Tuple[str, asyncio.Queue, Callable[[dict], bool]]],
+    progress: StageProgress,
+    on_chunked: Optional[Callable[[List[dict]], None]],
+) -> None:
+    """Feed each chunk to every (stage, queue, accepts) route that accepts it, then report the full list and end the streams."""
+    produced = []
+    for chunk in chunks:
+        produced.append(chunk)
+        for stage, queue, accepts in routes:
+            if accepts(chunk):
+                progress.add_items(stage)
+                await queue.put(chunk)
+        # Chunking is CPU-bound; let the stages run between chunks
+        await asyncio.sleep(0)
+    progress.seal()
+    if on_chunked:
+        on_chunked(produced)
+    for _, queue, _ in routes:
+        await queue.put(None)
+
+
+async def run_enrichment_stages(
+    user_id: str,
+    chunks: Iterable[dict],
+    client,
+    checkpoint,
+    tracker,
+    on_chunked: Optional[Callable[[List[dict]], None]] = None,
+    replace_conversations: Optional[List[str]] = None,
+    reused_facts: Optional[List[dict]] = None,
+) -> dict:
+    """
+    Run chunk embedding/insert and fact extraction as concurrent stages.
+
+    They hit different providers (Bedrock Titan + Supabase, Anthropic) with
+    independent AIMD limiters (get_embed_limiter, get_haiku_limiter) and
+    share no data, so wall-clock time is
+    roughly the longer of the two instead of their sum. Chunks are consumed
+    lazily (e.g. from iter_chunks) and fanned out to both stages through
+    bounded queues, so both start on the first chunk while chunking
+    continues. Every chunk tier is saved; only medium chunks go to fact
+    extraction. If any stage fails, the others are cancelled.
+
+    Args:
+        user_id: User whose chunks are processed
+        chunks: Chunk dicts (each has 'content'), list or generator
+        client: AsyncAnthropic client
+        checkpoint: PipelineCheckpoint for the run
+        tracker: CostTracker for the run
+        on_chunked: Optional callback(all_chunks) once the source is exhausted
+            (used to checkpoint the chunk list)
+        replace_conversations: Conversations whose existing chunks are
+            deleted before saving (None = all of the user's chunks)
+        reused_facts: Stored facts of conversations that were not re-chunked
+
+    Returns:
+        Reduced facts dict
+    """
+    progress = StageProgress({"chunks": 0, "facts": 0}, sealed=False)
+    save_queue: asyncio.Queue = asyncio.Queue(maxsize=CHUNK_QUEUE_SIZE)
+    facts_queue: asyncio.Queue = asyncio.Queue(maxsize=CHUNK_QUEUE_SIZE)
+    tasks = [
+        asyncio.create_task(_produce_chunks(
+            chunks, [("chunks", save_queue, lambda chunk: True), ("facts", facts_queue, _extracts_facts)],
+            progress, on_chunked)),
+        asyncio.create_task(_save_chunks_stage(
+            user_id, _queue_items(save_queue), checkpoint, tracker, progress, replace_conversations)),
+        asyncio.create_task(_facts_stage(
+            _queue_items(facts_queue), client, checkpoint, tracker, progress, reused_facts)),
+    ]
+    try:
+        _, _, reduced = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    return reduced
 
 async def run_full_pass_pipeline(
     user_id: str,
@@ -119,11 +528,18 @@ async def run_full_pass_pipeline(
     """
     Run the complete full pass pipeline.
 
+    Each stage is checkpointed (see pipeline_checkpoint); a retry for the
+    same storage_path resumes after the last completed stage and reuses
+    per-chunk fact results from earlier attempts. Conversations are
+    fingerprinted against the last import's index (see conversation_index):
+    only new or changed ones are chunked, embedded and extracted, and the
+    stored facts of unchanged ones are reused.
+
     Steps:
     1. Download conversations from Supabase Storage
-    2. Chunk conversations into ~2000 token segments
-    3. Save chunks to database
-    4. Extract facts in parallel via Haiku 4.5
+    2. Chunk conversations into ~2000 token segments (streamed into steps 3-4)
+    3. Embed chunks and save them with their vectors to the database
+    4. Extract facts in parallel via Haiku 4.5 (concurrently with steps 2-3)
     5. Consolidate and reduce facts if needed
     6. Generate MEMORY section from facts
     7. Save MEMORY to user_profiles.memory_md
@@ -146,114 +562,171 @@ async def run_full_pass_pipeline(
     # Initialize cost tracker
     from processors.cost_tracker import CostTracker
     tracker = CostTracker()
+    from processors.fact_extractor import get_haiku_limiter
+    haiku_start = get_haiku_limiter().stats()
 
-    # Step 1: Download conversations
-    from main import download_conversations
-    conversations = await download_conversations(storage_path, file_type=file_type)
-    print(f"[FullPass] Downloaded {len(conversations)} conversations")
-
-    # Step 2: Chunk conversations
-    from processors.conversation_chunker import chunk_conversations
-    chunks = chunk_conversations(conversations, target_tokens=2000, overlap_tokens=200)
-    print(f"[FullPass] Created {len(chunks)} chunks from {len(conversations)} conversations")
-
-    # Free raw conversations — chunks and v2 regen will use sampled subset
-    # Keep a lightweight copy for v2 regen (just id, title, first few messages)
-    conversations_light = []
-    for c in conversations:
-        conversations_light.append({
-            "id": c.get("id"),
-            "title": c.get("title"),
-            "messages": c.get("messages", [])[:20],  # First 20 messages only for v2
-            "createdAt": c.get("createdAt"),
-        })
-    del conversations
-    import gc; gc.collect()
-
-    # Step 3: Save chunks to database (in batches to avoid request size limits)
-    batch_size = 100
-    for i in range(0, len(chunks), batch_size):
-        batch = chunks[i:i+batch_size]
-
-        # Delete existing chunks on first batch
-        if i == 0:
-            await delete_user_chunks(user_id)
-
-        await save_chunks_batch(user_id, batch)
-
-    print(f"[FullPass] Saved {len(chunks)} chunks to database")
-
-    # Step 3.5: Generate embeddings for saved chunks
+    # Stage checkpoints: a retry of the same export resumes after the last completed stage
+    from processors import pipeline_checkpoint as cp
+    checkpoint = cp.PipelineCheckpoint(user_id, storage_path)
     try:
-        from processors.embedding_generator import generate_embeddings_for_chunks
-        embedded_count = await generate_embeddings_for_chunks(user_id, cost_tracker=tracker)
-        print(f"[FullPass] Generated embeddings for {embedded_count} chunks")
-    except Exception as e:
-        # Non-fatal: embeddings can be regenerated later, don't fail the pipeline
-        print(f"[FullPass] WARNING: Embedding generation failed: {e}")
-        # Pipeline continues — chunks are saved, facts can still be extracted
-
-    # Step 4: Extract facts in parallel
-    from processors.fact_extractor import (
-        extract_facts_parallel,
-        consolidate_facts,
-        hierarchical_reduce
-    )
-
-    all_facts = await extract_facts_parallel(chunks, client, cost_tracker=tracker)
-    print(f"[FullPass] Extracted facts from {len(chunks)} chunks")
-
-    # Step 5: Consolidate facts
-    consolidated = consolidate_facts(all_facts)
-    print(f"[FullPass] Consolidated {consolidated['total_count']} unique facts")
-
-    # Step 6: Reduce if too large (over 200K tokens)
-    reduced = await hierarchical_reduce(consolidated, client, max_tokens=200000, cost_tracker=tracker)
-
-    # Step 7: Generate MEMORY section
-    from processors.memory_generator import generate_memory_section
-    memory_md = await generate_memory_section(reduced, client, cost_tracker=tracker)
-    print(f"[FullPass] Generated MEMORY section ({len(memory_md)} chars)")
-
-    # Step 8: Save MEMORY to database (early save so user benefits even if v2 regen fails)
-    from main import update_user_profile
-    await update_user_profile(user_id, {"memory_md": memory_md})
-    print(f"[FullPass] Saved MEMORY section to database")
-
-    # Free chunks and facts before v2 regen
-    del chunks, all_facts, consolidated, reduced
-    gc.collect()
-
-    # Step 9: V2 Section Regeneration
-    from processors.v2_regenerator import regenerate_sections_v2, sections_to_soulprint_text
-
-    print(f"[FullPass] Starting v2 section regeneration for user {user_id}")
-    v2_sections = await regenerate_sections_v2(conversations_light, memory_md, client, cost_tracker=tracker)
-
-    if v2_sections:
-        # Build soulprint_text from v2 sections + MEMORY
-        soulprint_text = sections_to_soulprint_text(v2_sections, memory_md)
-
-        # Save all v2 sections + soulprint_text to database atomically
-        await update_user_profile(user_id, {
-            "soul_md": json.dumps(v2_sections["soul"]),
-            "identity_md": json.dumps(v2_sections["identity"]),
-            "user_md": json.dumps(v2_sections["user"]),
-            "agents_md": json.dumps(v2_sections["agents"]),
-            "tools_md": json.dumps(v2_sections["tools"]),
-            "soulprint_text": soulprint_text,
-        })
-        print(f"[FullPass] V2 sections saved for user {user_id}")
-    else:
-        print(f"[FullPass] V2 regeneration failed -- keeping v1 sections for user {user_id}")
-        # V1 sections stay, MEMORY already saved above
+        checkpoint.discard_stale()
+
+        from processors.conversation_store import ConversationStore
+        import gc
+
+        on_chunked = None
+        if checkpoint.completed(cp.CHUNKED):
+            # Resume: skip download and chunking
+            chunks = checkpoint.load("chunks")
+            conversations_light = ConversationStore.from_conversations(checkpoint.load("conversations_light"))
+            plan = checkpoint.load("import_plan")
+            print(f"[FullPass] Resuming: {len(chunks)} chunks from {len(conversations_light)} conversations")
+        else:
+            # Step 1: Download conversations
+            from main import download_conversations
+            conversations = await download_conversations(storage_path, file_type=file_type)
+            conversation_total = len(conversations)
+            print(f"[FullPass] Downloaded {conversation_total} conversations")
+
+            # Keep a compact copy for v2 regen (id, title, first 20 active-path messages)
+            # and fingerprint every conversation against the last import's index
+            from processors.dag_parser import extract_active_path
+            from processors.conversation_index import (
+                conversation_fingerprint, fallback_conversation_id, load_conversation_index, plan_import,
+            )
+            index = await load_conversation_index(user_id)
+            fingerprints: Dict[str, str] = {}
+            conversations_light = ConversationStore()
+            for c in conversations:
+                messages = extract_active_path(c)
+                if not c.get("id"):
+                    # Content-derived, so inserting or removing a conversation doesn't rename the others
+                    base = fallback_conversation_id(c, messages)
+                    c["id"] = base
+                    copies = 1
+                    while c["id"] in fingerprints:
+                        copies += 1
+                        c["id"] = f"{base}_{copies}"
+                fingerprints[str(c["id"])] = conversation_fingerprint(c.get("title", "Untitled"), messages)
+                conversations_light.append({
+                    "id": c.get("id"),
+                    "title": c.get("title"),
+                    "messages": messages,
+                    "createdAt": c.get("createdAt") or _iso_from_timestamp(c.get("create_time")),
+                }, max_messages=20)  # First 20 messages only for v2
+            conversations_light.compact()
+            print(f"[FullPass] Kept {conversations_light.message_count} messages for v2 regen ({conversations_light.nbytes() // 1024} KB)")
+            checkpoint.save("conversations_light", conversations_light.to_dicts())
+
+            # Only new or changed conversations are chunked, embedded and extracted
+            plan = plan_import(fingerprints, index)
+            plan["fingerprints"] = {cid: fingerprints[cid] for cid in plan["process"]}
+            plan["reused_facts"] = [index[cid].get("facts") or {} for cid in plan["unchanged"]]
+            del index, fingerprints
+            if not plan["full"]:
+                print(f"[FullPass] Incremental import: {len(plan['process'])} new/changed, "
+                      f"{len(plan['unchanged'])} unchanged, {len(plan['deleted'])} deleted conversations")
+            process = set(plan["process"])
+
+            # Step 2: Chunk conversations lazily; the stages below start on the first chunk.
+            # The generator holds the only remaining reference to the raw
+            # conversations, so they are freed once chunking finishes.
+            # Repeated content across conversations is chunked once (see ContentDeduper).
+            from processors.conversation_chunker import CHUNK_TIERS, CONTENT_DEDUP, ContentDeduper, iter_chunks
+            deduper = ContentDeduper() if CONTENT_DEDUP else None
+            chunks = iter_chunks((c for c in conversations if str(c["id"]) in process),
+                                 target_tokens=2000, overlap_tokens=200, tiers=CHUNK_TIERS, deduper=deduper)
+            del conversations
+
+            def on_chunked(all_chunks: List[dict]) -> None:
+                print(f"[FullPass] Created {len(all_chunks)} chunks from {len(process)} of {conversation_total} conversations")
+                if deduper:
+                    stats = deduper.stats()
+                    tracker.record_content_dedup(stats)
+                    print(f"[FullPass] Content dedup: {stats['duplicate_chunks']} repeated chunks "
+                          f"({stats['dedup_ratio']:.1%}) stored as references, "
+                          f"{stats['duplicate_messages']} repeated messages ({stats['message_dedup_ratio']:.1%} of message text)")
+                plan["depends_on"] = deduper.depends_on() if deduper else {}
+                checkpoint.save("import_plan", plan)
+                checkpoint.save("chunks", all_chunks)
+                checkpoint.mark(cp.CHUNKED)
+
+        # Steps 2-6: Chunking feeds embed + save chunks (Bedrock, Supabase) and fact extraction (Anthropic), all concurrent
+        reduced = await run_enrichment_stages(
+            user_id, chunks, client, checkpoint, tracker, on_chunked=on_chunked,
+            replace_conversations=None if plan["full"] else plan["process"] + plan["deleted"],
+            reused_facts=plan["reused_facts"],
+        )
 
-    # Step 10: Save cost summary to database
-    cost_summary = tracker.get_summary()
-    print(f"[FullPass] Cost summary: ${cost_summary['total_cost_usd']:.4f} "
-          f"(LLM: ${cost_summary['llm_cost_usd']:.4f}, Embed: ${cost_summary['embedding_cost_usd']:.4f})")
-    await update_user_profile(user_id, {"import_cost_json": json.dumps(cost_summary)})
+        # Record what this import processed so the next one can skip it
+        from processors.conversation_index import save_conversation_index
+        await save_conversation_index(
+            user_id, plan["fingerprints"], checkpoint.load("conversation_facts"), plan["depends_on"], plan["deleted"],
+        )
+        del plan
+        gc.collect()
 
+        from main import update_user_profile
+        if checkpoint.completed(cp.MEMORY_SAVED):
+            memory_md = checkpoint.load("memory_md")
+            print(f"[FullPass] Resuming: MEMORY section already saved ({len(memory_md)} chars)")
+        else:
+            # Step 7: Generate MEMORY section
+            from processors.memory_generator import generate_memory_section
+            memory_md = await generate_memory_section(reduced, client, cost_tracker=tracker)
+            print(f"[FullPass] Generated MEMORY section ({len(memory_md)} chars)")
+
+            # Step 8: Save MEMORY to database (early save so user benefits even if v2 regen fails)
+            await update_user_profile(user_id, {"memory_md": memory_md})
+            print(f"[FullPass] Saved MEMORY section to database")
+            checkpoint.save("memory_md", memory_md)
+            checkpoint.mark(cp.MEMORY_SAVED)
+
+        # Free chunks and facts before v2 regen
+        del chunks, reduced
+        gc.collect()
+
+        # Step 9: V2 Section Regeneration
+        from processors.v2_regenerator import regenerate_sections_v2, sections_to_soulprint_text
+
+        print(f"[FullPass] Starting v2 section regeneration for user {user_id}")
+        v2_sections = await regenerate_sections_v2(conversations_light, memory_md, client, cost_tracker=tracker)
+
+        if v2_sections:
+            # Build soulprint_text from v2 sections + MEMORY
+            soulprint_text = sections_to_soulprint_text(v2_sections, memory_md)
+
+            # Save all v2 sections + soulprint_text to database atomically
+            await update_user_profile(user_id, {
+                "soul_md": json.dumps(v2_sections["soul"]),
+                "identity_md": json.dumps(v2_sections["identity"]),
+                "user_md": json.dumps(v2_sections["user"]),
+                "agents_md": json.dumps(v2_sections["agents"]),
+                "tools_md": json.dumps(v2_sections["tools"]),
+                "soulprint_text": soulprint_text,
+            })
+            print(f"[FullPass] V2 sections saved for user {user_id}")
+        else:
+            print(f"[FullPass] V2 regeneration failed -- keeping v1 sections for user {user_id}")
+            # V1 sections stay, MEMORY already saved above
+
+        # Step 10: Save cost summary to database
+        from processors.token_counter import get_token_counter
+        cost_summary = tracker.get_summary()
+        # This run only: the limiter is shared by every job since process start
+        haiku = get_haiku_limiter().stats(since=haiku_start)
+        cost_summary["llm_concurrency_limit"] = haiku["limit"]
+        cost_summary["llm_throughput_per_s"] = haiku["throughput_per_s"]
+        cost_summary["llm_throttle_count"] = haiku["throttles"]
+        cost_summary["token_estimate_scale"] = get_token_counter().stats()["scale"]
+        print(f"[FullPass] Cost summary: ${cost_summary['total_cost_usd']:.4f} "
+              f"(LLM: ${cost_summary['llm_cost_usd']:.4f}, Embed: ${cost_summary['embedding_cost_usd']:.4f})")
+        await update_user_profile(user_id, {"import_cost_json": json.dumps(cost_summary)})
+
+        checkpoint.clear()
+    finally:
+        # Also on failure: the job worker is long-lived and would leak the connection
+        checkpoint.close()
     print(f"[FullPass] Pipeline complete for user {user_id}")
 
     return memory_md
@@ -0,0 +1,392 @@
+"""
+Job Queue
+Persistent background job queue with bounded worker slots for imports and full passes.
+
+Jobs live in a local SQLite database, so queued work and jobs interrupted by a
+deploy or crash survive a restart: interrupted jobs are re-enqueued at startup,
+up to JOB_MAX_ATTEMPTS runs (a job that keeps killing the process, e.g. by
+OOM, is failed instead of crash-looping the service). JOB_DB_PATH must be on
+a persistent disk (render.yaml mounts one at /var/data); a temp-dir path is
+wiped on every deploy, so startup refuses it on Render and warns elsewhere.
+At most JOB_WORKERS jobs run at once per process, which keeps concurrent
+imports from sharing (and exhausting) one instance's memory.
+
+JobStore is the only persistence seam -- a Supabase-backed store exposing the
+same methods can replace it without touching JobQueue or the handlers.
+"""
+import asyncio
+import contextvars
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join(tempfile.gettempdir(), "soulprint_jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Runs per job (including re-enqueues after a restart) before it is failed
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETE = "complete"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Job ID of the handler running in the current task (set by the worker)
+_current_job_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_job_id", default=None)
+
+
+class JobStore:
+    """SQLite-backed job table. All methods are synchronous and short (local disk)."""
+
+    def __init__(self, path: str = JOB_DB_PATH):
+        """
+        Open (or create) the job database.
+
+        Args:
+            path: SQLite file path (":memory:" for tests)
+        """
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL,
+                progress INTEGER NOT NULL DEFAULT 0,
+                stage TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state_created ON jobs(state, created_at)")
+
+    def create(self, kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert a new queued job and return it."""
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, payload, state, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), QUEUED, time.time()),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch one job as a dict (payload decoded), or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def claim_next(self) -> Optional[Dict[str, Any]]:
+        """Atomically move the oldest queued job to running and return it."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE state = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row:
+                    self._conn.execute(
+                        "UPDATE jobs SET state = ?, started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                        (RUNNING, time.time(), row["id"]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row["id"]) if row else None
+
+    def update(self, job_id: str, **fields) -> None:
+        """Set columns on a job (state, progress, stage, error, finished_at, ...)."""
+        if not fields:
+            return
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        """1-based position among queued jobs, or None if the job is not queued."""
+        with self._lock:
+            row = self._conn.execute(
+                """SELECT COUNT(*) AS ahead FROM jobs
+                   WHERE state = ? AND created_at <= (SELECT created_at FROM jobs WHERE id = ? AND state = ?)""",
+                (QUEUED, job_id, QUEUED),
+            ).fetchone()
+        return row["ahead"] or None
+
+    def requeue_interrupted(self, max_attempts: int = JOB_MAX_ATTEMPTS) -> Dict[str, List[str]]:
+        """
+        Return jobs left running by a previous process to the queue.
+
+        A job that already ran max_attempts times is failed instead: it
+        most likely took the process down itself (OOM kill, segfault).
+
+        Args:
+            max_attempts: Runs allowed per job
+
+        Returns:
+            Dict with requeued and failed job IDs
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute("SELECT id, attempts FROM jobs WHERE state = ?", (RUNNING,)).fetchall()
+                exhausted = [row["id"] for row in rows if row["attempts"] >= max_attempts]
+                requeued = [row["id"] for row in rows if row["attempts"] < max_attempts]
+                for job_id in exhausted:
+                    self._conn.execute(
+                        "UPDATE jobs SET state = ?, error = ?, finished_at = ? WHERE id = ?",
+                        (FAILED, f"Interrupted by a process restart or crash on each of {max_attempts} attempts; "
+                                 "not retried again (the job may be crashing the service, e.g. out of memory)",
+                         time.time(), job_id),
+                    )
+                for job_id in requeued:
+                    self._conn.execute(
+                        "UPDATE jobs SET state = ?, started_at = NULL WHERE id = ?", (QUEUED, job_id)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return {"requeued": requeued, "failed": exhausted}
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+
+class JobQueue:
+    """Runs registered async handlers for queued jobs with at most `workers` in flight."""
+
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS, poll_interval: float = 5.0):
+        """
+        Initialize the queue (call start() from a running event loop).
+
+        Args:
+            store: JobStore used for persistence
+            workers: Number of concurrent worker slots (default JOB_WORKERS)
+            poll_interval: Seconds between idle queue checks (default 5)
+        """
+        self.store = store
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self._handlers: Dict[str, Callable[..., Awaitable[Any]]] = {}
+        self._worker_tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._cancel_requested: set = set()
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def register(self, kind: str, handler: Callable[..., Awaitable[Any]]) -> None:
+        """Register the coroutine function that runs jobs of this kind (payload passed as kwargs)."""
+        self._handlers[kind] = handler
+
+    async def start(self) -> None:
+        """Re-enqueue interrupted jobs and start the worker slots."""
+        if self._worker_tasks:
+            return
+        self._wakeup = asyncio.Event()
+        interrupted = self.store.requeue_interrupted()
+        if interrupted["requeued"]:
+            print(f"[JobQueue] Re-enqueued {len(interrupted['requeued'])} interrupted jobs: {interrupted['requeued']}")
+        if interrupted["failed"]:
+            print(f"[JobQueue] Failed {len(interrupted['failed'])} jobs interrupted on all "
+                  f"{JOB_MAX_ATTEMPTS} attempts: {interrupted['failed']}")
+        for slot in range(self.workers):
+            self._worker_tasks.append(asyncio.create_task(self._worker(slot)))
+        print(f"[JobQueue] Started {self.workers} workers (db={JOB_DB_PATH})")
+
+    async def stop(self) -> None:
+        """Stop workers. Jobs still running stay 'running' and are re-enqueued on next start."""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> str:
+        """
+        Persist a job and wake a worker.
+
+        Args:
+            kind: Registered handler name (e.g. "import", "full_pass")
+            payload: JSON-serializable kwargs for the handler
+
+        Returns:
+            Job ID
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        job = self.store.create(kind, payload)
+        print(f"[JobQueue] Enqueued {kind} job {job['id']}")
+        if self._wakeup:
+            self._wakeup.set()
+        return job["id"]
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued or running job.
+
+        Queued jobs are marked cancelled immediately. Running jobs get
+        CancelledError raised at their next await, so try/finally cleanup
+        in the handler (temp files, etc.) still runs.
+
+        Returns:
+            True if the job was queued or running
+        """
+        job = self.store.get(job_id)
+        if not job or job["state"] not in (QUEUED, RUNNING):
+            return False
+        if job["state"] == QUEUED:
+            self.store.update(job_id, state=CANCELLED, finished_at=time.time())
+            return True
+        task = self._running.get(job_id)
+        if task is None:
+            return False
+        self._cancel_requested.add(job_id)
+        task.cancel()
+        return True
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Job state with timing: queue_wait_seconds (created -> started) and run_seconds.
+
+        Returns:
+            Status dict, or None if the job does not exist
+        """
+        job = self.store.get(job_id)
+        if not job:
+            return None
+        now = time.time()
+        started = job["started_at"]
+        finished = job["finished_at"]
+        if started is not None:
+            queue_wait = started - job["created_at"]
+        else:
+            queue_wait = (finished or now) - job["created_at"]
+        run_seconds = ((finished or now) - started) if started is not None else 0.0
+        return {
+            "id": job["id"],
+            "kind": job["kind"],
+            "state": job["state"],
+            "progress": job["progress"],
+            "stage": job["stage"],
+            "error": job["error"],
+            "attempts": job["attempts"],
+            "queue_position": self.store.queue_position(job_id) if job["state"] == QUEUED else None,
+            "queue_wait_seconds": round(queue_wait, 3),
+            "run_seconds": round(run_seconds, 3),
+        }
+
+    async def _worker(self, slot: int) -> None:
+        while True:
+            job = self.store.claim_next()
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job, slot)
+
+    async def _run(self, job: Dict[str, Any], slot: int) -> None:
+        job_id = job["id"]
+        handler = self._handlers.get(job["kind"])
+        if handler is None:
+            self.store.update(job_id, state=FAILED, error=f"Unknown job kind: {job['kind']}", finished_at=time.time())
+            return
+
+        print(f"[JobQueue] Worker {slot} running {job['kind']} job {job_id} (attempt {job['attempts']})")
+        token = _current_job_id.set(job_id)
+        try:
+            task = asyncio.create_task(handler(**job["payload"]))
+        finally:
+            _current_job_id.reset(token)
+        self._running[job_id] = task
+
+        try:
+            await task
+            self.store.update(job_id, state=COMPLETE, progress=100, finished_at=time.time())
+            print(f"[JobQueue] Job {job_id} complete")
+        except asyncio.CancelledError:
+            if job_id not in self._cancel_requested:
+                # Worker shutdown: leave the job 'running' so the next start re-enqueues it
+                raise
+            self.store.update(job_id, state=CANCELLED, finished_at=time.time())
+            print(f"[JobQueue] Job {job_id} cancelled")
+        except Exception as e:
+            self.store.update(job_id, state=FAILED, error=str(e)[:500], finished_at=time.time())
+            print(f"[JobQueue] Job {job_id} failed: {e}")
+            traceback.print_exc()
+        finally:
+            self._running.pop(job_id, None)
+            self._cancel_requested.discard(job_id)
+
+
+def report_progress(percent: int, stage: Optional[str] = None) -> None:
+    """Record progress on the job running in the current task (no-op outside a job)."""
+    job_id = _current_job_id.get()
+    if job_id is None or _job_queue is None:
+        return
+    try:
+        _job_queue.store.update(job_id, progress=int(percent), stage=stage)
+    except Exception as e:
+        # Best-effort -- never fail a job over progress bookkeeping
+        print(f"[JobQueue] WARN: progress update failed for {job_id}: {e}")
+
+
+def cancel_requested() -> bool:
+    """True if the job running in the current task was cancelled via JobQueue.cancel().
+
+    Lets handlers tell a user cancellation (record it) from a worker shutdown
+    (leave state alone -- the job is re-enqueued on restart).
+    """
+    job_id = _current_job_id.get()
+    return job_id is not None and _job_queue is not None and job_id in _job_queue._cancel_requested
+
+
+def require_persistent_path(path: str, name: str) -> None:
+    """
+    Refuse (on Render) or warn about a state database in the temp dir, which deploys wipe.
+
+    Args:
+        path: SQLite file path
+        name: Env var that configures it (for the message)
+
+    Raises:
+        RuntimeError: If running on Render (RENDER is set) and path is ephemeral
+    """
+    temp_dir = os.path.realpath(tempfile.gettempdir())
+    real = os.path.realpath(path)
+    if real != temp_dir and not real.startswith(temp_dir + os.sep):
+        return
+    message = (f"{name}={path} is in the temp dir, which is wiped on every deploy/restart; "
+               f"point {name} at a persistent disk (see render.yaml)")
+    if os.getenv("RENDER"):
+        raise RuntimeError(message)
+    print(f"[JobQueue] WARNING: {message}")
+
+
+# Lazy-init process-wide queue
+_job_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    global _job_queue
+    if _job_queue is None:
+        require_persistent_path(JOB_DB_PATH, "JOB_DB_PATH")
+        _job_queue = JobQueue(JobStore(JOB_DB_PATH))
+    return _job_queue
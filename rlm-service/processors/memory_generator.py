@@ -1,109 +1,241 @@
 """
 MEMORY Generator
 Creates structured markdown MEMORY section from consolidated facts using Claude Haiku 4.5
+
+Map-reduce: each category's subsection (preferences, projects, dates,
+beliefs, decisions) is drafted concurrently from that category's facts
+only, with retries per subsection, then merge_memory_sections stitches the
+drafts into one document.
 """
+import asyncio
 import json
-from typing import Optional
-
-
-MEMORY_GENERATION_PROMPT = """You are creating a MEMORY section for a personal AI assistant. This section captures durable facts about the user -- things that should be remembered long-term to provide personalized, context-aware responses.
-
-From the extracted facts below, create a structured markdown document with these sections:
-
-## Preferences
-- Communication preferences, tool preferences, workflow preferences, aesthetic preferences
-- How they like to work, learn, and receive information
-
-## Projects
-- Active and past projects with names, descriptions, and key details
-- Include tech stacks, timelines, and status when available
-
-## Important Dates
-- Birthdays, anniversaries, milestones, deadlines
-- Career events, project launches, personal milestones
-
-## Beliefs & Values
-- Core principles that guide their decisions
+import os
+import re
+from typing import Dict, List, Optional
+
+from .fact_extractor import haiku_call
+
+
+# Output budget of one subsection draft
+MEMORY_SECTION_MAX_TOKENS = int(os.getenv("MEMORY_SECTION_MAX_TOKENS", "2048"))
+
+# Category -> heading and what the subsection should capture, in document order
+MEMORY_SECTIONS = {
+    "preferences": {
+        "heading": "Preferences",
+        "guidance": """- Communication preferences, tool preferences, workflow preferences, aesthetic preferences
+- How they like to work, learn, and receive information""",
+    },
+    "projects": {
+        "heading": "Projects",
+        "guidance": """- Active and past projects with names, descriptions, and key details
+- Include tech stacks, timelines, and status when available""",
+    },
+    "dates": {
+        "heading": "Important Dates",
+        "guidance": """- Birthdays, anniversaries, milestones, deadlines
+- Career events, project launches, personal milestones""",
+    },
+    "beliefs": {
+        "heading": "Beliefs & Values",
+        "guidance": """- Core principles that guide their decisions
 - What they care about deeply (privacy, quality, speed, etc.)
-- Philosophical or professional stances
-
-## Decisions & Context
-- Key decisions they've made with context for why
+- Philosophical or professional stances""",
+    },
+    "decisions": {
+        "heading": "Decisions & Context",
+        "guidance": """- Key decisions they've made with context for why
 - Tradeoffs they've considered
-- Evolution of thinking (if they changed their mind on something, note both the old and new position)
+- Evolution of thinking (if they changed their mind on something, note both the old and new position)""",
+    },
+}
+
+MEMORY_SECTION_PROMPT = """You are writing one section of a MEMORY document for a personal AI assistant. The document captures durable facts about the user -- things that should be remembered long-term to provide personalized, context-aware responses.
+
+From the extracted facts below, write the "## {heading}" section. It covers:
+{guidance}
 
 RULES:
+- Start with the line "## {heading}", followed by bullet points ("- ...")
 - Only include facts with actual substance -- skip vague or generic items
 - Prefer specific over general ("prefers Tailwind CSS" over "likes CSS frameworks")
 - Include dates/timeframes when available
-- If a category has no substantive facts, include the heading with "No data yet."
+- Merge facts that say the same thing into one bullet
 - Keep each bullet point to one clear, concise sentence
-- Total output should be 1000-5000 tokens (roughly 4-20KB of markdown)
+- Keep the section to 200-1000 tokens
+- Output ONLY the section. No other headings, no text before or after it.
 
-Extracted facts:
+Extracted {category} facts:
 """
 
+_BULLET = re.compile(r"^\s*[-*]\s+(.*\S)\s*$")
+
 
 async def generate_memory_section(consolidated_facts: dict, anthropic_client, cost_tracker: Optional['CostTracker'] = None, max_retries: int = 2) -> str:
     """
     Generate a structured MEMORY section from consolidated facts.
 
+    Subsections are drafted concurrently (one Haiku call per non-empty
+    category) and merged locally. A subsection that still fails after its
+    retries is rendered directly from its facts, so one bad draft no
+    longer costs a rerun of the whole document.
+
     Args:
         consolidated_facts: Dict with preferences, projects, dates, beliefs, decisions
         anthropic_client: AsyncAnthropic client instance
         cost_tracker: Optional CostTracker instance to record token usage
-        max_retries: Number of retries on placeholder content (default 2)
+        max_retries: Retries per subsection on errors or placeholder content (default 2)
 
     Returns:
         Markdown string with MEMORY section (human-readable, NOT JSON)
-        Falls back to minimal MEMORY section on errors
+        Falls back to minimal MEMORY section when no category has facts
     """
-    # Format facts as readable JSON
-    facts_json = json.dumps(consolidated_facts, indent=2)
-
     print(f"[MemoryGenerator] Generating MEMORY section from {consolidated_facts.get('total_count', 0)} facts")
 
+    sections = await asyncio.gather(*(
+        generate_memory_subsection(category, consolidated_facts.get(category) or [], anthropic_client,
+                                   cost_tracker=cost_tracker, max_retries=max_retries)
+        for category in MEMORY_SECTIONS
+    ))
+    memory_md = merge_memory_sections(dict(zip(MEMORY_SECTIONS, sections)))
+
+    if _is_placeholder_memory(memory_md):
+        print("[MemoryGenerator] Not enough substantive facts for a MEMORY section, using fallback")
+        return _fallback_memory(consolidated_facts)
+    print(f"[MemoryGenerator] Generated MEMORY section ({len(memory_md)} chars)")
+    return memory_md
+
+
+async def generate_memory_subsection(category: str, facts: List, anthropic_client, cost_tracker: Optional['CostTracker'] = None, max_retries: int = 2) -> str:
+    """
+    Draft one category's subsection from that category's facts.
+
+    Args:
+        category: Fact category (key of MEMORY_SECTIONS)
+        facts: The category's consolidated facts
+        anthropic_client: AsyncAnthropic client instance
+        cost_tracker: Optional CostTracker instance to record token usage
+        max_retries: Number of retries on errors or placeholder content
+
+    Returns:
+        Markdown subsection starting with its "## " heading
+    """
+    heading = MEMORY_SECTIONS[category]["heading"]
+    if not facts:
+        return f"## {heading}\nNo data yet."
+
+    prompt = MEMORY_SECTION_PROMPT.format(category=category, **MEMORY_SECTIONS[category])
+    facts_json = json.dumps(facts, indent=2)
+
     for attempt in range(max_retries + 1):
         try:
-            # Call Haiku 4.5 to generate MEMORY section
-            response = await anthropic_client.messages.create(
+            response = await haiku_call(
+                anthropic_client,
                 model="claude-haiku-4-5-20251001",
-                max_tokens=4096,
+                max_tokens=MEMORY_SECTION_MAX_TOKENS,
                 temperature=0.5,  # Moderate temperature for natural writing
                 messages=[{
                     "role": "user",
-                    "content": MEMORY_GENERATION_PROMPT + "\n" + facts_json
+                    "content": prompt + "\n" + facts_json
                 }]
             )
 
-            # Record token usage
             if cost_tracker:
                 cost_tracker.record_llm_call(response)
 
-            # Extract markdown from response
             if not response.content or len(response.content) == 0:
-                print(f"[MemoryGenerator] Attempt {attempt+1}: empty response from Haiku")
-                if attempt == max_retries:
-                    return _fallback_memory(consolidated_facts)
+                print(f"[MemoryGenerator] {heading} attempt {attempt+1}: empty response from Haiku")
                 continue
 
-            memory_md = response.content[0].text
-
-            # Validate that content is not placeholder
-            if not _is_placeholder_memory(memory_md):
-                print(f"[MemoryGenerator] Generated MEMORY section ({len(memory_md)} chars)")
-                return memory_md
+            section = _normalize_section(response.content[0].text, heading)
+            if not _is_placeholder_section(section):
+                return section
 
-            print(f"[MemoryGenerator] Attempt {attempt+1}: placeholder content detected, retrying...")
+            print(f"[MemoryGenerator] {heading} attempt {attempt+1}: placeholder content detected, retrying...")
 
         except Exception as e:
-            print(f"[MemoryGenerator] Attempt {attempt+1} error: {e}")
-            if attempt == max_retries:
-                return _fallback_memory(consolidated_facts)
+            print(f"[MemoryGenerator] {heading} attempt {attempt+1} error: {e}")
 
-    # All attempts produced placeholder content
-    print(f"[MemoryGenerator] All {max_retries + 1} attempts produced placeholder content, using fallback")
-    return _fallback_memory(consolidated_facts)
+    print(f"[MemoryGenerator] {heading}: all {max_retries + 1} attempts failed, listing facts directly")
+    return _render_facts_section(category, facts)
+
+
+def merge_memory_sections(sections: Dict[str, str]) -> str:
+    """
+    Stitch subsection drafts into one MEMORY document.
+
+    Sections keep MEMORY_SECTIONS order. A bullet repeated in a later
+    section (same text, ignoring case and punctuation) is dropped, since
+    drafts are written independently and the same fact can land in two
+    categories.
+
+    Args:
+        sections: Category -> markdown subsection
+
+    Returns:
+        Markdown MEMORY document
+    """
+    seen = set()
+    parts = ["# MEMORY"]
+    for category in MEMORY_SECTIONS:
+        lines = []
+        for line in sections.get(category, "").strip().split("\n"):
+            match = _BULLET.match(line)
+            if match:
+                key = re.sub(r"[^\w\s]", "", match.group(1).lower()).strip()
+                if key in seen:
+                    continue
+                seen.add(key)
+            lines.append(line.rstrip())
+        if not any(_BULLET.match(line) for line in lines) and "No data yet." not in lines:
+            lines.append("No data yet.")
+        parts.append("\n".join(lines))
+    return "\n\n".join(parts) + "\n"
+
+
+def _normalize_section(text: str, heading: str) -> str:
+    """Strip fences and stray headings from a draft and put its "## " heading first."""
+    lines = [line for line in text.strip().split("\n") if not line.strip().startswith("```")]
+    body = [line for line in lines if not line.lstrip().startswith("#")]
+    return f"## {heading}\n" + "\n".join(body).strip()
+
+
+def _is_placeholder_section(section: str) -> bool:
+    """Check if a drafted subsection lacks real content (facts were given, so it must have bullets)."""
+    if "No data yet." in section:
+        return True
+    bullets = [line for line in section.split("\n") if _BULLET.match(line) and len(line.strip()) > 10]
+    return not bullets
+
+
+def _render_facts_section(category: str, facts: List) -> str:
+    """
+    Render a subsection straight from its facts (used when every draft failed).
+
+    Args:
+        category: Fact category (key of MEMORY_SECTIONS)
+        facts: The category's consolidated facts
+
+    Returns:
+        Markdown subsection with one bullet per fact
+    """
+    bullets = []
+    for fact in facts:
+        if isinstance(fact, dict):
+            if category == "projects":
+                text = " -- ".join(str(fact[k]) for k in ("name", "description", "details") if fact.get(k))
+            elif category == "dates":
+                text = f"{fact.get('event', '')} ({fact['date']})" if fact.get("date") else str(fact.get("event", ""))
+            elif category == "decisions":
+                text = " -- ".join(str(fact[k]) for k in ("decision", "context") if fact.get(k))
+            else:
+                text = "; ".join(str(v) for v in fact.values() if v)
+        else:
+            text = str(fact)
+        text = " ".join(text.split())
+        if text:
+            bullets.append(f"- {text}")
+    return f"## {MEMORY_SECTIONS[category]['heading']}\n" + ("\n".join(bullets) or "No data yet.")
 
 
 def _is_placeholder_memory(memory_md: str) -> bool:
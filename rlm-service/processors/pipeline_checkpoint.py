@@ -0,0 +1,175 @@
+"""
+Pipeline Checkpoint
+Stage checkpoints for the full pass so a retry resumes instead of starting over.
+
+A checkpoint belongs to one run, identified by (user_id, storage_path): a
+retry of the same export resumes, a new import starts clean. Stage markers,
+stage artifacts (chunk list, consolidated/reduced facts, MEMORY) and per-chunk
+fact results live in a local SQLite database next to the job queue's, on the
+persistent disk render.yaml mounts (CHECKPOINT_DB_PATH): a temp-dir path
+would lose every checkpoint on deploy, so startup refuses it on Render.
+Per-chunk results are keyed by a hash of the chunk content, so they stay valid
+however the chunk list is ordered.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, Optional
+
+CHECKPOINT_DB_PATH = os.getenv(
+    "CHECKPOINT_DB_PATH", os.path.join(tempfile.gettempdir(), "soulprint_checkpoints.sqlite3")
+)
+
+# Full pass stages, in pipeline order
+CHUNKED = "chunked"
+CHUNKS_SAVED = "chunks_saved"
+EMBEDDINGS_DONE = "embeddings_done"
+FACTS_CONSOLIDATED = "facts_consolidated"
+FACTS_REDUCED = "facts_reduced"
+MEMORY_SAVED = "memory_saved"
+
+
+def chunk_key(content: str) -> str:
+    """Stable key for a chunk's extraction result (sha256 of its content)."""
+    return hashlib.sha256(content.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class PipelineCheckpoint:
+    """Persisted progress of one full pass run."""
+
+    def __init__(self, user_id: str, storage_path: str, path: Optional[str] = None):
+        """
+        Open the checkpoint for a run.
+
+        Args:
+            user_id: User the pipeline runs for
+            storage_path: Export being processed (part of the run identity)
+            path: SQLite file path (default CHECKPOINT_DB_PATH)
+        """
+        self.user_id = user_id
+        self.storage_path = storage_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path or CHECKPOINT_DB_PATH, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")  # per-chunk writes; WAL keeps this crash-safe
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS stages (
+                user_id TEXT NOT NULL,
+                storage_path TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                completed_at REAL NOT NULL,
+                PRIMARY KEY (user_id, storage_path, stage)
+            );
+            CREATE TABLE IF NOT EXISTS artifacts (
+                user_id TEXT NOT NULL,
+                storage_path TEXT NOT NULL,
+                name TEXT NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (user_id, storage_path, name)
+            );
+            CREATE TABLE IF NOT EXISTS chunk_facts (
+                user_id TEXT NOT NULL,
+                storage_path TEXT NOT NULL,
+                chunk_key TEXT NOT NULL,
+                facts BLOB NOT NULL,
+                PRIMARY KEY (user_id, storage_path, chunk_key)
+            );
+        """)
+
+    def _run(self) -> tuple:
+        return (self.user_id, self.storage_path)
+
+    def discard_stale(self) -> None:
+        """Drop checkpoints this user left for other exports (superseded imports)."""
+        with self._lock:
+            for table in ("stages", "artifacts", "chunk_facts"):
+                self._conn.execute(
+                    f"DELETE FROM {table} WHERE user_id = ? AND storage_path != ?", self._run()
+                )
+
+    def completed(self, stage: str) -> bool:
+        """True if the stage finished in an earlier attempt of this run."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM stages WHERE user_id = ? AND storage_path = ? AND stage = ?",
+                (*self._run(), stage),
+            ).fetchone()
+        return row is not None
+
+    def mark(self, stage: str) -> None:
+        """Record a stage as completed."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?)", (*self._run(), stage, time.time())
+            )
+        print(f"[Checkpoint] {self.user_id}: {stage} complete")
+
+    def save(self, name: str, value: Any) -> None:
+        """Persist a JSON-serializable stage artifact (zlib-compressed)."""
+        data = zlib.compress(json.dumps(value).encode("utf-8", "surrogatepass"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?)", (*self._run(), name, data)
+            )
+
+    def load(self, name: str) -> Any:
+        """
+        Load a stage artifact saved by save().
+
+        Raises:
+            KeyError: If the artifact was never saved for this run
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM artifacts WHERE user_id = ? AND storage_path = ? AND name = ?",
+                (*self._run(), name),
+            ).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return json.loads(zlib.decompress(row[0]).decode("utf-8", "surrogatepass"))
+
+    def save_chunk_facts(self, key: str, facts: dict) -> None:
+        """Persist one chunk's extraction result as soon as it arrives."""
+        data = zlib.compress(json.dumps(facts).encode("utf-8", "surrogatepass"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chunk_facts VALUES (?, ?, ?, ?)", (*self._run(), key, data)
+            )
+
+    def load_chunk_facts(self, keys: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+        """
+        Fetch extraction results saved by earlier attempts.
+
+        Args:
+            keys: chunk_key() values to look up (None: every saved result,
+                for callers that only learn keys as chunks stream in)
+
+        Returns:
+            Dict of key -> facts for the keys that have a saved result
+        """
+        wanted = None if keys is None else set(keys)
+        found: Dict[str, dict] = {}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_key, facts FROM chunk_facts WHERE user_id = ? AND storage_path = ?", self._run()
+            ).fetchall()
+        for key, data in rows:
+            if wanted is None or key in wanted:
+                found[key] = json.loads(zlib.decompress(data).decode("utf-8", "surrogatepass"))
+        return found
+
+    def clear(self) -> None:
+        """Delete everything stored for this run (called once the pipeline completes)."""
+        with self._lock:
+            for table in ("stages", "artifacts", "chunk_facts"):
+                self._conn.execute(
+                    f"DELETE FROM {table} WHERE user_id = ? AND storage_path = ?", self._run()
+                )
+
+    def close(self) -> None:
+        self._conn.close()
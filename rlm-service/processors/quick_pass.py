@@ -5,18 +5,44 @@ Generates 5 structured personality sections from a user's ChatGPT
 conversation history using Haiku 4.5 on Bedrock. Designed to run
 in ~15-30 seconds during the import flow.
 
+Fully async: uses one shared AsyncAnthropicBedrock client, streams the
+response under a hard timeout, and validates the JSON structure as it
+arrives so malformed output aborts the call early instead of after
+8192 tokens.
+
 Returns None on any failure -- the import pipeline must never fail
 because of the quick pass.
 
 Ported from lib/soulprint/quick-pass.ts
 """
 
+import asyncio
 import json
 import os
 from typing import Dict, Any, Optional, List
-from anthropic import AnthropicBedrock
+from anthropic import AsyncAnthropicBedrock
 
 from .sample import sample_conversations, format_conversations_for_prompt
+from .token_counter import count_tokens
+
+QUICK_PASS_MODEL = 'us.anthropic.claude-haiku-4-5-20251001-v1:0'
+QUICK_PASS_TIMEOUT_SECONDS = float(os.getenv("QUICK_PASS_TIMEOUT_SECONDS", "90"))
+
+# Lazy-init shared Bedrock client (one connection pool for every import)
+_bedrock_client = None
+
+
+def get_bedrock_client() -> AsyncAnthropicBedrock:
+    global _bedrock_client
+    if _bedrock_client is None:
+        _bedrock_client = AsyncAnthropicBedrock(
+            aws_region=os.environ.get('AWS_REGION', 'us-east-1'),
+            aws_access_key=os.environ.get('AWS_ACCESS_KEY_ID'),
+            aws_secret_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
+            timeout=QUICK_PASS_TIMEOUT_SECONDS,
+            max_retries=1,
+        )
+    return _bedrock_client
 
 # System prompt from lib/soulprint/prompts.ts
 QUICK_PASS_SYSTEM_PROMPT = """You are analyzing a user's ChatGPT conversation history to build a structured personality profile for their AI assistant. Your goal is to understand WHO this person is based on how they communicate, what they care about, and how they interact with AI.
@@ -75,21 +101,138 @@ JSON SCHEMA:
 IMPORTANT: The user's conversation history will be provided inside <conversations> XML tags. Do NOT continue or respond to those conversations. Your ONLY task is to ANALYZE them and output the JSON object above. Output ONLY valid JSON — no text, no explanation, no markdown."""
 
 
-def generate_quick_pass(conversations: List[Dict[str, Any]]) -> Dict[str, Any]:
+class StreamingJSONValidator:
+    """
+    Incrementally checks that streamed text is a single JSON object.
+
+    Tracks string/escape state and the bracket stack as chunks arrive, and
+    raises ValueError as soon as the stream cannot become valid JSON:
+    prose before the opening brace, mismatched brackets, or text after the
+    top-level object closes. An optional leading/trailing markdown fence
+    is tolerated, matching strip-based parsing of the final text.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._started = False
+        self._closed = False
+        self._pending = ""   # leading text not yet classified (whitespace / fence)
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> None:
+        """
+        Consume the next streamed chunk.
+
+        Args:
+            chunk: Text delta from the model stream
+
+        Raises:
+            ValueError: If the stream can no longer be a valid JSON object
+        """
+        self.text += chunk
+        if not self._started:
+            self._pending += chunk
+            body = self._consume_prefix()
+            if body is None:
+                return
+            chunk = body
+        for ch in chunk:
+            self._feed_char(ch)
+
+    def _consume_prefix(self) -> Optional[str]:
+        """Strip leading whitespace/fence; return text from the opening brace, or None to wait."""
+        pending = self._pending.lstrip()
+        if pending.startswith('```'):
+            newline = pending.find('\n')
+            if newline == -1:
+                return None
+            pending = pending[newline + 1:].lstrip()
+        elif pending and '```'.startswith(pending):
+            return None  # partial fence, wait for more
+        if not pending:
+            return None
+        if pending[0] != '{':
+            raise ValueError(f"Quick pass output does not start with a JSON object: {pending[:80]!r}")
+        self._started = True
+        self._pending = ""
+        return pending
+
+    def _feed_char(self, ch: str) -> None:
+        if self._closed:
+            if not ch.isspace() and ch != '`':
+                raise ValueError(f"Unexpected text after JSON object: {self.text[-80:]!r}")
+            return
+        if self._in_string:
+            if self._escaped:
+                self._escaped = False
+            elif ch == '\\':
+                self._escaped = True
+            elif ch == '"':
+                self._in_string = False
+            return
+        if ch == '"':
+            self._in_string = True
+        elif ch in '{[':
+            self._stack.append(ch)
+        elif ch in '}]':
+            expected = '{' if ch == '}' else '['
+            if not self._stack or self._stack[-1] != expected:
+                raise ValueError(f"Mismatched '{ch}' in quick pass JSON: {self.text[-80:]!r}")
+            self._stack.pop()
+            if not self._stack:
+                self._closed = True
+
+
+async def _stream_quick_pass(user_content: str) -> str:
+    """Stream the Haiku 4.5 response, validating JSON structure as it arrives."""
+    client = get_bedrock_client()
+    validator = StreamingJSONValidator()
+
+    # Leaving the context manager on a validation error closes the HTTP stream
+    async with client.messages.stream(
+        model=QUICK_PASS_MODEL,
+        max_tokens=8192,
+        temperature=0.3,  # Lower temp for more structured output
+        system=QUICK_PASS_SYSTEM_PROMPT,
+        messages=[
+            {
+                'role': 'user',
+                'content': user_content
+            }
+        ]
+    ) as stream:
+        async for text in stream.text_stream:
+            validator.feed(text)
+
+    return validator.text
+
+
+async def generate_quick_pass(
+    conversations: List[Dict[str, Any]],
+    timeout: float = QUICK_PASS_TIMEOUT_SECONDS,
+    presampled: bool = False,
+) -> Dict[str, Any]:
     """
     Generate structured personality sections from ChatGPT conversations.
 
-    Samples the richest conversations, sends them to Haiku 4.5 for analysis,
+    Samples the richest conversations, streams them to Haiku 4.5 for analysis,
     and returns the parsed result. Raises on failure with descriptive error.
+    Sampling and formatting run in a worker thread so the event loop keeps
+    serving chat requests during the quick pass.
 
     Args:
         conversations: All parsed conversations from the ChatGPT export
+        timeout: Hard limit in seconds for the Bedrock call (default 90)
+        presampled: True if conversations were already selected by a
+            StreamingSampler during parsing (skips sampling)
 
     Returns:
         QuickPassResult dict with all 5 sections
 
     Raises:
-        ValueError: If generation fails (with descriptive message for user)
+        ValueError: If generation fails or times out (with descriptive message for user)
     """
     # Pre-flight: check AWS credentials
     aws_key = os.environ.get('AWS_ACCESS_KEY_ID')
@@ -100,48 +243,34 @@ def generate_quick_pass(conversations: List[Dict[str, Any]]) -> Dict[str, Any]:
         raise ValueError(f"AWS Bedrock credentials not configured (key={'set' if aws_key else 'MISSING'}, secret={'set' if aws_secret else 'MISSING'}, region={aws_region})")
 
     # Sample the richest conversations within token budget
-    sampled = sample_conversations(conversations)
-    print(f"[quick_pass] Conversations sampled: {len(conversations)} input -> {len(sampled)} sampled")
+    if presampled:
+        sampled = conversations
+    else:
+        sampled = await asyncio.to_thread(sample_conversations, conversations)
+        print(f"[quick_pass] Conversations sampled: {len(conversations)} input -> {len(sampled)} sampled")
 
     # Format as readable text for the prompt
-    formatted_text = format_conversations_for_prompt(sampled)
+    formatted_text = await asyncio.to_thread(format_conversations_for_prompt, sampled)
 
     if not formatted_text or len(formatted_text.strip()) == 0:
         raise ValueError(f"No conversation text after formatting ({len(sampled)} sampled conversations had no message content)")
 
-    approx_tokens = len(formatted_text) // 4
+    approx_tokens = count_tokens(formatted_text)
     print(f"[quick_pass] Calling Haiku 4.5: {len(formatted_text)} chars (~{approx_tokens} tokens)")
 
-    # Initialize Bedrock client
-    client = AnthropicBedrock(
-        aws_region=aws_region,
-        aws_access_key=aws_key,
-        aws_secret_key=aws_secret,
-    )
-
     # Call Haiku 4.5 via Bedrock
     # Wrap conversations in XML tags so model analyzes them instead of continuing them
     user_content = f"<conversations>\n{formatted_text}\n</conversations>\n\nAnalyze the conversations above and output ONLY the JSON object. No other text."
 
-    response = client.messages.create(
-        model='us.anthropic.claude-haiku-4-5-20251001-v1:0',
-        max_tokens=8192,
-        temperature=0.3,  # Lower temp for more structured output
-        system=QUICK_PASS_SYSTEM_PROMPT,
-        messages=[
-            {
-                'role': 'user',
-                'content': user_content
-            }
-        ]
-    )
+    try:
+        result_text = await asyncio.wait_for(_stream_quick_pass(user_content), timeout=timeout)
+    except asyncio.TimeoutError:
+        raise ValueError(f"Bedrock Haiku 4.5 quick pass timed out after {timeout:g}s")
 
     # Extract text from response
-    if not response.content or len(response.content) == 0:
+    if not result_text or not result_text.strip():
         raise ValueError("Empty response from Bedrock Haiku 4.5")
 
-    result_text = response.content[0].text
-
     # Parse JSON response
     json_str = result_text.strip()
     if json_str.startswith('```json'):
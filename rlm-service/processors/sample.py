@@ -4,27 +4,36 @@ Conversation Sampling for Quick Pass Pipeline
 Selects the richest conversations from a user's ChatGPT export
 and formats them as readable text for Haiku 4.5 analysis.
 
+Sampling is single-pass: StreamingSampler scores each conversation as it
+leaves the parser and keeps only candidates that could still be selected,
+so the full export never has to be held in memory.
+
 Ported from lib/soulprint/sample.ts
 """
 
-from typing import List, Dict, Any
+import heapq
+from typing import List, Dict, Any, Tuple
 from datetime import datetime
 
+from .token_counter import chars_for_tokens, count_tokens
+from .token_diet import diet_message, format_savings, uses_token_diet
+
 # Constants matching TypeScript exactly
 MIN_MESSAGES = 4
 DEFAULT_TARGET_TOKENS = 50000
 HARD_CAP = 50
 MIN_SELECTED = 5
-CHARS_PER_TOKEN = 4
 MAX_MESSAGE_LENGTH = 2000
+# Hard limit: Haiku 4.5 has 200K token context, system prompt ~2K tokens
+# At 4 chars/token, that's ~792K chars max. Use 600K to be safe.
+ABSOLUTE_CHAR_LIMIT = 600_000
+# Candidate count that triggers the first pruning pass
+PRUNE_MIN_CANDIDATES = 4 * HARD_CAP
 
 
-def sample_conversations(
-    conversations: List[Dict[str, Any]],
-    target_tokens: int = DEFAULT_TARGET_TOKENS
-) -> List[Dict[str, Any]]:
+def score_conversation(conv: Dict[str, Any]) -> Tuple[float, int]:
     """
-    Sample the richest conversations from a parsed ChatGPT export.
+    Score a conversation by richness and measure its size.
 
     Scoring algorithm:
     - Message count * 10 (prefer multi-turn conversations)
@@ -32,100 +41,230 @@ def sample_conversations(
     - Min(user, assistant) count * 20 (prefer balanced conversations)
     - Slight recency bonus from createdAt timestamp
 
-    Filters out conversations with fewer than 4 messages.
-    Selects conversations until the token budget is met.
-    Forces at least 5 conversations if available (even if over budget).
-    Hard-capped at 50 conversations.
-
     Args:
-        conversations: Parsed conversation array from ChatGPT export
-        target_tokens: Approximate token budget (default 50,000)
+        conv: Parsed conversation with messages and createdAt
 
     Returns:
-        Subset of conversations ranked by richness within token budget
+        (score, total_chars) tuple
     """
-    # Filter out short conversations
-    eligible = [c for c in conversations if len(c.get('messages', [])) >= MIN_MESSAGES]
+    total_chars = 0
+    user_chars = 0
+    user_count = 0
+    assistant_count = 0
+    message_count = 0
+
+    # One pass over the messages instead of a comprehension per metric
+    for m in conv.get('messages', []):
+        length = len(m.get('content', ''))
+        total_chars += length
+        message_count += 1
+        role = m.get('role')
+        if role == 'user':
+            user_count += 1
+            user_chars += min(length, 500)
+        elif role == 'assistant':
+            assistant_count += 1
+
+    score = (
+        # Prefer conversations with many messages (back-and-forth)
+        message_count * 10 +
+        # Prefer conversations with substantial user messages (capped at 500 chars each)
+        user_chars +
+        # Prefer balanced conversations (both user and assistant)
+        min(user_count, assistant_count) * 20
+    )
+
+    # Add slight recency bonus
+    try:
+        created_at = conv.get('createdAt', '')
+        if created_at:
+            timestamp = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+            score += timestamp.timestamp() / 1e12
+    except (ValueError, AttributeError):
+        pass  # Skip recency bonus if date parsing fails
 
-    print(f"[sample_conversations] Filtering: {len(conversations)} total, {len(eligible)} eligible (min {MIN_MESSAGES} messages)")
+    return score, total_chars
 
-    if len(eligible) == 0:
-        print("[sample_conversations] WARNING: No conversations with enough messages, returning all conversations")
-        return conversations[:HARD_CAP]
 
-    # Score each conversation
-    scored = []
-    for conv in eligible:
+class StreamingSampler:
+    """
+    Single-pass top-K conversation sampler.
+
+    Feed conversations one at a time with add(); select() returns exactly
+    what sample_conversations() selects for the same input order.
+
+    Candidates are ranked by (score desc, arrival order). If a candidate
+    is selected, every higher-ranked candidate no larger than it is
+    selected too. So a candidate is unreachable once those "dominators"
+    number HARD_CAP, or number at least MIN_SELECTED (putting it past the
+    force-include phase) and together with it overrun the char target.
+    An unreachable candidate can still end the walk via the
+    ABSOLUTE_CHAR_LIMIT break, but only if it is larger than
+    ABSOLUTE_CHAR_LIMIT - target. Smaller ones are dropped; the rare
+    larger ones are kept as size-only ghosts. The candidate heap stays
+    bounded by what could still be selected, not by the export size.
+    """
+
+    def __init__(self, target_tokens: int = DEFAULT_TARGET_TOKENS):
+        """
+        Initialize an empty sampler.
+
+        Args:
+            target_tokens: Approximate token budget (default 50,000)
+        """
+        # Candidates are sized in chars (cheap to measure per conversation);
+        # the token budget converts at the raw ratio so a sample does not
+        # depend on calibration from earlier calls in this process
+        self.target_chars = chars_for_tokens(target_tokens, calibrated=False)
+        self.total_count = 0
+        self.eligible_count = 0
+        self.message_count = 0
+        self._first: List[Dict[str, Any]] = []  # fallback when nothing is eligible
+        self._heap: List[tuple] = []  # (-score, seq, chars, conv)
+        self._prune_at = PRUNE_MIN_CANDIDATES
+
+    def add(self, conv: Dict[str, Any]) -> None:
+        """
+        Score one conversation and keep it if it could still be selected.
+
+        Args:
+            conv: Parsed conversation dict (or ConversationStore view)
+        """
+        seq = self.total_count
+        self.total_count += 1
         messages = conv.get('messages', [])
-        total_chars = sum(len(m.get('content', '')) for m in messages)
-
-        user_messages = [m for m in messages if m.get('role') == 'user']
-        assistant_messages = [m for m in messages if m.get('role') == 'assistant']
-
-        # Calculate score
-        score = (
-            # Prefer conversations with many messages (back-and-forth)
-            len(messages) * 10 +
-            # Prefer conversations with substantial user messages (capped at 500 chars each)
-            sum(min(len(m.get('content', '')), 500) for m in user_messages) +
-            # Prefer balanced conversations (both user and assistant)
-            min(len(user_messages), len(assistant_messages)) * 20
-        )
-
-        # Add slight recency bonus
-        try:
-            created_at = conv.get('createdAt', '')
-            if created_at:
-                timestamp = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                score += timestamp.timestamp() / 1e12
-        except (ValueError, AttributeError):
-            pass  # Skip recency bonus if date parsing fails
-
-        scored.append({
-            'conv': conv,
-            'score': score,
-            'chars': total_chars
-        })
-
-    # Sort by score descending
-    scored.sort(key=lambda x: x['score'], reverse=True)
-
-    # Select conversations within token budget
-    target_chars = target_tokens * CHARS_PER_TOKEN
-    # Hard limit: Haiku 4.5 has 200K token context, system prompt ~2K tokens
-    # At 4 chars/token, that's ~792K chars max. Use 600K to be safe.
-    ABSOLUTE_CHAR_LIMIT = 600_000
-    selected = []
-    total_chars = 0
+        self.message_count += len(messages)
+
+        # Filter out short conversations
+        if len(messages) < MIN_MESSAGES:
+            if self.eligible_count == 0 and len(self._first) < HARD_CAP:
+                self._first.append(conv)
+            return
+        self.eligible_count += 1
+        self._first = []
+
+        score, chars = score_conversation(conv)
+        heapq.heappush(self._heap, (-score, seq, chars, conv))
+
+        if len(self._heap) >= self._prune_at:
+            self._prune()
+
+    def _prune(self) -> None:
+        """Drop candidates that higher-ranked, no-larger candidates make unreachable."""
+        ranked = sorted(self._heap)
+        sizes = sorted({item[2] for item in ranked})
+        position = {size: i + 1 for i, size in enumerate(sizes)}
+        # Fenwick trees over size rank: count and char total of kept, higher-ranked candidates
+        counts = [0] * (len(sizes) + 1)
+        totals = [0] * (len(sizes) + 1)
+        break_threshold = ABSOLUTE_CHAR_LIMIT - self.target_chars
+        kept = []
+
+        for item in ranked:
+            chars = item[2]
+            dominators = 0
+            dominator_chars = 0
+            i = position[chars]
+            while i > 0:
+                dominators += counts[i]
+                dominator_chars += totals[i]
+                i -= i & -i
+
+            unreachable = dominators >= HARD_CAP or (
+                dominators >= MIN_SELECTED and dominator_chars + chars > self.target_chars
+            )
+            if unreachable:
+                if chars <= break_threshold:
+                    continue
+                # Never selectable, but may still end the walk: keep rank and size only
+                item = item[:3] + (None,)
+
+            kept.append(item)
+            i = position[chars]
+            while i < len(counts):
+                counts[i] += 1
+                totals[i] += chars
+                i += i & -i
+
+        # A sorted list is a valid heap
+        self._heap = kept
+        self._prune_at = max(PRUNE_MIN_CANDIDATES, 2 * len(kept))
+
+    def select(self) -> List[Dict[str, Any]]:
+        """
+        Select conversations within the token budget.
+
+        Selects conversations until the token budget is met.
+        Forces at least 5 conversations if available (even if over budget).
+        Hard-capped at 50 conversations.
+
+        Returns:
+            Subset of conversations ranked by richness within token budget
+        """
+        print(f"[sample_conversations] Filtering: {self.total_count} total, {self.eligible_count} eligible (min {MIN_MESSAGES} messages)")
+
+        if self.eligible_count == 0:
+            print("[sample_conversations] WARNING: No conversations with enough messages, returning all conversations")
+            return list(self._first)
+
+        # Sort by score descending (ties keep input order)
+        scored = sorted(self._heap)
+
+        # Select conversations within token budget
+        target_chars = self.target_chars
+        selected = []
+        total_chars = 0
+
+        for _neg_score, _seq, chars, conv in scored:
+            # Never exceed absolute limit (prevents blowing past model context)
+            if total_chars + chars > ABSOLUTE_CHAR_LIMIT and len(selected) > 0:
+                break
+
+            if total_chars + chars > target_chars:
+                # Force-include up to MIN_SELECTED, but only if this single
+                # conversation won't blow past the absolute limit on its own
+                if len(selected) < MIN_SELECTED and total_chars + chars <= ABSOLUTE_CHAR_LIMIT:
+                    selected.append(conv)
+                    total_chars += chars
+                    continue
+                # Over budget and have enough -- skip remaining
+                continue
 
-    for item in scored:
-        conv = item['conv']
-        chars = item['chars']
+            selected.append(conv)
+            total_chars += chars
 
-        # Never exceed absolute limit (prevents blowing past model context)
-        if total_chars + chars > ABSOLUTE_CHAR_LIMIT and len(selected) > 0:
-            break
+            if len(selected) >= HARD_CAP:
+                break
 
-        if total_chars + chars > target_chars:
-            # Force-include up to MIN_SELECTED, but only if this single
-            # conversation won't blow past the absolute limit on its own
-            if len(selected) < MIN_SELECTED and total_chars + chars <= ABSOLUTE_CHAR_LIMIT:
-                selected.append(conv)
-                total_chars += chars
-                continue
-            # Over budget and have enough -- skip remaining
-            continue
+        top_score = -scored[0][0] if scored else 0
+        print(f"[sample_conversations] Selected: {len(selected)} conversations, {total_chars} chars (target: {target_chars}), top score: {top_score:.2f}")
 
-        selected.append(conv)
-        total_chars += chars
+        return selected
 
-        if len(selected) >= HARD_CAP:
-            break
 
-    top_score = scored[0]['score'] if scored else 0
-    print(f"[sample_conversations] Selected: {len(selected)} conversations, {total_chars} chars (target: {target_chars}), top score: {top_score:.2f}")
+def sample_conversations(
+    conversations: List[Dict[str, Any]],
+    target_tokens: int = DEFAULT_TARGET_TOKENS
+) -> List[Dict[str, Any]]:
+    """
+    Sample the richest conversations from a parsed ChatGPT export.
 
-    return selected
+    Scoring is described in score_conversation(). Filters out
+    conversations with fewer than 4 messages, selects conversations
+    until the token budget is met, forces at least 5 conversations if
+    available (even if over budget), and hard-caps at 50.
+
+    Args:
+        conversations: Parsed conversation array from ChatGPT export
+        target_tokens: Approximate token budget (default 50,000)
+
+    Returns:
+        Subset of conversations ranked by richness within token budget
+    """
+    sampler = StreamingSampler(target_tokens)
+    for conv in conversations:
+        sampler.add(conv)
+    return sampler.select()
 
 
 def format_conversations_for_prompt(conversations: List[Dict[str, Any]]) -> str:
@@ -140,6 +279,8 @@ def format_conversations_for_prompt(conversations: List[Dict[str, Any]]) -> str:
     ```
 
     Messages longer than 2000 characters are truncated with "... [truncated]".
+    With "quick_pass" in TOKEN_DIET_STAGES, messages use the diet rendering
+    first (see token_diet).
 
     Args:
         conversations: Sampled conversations to format
@@ -148,6 +289,8 @@ def format_conversations_for_prompt(conversations: List[Dict[str, Any]]) -> str:
         Formatted text block suitable for inclusion in a prompt
     """
     blocks = []
+    diet = uses_token_diet("quick_pass")
+    diet_tokens = [0, 0]
 
     for conv in conversations:
         # Extract date (YYYY-MM-DD)
@@ -171,6 +314,12 @@ def format_conversations_for_prompt(conversations: List[Dict[str, Any]]) -> str:
                 role_label = role
 
             content = msg.get('content', '')
+            if diet:
+                rendered = diet_message(role, content)
+                if rendered != content:
+                    diet_tokens[0] += count_tokens(content[:MAX_MESSAGE_LENGTH])
+                    diet_tokens[1] += count_tokens(rendered[:MAX_MESSAGE_LENGTH])
+                    content = rendered
 
             # Truncate long messages
             if len(content) > MAX_MESSAGE_LENGTH:
@@ -181,13 +330,17 @@ def format_conversations_for_prompt(conversations: List[Dict[str, Any]]) -> str:
         blocks.append('\n'.join([header] + message_lines))
 
     result = '\n\n'.join(blocks)
-
-    # Safety truncation: Haiku 4.5 has 200K token context (~800K chars).
-    # System prompt uses ~2K tokens. Cap user content at 180K tokens = 720K chars.
-    MAX_PROMPT_CHARS = 720_000
-    if len(result) > MAX_PROMPT_CHARS:
-        print(f"[format_conversations_for_prompt] Truncating from {len(result)} to {MAX_PROMPT_CHARS} chars (model context limit)")
-        result = result[:MAX_PROMPT_CHARS] + "\n\n[... remaining conversations truncated to fit model context ...]"
+    if diet:
+        print(format_savings("quick_pass", diet_tokens[0], diet_tokens[1]))
+
+    # Safety truncation: Haiku 4.5 has 200K token context.
+    # System prompt uses ~2K tokens. Cap user content at 180K tokens.
+    MAX_PROMPT_TOKENS = 180_000
+    result_tokens = count_tokens(result)
+    if result_tokens > MAX_PROMPT_TOKENS:
+        max_chars = chars_for_tokens(MAX_PROMPT_TOKENS, result)
+        print(f"[format_conversations_for_prompt] Truncating from ~{result_tokens} tokens to {MAX_PROMPT_TOKENS} ({max_chars} chars, model context limit)")
+        result = result[:max_chars] + "\n\n[... remaining conversations truncated to fit model context ...]"
 
     print(f"[format_conversations_for_prompt] Formatted {len(conversations)} conversations, {len(result)} chars")
 
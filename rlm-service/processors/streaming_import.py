@@ -20,12 +20,14 @@ import tempfile
 import traceback
 import zipfile
 from datetime import datetime, timezone
-from typing import Optional
+from typing import List, Optional, Tuple
 
 import httpx
 import ijson
 
 from .dag_parser import extract_active_path
+from .job_queue import cancel_requested, get_job_queue, report_progress
+from .sample import StreamingSampler
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
@@ -35,8 +37,10 @@ async def update_progress(user_id: str, percent: int, stage: str):
     """Update user_profiles with progress_percent and import_stage.
 
     Called at every major pipeline stage so the frontend can show
-    real-time progress to the user.
+    real-time progress to the user. Also recorded on the running job
+    (if any) for the /jobs/{id} status endpoint.
     """
+    report_progress(percent, stage)
     try:
         async with httpx.AsyncClient() as client:
             response = await client.patch(
@@ -118,46 +122,53 @@ def extract_if_zip(file_path: str, file_type: str = 'json') -> str:
     return extracted_path
 
 
-def parse_conversations_streaming(file_path: str) -> list:
-    """Parse ChatGPT conversations.json with ijson from file (constant memory).
+def _iter_raw_conversations(file_path: str):
+    """Yield raw conversation objects from conversations.json one at a time via ijson.
+
+    Tries the bare array format first, then the wrapped { conversations: [...] } format.
+    """
+    with open(file_path, "rb") as f:
+        yielded = 0
+        try:
+            # Try bare array format first (most common)
+            for raw_convo in ijson.items(f, "item", use_float=True):
+                yielded += 1
+                yield raw_convo
+        except (ijson.JSONError, ijson.common.IncompleteJSONError) as e:
+            if yielded:
+                # Already streamed items downstream -- keep what parsed cleanly
+                print(f"[streaming_import] WARN: Parse stopped after {yielded} conversations: {e}")
+                return
+
+        if yielded:
+            return
+
+        # No items found (or bare array failed) -- might be wrapped format
+        f.seek(0)  # Reset file pointer
+        try:
+            for raw_convo in ijson.items(f, "conversations.item", use_float=True):
+                yield raw_convo
+        except Exception as e:
+            # Both formats failed
+            print(f"[streaming_import] ERROR: Both parse formats failed: {e}")
+
+
+def iter_conversations_streaming(file_path: str):
+    """Parse ChatGPT conversations.json lazily, one conversation at a time.
 
     ijson reads from file handle directly, never loading the entire file
-    into RAM. Handles both formats:
+    into RAM, and each conversation is reduced to its active DAG path as
+    soon as it is read. Handles both formats:
     - Bare array: [...]
     - Wrapped object: { conversations: [...] }
 
     Args:
         file_path: Path to the downloaded JSON file on disk
 
-    Returns:
-        List of parsed conversation dicts
+    Yields:
+        Parsed conversation dicts ({id, title, createdAt, messages})
     """
-    raw_convos = []
-
-    with open(file_path, "rb") as f:
-        try:
-            # Try bare array format first (most common)
-            parser = ijson.items(f, "item")
-            raw_convos = list(parser)
-
-            # If no items found, might be wrapped format
-            if len(raw_convos) == 0:
-                f.seek(0)  # Reset file pointer
-                parser = ijson.items(f, "conversations.item")
-                raw_convos = list(parser)
-        except (ijson.JSONError, ijson.common.IncompleteJSONError):
-            # If bare array fails, try wrapped format
-            f.seek(0)  # Reset file pointer
-            try:
-                parser = ijson.items(f, "conversations.item")
-                raw_convos = list(parser)
-            except Exception as e:
-                # Both formats failed
-                print(f"[streaming_import] ERROR: Both parse formats failed: {e}")
-
-    # Process each conversation with DAG traversal
-    conversations = []
-    for raw_convo in raw_convos:
+    for raw_convo in _iter_raw_conversations(file_path):
         parsed_messages = extract_active_path(raw_convo)
 
         if parsed_messages:
@@ -167,25 +178,44 @@ def parse_conversations_streaming(file_path: str) -> list:
             else:
                 created_at = datetime.now(timezone.utc).isoformat()
 
-            conversations.append({
+            yield {
                 "id": raw_convo.get("id"),
                 "title": raw_convo.get("title", "Untitled"),
                 "createdAt": created_at,
                 "messages": parsed_messages,
-            })
+            }
 
-    total_messages = sum(len(c["messages"]) for c in conversations)
-    print(f"[streaming_import] Parsed {len(conversations)} conversations with DAG traversal ({total_messages} total messages)")
-    return conversations
+
+def parse_and_sample_streaming(file_path: str) -> Tuple[List[dict], int]:
+    """Parse conversations.json and sample the quick pass input in a single pass.
+
+    Each conversation is scored by StreamingSampler as it leaves the parser
+    and dropped unless it could still be selected, so the full export is
+    never held in memory and the quick pass can start the moment parsing ends.
+
+    Args:
+        file_path: Path to the downloaded JSON file on disk
+
+    Returns:
+        (sampled conversations, total parsed conversation count)
+    """
+    sampler = StreamingSampler()
+    for conversation in iter_conversations_streaming(file_path):
+        sampler.add(conversation)
+
+    print(f"[streaming_import] Parsed {sampler.total_count} conversations with DAG traversal ({sampler.message_count} total messages)")
+    if sampler.total_count == 0:
+        return [], 0
+    return sampler.select(), sampler.total_count
 
 
 FULL_PASS_TIMEOUT_SECONDS = 30 * 60  # 30 minutes max for full pass
 
 
 async def trigger_full_pass(user_id: str, storage_path: str, conversation_count: int, file_type: str = 'json'):
-    """Fire-and-forget full pass after quick pass succeeds.
+    """Full pass job, queued after quick pass succeeds.
 
-    Runs asynchronously — does not block chat access.
+    Runs on a job queue worker — does not block chat access.
     Creates conversation chunks, extracts facts, generates MEMORY section,
     and regenerates v2 soulprint sections.
 
@@ -256,6 +286,28 @@ async def trigger_full_pass(user_id: str, storage_path: str, conversation_count:
                 )
         except Exception:
             pass
+        raise
+
+    except asyncio.CancelledError:
+        if cancel_requested():
+            try:
+                async with httpx.AsyncClient() as client:
+                    await client.patch(
+                        f"{SUPABASE_URL}/rest/v1/user_profiles?user_id=eq.{user_id}",
+                        json={
+                            "full_pass_status": "failed",
+                            "full_pass_error": "Cancelled",
+                        },
+                        headers={
+                            "apikey": SUPABASE_SERVICE_KEY,
+                            "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
+                            "Content-Type": "application/json",
+                            "Prefer": "return=minimal",
+                        },
+                    )
+            except Exception:
+                pass
+        raise
 
     except Exception as e:
         error_msg = str(e)[:500]
@@ -278,6 +330,7 @@ async def trigger_full_pass(user_id: str, storage_path: str, conversation_count:
                 )
         except Exception:
             pass
+        raise  # Let the job queue record the failure
 
 
 async def process_import_streaming(user_id: str, storage_path: str, file_type: str = 'json'):
@@ -286,8 +339,9 @@ async def process_import_streaming(user_id: str, storage_path: str, file_type: s
     Uses temporary file approach:
     1. Stream httpx download to temp file (chunk-by-chunk, no accumulation)
     1.5. If ZIP, extract conversations.json from it
-    2. Pass temp file to ijson for parsing (file handle, no memory load)
-    3. Generate quick pass soulprint from parsed conversations
+    2. Pass temp file to ijson for parsing (file handle, no memory load),
+       scoring conversations for the quick pass sample as they are parsed
+    3. Generate quick pass soulprint from the sampled conversations
     4. Save results to database
     5. Clean up temp file after processing
 
@@ -318,19 +372,19 @@ async def process_import_streaming(user_id: str, storage_path: str, file_type: s
         temp_file_path = extract_if_zip(temp_file_path, file_type)
         await update_progress(user_id, 20, "Parsing conversations")
 
-        # Stage 2: Parse from temp file (20-50%)
+        # Stage 2: Parse from temp file and sample as we go (20-50%)
         print(f"[streaming_import] Parsing conversations for user {user_id}")
-        conversations = parse_conversations_streaming(temp_file_path)
+        sampled, conversation_count = await asyncio.to_thread(parse_and_sample_streaming, temp_file_path)
 
-        if not conversations:
+        if conversation_count == 0:
             raise ValueError("No conversations found in export file")
 
         await update_progress(user_id, 50, "Generating soulprint")
 
         # Stage 3: Quick Pass (50-100%)
-        print(f"[streaming_import] Generating quick pass for user {user_id} ({len(conversations)} conversations)")
+        print(f"[streaming_import] Generating quick pass for user {user_id} ({conversation_count} conversations)")
         from .quick_pass import generate_quick_pass
-        quick_pass_result = generate_quick_pass(conversations)  # synchronous, raises on failure
+        quick_pass_result = await generate_quick_pass(sampled, presampled=True)  # streamed with timeout, raises on failure
 
         # Save to database (matching process-server.ts structure)
         soul_md = json.dumps(quick_pass_result.get("soul", {}))
@@ -387,10 +441,34 @@ async def process_import_streaming(user_id: str, storage_path: str, file_type: s
 
         print(f"[streaming_import] Quick pass complete for user {user_id}: ai_name={ai_name}, archetype={archetype}")
 
-        # Fire-and-forget full pass (chunks, facts, memory, v2 sections)
+        # Queue the full pass (chunks, facts, memory, v2 sections)
         # User can chat immediately with quick pass results while this runs
-        asyncio.create_task(trigger_full_pass(user_id, storage_path, len(conversations), file_type))
-        print(f"[streaming_import] Full pass triggered for user {user_id}")
+        job_id = get_job_queue().enqueue("full_pass", {
+            "user_id": user_id,
+            "storage_path": storage_path,
+            "conversation_count": conversation_count,
+            "file_type": file_type,
+        })
+        print(f"[streaming_import] Full pass queued for user {user_id}: job {job_id}")
+
+    except asyncio.CancelledError:
+        if cancel_requested():
+            await update_progress(user_id, 100, "Cancelled")
+            try:
+                async with httpx.AsyncClient() as client:
+                    await client.patch(
+                        f"{SUPABASE_URL}/rest/v1/user_profiles?user_id=eq.{user_id}",
+                        json={"import_status": "failed", "import_error": "Import cancelled"},
+                        headers={
+                            "apikey": SUPABASE_SERVICE_KEY,
+                            "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
+                            "Content-Type": "application/json",
+                            "Prefer": "return=minimal",
+                        },
+                    )
+            except Exception:
+                pass
+        raise
 
     except Exception as e:
         # Update status to failed with specific error message
@@ -418,6 +496,7 @@ async def process_import_streaming(user_id: str, storage_path: str, file_type: s
                 )
         except Exception as update_err:
             print(f"[streaming_import] ERROR: Failed to update error status for {user_id}: {update_err}")
+        raise  # Let the job queue record the failure
 
     finally:
         # Clean up temp files and any extraction directory
@@ -0,0 +1,221 @@
+"""
+Tests for the AIMD adaptive limiter and the parallel Titan embedding engine
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import embedding_generator
+from .adaptive_limiter import AdaptiveLimiter, SUCCESS, THROTTLED, ERROR
+from .cost_tracker import CostTracker
+
+
+class FakeThrottle(Exception):
+    """Shaped like botocore.exceptions.ClientError."""
+
+    def __init__(self, code="ThrottlingException"):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class TestAdaptiveLimiter:
+    """Tests for the AIMD controller."""
+
+    def test_additive_increase_up_to_ceiling(self):
+        async def run():
+            limiter = AdaptiveLimiter("t", initial_limit=2, max_limit=4)
+            for _ in range(50):
+                limiter.release(await limiter.acquire(), SUCCESS)
+            return limiter
+
+        limiter = asyncio.run(run())
+        assert limiter.limit == 4
+        assert limiter.stats()["successes"] == 50
+
+    def test_one_decrease_per_window(self):
+        async def run():
+            limiter = AdaptiveLimiter("t", initial_limit=8, max_limit=8)
+            epochs = [await limiter.acquire() for _ in range(8)]
+            for epoch in epochs:
+                limiter.release(epoch, THROTTLED)  # one burst -> halved once
+            after_burst = limiter.limit
+            limiter.release(await limiter.acquire(), THROTTLED)  # new window -> halved again
+            limiter.release(await limiter.acquire(), ERROR)  # errors don't move the limit
+            return after_burst, limiter
+
+        after_burst, limiter = asyncio.run(run())
+        assert after_burst == 4
+        assert limiter.limit == 2
+        assert limiter.stats()["throttles"] == 9 and limiter.stats()["errors"] == 1
+
+    def test_caps_in_flight_and_reports_effective_concurrency(self):
+        async def run():
+            limiter = AdaptiveLimiter("t", initial_limit=3, max_limit=3)
+
+            async def call():
+                epoch = await limiter.acquire()
+                await asyncio.sleep(0.02)
+                limiter.release(epoch, SUCCESS)
+
+            await asyncio.gather(*(call() for _ in range(12)))
+            return limiter.stats()
+
+        stats = asyncio.run(run())
+        assert stats["peak_in_flight"] == 3
+        assert 2.0 < stats["effective_concurrency"] <= 3.0
+        assert stats["throughput_per_s"] > 0
+
+    def test_stats_since_snapshot_cover_only_that_interval(self):
+        async def run():
+            limiter = AdaptiveLimiter("t", initial_limit=2, max_limit=2)
+            for _ in range(5):
+                limiter.release(await limiter.acquire(), SUCCESS)
+            limiter.release(await limiter.acquire(), THROTTLED)
+            await asyncio.sleep(0.2)  # idle gap before the next import
+            start = limiter.stats()
+            for _ in range(3):
+                epoch = await limiter.acquire()
+                await asyncio.sleep(0.02)
+                limiter.release(epoch, SUCCESS)
+            return limiter.stats(), limiter.stats(since=start)
+
+        lifetime, run_stats = asyncio.run(run())
+        assert (lifetime["successes"], lifetime["throttles"]) == (8, 1)
+        assert (run_stats["successes"], run_stats["throttles"]) == (3, 0)
+        assert run_stats["elapsed_s"] < 0.15 < lifetime["elapsed_s"]
+        assert run_stats["throughput_per_s"] > lifetime["throughput_per_s"]
+        assert 0.8 < run_stats["effective_concurrency"] <= 1.0
+
+    def test_retry_after_pauses_new_calls(self):
+        async def run():
+            limiter = AdaptiveLimiter("t", initial_limit=2, max_limit=2)
+            limiter.release(await limiter.acquire(), THROTTLED, retry_after=0.1)
+            start = time.monotonic()
+            limiter.release(await limiter.acquire(), SUCCESS)
+            return time.monotonic() - start
+
+        assert asyncio.run(run()) >= 0.09
+
+    def test_latency_gate_holds_limit_when_calls_slow_down(self):
+        async def run():
+            limiter = AdaptiveLimiter("t", initial_limit=2, max_limit=10, latency_tolerance=1.5)
+            for _ in range(4):
+                limiter.release(await limiter.acquire(), SUCCESS, latency=1.0)
+            grown = limiter.limit
+            for _ in range(20):
+                limiter.release(await limiter.acquire(), SUCCESS, latency=5.0)  # provider queueing
+            return grown, limiter
+
+        grown, limiter = asyncio.run(run())
+        assert grown == 3
+        # Slow successes don't grow the limit until they become the new normal
+        assert limiter.limit < 6
+        assert limiter.stats()["avg_latency_s"] > 1.0
+
+    def test_shared_across_event_loops(self):
+        limiter = AdaptiveLimiter("t", initial_limit=1, max_limit=1)
+        peak = []
+
+        async def call():
+            epoch = await limiter.acquire()
+            peak.append(limiter.in_flight)
+            await asyncio.sleep(0.01)
+            limiter.release(epoch, SUCCESS)
+
+        async def burst():
+            await asyncio.wait_for(asyncio.gather(*(call() for _ in range(5))), timeout=5)
+
+        threads = [threading.Thread(target=lambda: asyncio.run(burst())) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(peak) == 15 and max(peak) == 1
+
+
+class TestEmbedBatchAsync:
+    """Tests for the parallel Titan engine."""
+
+    def test_ordered_results_retries_throttles_and_records_stats(self, monkeypatch):
+        attempts = {}
+        lock = threading.Lock()
+
+        def embed_text(text, dimensions=768, cost_tracker=None):
+            time.sleep(0.01)
+            with lock:
+                attempts[text] = attempts.get(text, 0) + 1
+                first = attempts[text] == 1
+            if first and text.endswith("3"):
+                raise FakeThrottle()
+            if cost_tracker:
+                cost_tracker.record_embedding(len(text))
+            return [float(text.split()[-1])]
+
+        monkeypatch.setattr(embedding_generator, "embed_text", embed_text)
+        monkeypatch.setattr(embedding_generator.random, "random", lambda: 0.0)
+        monkeypatch.setattr(embedding_generator, "EMBED_MAX_ATTEMPTS", 3)
+        limiter = AdaptiveLimiter("titan-test", initial_limit=4, max_limit=8)
+        tracker = CostTracker()
+
+        texts = [f"text {i}" for i in range(20)]
+        result = asyncio.run(embedding_generator.embed_batch_async(texts, cost_tracker=tracker, limiter=limiter))
+
+        assert result == [[float(i)] for i in range(20)]
+        assert attempts["text 3"] == 2 and attempts["text 13"] == 2
+        summary = tracker.get_summary()
+        assert summary["embedding_throttle_count"] == 2
+        assert summary["embedding_call_count"] == 20
+        assert summary["embedding_throughput_per_s"] > 0
+        assert summary["embedding_effective_concurrency"] > 0
+        assert limiter.stats()["peak_in_flight"] > 1
+
+    def test_timeouts_count_as_throttles_and_hard_errors_fail_fast(self, monkeypatch):
+        def embed_text(text, dimensions=768, cost_tracker=None):
+            if text == "slow":
+                time.sleep(0.2)
+            if text == "bad":
+                raise FakeThrottle("ValidationException")
+            return [1.0]
+
+        monkeypatch.setattr(embedding_generator, "embed_text", embed_text)
+        monkeypatch.setattr(embedding_generator, "EMBED_CALL_TIMEOUT_SECONDS", 0.05)
+        monkeypatch.setattr(embedding_generator, "EMBED_MAX_ATTEMPTS", 1)
+        limiter = AdaptiveLimiter("titan-test", initial_limit=4, max_limit=4)
+
+        async def run(texts):
+            try:
+                await embedding_generator.embed_batch_async(texts, limiter=limiter)
+            except Exception as e:
+                return e
+
+        timed_out = asyncio.run(run(["ok", "slow"]))
+        assert "timed out" in str(timed_out)
+        # The timed-out call keeps its slot until its thread returns
+        assert limiter.stats()["in_flight"] == 1
+        deadline = time.monotonic() + 5
+        while limiter.stats()["in_flight"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert limiter.stats()["throttles"] == 1 and limiter.limit == 2
+
+        invalid = asyncio.run(run(["bad"]))
+        assert isinstance(invalid, FakeThrottle)
+        assert limiter.limit == 2
+
+    def test_executor_queueing_is_not_a_timeout(self, monkeypatch):
+        def embed_text(text, dimensions=768, cost_tracker=None):
+            time.sleep(0.1)
+            return [1.0]
+
+        # One Titan thread for two slots: the second call waits 0.1s for the thread
+        monkeypatch.setattr(embedding_generator, "embed_text", embed_text)
+        monkeypatch.setattr(embedding_generator, "_embed_executor", ThreadPoolExecutor(max_workers=1))
+        monkeypatch.setattr(embedding_generator, "EMBED_CALL_TIMEOUT_SECONDS", 0.15)
+        monkeypatch.setattr(embedding_generator, "EMBED_MAX_ATTEMPTS", 1)
+        limiter = AdaptiveLimiter("titan-test", initial_limit=2, max_limit=2)
+
+        result = asyncio.run(embedding_generator.embed_batch_async(["a", "b"], limiter=limiter))
+
+        assert result == [[1.0], [1.0]]
+        assert limiter.stats()["throttles"] == 0 and limiter.limit == 2
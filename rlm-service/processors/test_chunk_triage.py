@@ -0,0 +1,116 @@
+"""
+Tests for pre-extraction chunk triage
+"""
+
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+
+import pytest
+
+from . import chunk_triage, fact_extractor, token_diet
+from .chunk_triage import TriageModel, chunk_features, evaluate_triage, fit_triage_model
+from .cost_tracker import CostTracker
+
+PERSONAL = (
+    "User: I'm building a meal planning app for my startup and I prefer TypeScript with Supabase.\n"
+    "Assistant: Sounds good, here is a schema outline."
+)
+CODE = "User: fix this error\nAssistant: ```python\ndef f(x):\n    return x + 1\n```"
+LOGS = (
+    "User: why?\n"
+    "Assistant: 2024-05-01 10:00:01 ERROR worker crashed\n"
+    "2024-05-01 10:00:02 ERROR Traceback (most recent call last)\n"
+    'File "app.py", line 10'
+)
+TRANSLATE = "User: translate to spanish: good morning\nAssistant: Buenos días"
+
+
+class TestTriageModel:
+    """Tests for features and scoring."""
+
+    def test_personal_chunk_outscores_code_logs_and_translation(self):
+        model = TriageModel()
+        personal = model.score(PERSONAL)
+        assert personal >= chunk_triage.TRIAGE_THRESHOLD
+        for low in (CODE, LOGS, TRANSLATE):
+            assert model.score(low) < chunk_triage.TRIAGE_THRESHOLD < personal
+
+    def test_features_split_user_text_from_assistant_text(self):
+        features = chunk_features("User: my dog\nAssistant: I love dogs, my favorite animal")
+        assert features["fact_cues"] > 0  # "my dog" in the user turn
+        assert chunk_features("User: ok\nAssistant: I love my favorite dog")["fact_cues"] == 0
+
+    def test_fit_learns_labels_and_round_trips(self, tmp_path):
+        contents = [PERSONAL, CODE, LOGS, TRANSLATE] * 5
+        labels = [1, 0, 0, 0] * 5
+
+        model = fit_triage_model(contents, labels)
+        path = tmp_path / "triage.json"
+        model.save(str(path))
+        loaded = TriageModel.load(str(path))
+
+        assert loaded.score(PERSONAL) > 0.5 > loaded.score(CODE)
+        assert evaluate_triage(contents, [3, 0, 0, 0] * 5, 0.5, loaded) == {
+            "chunks": 20, "low_value": 15, "fact_recall": 1.0, "fact_bearing_recall": 1.0,
+        }
+
+
+class EchoHaiku:
+    """Echoes each packed conversation back as a preference."""
+
+    def __init__(self):
+        self.prompts = []
+        self.messages = self
+
+    async def create(self, **kwargs):
+        prompt = kwargs["messages"][0]["content"]
+        self.prompts.append(prompt)
+        packed = re.findall(r'<conversation id="(\d+)">\n(.*?)\n</conversation>', prompt, re.S)
+        if packed:
+            body = {i: {"preferences": [text]} for i, text in packed}
+        else:
+            body = {"preferences": [re.search(r"<conversation>\n(.*?)\n</conversation>", prompt, re.S).group(1)]}
+        return SimpleNamespace(content=[SimpleNamespace(text=json.dumps(body))],
+                               usage=SimpleNamespace(input_tokens=10, output_tokens=10))
+
+
+class TestTriagedExtraction:
+    """Tests for triage lanes in extract_facts_stream."""
+
+    def chunks(self):
+        return [{"content": text, "token_count": 1500} for text in [PERSONAL, CODE, PERSONAL, LOGS, TRANSLATE, CODE]]
+
+    @pytest.fixture(autouse=True)
+    def triage_on(self, monkeypatch):
+        monkeypatch.setattr(chunk_triage, "TRIAGE_THRESHOLD", 0.2)
+        monkeypatch.setattr(chunk_triage, "TRIAGE_PACK_TOKEN_BUDGET", 12000)
+        monkeypatch.setattr(chunk_triage, "_triage_model", TriageModel())
+        monkeypatch.setattr(token_diet, "TOKEN_DIET_STAGES", [])  # echo full chunk text
+
+    def test_pack_mode_shares_requests_for_low_value_chunks(self, monkeypatch):
+        monkeypatch.setattr(chunk_triage, "TRIAGE_MODE", "pack")
+        client, tracker = EchoHaiku(), CostTracker()
+
+        results = asyncio.run(fact_extractor.extract_facts_stream(
+            self.chunks(), client, cost_tracker=tracker, pack_token_budget=2000))
+
+        assert [r["preferences"] for r in results] == [[c["content"]] for c in self.chunks()]
+        assert len(client.prompts) == 3  # personal chunks alone (1500 + 1500 > 2000), 4 low-value ones together
+        summary = tracker.get_summary()
+        assert summary["chunks_low_value"] == 4 and summary["chunks_skipped"] == 0
+        assert summary["triage_calls_saved"] == 6 - 3
+
+    def test_skip_mode_reports_empty_facts_without_calls(self, monkeypatch):
+        monkeypatch.setattr(chunk_triage, "TRIAGE_MODE", "skip")
+        client, tracker, reported = EchoHaiku(), CostTracker(), {}
+
+        results = asyncio.run(fact_extractor.extract_facts_stream(
+            self.chunks(), client, cost_tracker=tracker, pack_token_budget=0,
+            on_result=lambda i, facts: reported.setdefault(i, facts)))
+
+        assert len(client.prompts) == 2
+        assert [bool(r["preferences"]) for r in results] == [True, False, True, False, False, False]
+        assert sorted(reported) == list(range(6))
+        assert tracker.get_summary()["chunks_skipped"] == 4
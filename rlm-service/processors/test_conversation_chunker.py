@@ -0,0 +1,200 @@
+"""
+Tests for conversation chunking
+
+The golden file pins chunk boundaries produced by the original
+find()-based splitter; the single-scan splitter must reproduce them
+exactly.
+"""
+
+import hashlib
+import json
+import os
+import random
+
+from . import token_counter
+from .conversation_chunker import ContentDeduper, chunk_conversations, content_hash, split_sentences
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), "testdata", "chunker_golden.json")
+CONFIGS = [(2000, 200), (300, 50)]
+
+WORDS = ["the", "user", "asked", "about", "TypeScript", "deploy", "e.g.", "v2.1", "naïve", "café", "日本語",
+         "config", "why", "really", "ok", "data", "...", "?!", "3.14", "https://example.com/a.b"]
+ENDINGS = [". ", "? ", "! ", "\n", ".\n", "... ", "?! ", " ", ", ", "!", ".", "\n\n"]
+
+
+def golden_conversations():
+    """Deterministic conversations: short, long, boundary-free blobs and mixed punctuation."""
+    rng = random.Random(44)
+    conversations = []
+    for c in range(40):
+        messages = []
+        for m in range(rng.choice([1, 2, 4, 10, 30])):
+            if rng.random() < 0.05:
+                content = "x" * rng.randint(5000, 20000)  # no sentence boundary at all
+            else:
+                content = "".join(
+                    " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 25))) + rng.choice(ENDINGS)
+                    for _ in range(rng.randint(1, 60))
+                )
+            messages.append({"role": "user" if m % 2 == 0 else "assistant", "content": content})
+        conversations.append({"id": f"conv-{c}", "title": f"Conversation {c}", "messages": messages,
+                              "created_at": "2025-01-01T00:00:00"})
+    return conversations
+
+
+def chunk_signature(target_tokens, overlap_tokens):
+    chunks = chunk_conversations(golden_conversations(), target_tokens=target_tokens, overlap_tokens=overlap_tokens)
+    return [
+        [c["conversation_id"], c["chunk_index"], c["total_chunks"], c["token_count"], len(c["content"]),
+         hashlib.sha256(c["content"].encode()).hexdigest()[:16]]
+        for c in chunks
+    ]
+
+
+class TestChunkConversations:
+    """Tests for chunk_conversations."""
+
+    def test_matches_golden_boundaries(self):
+        with open(GOLDEN_PATH) as f:
+            golden = json.load(f)
+        for target_tokens, overlap_tokens in CONFIGS:
+            assert chunk_signature(target_tokens, overlap_tokens) == golden[f"{target_tokens}/{overlap_tokens}"]
+
+    def test_boundaries_ignore_token_calibration(self, monkeypatch):
+        # A retry in a fresh process (scale 1.0) must re-create the same chunks
+        # as a process whose counter was calibrated by earlier imports
+        counter = token_counter.get_token_counter()
+        for scale in (0.5, 2.0):
+            monkeypatch.setattr(counter, "scale", scale)
+            for target_tokens, overlap_tokens in CONFIGS:
+                monkeypatch.setattr(counter, "scale", 1.0)
+                expected = chunk_signature(target_tokens, overlap_tokens)
+                monkeypatch.setattr(counter, "scale", scale)
+                assert chunk_signature(target_tokens, overlap_tokens) == expected
+
+    def test_sentences_are_contiguous_slices(self):
+        text = "Hi. How are you?! Fine\nok... e.g. this.\n\nEnd"
+        sentences = split_sentences(text)
+        assert "".join(sentences) == text
+        assert sentences == ["Hi.", " How are you?!", " Fine\n", "ok...", " e.g.", " this.\n", "\n", "End"]
+
+
+class TestChunkTiers:
+    """Tests for micro/medium/macro tiers."""
+
+    def conversation(self, sentences):
+        return {"id": "c1", "title": "Deploys", "created_at": "2025-01-01T00:00:00", "messages": [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"Message {i} opens here. " + "More detail follows. " * sentences}
+            for i in range(12)
+        ]}
+
+    def test_one_pass_emits_all_tiers(self):
+        chunks = chunk_conversations([self.conversation(60)], tiers=("micro", "medium", "macro"))
+        by_tier = {tier: [c for c in chunks if c["chunk_tier"] == tier] for tier in ("micro", "medium", "macro")}
+
+        assert [c["content"] for c in by_tier["medium"]] == [c["content"] for c in chunk_conversations([self.conversation(60)])]
+        assert len(by_tier["micro"]) > len(by_tier["medium"]) > 1
+        assert all(c["token_count"] <= 400 for c in by_tier["micro"])
+        assert [c["chunk_index"] for c in by_tier["micro"]] == list(range(len(by_tier["micro"])))
+
+        (overview,) = by_tier["macro"]
+        assert overview["content"].startswith("# Deploys\n[Overview of a 12-message conversation]")
+        assert "User: Message 0 opens here." in overview["content"]
+        assert overview["token_count"] <= 1000
+
+    def test_small_conversations_are_not_duplicated_across_tiers(self):
+        chunks = chunk_conversations([self.conversation(0)], tiers=("micro", "medium", "macro"))
+        assert [c["chunk_tier"] for c in chunks] == ["medium"]
+
+    def test_tier_plan_by_budget(self):
+        from .conversation_chunker import chunk_tier_plan
+        all_tiers = ("micro", "medium", "macro")
+        # Smallest chunks first, as many as fit; medium last for older imports
+        assert chunk_tier_plan(4000, 8, all_tiers) == [("micro", 8), ("macro", 4), ("medium", 2)]
+        assert chunk_tier_plan(16000, 8, all_tiers) == [("micro", 8), ("macro", 8), ("medium", 8)]
+        assert chunk_tier_plan(1500, 8, all_tiers) == [("micro", 5), ("medium", 1)]
+        assert chunk_tier_plan(0, 8, all_tiers) == [("micro", 1), ("medium", 1)]
+        # Only stored tiers are searched
+        assert chunk_tier_plan(4000, 8, ("medium",)) == [("medium", 2)]
+
+    def search_for_request(self, monkeypatch, stored, **request):
+        """Walk the /query budget path against a store holding `stored` chunks per tier."""
+        import asyncio
+        import main
+        from .conversation_chunker import TIER_TOKENS
+
+        searches = []
+
+        async def search_chunks_semantic(user_id, query, match_count=8, threshold=0.3, tier=None):
+            searches.append((tier, match_count))
+            content = "Detail about the deploy. " * (TIER_TOKENS[tier] // 5)
+            return [{"title": "Deploys", "similarity": 0.8, "content": content}
+                    for _ in range(min(match_count, stored.get(tier, 0)))]
+
+        monkeypatch.setattr(main, "search_chunks_semantic", search_chunks_semantic)
+        budget = main.query_context_budget(main.QueryRequest(user_id="u1", **request))
+        chunks = asyncio.run(main.search_chunks_for_budget("u1", request["message"], budget, max_matches=8))
+        return budget, searches, main.format_chunk_context(chunks, budget)
+
+    def test_default_query_injects_less_text(self, monkeypatch):
+        from .token_counter import count_tokens
+        stored = {"micro": 50, "medium": 20, "macro": 5}
+
+        budget, searches, context = self.search_for_request(
+            monkeypatch, stored, message="What did I decide about the database?")
+
+        assert budget == 4000 and searches == [("micro", 8)]
+        # Before tiers: 8 medium chunks cut to 2000 chars each
+        medium = "Detail about the deploy. " * 400
+        baseline = "".join(f"\n---\n**Deploys** (relevance: 0.80)\n{medium[:2000]}" for _ in range(8))
+        assert count_tokens(context) < 0.8 * count_tokens(baseline)
+        assert context.count("**Deploys**") == 8
+
+    def test_query_falls_back_to_larger_tiers(self, monkeypatch):
+        # Import from before micro/macro existed: only medium chunks are stored
+        _, searches, context = self.search_for_request(monkeypatch, {"medium": 20}, message="And the deploy?")
+        assert searches == [("micro", 8), ("macro", 4), ("medium", 2)]
+        assert context.count("**Deploys**") == 2
+
+        # A long profile leaves less room for retrieved context
+        budget, searches, _ = self.search_for_request(
+            monkeypatch, {"micro": 50}, message="And the deploy?", soulprint_text="Profile detail. " * 4500)
+        assert 0 < budget < 4000 and searches == [("micro", min(8, budget // 300))]
+
+
+class TestContentDedup:
+    """Tests for cross-conversation dedup."""
+
+    DOC = "Quarterly report. " * 60  # pasted into several conversations
+
+    def conversations(self):
+        return [
+            {"id": "a", "title": "Review", "messages": [{"role": "user", "content": "Summarize:\n" + self.DOC}]},
+            {"id": "b", "title": "Again", "messages": [
+                {"role": "user", "content": "Summarize:   \n" + self.DOC.replace(". ", ".  ")},  # whitespace differs
+                {"role": "assistant", "content": "Short summary."},
+            ]},
+            {"id": "c", "title": "Review", "messages": [{"role": "user", "content": "Summarize:\n" + self.DOC}]},
+        ]
+
+    def test_repeats_become_references(self):
+        deduper = ContentDeduper()
+        chunks = chunk_conversations(self.conversations(), deduper=deduper)
+        a, b, c = chunks
+
+        assert a["duplicate_of"] is None and a["content"].count("Quarterly report.") == 60
+        # Long repeated message replaced inside an otherwise new chunk
+        assert b["duplicate_of"] is None and "Quarterly" not in b["content"]
+        copy = self.conversations()[1]["messages"][0]["content"]
+        assert f'User: [Repeated content ({len(copy)} chars), first seen in "Review"]' in b["content"]
+        # Whole chunk repeated: reference to the first copy
+        assert c["duplicate_of"] == a["content_hash"] == content_hash(a["content"])
+        assert c["content"] == "[Same content as chunk 0 of conversation a]"
+
+        stats = deduper.stats()
+        assert (stats["chunks"], stats["duplicate_chunks"], stats["duplicate_messages"]) == (3, 1, 2)
+        assert stats["dedup_ratio"] == 1 / 3
+
+    def test_without_deduper_nothing_changes(self):
+        chunks = chunk_conversations(self.conversations())
+        assert all("duplicate_of" not in c and "Quarterly" in c["content"] for c in chunks)
@@ -0,0 +1,170 @@
+"""
+Tests for incremental re-import
+
+Verifies conversation fingerprints, plan_import, and that a second
+run_full_pass_pipeline on an edited export only chunks and extracts new or
+changed conversations, reusing stored facts for the rest.
+"""
+
+import asyncio
+
+import main
+from . import (
+    conversation_index, embedding_generator, fact_extractor, full_pass, memory_generator, pipeline_checkpoint,
+    token_diet, v2_regenerator,
+)
+from .conversation_index import conversation_fingerprint, fallback_conversation_id, in_filter, plan_import
+
+
+def _messages(text):
+    return [{"role": "user", "content": text}, {"role": "assistant", "content": "Noted."}]
+
+
+class TestPlanImport:
+    """Tests for fingerprints and the import plan."""
+
+    def test_fingerprint_tracks_content_not_whitespace(self):
+        base = conversation_fingerprint("Trip", _messages("I live in Lisbon."))
+        assert conversation_fingerprint("Trip", _messages("I live in  Lisbon. ")) == base
+        assert conversation_fingerprint("Trip", _messages("I live in Porto.")) != base
+        assert conversation_fingerprint("Move", _messages("I live in Lisbon.")) != base
+
+    def test_empty_index_is_full_import(self):
+        plan = plan_import({"a": "1", "b": "2"}, {})
+        assert plan == {"full": True, "process": ["a", "b"], "unchanged": [], "deleted": []}
+
+    def test_only_new_and_changed_are_processed(self):
+        index = {"a": {"fingerprint": "1"}, "b": {"fingerprint": "2"}, "gone": {"fingerprint": "3"}}
+        plan = plan_import({"a": "1", "b": "2-edited", "new": "4"}, index)
+        assert plan == {"full": False, "process": ["b", "new"], "unchanged": ["a"], "deleted": ["gone"]}
+
+    def test_dependents_of_changed_or_deleted_are_reprocessed(self):
+        index = {
+            "a": {"fingerprint": "1"},
+            "b": {"fingerprint": "2", "depends_on": ["a"]},
+            "c": {"fingerprint": "3", "depends_on": ["gone"]},
+            "d": {"fingerprint": "4", "depends_on": ["b"]},
+            "gone": {"fingerprint": "5"},
+        }
+        plan = plan_import({"a": "1-edited", "b": "2", "c": "3", "d": "4"}, index)
+        assert plan["process"] == ["a", "b", "c"]
+        assert plan["unchanged"] == ["d"]
+        assert plan["deleted"] == ["gone"]
+
+    def test_in_filter_quotes_ids(self):
+        assert in_filter(['a,b', 'say "hi"']) == 'in.("a,b","say \\"hi\\"")'
+
+
+class TestIncrementalImport:
+    """A re-import only processes conversations that changed since the last one."""
+
+    def fake_pipeline(self, tmp_path, monkeypatch):
+        """Run full passes against in-memory storage; returns (export, stored_index, calls)."""
+        monkeypatch.setattr(pipeline_checkpoint, "CHECKPOINT_DB_PATH", str(tmp_path / "cp.db"))
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+        stored_index = {}
+        export = {"conversations": []}
+        calls = {"extract": [], "delete_all": 0, "delete_conversations": []}
+
+        async def download_conversations(storage_path, file_type="json"):
+            return [dict(c) for c in export["conversations"]]
+
+        async def load_index(user_id):
+            return {cid: dict(row) for cid, row in stored_index.items()}
+
+        async def save_index(user_id, fingerprints, facts, depends_on, deleted):
+            for cid, fingerprint in fingerprints.items():
+                stored_index[cid] = {"fingerprint": fingerprint, "facts": facts.get(cid, {}),
+                                     "depends_on": depends_on.get(cid, [])}
+            for cid in deleted:
+                stored_index.pop(cid, None)
+
+        async def noop(*args, **kwargs):
+            return None
+
+        async def delete_user_chunks(user_id):
+            calls["delete_all"] += 1
+
+        async def delete_conversation_chunks(user_id, conversation_ids):
+            calls["delete_conversations"].append(sorted(conversation_ids))
+
+        async def extract(chunk_content, client, cost_tracker=None):
+            calls["extract"].append(chunk_content)
+            return {"preferences": [chunk_content.split("\n")[0]], "projects": [], "dates": [], "beliefs": [],
+                    "decisions": []}
+
+        async def generate_memory(facts, client, cost_tracker=None):
+            return "## Memory\n" + "\n".join(sorted(facts["preferences"]))
+
+        monkeypatch.setattr(main, "download_conversations", download_conversations)
+        monkeypatch.setattr(main, "update_user_profile", noop)
+        monkeypatch.setattr(conversation_index, "load_conversation_index", load_index)
+        monkeypatch.setattr(conversation_index, "save_conversation_index", save_index)
+        monkeypatch.setattr(token_diet, "TOKEN_DIET_STAGES", [])
+        monkeypatch.setattr(full_pass, "delete_user_chunks", delete_user_chunks)
+        monkeypatch.setattr(full_pass, "delete_conversation_chunks", delete_conversation_chunks)
+        monkeypatch.setattr(full_pass, "save_chunks_batch", noop)
+        monkeypatch.setattr(embedding_generator, "embed_text", lambda text, dimensions=768, cost_tracker=None: [0.1])
+        monkeypatch.setattr(fact_extractor, "extract_facts_from_chunk", extract)
+        monkeypatch.setattr(fact_extractor, "FACT_PACK_TOKEN_BUDGET", 0)
+        monkeypatch.setattr(memory_generator, "generate_memory_section", generate_memory)
+        monkeypatch.setattr(v2_regenerator, "regenerate_sections_v2", noop)
+        return export, stored_index, calls
+
+    def test_second_import_processes_only_changes(self, tmp_path, monkeypatch):
+        export, stored_index, calls = self.fake_pipeline(tmp_path, monkeypatch)
+
+        def conversation(cid, text):
+            return {"id": cid, "title": cid.upper(), "createdAt": "2025-01-01T00:00:00+00:00", "messages": _messages(text)}
+
+        # First import: no index yet, everything is processed and replaced
+        export["conversations"] = [conversation("a", "I am building a boat."),
+                                   conversation("b", "I am learning Go."),
+                                   conversation("c", "My dog is called Rex.")]
+        first = asyncio.run(full_pass.run_full_pass_pipeline("u1", "raw-1.json"))
+        assert calls["delete_all"] == 1 and calls["delete_conversations"] == []
+        assert len(calls["extract"]) == 3
+        assert set(stored_index) == {"a", "b", "c"}
+        assert "# B" in first
+
+        # Second import: a unchanged, b edited, c deleted, d new
+        calls["extract"].clear()
+        export["conversations"] = [conversation("a", "I am building a boat."),
+                                   conversation("b", "I am learning Rust now."),
+                                   conversation("d", "We are moving to Lisbon.")]
+        second = asyncio.run(full_pass.run_full_pass_pipeline("u1", "raw-2.json"))
+        assert calls["delete_all"] == 1
+        assert calls["delete_conversations"] == [["b", "c", "d"]]
+        assert sorted(content.split("\n")[0] for content in calls["extract"]) == ["# B", "# D"]
+        assert set(stored_index) == {"a", "b", "d"}
+        # Facts of the unchanged conversation are reused, not re-extracted
+        assert "# A" in second and "# B" in second and "# D" in second
+        assert "# C" not in second
+
+    def test_inserting_a_conversation_without_ids_keeps_the_others(self, tmp_path, monkeypatch):
+        export, stored_index, calls = self.fake_pipeline(tmp_path, monkeypatch)
+
+        def conversation(title, text, created):
+            return {"title": title, "create_time": created, "messages": _messages(text)}
+
+        boat = conversation("Boat", "I am building a boat.", 1735689600)
+        go = conversation("Go", "I am learning Go.", 1735776000)
+        export["conversations"] = [boat, go]
+        asyncio.run(full_pass.run_full_pass_pipeline("u1", "raw-1.json"))
+        first_ids = set(stored_index)
+
+        # Re-export with a new conversation in front of the others
+        calls["extract"].clear()
+        export["conversations"] = [conversation("Lisbon", "We are moving to Lisbon.", 1735862400), boat, go]
+        asyncio.run(full_pass.run_full_pass_pipeline("u1", "raw-2.json"))
+
+        assert first_ids < set(stored_index) and len(stored_index) == 3
+        assert [content.split("\n")[0] for content in calls["extract"]] == ["# Lisbon"]
+        assert calls["delete_conversations"][-1] == sorted(set(stored_index) - first_ids)
+
+    def test_fallback_ids_are_content_derived(self):
+        conversation = {"title": "Trip", "create_time": 1735689600, "messages": []}
+        base = fallback_conversation_id(conversation, _messages("I live in Lisbon."))
+        assert fallback_conversation_id(dict(conversation), _messages("I live in Lisbon.")) == base
+        assert fallback_conversation_id(conversation, _messages("I live in Porto.")) != base
+        assert fallback_conversation_id(dict(conversation, create_time=1735689601), _messages("I live in Lisbon.")) != base
@@ -0,0 +1,97 @@
+"""
+Tests for ConversationStore
+
+Verifies that the array-backed views read exactly like the parsed
+conversation dicts they replace, including through the processors
+that consume them.
+"""
+
+from .conversation_store import ConversationStore
+from .conversation_chunker import chunk_conversations
+from .sample import sample_conversations, format_conversations_for_prompt
+from .v2_regenerator import sample_conversations_for_v2, format_conversations_for_prompt as format_for_v2
+
+
+def _make_conversations(count=12):
+    conversations = []
+    for i in range(count):
+        messages = []
+        for j in range(2 + i % 7):
+            role = "user" if j % 2 == 0 else "assistant"
+            messages.append({
+                "role": role,
+                "content": f"Message {j} of conversation {i}. Café ünïcode ✓ " * (1 + (i * j) % 40),
+                "create_time": 1700000000.0 + i * 100 + j,
+            })
+        conversations.append({
+            "id": f"conv-{i}",
+            "title": f"Conversation {i}",
+            "createdAt": f"2025-0{1 + i % 9}-1{i % 10}T12:00:00+00:00",
+            "messages": messages,
+        })
+    return conversations
+
+
+class TestConversationStore:
+    """Tests for view fidelity and round-tripping."""
+
+    def test_views_match_source_dicts(self):
+        conversations = _make_conversations()
+        store = ConversationStore.from_conversations(conversations)
+
+        assert len(store) == len(conversations)
+        assert store.message_count == sum(len(c["messages"]) for c in conversations)
+        assert store.to_dicts() == conversations
+
+        view = store[3]
+        assert view["id"] == "conv-3"
+        assert view.get("title", "Untitled") == "Conversation 3"
+        assert "messages" in view
+        assert len(view["messages"]) == 5
+        assert view["messages"][-1]["content"] == conversations[3]["messages"][-1]["content"]
+
+    def test_missing_keys_behave_like_dicts(self):
+        store = ConversationStore.from_conversations([
+            {"title": None, "messages": [{"role": "user", "content": "hi"}]},
+        ])
+        view = store[0]
+
+        assert "id" not in view
+        assert view.get("id", "fallback") == "fallback"
+        assert view.get("title", "Untitled") is None
+        assert view.get("created_at") is None
+        assert view["messages"][0]["create_time"] is None
+
+    def test_max_messages_and_slicing(self):
+        conversations = _make_conversations()
+        store = ConversationStore.from_conversations(conversations, max_messages=3)
+
+        assert all(len(v["messages"]) <= 3 for v in store)
+        assert [m.to_dict() for m in store[6]["messages"][1:]] == conversations[6]["messages"][1:3]
+        assert [v["id"] for v in store[:2]] == ["conv-0", "conv-1"]
+
+    def test_processors_produce_identical_output(self):
+        conversations = _make_conversations(30)
+        store = ConversationStore.from_conversations(conversations)
+
+        sampled_dicts = sample_conversations(conversations, target_tokens=2000)
+        sampled_views = sample_conversations(store, target_tokens=2000)
+        assert [c["id"] for c in sampled_views] == [c["id"] for c in sampled_dicts]
+        assert format_conversations_for_prompt(sampled_views) == format_conversations_for_prompt(sampled_dicts)
+
+        def without_timestamps(chunks):
+            # created_at falls back to utcnow() for parsed conversations
+            return [{k: v for k, v in c.items() if k != "created_at"} for c in chunks]
+
+        assert without_timestamps(chunk_conversations(store, target_tokens=200)) == \
+            without_timestamps(chunk_conversations(conversations, target_tokens=200))
+
+        v2_dicts = sample_conversations_for_v2(conversations, target_count=10)
+        v2_views = sample_conversations_for_v2(store, target_count=10)
+        assert format_for_v2(v2_views) == format_for_v2(v2_dicts)
+        assert format_for_v2(v2_views) != ""
+
+    def test_store_is_smaller_than_dicts(self):
+        store = ConversationStore.from_conversations(_make_conversations(50))
+        assert store.nbytes() > 0
+        assert store.nbytes() < len(store._text) * 2
@@ -0,0 +1,107 @@
+"""
+Tests for the persistent embedding cache
+"""
+
+import asyncio
+
+from . import embedding_cache, embedding_generator
+from .adaptive_limiter import AdaptiveLimiter
+from .cost_tracker import CostTracker
+from .embedding_cache import EmbeddingCache
+
+MODEL = embedding_generator.TITAN_MODEL_ID
+
+
+class TestEmbeddingCache:
+    """Tests for EmbeddingCache."""
+
+    def test_round_trip_as_float32(self, tmp_path):
+        cache = EmbeddingCache(str(tmp_path / "e.db"))
+        cache.put(MODEL, 3, "hello", [0.5, -0.25, 0.1])
+
+        vector = cache.get(MODEL, 3, "hello")
+        assert vector[:2] == [0.5, -0.25]
+        assert abs(vector[2] - 0.1) < 1e-7
+        assert cache.get(MODEL, 3, "other") is None
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_key_includes_model_and_dimensions(self, tmp_path):
+        cache = EmbeddingCache(str(tmp_path / "e.db"))
+        cache.put(MODEL, 3, "hello", [1.0, 2.0, 3.0])
+
+        assert cache.get(MODEL, 256, "hello") is None
+        assert cache.get("other-model", 3, "hello") is None
+
+    def test_get_many_preserves_order_and_persists(self, tmp_path):
+        path = str(tmp_path / "e.db")
+        cache = EmbeddingCache(path)
+        cache.put(MODEL, 1, "b", [2.0])
+        cache.put(MODEL, 1, "d", [4.0])
+        cache.close()
+
+        reopened = EmbeddingCache(path)
+        assert reopened.get_many(MODEL, 1, ["a", "b", "c", "d", "b"]) == [None, [2.0], None, [4.0], [2.0]]
+        assert reopened.total_bytes > 0
+
+    def test_lru_eviction_keeps_recently_used(self, tmp_path):
+        entry = 4 * 4 + 64  # 4 float32 + hex key
+        cache = EmbeddingCache(str(tmp_path / "e.db"), max_bytes=entry * 3)
+        cache.put(MODEL, 4, "old", [0.0] * 4)
+        cache.put(MODEL, 4, "used", [1.0] * 4)
+        cache.put(MODEL, 4, "new", [2.0] * 4)
+        cache.get(MODEL, 4, "used")  # bump recency past "new"
+        cache.put(MODEL, 4, "newest", [3.0] * 4)  # over bound -> evict down to 90%
+
+        assert cache.total_bytes <= entry * 3 * 0.9
+        assert cache.get_many(MODEL, 4, ["old", "new"]) == [None, None]
+        assert cache.get(MODEL, 4, "used") == [1.0] * 4
+        assert cache.get(MODEL, 4, "newest") == [3.0] * 4
+
+
+class TestCachedEmbedding:
+    """Tests for the cache in front of Titan."""
+
+    def test_embed_batch_async_only_calls_titan_for_misses(self, tmp_path, monkeypatch):
+        cache = EmbeddingCache(str(tmp_path / "e.db"))
+        cache.put(MODEL, 768, "cached", [9.0])
+        called = []
+
+        def embed_text(text, dimensions=768, cost_tracker=None):
+            called.append(text)
+            return [1.0]
+
+        monkeypatch.setattr(embedding_cache, "_embedding_cache", cache)
+        monkeypatch.setattr(embedding_generator, "embed_text", embed_text)
+        tracker = CostTracker()
+        limiter = AdaptiveLimiter("titan-test", initial_limit=2, max_limit=2)
+
+        result = asyncio.run(embedding_generator.embed_batch_async(
+            ["cached", "fresh", "cached"], cost_tracker=tracker, limiter=limiter))
+
+        assert result == [[9.0], [1.0], [9.0]]
+        assert called == ["fresh"]
+        assert tracker.get_summary()["embedding_cache_hits"] == 2
+
+    def test_embed_text_stores_titan_result(self, tmp_path, monkeypatch):
+        cache = EmbeddingCache(str(tmp_path / "e.db"))
+        calls = []
+
+        class FakeBody:
+            def read(self):
+                return b'{"embedding": [0.5, 0.75]}'
+
+        class FakeBedrock:
+            def invoke_model(self, **kwargs):
+                calls.append(kwargs)
+                return {"body": FakeBody()}
+
+        monkeypatch.setattr(embedding_cache, "_embedding_cache", cache)
+        monkeypatch.setattr(embedding_generator, "get_bedrock_client", lambda: FakeBedrock())
+
+        assert embedding_generator.embed_text("hi", dimensions=2) == [0.5, 0.75]
+        assert embedding_generator.embed_text("hi", dimensions=2) == [0.5, 0.75]
+        assert len(calls) == 1
+
+    def test_disabled_cache(self, monkeypatch):
+        monkeypatch.setattr(embedding_cache, "EMBED_CACHE_PATH", "")
+        assert embedding_cache.get_embedding_cache() is None
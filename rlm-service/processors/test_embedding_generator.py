@@ -0,0 +1,117 @@
+"""
+Tests for writing chunk embeddings back to Supabase
+"""
+
+import asyncio
+import json
+
+import httpx
+
+from . import embedding_cache, embedding_generator
+
+
+def patch_supabase(monkeypatch, handler):
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(embedding_generator, "SUPABASE_URL", "http://supabase.local")
+    monkeypatch.setattr(embedding_generator, "SUPABASE_SERVICE_KEY", "key")
+    monkeypatch.setattr(embedding_generator.httpx, "AsyncClient",
+                        lambda *a, **kw: real_client(transport=httpx.MockTransport(handler)))
+
+
+class TestBulkEmbeddingUpdate:
+    """Tests for update_chunk_embeddings_bulk."""
+
+    def test_vector_literal_is_compact_pgvector_text(self):
+        assert embedding_generator.vector_literal([0.5, -0.25, 1.0]) == "[0.5,-0.25,1]"
+        assert embedding_generator.vector_literal([0.012345678901234]) == "[0.01234568]"
+
+    def test_one_rpc_call_per_batch(self, monkeypatch):
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append((request.url.path, json.loads(request.content)))
+            return httpx.Response(200, json=2)
+
+        patch_supabase(monkeypatch, handler)
+        updated = asyncio.run(embedding_generator.update_chunk_embeddings_bulk(["a", "b"], [[0.5], [0.25, 1.0]]))
+
+        assert updated == 2
+        assert calls == [("/rest/v1/rpc/update_chunk_embeddings",
+                          {"chunk_ids": ["a", "b"], "embeddings": ["[0.5]", "[0.25,1]"]})]
+
+    def test_failure_raises(self, monkeypatch):
+        patch_supabase(monkeypatch, lambda request: httpx.Response(400, text="bad vector"))
+
+        try:
+            asyncio.run(embedding_generator.update_chunk_embeddings_bulk(["a"], [[0.5]]))
+        except RuntimeError as e:
+            assert "400" in str(e)
+        else:
+            raise AssertionError("expected RuntimeError")
+
+
+class FakeChunkTable:
+    """conversation_chunks behind PostgREST: is.null, id=gt., order, limit, offset, count."""
+
+    def __init__(self, ids, stuck=()):
+        self.embeddings = {chunk_id: None for chunk_id in ids}
+        self.stuck = set(stuck)  # rows the RPC silently fails to update
+        self.events = []
+
+    def rows(self, params):
+        rows = sorted(k for k, v in self.embeddings.items() if v is None)
+        if params.get("id", "").startswith("gt."):
+            rows = [r for r in rows if r > params["id"][3:]]
+        return rows
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        if request.method == "HEAD":
+            return httpx.Response(200, headers={"Content-Range": f"*/{len(self.rows(params))}"})
+        if request.method == "GET":
+            self.events.append(("get", params.get("id")))
+            offset = int(params.get("offset", 0))
+            page = self.rows(params)[offset:offset + int(params["limit"])]
+            return httpx.Response(200, json=[{"id": r, "content": r} for r in page])
+        body = json.loads(request.content)
+        self.events.append(("rpc", body["chunk_ids"]))
+        for chunk_id, literal in zip(body["chunk_ids"], body["embeddings"]):
+            if chunk_id not in self.stuck:
+                self.embeddings[chunk_id] = literal
+        return httpx.Response(200, json=len(body["chunk_ids"]))
+
+
+class TestEmbeddingBackfill:
+    """Tests for generate_embeddings_for_chunks."""
+
+    def run_backfill(self, monkeypatch, table, batch_size):
+        patch_supabase(monkeypatch, table.handler)
+        monkeypatch.setattr(embedding_cache, "EMBED_CACHE_PATH", "")
+        monkeypatch.setattr(embedding_generator, "embed_text", lambda text, dimensions=768, cost_tracker=None: [1.0])
+        return asyncio.run(embedding_generator.generate_embeddings_for_chunks("u1", batch_size=batch_size))
+
+    def test_keyset_pages_embed_every_row(self, monkeypatch):
+        # Offset paging over the shrinking is.null set skipped a page's worth of rows per batch
+        table = FakeChunkTable([f"id{i:02d}" for i in range(7)])
+
+        result = self.run_backfill(monkeypatch, table, batch_size=3)
+
+        assert result == {"embedded": 7, "remaining": 0, "complete": 1}
+        assert all(v == "[1]" for v in table.embeddings.values())
+        rpcs = [ids for kind, ids in table.events if kind == "rpc"]
+        assert rpcs == [["id00", "id01", "id02"], ["id03", "id04", "id05"], ["id06"]]
+
+    def test_next_page_is_prefetched_before_current_page_is_written(self, monkeypatch):
+        table = FakeChunkTable([f"id{i:02d}" for i in range(4)])
+
+        self.run_backfill(monkeypatch, table, batch_size=2)
+
+        assert table.events[:3] == [("get", None), ("get", "gt.id01"), ("rpc", ["id00", "id01"])]
+
+    def test_reports_rows_still_missing(self, monkeypatch):
+        table = FakeChunkTable(["a", "b", "c"], stuck={"b"})
+
+        result = self.run_backfill(monkeypatch, table, batch_size=2)
+
+        # Keyset cursor moves past "b", so the loop ends instead of refetching it forever
+        assert result == {"embedded": 3, "remaining": 1, "complete": 0}
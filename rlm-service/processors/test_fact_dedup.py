@@ -0,0 +1,84 @@
+"""
+Tests for near-duplicate fact collapsing
+"""
+
+from .fact_dedup import collapse_near_duplicates, shingles
+
+
+def facts(**categories):
+    out = {c: [] for c in ["preferences", "projects", "dates", "beliefs", "decisions"]}
+    out.update(categories)
+    out["total_count"] = sum(len(v) for v in categories.values())
+    return out
+
+
+class TestCollapseNearDuplicates:
+    """Tests for collapse_near_duplicates."""
+
+    def test_shingles_ignore_filler_and_inflection(self):
+        assert shingles("Prefers TypeScript") == shingles("User prefers using TypeScript.")
+
+    def test_paraphrases_merge_distinct_facts_survive(self):
+        collapsed, stats = collapse_near_duplicates(facts(preferences=[
+            "Prefers TypeScript",
+            "Prefers Rust for systems work",
+            "User prefers using TypeScript",
+            "prefers typescript",
+        ]), threshold=0.75)
+
+        # Longest phrasing kept, at the position of the first occurrence
+        assert collapsed["preferences"] == ["User prefers using TypeScript", "Prefers Rust for systems work"]
+        assert collapsed["total_count"] == 2
+        assert stats["facts_before"] == 4 and stats["collapsed"] == 2
+
+    def test_dict_facts_compare_on_identifying_fields(self):
+        collapsed, _ = collapse_near_duplicates(facts(
+            projects=[
+                {"name": "SoulPrint", "description": "AI memory app built with Next.js"},
+                {"name": "Soulprint app", "description": "An AI memory app built using Next.js"},
+            ],
+            dates=[
+                {"event": "Birthday", "date": "1990-05-01"},
+                {"event": "Birthday party", "date": "2024-05-04"},
+            ],
+        ), threshold=0.6)
+
+        assert len(collapsed["projects"]) == 1
+        assert len(collapsed["dates"]) == 2
+
+    def test_reports_reduction_calls_avoided(self):
+        topics = ["dark mode in every editor", "tabs over spaces when coding", "Postgres over MySQL for side projects"]
+        repeated = [f"User really prefers {topics[i % 3]}" for i in range(300)]
+        paraphrased = [p.replace("User really prefers", "Prefers") if i % 2 else p for i, p in enumerate(repeated)]
+
+        collapsed, stats = collapse_near_duplicates(facts(preferences=paraphrased), threshold=0.75,
+                                                    reduce_max_tokens=1000)
+
+        assert collapsed["total_count"] == 3
+        assert stats["reduce_calls_avoided"] >= 1 and stats["reduce_tokens_avoided"] > 1000
+
+    def test_negated_facts_never_merge(self):
+        pairs = [
+            ("Is vegetarian", "Is not vegetarian"),
+            ("Wants to use TypeScript for the backend", "Does not want to use TypeScript for the backend"),
+            ("Uses Docker for local development", "Doesn't use Docker for local development"),
+            ("Likes working late at night on side projects", "Hates working late at night on side projects"),
+        ]
+        for fact, negated in pairs:
+            collapsed, stats = collapse_near_duplicates(facts(preferences=[fact, negated]), threshold=0.5)
+            assert collapsed["preferences"] == [fact, negated]
+            assert stats["collapsed"] == 0
+
+    def test_swapped_order_facts_never_merge(self):
+        collapsed, _ = collapse_near_duplicates(facts(
+            decisions=[{"decision": "Chose Postgres over MySQL", "context": "reliability"},
+                       {"decision": "Chose MySQL over Postgres", "context": "hosting"}],
+            beliefs=["Values speed over correctness", "Values correctness over speed"],
+        ))
+        assert len(collapsed["decisions"]) == 2
+        assert collapsed["beliefs"] == ["Values speed over correctness", "Values correctness over speed"]
+
+    def test_threshold_zero_disables(self):
+        original = facts(preferences=["Prefers TypeScript", "prefers typescript"])
+        collapsed, stats = collapse_near_duplicates(original, threshold=0)
+        assert collapsed is original and stats["collapsed"] == 0
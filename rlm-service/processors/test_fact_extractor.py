@@ -0,0 +1,308 @@
+"""
+Tests for fact extraction: request packing, Haiku rate control, consolidation and reduction
+"""
+
+import asyncio
+import json
+import random
+import re
+from types import SimpleNamespace
+
+import anthropic
+import httpx
+import pytest
+
+from . import chunk_triage, fact_extractor
+from .adaptive_limiter import AdaptiveLimiter
+from .fact_extractor import pack_chunks, extract_facts_parallel, haiku_call
+
+PACKED = re.compile(r'<conversation id="(\d+)">\n(.*?)\n</conversation>', re.S)
+SINGLE = re.compile(r"<conversation>\n(.*?)\n</conversation>", re.S)
+
+
+class FakeHaiku:
+    """AsyncAnthropic stand-in: echoes each conversation's text back as a preference."""
+
+    def __init__(self, drop_ids=()):
+        self.prompts = []
+        self.drop_ids = set(drop_ids)
+        self.messages = self
+
+    async def create(self, **kwargs):
+        prompt = kwargs["messages"][0]["content"]
+        self.prompts.append(prompt)
+        packed = PACKED.findall(prompt)
+        if packed:
+            body = {i: {"preferences": [text]} for i, text in packed if text not in self.drop_ids}
+        else:
+            body = {"preferences": [SINGLE.search(prompt).group(1)]}
+        return SimpleNamespace(content=[SimpleNamespace(text=json.dumps(body))])
+
+
+@pytest.fixture(autouse=True)
+def no_triage(monkeypatch):
+    """Packing tests use placeholder text; triage is covered in test_chunk_triage."""
+    monkeypatch.setattr(chunk_triage, "TRIAGE_THRESHOLD", 0)
+
+
+def chunk(text, tokens):
+    return {"content": text, "token_count": tokens}
+
+
+class TestPackChunks:
+    """Tests for request grouping."""
+
+    def test_fills_requests_up_to_budget_in_order(self):
+        chunks = [chunk("a", 300), chunk("b", 500), chunk("c", 400), chunk("d", 2000), chunk("e", 100)]
+        assert pack_chunks(chunks, token_budget=1000) == [[0, 1], [2], [3], [4]]
+
+    def test_caps_chunks_per_request(self):
+        chunks = [chunk(str(i), 10) for i in range(5)]
+        assert pack_chunks(chunks, token_budget=1000, max_chunks=2) == [[0, 1], [2, 3], [4]]
+
+
+class TestPackedExtraction:
+    """Tests for extract_facts_parallel with packing."""
+
+    def test_results_split_back_per_chunk(self):
+        client = FakeHaiku()
+        chunks = [chunk(f"small {i}", 100) for i in range(6)] + [chunk("big", 5000)]
+        reported = {}
+
+        results = asyncio.run(extract_facts_parallel(
+            chunks, client, pack_token_budget=400, on_result=lambda i, facts: reported.setdefault(i, facts)))
+
+        assert [r["preferences"] for r in results] == [[f"small {i}"] for i in range(6)] + [["big"]]
+        assert all(r["projects"] == [] for r in results)
+        assert reported == dict(enumerate(results))
+        assert len(client.prompts) == 3  # 4 + 2 small chunks packed, the big one alone
+
+    def test_missing_ids_fall_back_to_single_requests(self):
+        client = FakeHaiku(drop_ids={"small 1"})
+        chunks = [chunk(f"small {i}", 100) for i in range(3)]
+
+        results = asyncio.run(extract_facts_parallel(chunks, client, pack_token_budget=1000))
+
+        assert [r["preferences"] for r in results] == [["small 0"], ["small 1"], ["small 2"]]
+        assert len(client.prompts) == 2
+        assert '<conversation id="' not in client.prompts[1]
+
+    def test_budget_zero_disables_packing(self, monkeypatch):
+        monkeypatch.setattr(fact_extractor, "FACT_PACK_TOKEN_BUDGET", 0)
+        client = FakeHaiku()
+
+        asyncio.run(extract_facts_parallel([chunk("a", 10), chunk("b", 10)], client))
+
+        assert len(client.prompts) == 2
+
+
+class TestHaikuLimiter:
+    """Tests for haiku_call rate control."""
+
+    def test_rate_limit_halves_limit_and_honours_retry_after(self):
+        request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+        error = anthropic.RateLimitError(
+            "rate limited", response=httpx.Response(429, headers={"retry-after": "0.2"}, request=request), body=None)
+
+        class LimitedHaiku:
+            def __init__(self):
+                self.messages = self
+
+            async def create(self, **kwargs):
+                raise error
+
+        async def run():
+            limiter = AdaptiveLimiter("haiku-test", initial_limit=8, max_limit=8)
+            with pytest.raises(anthropic.RateLimitError):
+                await haiku_call(LimitedHaiku(), limiter=limiter, model="m")
+            start = asyncio.get_running_loop().time()
+            limiter.release(await limiter.acquire())
+            return limiter, asyncio.get_running_loop().time() - start
+
+        limiter, waited = asyncio.run(run())
+        assert limiter.limit == 4 and limiter.stats()["throttles"] == 1
+        assert waited >= 0.15
+
+    def test_overload_halves_limit_but_server_errors_do_not(self):
+        request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+        overloaded = anthropic.OverloadedError(
+            "overloaded", response=httpx.Response(529, request=request), body=None)
+        server_error = anthropic.InternalServerError(
+            "server error", response=httpx.Response(500, request=request), body=None)
+
+        class FailingHaiku:
+            def __init__(self, error):
+                self.error = error
+                self.messages = self
+
+            async def create(self, **kwargs):
+                raise self.error
+
+        async def run(error):
+            limiter = AdaptiveLimiter("haiku-test", initial_limit=8, max_limit=8)
+            with pytest.raises(type(error)):
+                await haiku_call(FailingHaiku(error), limiter=limiter, model="m")
+            return limiter
+
+        limiter = asyncio.run(run(overloaded))
+        assert limiter.limit == 4 and limiter.stats()["throttles"] == 1
+        limiter = asyncio.run(run(server_error))
+        assert limiter.limit == 8 and limiter.stats()["errors"] == 1
+
+    def test_extraction_runs_under_shared_limiter(self, monkeypatch):
+        limiter = AdaptiveLimiter("haiku-test", initial_limit=2, max_limit=4)
+        monkeypatch.setattr(fact_extractor, "_haiku_limiter", limiter)
+
+        asyncio.run(extract_facts_parallel([chunk(f"c{i}", 10) for i in range(6)], FakeHaiku(), pack_token_budget=0))
+
+        stats = limiter.stats()
+        assert stats["successes"] == 6 and stats["in_flight"] == 0
+        assert limiter.limit > 2
+
+
+def quadratic_consolidate(all_facts):
+    """The list-scan consolidate_facts this module replaced, kept as the reference."""
+    out = {"preferences": [], "projects": [], "dates": [], "beliefs": [], "decisions": []}
+    for facts in all_facts:
+        for pref in facts.get("preferences", []):
+            if pref and pref not in out["preferences"]:
+                out["preferences"].append(pref)
+        for proj in facts.get("projects", []):
+            if proj and proj.get("name", "").lower() not in [p.get("name", "").lower() for p in out["projects"]]:
+                out["projects"].append(proj)
+        for d in facts.get("dates", []):
+            if d and d.get("event", "").lower() not in [x.get("event", "").lower() for x in out["dates"]]:
+                out["dates"].append(d)
+        for belief in facts.get("beliefs", []):
+            if belief and belief not in out["beliefs"]:
+                out["beliefs"].append(belief)
+        for dec in facts.get("decisions", []):
+            if dec and dec.get("decision", "").lower() not in [x.get("decision", "").lower() for x in out["decisions"]]:
+                out["decisions"].append(dec)
+    out["total_count"] = sum(len(v) for v in out.values())
+    return out
+
+
+class TestConsolidateFacts:
+    """consolidate_facts must match the old list-scan implementation exactly."""
+
+    def test_matches_reference_on_random_facts(self):
+        rng = random.Random(5)
+        words = ["TypeScript", "typescript", "Rust", "Next.js", "supabase", "", "Postgres", "tabs"]
+
+        def text():
+            return rng.choice(words) + (f" {rng.randint(0, 30)}" if rng.random() < 0.7 else "")
+
+        all_facts = []
+        for _ in range(300):
+            all_facts.append({
+                "preferences": [text() for _ in range(rng.randint(0, 4))],
+                "projects": [{"name": text(), "description": str(rng.random())} for _ in range(rng.randint(0, 2))],
+                "dates": [{"event": text().upper(), "date": "2024"} for _ in range(rng.randint(0, 2))] + [{}],
+                "beliefs": [text() for _ in range(rng.randint(0, 3))] + [None],
+                "decisions": [{"decision": text(), "context": "x"} for _ in range(rng.randint(0, 2))],
+            })
+        all_facts.append({})
+
+        assert fact_extractor.consolidate_facts(all_facts) == quadratic_consolidate(all_facts)
+
+    def test_unhashable_facts_dedup_like_list_membership(self):
+        facts = [{"preferences": [{"a": 1, "b": 2}, "x"]}, {"preferences": [{"b": 2, "a": 1}, ["y"], ["y"]]}]
+        assert fact_extractor.consolidate_facts(facts) == quadratic_consolidate(facts)
+
+
+class TestHierarchicalReduce:
+    """Tests for concurrent batch reduction."""
+
+    def setup_reduce(self, monkeypatch, workers=20):
+        monkeypatch.setattr(fact_extractor, "REDUCE_BATCH_TOKENS", 50)  # ~200 chars per batch
+        monkeypatch.setattr(fact_extractor, "HAIKU_MAX_CONCURRENCY", workers)
+        monkeypatch.setattr(fact_extractor, "_haiku_limiter", AdaptiveLimiter("haiku-test", 20, 20))
+        facts = {c: [f"{c} fact number {i:02d}" for i in range(12)] for c in fact_extractor.FACT_CATEGORIES}
+        facts["total_count"] = 60
+        return facts
+
+    def test_batches_run_concurrently_and_reassemble_in_order(self, monkeypatch):
+        facts = self.setup_reduce(monkeypatch)
+        rng = random.Random(1)
+        in_flight = {"now": 0, "peak": 0}
+
+        class HalvingHaiku:
+            def __init__(self):
+                self.messages = self
+
+            async def create(self, **kwargs):
+                batch = json.loads(kwargs["messages"][0]["content"].split("Facts:\n", 1)[1].rsplit("\n\nReturn", 1)[0])
+                in_flight["now"] += 1
+                in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+                await asyncio.sleep(rng.random() * 0.02)  # finish out of order
+                in_flight["now"] -= 1
+                return SimpleNamespace(content=[SimpleNamespace(text=json.dumps(batch[::2]))])
+
+        reduced = asyncio.run(fact_extractor.hierarchical_reduce(facts, HalvingHaiku(), max_tokens=100, _max_depth=1))
+
+        assert in_flight["peak"] > 1
+        for category in fact_extractor.FACT_CATEGORIES:
+            kept = reduced[category]
+            assert kept == sorted(kept)  # category/batch order preserved
+            assert set(kept) <= set(facts[category])
+
+    def test_sliding_window_breaker_stops_dispatching(self, monkeypatch):
+        facts = self.setup_reduce(monkeypatch, workers=2)
+        calls = []
+
+        class FailingHaiku:
+            def __init__(self):
+                self.messages = self
+
+            async def create(self, **kwargs):
+                calls.append(1)
+                raise RuntimeError("overloaded")
+
+        reduced = asyncio.run(fact_extractor.hierarchical_reduce(facts, FailingHaiku(), max_tokens=100_000_000))
+        assert reduced is facts  # under the limit: nothing to do
+
+        asyncio.run(fact_extractor.hierarchical_reduce(dict(facts), FailingHaiku(), max_tokens=100, _max_depth=1))
+
+        batches = sum(len(fact_extractor.split_into_batches(facts[c], 200)) for c in fact_extractor.FACT_CATEGORIES)
+        assert fact_extractor.REDUCE_BREAKER_FAILURES <= len(calls) < batches
+
+
+class TestExtractFactsStream:
+    """Tests for streaming extraction with a bounded worker pool."""
+
+    def test_starts_before_source_ends_with_bounded_tasks(self, monkeypatch):
+        monkeypatch.setattr(fact_extractor, "HAIKU_MAX_CONCURRENCY", 3)
+        monkeypatch.setattr(fact_extractor, "_haiku_limiter", AdaptiveLimiter("haiku-test", 3, 3))
+        events = []
+        peak_tasks = {"value": 0}
+
+        class SlowHaiku(FakeHaiku):
+            async def create(self, **kwargs):
+                events.append("extract")
+                peak_tasks["value"] = max(peak_tasks["value"], len(asyncio.all_tasks()))
+                await asyncio.sleep(0.001)
+                return await super().create(**kwargs)
+
+        async def source():
+            for i in range(100):
+                events.append("chunk")
+                yield chunk(f"c{i}", 10)
+                await asyncio.sleep(0)
+
+        results = asyncio.run(fact_extractor.extract_facts_stream(source(), SlowHaiku(), pack_token_budget=0))
+
+        assert [r["preferences"] for r in results] == [[f"c{i}"] for i in range(100)]
+        assert events.index("extract") < len(events) - 1 - events[::-1].index("chunk")
+        assert peak_tasks["value"] <= 2 * 3 + 1  # workers + main task, not one per chunk
+
+    def test_groups_match_pack_chunks(self):
+        client = FakeHaiku()
+        sizes = [300, 500, 400, 2000, 100, 50, 50]
+        chunks = [chunk(f"c{i}", tokens) for i, tokens in enumerate(sizes)]
+
+        asyncio.run(fact_extractor.extract_facts_stream(iter(chunks), client, pack_token_budget=1000))
+
+        sent = sorted(tuple(text for _, text in PACKED.findall(p)) or (SINGLE.search(p).group(1),) for p in client.prompts)
+        expected = sorted(tuple(f"c{i}" for i in group) for group in pack_chunks(chunks, token_budget=1000))
+        assert sent == expected
@@ -0,0 +1,263 @@
+"""
+Tests for full pass stage orchestration
+
+Verifies that the chunk embed/insert and fact extraction stages overlap,
+that vectors go out with the insert, and that combined progress is reported.
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from . import embedding_generator, fact_extractor, full_pass
+from .cost_tracker import CostTracker
+from .pipeline_checkpoint import PipelineCheckpoint, CHUNKS_SAVED, EMBEDDINGS_DONE, FACTS_REDUCED
+
+
+class TestEnrichmentStages:
+    """Tests for run_enrichment_stages."""
+
+    def test_stages_run_concurrently(self, tmp_path, monkeypatch):
+        saved = []
+
+        def embed_text(text, dimensions=768, cost_tracker=None):
+            # Blocking like boto3: must run in a worker thread to let extraction proceed
+            time.sleep(0.2)
+            return [float(len(text))]
+
+        async def save_chunks_batch(user_id, chunks, embeddings=None):
+            saved.extend(zip([c["content"] for c in chunks], embeddings))
+
+        async def noop(*args, **kwargs):
+            return None
+
+        async def extract(chunk_content, client, cost_tracker=None):
+            await asyncio.sleep(0.05)
+            return {"preferences": [chunk_content], "projects": [], "dates": [], "beliefs": [], "decisions": []}
+
+        monkeypatch.setattr(embedding_generator, "embed_text", embed_text)
+        monkeypatch.setattr(full_pass, "save_chunks_batch", save_chunks_batch)
+        monkeypatch.setattr(full_pass, "delete_user_chunks", noop)
+        monkeypatch.setattr(fact_extractor, "extract_facts_from_chunk", extract)
+        monkeypatch.setattr(fact_extractor, "FACT_PACK_TOKEN_BUDGET", 0)
+        checkpoint = PipelineCheckpoint("u1", "raw.json", path=str(tmp_path / "cp.db"))
+        chunks = [{"content": f"chunk {i}"} for i in range(4)]
+
+        start = time.perf_counter()
+        reduced = asyncio.run(full_pass.run_enrichment_stages("u1", chunks, None, checkpoint, CostTracker()))
+        elapsed = time.perf_counter() - start
+
+        assert reduced["preferences"] == [f"chunk {i}" for i in range(4)]
+        assert saved == [(f"chunk {i}", [7.0]) for i in range(4)]
+        assert checkpoint.completed(CHUNKS_SAVED) and checkpoint.completed(EMBEDDINGS_DONE)
+        assert checkpoint.completed(FACTS_REDUCED)
+        # Sequential would take >= 0.2s + 0.05s; overlapped is about max(0.2, 0.05)
+        assert elapsed < 0.24
+
+    def test_failed_embeddings_are_inserted_then_repaired(self, tmp_path, monkeypatch):
+        saved = []
+        repaired = []
+
+        def embed_text(text, dimensions=768, cost_tracker=None):
+            raise RuntimeError("AccessDeniedException")
+
+        async def save_chunks_batch(user_id, chunks, embeddings=None):
+            saved.append(embeddings)
+
+        async def repair(user_id, cost_tracker=None, **kwargs):
+            repaired.append(user_id)
+            return {"embedded": 2, "remaining": 0, "complete": 1}
+
+        async def noop(*args, **kwargs):
+            return None
+
+        async def extract(chunk_content, client, cost_tracker=None):
+            return {"preferences": [], "projects": [], "dates": [], "beliefs": [], "decisions": []}
+
+        monkeypatch.setattr(embedding_generator, "embed_text", embed_text)
+        monkeypatch.setattr(embedding_generator, "generate_embeddings_for_chunks", repair)
+        monkeypatch.setattr(full_pass, "save_chunks_batch", save_chunks_batch)
+        monkeypatch.setattr(full_pass, "delete_user_chunks", noop)
+        monkeypatch.setattr(fact_extractor, "extract_facts_from_chunk", extract)
+        monkeypatch.setattr(fact_extractor, "FACT_PACK_TOKEN_BUDGET", 0)
+        checkpoint = PipelineCheckpoint("u1", "raw.json", path=str(tmp_path / "cp.db"))
+
+        asyncio.run(full_pass.run_enrichment_stages(
+            "u1", [{"content": "a"}, {"content": "b"}], None, checkpoint, CostTracker()))
+
+        assert saved == [None]
+        assert repaired == ["u1"]
+        assert checkpoint.completed(EMBEDDINGS_DONE)
+
+    def test_chunk_generator_streams_into_stages(self, tmp_path, monkeypatch):
+        events = []
+        chunked = []
+
+        def embed_text(text, dimensions=768, cost_tracker=None):
+            return [1.0]
+
+        async def save_chunks_batch(user_id, chunks, embeddings=None):
+            events.append(("save", len(chunks)))
+
+        async def noop(*args, **kwargs):
+            return None
+
+        async def extract(chunk_content, client, cost_tracker=None):
+            events.append(("extract", chunk_content))
+            return {"preferences": [chunk_content], "projects": [], "dates": [], "beliefs": [], "decisions": []}
+
+        def source():
+            for i in range(250):
+                events.append(("chunk", i))
+                yield {"content": f"chunk {i}"}
+
+        monkeypatch.setattr(embedding_generator, "embed_text", embed_text)
+        monkeypatch.setattr(full_pass, "save_chunks_batch", save_chunks_batch)
+        monkeypatch.setattr(full_pass, "delete_user_chunks", noop)
+        monkeypatch.setattr(fact_extractor, "extract_facts_from_chunk", extract)
+        monkeypatch.setattr(fact_extractor, "FACT_PACK_TOKEN_BUDGET", 0)
+        checkpoint = PipelineCheckpoint("u1", "raw.json", path=str(tmp_path / "cp.db"))
+
+        reduced = asyncio.run(full_pass.run_enrichment_stages(
+            "u1", source(), None, checkpoint, CostTracker(), on_chunked=chunked.append))
+
+        assert reduced["preferences"] == [f"chunk {i}" for i in range(250)]
+        assert [c["content"] for c in chunked[0]] == [f"chunk {i}" for i in range(250)]
+        # First extraction and first insert happen while chunks are still being produced
+        last_chunk = events.index(("chunk", 249))
+        assert events.index(("extract", "chunk 0")) < last_chunk
+        assert events.index(("save", 100)) < last_chunk
+        assert [n for kind, n in events if kind == "save"] == [100, 100, 50]
+
+    def test_reference_chunks_are_not_embedded_or_extracted(self, tmp_path, monkeypatch):
+        saved, embedded, extracted = [], [], []
+
+        def embed_text(text, dimensions=768, cost_tracker=None):
+            embedded.append(text)
+            return [1.0]
+
+        async def save_chunks_batch(user_id, chunks, embeddings=None):
+            saved.extend(zip([c["content"] for c in chunks], embeddings))
+
+        async def noop(*args, **kwargs):
+            return None
+
+        async def extract(chunk_content, client, cost_tracker=None):
+            extracted.append(chunk_content)
+            return {"preferences": [chunk_content], "projects": [], "dates": [], "beliefs": [], "decisions": []}
+
+        monkeypatch.setattr(embedding_generator, "embed_text", embed_text)
+        monkeypatch.setattr(full_pass, "save_chunks_batch", save_chunks_batch)
+        monkeypatch.setattr(full_pass, "delete_user_chunks", noop)
+        monkeypatch.setattr(fact_extractor, "extract_facts_from_chunk", extract)
+        monkeypatch.setattr(fact_extractor, "FACT_PACK_TOKEN_BUDGET", 0)
+        checkpoint = PipelineCheckpoint("u1", "raw.json", path=str(tmp_path / "cp.db"))
+        chunks = [
+            {"content": "doc", "content_hash": "h1", "duplicate_of": None},
+            {"content": "[Same content as chunk 0 of conversation a]", "content_hash": "h1", "duplicate_of": "h1"},
+            {"content": "other", "content_hash": "h2", "duplicate_of": None},
+        ]
+
+        asyncio.run(full_pass.run_enrichment_stages("u1", chunks, None, checkpoint, CostTracker()))
+
+        assert sorted(embedded) == sorted(extracted) == ["doc", "other"]
+        assert [vector for _, vector in saved] == [[1.0], None, [1.0]]
+        assert checkpoint.completed(EMBEDDINGS_DONE)
+
+    def test_facts_under_reduce_budget_are_not_collapsed(self, tmp_path, monkeypatch):
+        async def noop(*args, **kwargs):
+            return None
+
+        async def extract(chunk_content, client, cost_tracker=None):
+            return {"preferences": [chunk_content], "projects": [], "dates": [], "beliefs": [], "decisions": []}
+
+        monkeypatch.setattr(embedding_generator, "embed_text", lambda text, dimensions=768, cost_tracker=None: [1.0])
+        monkeypatch.setattr(full_pass, "save_chunks_batch", noop)
+        monkeypatch.setattr(full_pass, "delete_user_chunks", noop)
+        monkeypatch.setattr(fact_extractor, "extract_facts_from_chunk", extract)
+        monkeypatch.setattr(fact_extractor, "FACT_PACK_TOKEN_BUDGET", 0)
+        checkpoint = PipelineCheckpoint("u1", "raw.json", path=str(tmp_path / "cp.db"))
+        paraphrases = ["Prefers TypeScript", "User prefers using TypeScript"]
+        tracker = CostTracker()
+
+        reduced = asyncio.run(full_pass.run_enrichment_stages(
+            "u1", [{"content": text} for text in paraphrases], None, checkpoint, tracker))
+
+        assert sorted(reduced["preferences"]) == sorted(paraphrases)
+        assert tracker.get_summary()["facts_collapsed"] == 0
+
+    def test_failed_run_closes_checkpoint(self, tmp_path, monkeypatch):
+        import main
+        from . import pipeline_checkpoint
+
+        opened = []
+
+        class RecordingCheckpoint(PipelineCheckpoint):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.closed = False
+                opened.append(self)
+
+            def close(self):
+                self.closed = True
+                super().close()
+
+        async def download_conversations(storage_path, file_type="json"):
+            raise RuntimeError("storage unavailable")
+
+        monkeypatch.setattr(pipeline_checkpoint, "CHECKPOINT_DB_PATH", str(tmp_path / "cp.db"))
+        monkeypatch.setattr(pipeline_checkpoint, "PipelineCheckpoint", RecordingCheckpoint)
+        monkeypatch.setattr(main, "download_conversations", download_conversations)
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+
+        with pytest.raises(RuntimeError, match="storage unavailable"):
+            asyncio.run(full_pass.run_full_pass_pipeline("u1", "raw.json"))
+
+        assert [c.closed for c in opened] == [True]
+
+    def test_stage_progress_reports_combined_fraction(self, monkeypatch):
+        reported = []
+        from . import job_queue
+        monkeypatch.setattr(job_queue, "report_progress", lambda percent, stage=None: reported.append((percent, stage)))
+
+        progress = full_pass.StageProgress({"chunks": 10, "facts": 10}, report_every=0.25)
+        progress.advance("chunks", 5)
+        progress.advance("facts", 1)
+        progress.complete("chunks")
+        progress.complete("facts")
+
+        assert [p for p, _ in reported] == [25, 55, 100]
+        assert reported[-1][1] == "Full pass: chunks 10/10, facts 10/10"
+
+
+class TestSaveChunksBatch:
+    """Tests for the bulk chunk insert."""
+
+    def test_embeddings_are_written_in_the_insert(self, monkeypatch):
+        posted = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            posted.append(json.loads(request.content))
+            return httpx.Response(201)
+
+        real_client = httpx.AsyncClient
+        monkeypatch.setattr(full_pass, "SUPABASE_URL", "http://supabase.local")
+        monkeypatch.setattr(full_pass, "SUPABASE_SERVICE_KEY", "key")
+        monkeypatch.setattr(full_pass.httpx, "AsyncClient", lambda *a, **kw: real_client(transport=httpx.MockTransport(handler)))
+
+        chunks = [
+            {"conversation_id": "c1", "content": "a", "chunk_index": 0, "created_at": "2020-01-01T00:00:00Z"},
+            {"conversation_id": "c1", "content": "b", "chunk_index": 1},
+        ]
+        asyncio.run(full_pass.save_chunks_batch("u1", chunks, [[0.5, 0.25], None]))
+
+        rows = posted[0]
+        assert [r["embedding"] for r in rows] == [[0.5, 0.25], None]
+        assert all("embedding" in r for r in rows)
+        assert "chunk_index" not in rows[0] and rows[0]["user_id"] == "u1"
+        assert rows[0]["is_recent"] is False and rows[0]["chunk_tier"] == "medium"
+        # Caller's chunk dicts are not mutated
+        assert chunks[0]["chunk_index"] == 0 and "embedding" not in chunks[0]
@@ -0,0 +1,195 @@
+"""
+Tests for the persistent job queue
+
+Covers the worker-slot cap, progress reporting, cancellation, failure
+recording and re-enqueueing of jobs interrupted by a restart.
+"""
+
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+from . import job_queue
+from .job_queue import JobQueue, JobStore, report_progress, COMPLETE, FAILED, CANCELLED, QUEUED, RUNNING
+
+
+async def _wait_for_state(queue, job_id, state, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while queue.status(job_id)["state"] != state:
+        assert asyncio.get_running_loop().time() < deadline, f"job never reached {state}"
+        await asyncio.sleep(0.01)
+
+
+class TestJobQueue:
+    """Tests for JobQueue against a SQLite JobStore."""
+
+    def test_worker_slots_cap_concurrency(self, tmp_path):
+        async def run():
+            queue = JobQueue(JobStore(str(tmp_path / "jobs.db")), workers=2, poll_interval=0.05)
+            active = 0
+            peak = 0
+
+            async def handler(n):
+                nonlocal active, peak
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.05)
+                active -= 1
+
+            queue.register("work", handler)
+            await queue.start()
+            ids = [queue.enqueue("work", {"n": i}) for i in range(6)]
+            for job_id in ids:
+                await _wait_for_state(queue, job_id, COMPLETE)
+            await queue.stop()
+            return queue, ids, peak
+
+        queue, ids, peak = asyncio.run(run())
+        assert peak == 2
+        status = queue.status(ids[-1])
+        assert status["progress"] == 100
+        assert status["queue_wait_seconds"] > 0
+        assert status["run_seconds"] > 0
+        assert status["attempts"] == 1
+
+    def test_progress_failure_and_queue_position(self, tmp_path):
+        async def run():
+            queue = JobQueue(JobStore(str(tmp_path / "jobs.db")), workers=1, poll_interval=0.05)
+            job_queue._job_queue = queue
+            release = asyncio.Event()
+
+            async def slow(stage):
+                report_progress(40, stage)
+                await release.wait()
+
+            async def broken():
+                raise RuntimeError("boom")
+
+            queue.register("slow", slow)
+            queue.register("broken", broken)
+            await queue.start()
+            slow_id = queue.enqueue("slow", {"stage": "Parsing"})
+            broken_id = queue.enqueue("broken", {})
+            await _wait_for_state(queue, slow_id, RUNNING)
+            await asyncio.sleep(0.02)
+
+            running = queue.status(slow_id)
+            waiting = queue.status(broken_id)
+            release.set()
+            await _wait_for_state(queue, broken_id, FAILED)
+            await queue.stop()
+            return running, waiting, queue.status(broken_id)
+
+        try:
+            running, waiting, failed = asyncio.run(run())
+        finally:
+            job_queue._job_queue = None
+        assert running["progress"] == 40 and running["stage"] == "Parsing"
+        assert waiting["state"] == QUEUED and waiting["queue_position"] == 1
+        assert failed["error"] == "boom"
+
+    def test_cancel_queued_and_running(self, tmp_path):
+        async def run():
+            queue = JobQueue(JobStore(str(tmp_path / "jobs.db")), workers=1, poll_interval=0.05)
+            cleaned_up = []
+
+            async def handler():
+                try:
+                    await asyncio.sleep(60)
+                finally:
+                    cleaned_up.append(True)
+
+            queue.register("long", handler)
+            await queue.start()
+            running_id = queue.enqueue("long", {})
+            queued_id = queue.enqueue("long", {})
+            await _wait_for_state(queue, running_id, RUNNING)
+
+            assert queue.cancel(queued_id)
+            assert queue.cancel(running_id)
+            await _wait_for_state(queue, running_id, CANCELLED)
+            assert not queue.cancel(running_id)
+            await queue.stop()
+            return queue.status(queued_id), cleaned_up
+
+        queued, cleaned_up = asyncio.run(run())
+        assert queued["state"] == CANCELLED
+        assert cleaned_up == [True]
+
+    def test_interrupted_jobs_are_requeued_on_start(self, tmp_path):
+        db_path = str(tmp_path / "jobs.db")
+        runs = []
+
+        async def first_process():
+            queue = JobQueue(JobStore(db_path), workers=1, poll_interval=0.05)
+
+            async def handler(user_id):
+                runs.append(user_id)
+                await asyncio.sleep(60)
+
+            queue.register("import", handler)
+            await queue.start()
+            job_id = queue.enqueue("import", {"user_id": "u1"})
+            await _wait_for_state(queue, job_id, RUNNING)
+            await queue.stop()  # simulated deploy: job left 'running'
+            return job_id
+
+        async def second_process(job_id):
+            queue = JobQueue(JobStore(db_path), workers=1, poll_interval=0.05)
+
+            async def handler(user_id):
+                runs.append(user_id)
+
+            queue.register("import", handler)
+            await queue.start()
+            await _wait_for_state(queue, job_id, COMPLETE)
+            await queue.stop()
+            return queue.status(job_id)
+
+        job_id = asyncio.run(first_process())
+        assert JobStore(db_path).get(job_id)["state"] == RUNNING
+        status = asyncio.run(second_process(job_id))
+        assert runs == ["u1", "u1"]
+        assert status["attempts"] == 2
+
+    def test_jobs_interrupted_on_every_attempt_are_failed(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(job_queue, "JOB_MAX_ATTEMPTS", 2)
+        db_path = str(tmp_path / "jobs.db")
+        store = JobStore(db_path)
+        job_id = store.create("import", {"user_id": "u1"})["id"]
+
+        # Each claim stands for a run that took the process down
+        for _ in range(2):
+            assert store.claim_next()["id"] == job_id
+            result = JobStore(db_path).requeue_interrupted(max_attempts=2)
+        assert result == {"requeued": [], "failed": [job_id]}
+        job = store.get(job_id)
+        assert job["state"] == FAILED and job["attempts"] == 2
+        assert "2 attempts" in job["error"]
+        assert store.claim_next() is None
+
+    def test_temp_dir_db_path_is_refused_on_render(self, monkeypatch):
+        ephemeral = os.path.join(tempfile.gettempdir(), "jobs.sqlite3")
+        monkeypatch.delenv("RENDER", raising=False)
+        job_queue.require_persistent_path(ephemeral, "JOB_DB_PATH")  # warns only
+        monkeypatch.setenv("RENDER", "true")
+        with pytest.raises(RuntimeError, match="JOB_DB_PATH"):
+            job_queue.require_persistent_path(ephemeral, "JOB_DB_PATH")
+        job_queue.require_persistent_path("/var/data/jobs.sqlite3", "JOB_DB_PATH")
+
+    def test_app_lifespan_starts_and_stops_the_queue(self, tmp_path, monkeypatch):
+        from fastapi.testclient import TestClient
+        import main
+        from . import embedding_cache, pipeline_checkpoint
+
+        queue = JobQueue(JobStore(str(tmp_path / "jobs.db")), workers=2)
+        monkeypatch.setattr(job_queue, "_job_queue", queue)
+        monkeypatch.setattr(pipeline_checkpoint, "CHECKPOINT_DB_PATH", str(tmp_path / "cp.db"))
+        monkeypatch.setattr(embedding_cache, "EMBED_CACHE_PATH", str(tmp_path / "e.db"))
+
+        with TestClient(main.app):
+            assert len(queue._worker_tasks) == 2
+            assert set(queue._handlers) == {"import", "full_pass"}
+        assert queue._worker_tasks == []
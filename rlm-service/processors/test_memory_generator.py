@@ -0,0 +1,106 @@
+"""
+Tests for MEMORY generation: concurrent per-category drafts, per-subsection retries and the merge
+"""
+
+import asyncio
+import re
+from types import SimpleNamespace
+
+from .memory_generator import generate_memory_section, merge_memory_sections
+
+HEADING = re.compile(r'write the "## (.+?)" section')
+
+
+def facts(**categories):
+    consolidated = {"preferences": [], "projects": [], "dates": [], "beliefs": [], "decisions": []}
+    consolidated.update(categories)
+    consolidated["total_count"] = sum(len(v) for v in categories.values())
+    return consolidated
+
+
+class FakeHaiku:
+    """AsyncAnthropic stand-in: drafts a subsection from the facts in the prompt."""
+
+    def __init__(self, placeholder_headings=()):
+        self.prompts = []
+        self.placeholder_headings = set(placeholder_headings)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.messages = self
+
+    async def create(self, **kwargs):
+        prompt = kwargs["messages"][0]["content"]
+        self.prompts.append(prompt)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        heading = HEADING.search(prompt).group(1)
+        if heading in self.placeholder_headings:
+            text = f"## {heading}\nNo data yet."
+        else:
+            items = re.findall(r'^\s+(?:"\w+": )?"([^"]+)",?$', prompt, re.M)
+            text = f"```markdown\n## {heading}\n" + "\n".join(f"- The user {item}." for item in items) + "\n```"
+        return SimpleNamespace(content=[SimpleNamespace(text=text)])
+
+
+class TestGenerateMemorySection:
+    """Tests for the map-reduce generator."""
+
+    def test_drafts_each_category_concurrently_from_its_own_facts(self):
+        client = FakeHaiku()
+        consolidated = facts(
+            preferences=["prefers dark mode in every editor", "prefers short written answers"],
+            beliefs=["values privacy over convenience in tools"],
+        )
+
+        memory_md = asyncio.run(generate_memory_section(consolidated, client))
+
+        assert len(client.prompts) == 2  # empty categories need no call
+        assert client.max_in_flight == 2
+        preferences_prompt = next(p for p in client.prompts if "Preferences" in HEADING.search(p).group(1))
+        assert "dark mode" in preferences_prompt and "privacy" not in preferences_prompt
+        headings = re.findall(r"^## (.+)$", memory_md, re.M)
+        assert headings == ["Preferences", "Projects", "Important Dates", "Beliefs & Values", "Decisions & Context"]
+        assert memory_md.startswith("# MEMORY")
+        assert "- The user prefers dark mode in every editor." in memory_md
+        assert "```" not in memory_md
+        assert memory_md.count("No data yet.") == 3
+
+    def test_retries_only_the_failing_subsection_then_lists_its_facts(self):
+        client = FakeHaiku(placeholder_headings={"Projects"})
+        consolidated = facts(
+            preferences=["prefers tabs over spaces in Python", "prefers Postgres for side projects"],
+            projects=[{"name": "Soulprint", "description": "memory layer for assistants", "details": ""}],
+            dates=[{"event": "Launch", "date": "2026-03-01"}],
+        )
+
+        memory_md = asyncio.run(generate_memory_section(consolidated, client, max_retries=2))
+
+        headings = [HEADING.search(p).group(1) for p in client.prompts]
+        assert headings.count("Projects") == 3
+        assert headings.count("Preferences") == 1 and headings.count("Important Dates") == 1
+        assert "- Soulprint -- memory layer for assistants" in memory_md
+        assert "[FALLBACK]" not in memory_md
+
+    def test_no_facts_uses_fallback_without_calls(self):
+        client = FakeHaiku()
+        memory_md = asyncio.run(generate_memory_section(facts(), client))
+        assert client.prompts == []
+        assert memory_md.startswith("[FALLBACK]")
+
+
+class TestMergeMemorySections:
+    """Tests for stitching drafts together."""
+
+    def test_orders_sections_and_drops_repeated_bullets(self):
+        memory_md = merge_memory_sections({
+            "decisions": "## Decisions & Context\n- Chose Postgres over Mongo for reliability.",
+            "preferences": "## Preferences\n- Prefers Postgres.\n- Uses Vim daily.",
+            "beliefs": "## Beliefs & Values\n- prefers postgres",
+        })
+        assert memory_md.index("## Preferences") < memory_md.index("## Beliefs & Values")
+        assert memory_md.index("## Beliefs & Values") < memory_md.index("## Decisions & Context")
+        assert memory_md.count("ostgres.") == 1
+        assert "## Beliefs & Values\nNo data yet." in memory_md
+        assert "Chose Postgres over Mongo" in memory_md
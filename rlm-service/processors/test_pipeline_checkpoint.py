@@ -0,0 +1,183 @@
+"""
+Tests for full pass checkpointing
+
+Verifies the checkpoint store and that run_full_pass_pipeline resumes after
+the last completed stage, reusing per-chunk fact results.
+"""
+
+import asyncio
+
+import pytest
+
+import main
+from . import (
+    conversation_index, embedding_generator, fact_extractor, full_pass, memory_generator, pipeline_checkpoint,
+    token_diet, v2_regenerator,
+)
+from .pipeline_checkpoint import PipelineCheckpoint, chunk_key, CHUNKS_SAVED, MEMORY_SAVED
+
+
+class TestPipelineCheckpoint:
+    """Tests for the SQLite checkpoint store."""
+
+    def test_stages_artifacts_and_chunk_facts(self, tmp_path):
+        db = str(tmp_path / "cp.db")
+        checkpoint = PipelineCheckpoint("u1", "user-imports/u1/raw-1.json", path=db)
+        checkpoint.mark(CHUNKS_SAVED)
+        checkpoint.save("chunks", [{"content": "héllo"}])
+        checkpoint.save_chunk_facts(chunk_key("héllo"), {"preferences": ["tea"]})
+
+        reopened = PipelineCheckpoint("u1", "user-imports/u1/raw-1.json", path=db)
+        assert reopened.completed(CHUNKS_SAVED)
+        assert not reopened.completed(MEMORY_SAVED)
+        assert reopened.load("chunks") == [{"content": "héllo"}]
+        assert reopened.load_chunk_facts([chunk_key("héllo"), chunk_key("other")]) == {
+            chunk_key("héllo"): {"preferences": ["tea"]}
+        }
+        with pytest.raises(KeyError):
+            reopened.load("memory_md")
+
+    def test_runs_are_isolated_and_stale_runs_discarded(self, tmp_path):
+        db = str(tmp_path / "cp.db")
+        old = PipelineCheckpoint("u1", "raw-old.json", path=db)
+        old.mark(CHUNKS_SAVED)
+        other_user = PipelineCheckpoint("u2", "raw-old.json", path=db)
+        other_user.mark(CHUNKS_SAVED)
+
+        new = PipelineCheckpoint("u1", "raw-new.json", path=db)
+        assert not new.completed(CHUNKS_SAVED)
+        new.discard_stale()
+        assert not old.completed(CHUNKS_SAVED)
+        assert other_user.completed(CHUNKS_SAVED)
+
+        other_user.clear()
+        assert not other_user.completed(CHUNKS_SAVED)
+
+
+class TestFullPassResume:
+    """run_full_pass_pipeline resumes from its checkpoint after a failure."""
+
+    def test_retry_skips_completed_stages(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(pipeline_checkpoint, "CHECKPOINT_DB_PATH", str(tmp_path / "cp.db"))
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+        calls = {"download": 0, "save": 0, "embed": 0, "extract": [], "memory": 0}
+
+        conversations = [
+            {
+                "id": f"c{i}",
+                "title": f"T{i}",
+                "createdAt": "2025-01-01T00:00:00+00:00",
+                "messages": [
+                    {"role": "user", "content": f"I am building project {i}. " * 50},
+                    {"role": "assistant", "content": "Sounds great. " * 50},
+                ],
+            }
+            for i in range(6)
+        ]
+
+        async def download_conversations(storage_path, file_type="json"):
+            calls["download"] += 1
+            return conversations
+
+        async def noop(*args, **kwargs):
+            return None
+
+        async def save_chunks_batch(user_id, chunks, embeddings=None):
+            assert embeddings is not None and len(embeddings) == len(chunks)
+            calls["save"] += 1
+
+        def embed_text(text, dimensions=768, cost_tracker=None):
+            calls["embed"] += 1
+            return [0.1] * 4
+
+        failing = {"chunk": None}
+
+        async def extract(chunk_content, client, cost_tracker=None):
+            calls["extract"].append(chunk_content)
+            if chunk_content == failing["chunk"]:
+                raise RuntimeError("rate limited")
+            return {"preferences": [chunk_content[:30]], "projects": [], "dates": [], "beliefs": [], "decisions": []}
+
+        memory_fails = {"value": True}
+
+        async def generate_memory(facts, client, cost_tracker=None):
+            calls["memory"] += 1
+            if memory_fails["value"]:
+                raise RuntimeError("memory timeout")
+            return "## Memory\n" + "\n".join(facts["preferences"])
+
+        async def no_sleep(_seconds):
+            return None
+
+        async def load_index(user_id):
+            return {}
+
+        monkeypatch.setattr(main, "download_conversations", download_conversations)
+        monkeypatch.setattr(main, "update_user_profile", noop)
+        monkeypatch.setattr(conversation_index, "load_conversation_index", load_index)
+        monkeypatch.setattr(conversation_index, "save_conversation_index", noop)
+        monkeypatch.setattr(token_diet, "TOKEN_DIET_STAGES", [])
+        monkeypatch.setattr(full_pass, "delete_user_chunks", noop)
+        monkeypatch.setattr(full_pass, "save_chunks_batch", save_chunks_batch)
+        monkeypatch.setattr(embedding_generator, "embed_text", embed_text)
+        monkeypatch.setattr(fact_extractor, "extract_facts_from_chunk", extract)
+        monkeypatch.setattr(fact_extractor, "FACT_PACK_TOKEN_BUDGET", 0)
+        monkeypatch.setattr(fact_extractor.asyncio, "sleep", no_sleep)
+        monkeypatch.setattr(memory_generator, "generate_memory_section", generate_memory)
+        monkeypatch.setattr(v2_regenerator, "regenerate_sections_v2", noop)
+
+        from .conversation_chunker import CHUNK_TIERS, chunk_conversations
+        chunk_contents = [c["content"] for c in chunk_conversations(conversations, target_tokens=2000, overlap_tokens=200)]
+        assert len(chunk_contents) > 1
+        # Every tier is embedded and saved; facts come from medium chunks only
+        saved_count = len(chunk_conversations(conversations, target_tokens=2000, overlap_tokens=200, tiers=CHUNK_TIERS))
+        failing["chunk"] = chunk_contents[0]
+
+        run = lambda: asyncio.run(full_pass.run_full_pass_pipeline("u1", "raw-1.json"))
+
+        # Attempt 1: one chunk's extraction fails, then MEMORY generation fails
+        with pytest.raises(RuntimeError, match="memory timeout"):
+            run()
+        assert calls["download"] == 1 and calls["save"] == 1 and calls["memory"] == 1
+        assert calls["embed"] == saved_count
+        first_extract_count = len(calls["extract"])
+
+        # Attempt 2: nothing before MEMORY is redone
+        memory_fails["value"] = False
+        memory_md = run()
+        assert calls["download"] == 1
+        assert calls["save"] == 1
+        assert calls["embed"] == saved_count
+        assert len(calls["extract"]) == first_extract_count
+        assert calls["memory"] == 2
+        assert memory_md.startswith("## Memory")
+
+        # Completed runs clear their checkpoint
+        assert not PipelineCheckpoint("u1", "raw-1.json").completed(CHUNKS_SAVED)
+
+    def test_retry_reextracts_only_missing_chunks(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(pipeline_checkpoint, "CHECKPOINT_DB_PATH", str(tmp_path / "cp.db"))
+        checkpoint = PipelineCheckpoint("u1", "raw-1.json")
+        chunks = [{"content": f"chunk {i}"} for i in range(4)]
+        checkpoint.save_chunk_facts(chunk_key("chunk 1"), {"preferences": ["cached"]})
+
+        extracted = []
+
+        async def extract(chunk_content, client, cost_tracker=None):
+            extracted.append(chunk_content)
+            return {"preferences": [chunk_content], "projects": [], "dates": [], "beliefs": [], "decisions": []}
+
+        monkeypatch.setattr(fact_extractor, "extract_facts_from_chunk", extract)
+        monkeypatch.setattr(fact_extractor, "FACT_PACK_TOKEN_BUDGET", 0)
+        keys = [chunk_key(c["content"]) for c in chunks]
+        done = checkpoint.load_chunk_facts(keys)
+        pending = [i for i, k in enumerate(keys) if k not in done]
+
+        asyncio.run(fact_extractor.extract_facts_parallel(
+            [chunks[i] for i in pending], None,
+            on_result=lambda j, facts: checkpoint.save_chunk_facts(keys[pending[j]], facts),
+        ))
+
+        assert sorted(extracted) == ["chunk 0", "chunk 2", "chunk 3"]
+        assert checkpoint.load_chunk_facts(keys)[keys[1]] == {"preferences": ["cached"]}
+        assert len(checkpoint.load_chunk_facts(keys)) == 4
@@ -0,0 +1,59 @@
+"""
+Tests for Quick Pass streaming validation
+
+Verifies that StreamingJSONValidator accepts well-formed streamed JSON
+(including fenced output split across arbitrary chunk boundaries) and
+aborts as soon as the stream cannot be valid.
+"""
+
+import json
+
+import pytest
+from .quick_pass import StreamingJSONValidator
+
+
+VALID = json.dumps({
+    "soul": {"communication_style": "direct {braces} and [brackets] in \"strings\""},
+    "identity": {"ai_name": "Nova"},
+    "user": {}, "agents": {"do_not": ["x", "y"]}, "tools": {},
+})
+
+
+def _feed_in_pieces(text, size):
+    validator = StreamingJSONValidator()
+    for i in range(0, len(text), size):
+        validator.feed(text[i:i + size])
+    return validator
+
+
+class TestStreamingJSONValidator:
+    """Tests for incremental JSON structure checks."""
+
+    @pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 10_000])
+    def test_accepts_valid_json_any_chunking(self, size):
+        validator = _feed_in_pieces(VALID, size)
+        assert validator.text == VALID
+
+    @pytest.mark.parametrize("size", [1, 5, 10_000])
+    def test_accepts_markdown_fence(self, size):
+        fenced = "  ```json\n" + VALID + "\n```\n"
+        validator = _feed_in_pieces(fenced, size)
+        assert validator.text == fenced
+
+    def test_rejects_leading_prose(self):
+        with pytest.raises(ValueError, match="does not start"):
+            _feed_in_pieces("Sure! Here is the JSON: " + VALID, 4)
+
+    def test_rejects_trailing_prose(self):
+        with pytest.raises(ValueError, match="after JSON"):
+            _feed_in_pieces(VALID + "\nLet me know if you need anything else.", 4)
+
+    def test_rejects_mismatched_brackets(self):
+        with pytest.raises(ValueError, match="Mismatched"):
+            _feed_in_pieces('{"soul": [1, 2}', 3)
+
+    def test_aborts_before_stream_ends(self):
+        validator = StreamingJSONValidator()
+        validator.feed('{"soul": {}}')
+        with pytest.raises(ValueError):
+            validator.feed(' and then the model kept talking')
@@ -0,0 +1,123 @@
+"""
+Tests for conversation sampling
+
+Verifies that the single-pass StreamingSampler selects exactly what the
+original sort-everything implementation selected, including ties, huge
+conversations that trip the absolute limit, and the no-eligible fallback.
+"""
+
+import random
+from datetime import datetime
+
+import pytest
+from . import token_counter
+from .sample import StreamingSampler, sample_conversations, HARD_CAP, PRUNE_MIN_CANDIDATES
+
+
+def _reference_sample(conversations, target_tokens=50000):
+    """The pre-streaming implementation of sample_conversations, kept verbatim as an oracle."""
+    eligible = [c for c in conversations if len(c.get('messages', [])) >= 4]
+    if len(eligible) == 0:
+        return conversations[:50]
+
+    scored = []
+    for conv in eligible:
+        messages = conv.get('messages', [])
+        total_chars = sum(len(m.get('content', '')) for m in messages)
+        user_messages = [m for m in messages if m.get('role') == 'user']
+        assistant_messages = [m for m in messages if m.get('role') == 'assistant']
+        score = (
+            len(messages) * 10 +
+            sum(min(len(m.get('content', '')), 500) for m in user_messages) +
+            min(len(user_messages), len(assistant_messages)) * 20
+        )
+        try:
+            created_at = conv.get('createdAt', '')
+            if created_at:
+                timestamp = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+                score += timestamp.timestamp() / 1e12
+        except (ValueError, AttributeError):
+            pass
+        scored.append({'conv': conv, 'score': score, 'chars': total_chars})
+
+    scored.sort(key=lambda x: x['score'], reverse=True)
+
+    target_chars = target_tokens * 4
+    ABSOLUTE_CHAR_LIMIT = 600_000
+    selected = []
+    total_chars = 0
+    for item in scored:
+        conv = item['conv']
+        chars = item['chars']
+        if total_chars + chars > ABSOLUTE_CHAR_LIMIT and len(selected) > 0:
+            break
+        if total_chars + chars > target_chars:
+            if len(selected) < 5 and total_chars + chars <= ABSOLUTE_CHAR_LIMIT:
+                selected.append(conv)
+                total_chars += chars
+                continue
+            continue
+        selected.append(conv)
+        total_chars += chars
+        if len(selected) >= 50:
+            break
+    return selected
+
+
+def _random_conversations(rng, count, huge_rate=0.0, coarse_scores=False):
+    conversations = []
+    for i in range(count):
+        n_messages = rng.choice([1, 2, 3, 4, 5, 8, 12, 20, 40])
+        messages = []
+        for j in range(n_messages):
+            if rng.random() < huge_rate:
+                length = rng.randint(100_000, 700_000)
+            else:
+                length = int(rng.expovariate(1 / 1500))
+            messages.append({"role": "user" if j % 2 == 0 else "assistant", "content": "x" * length})
+        conv = {"id": f"c{i}", "title": f"T{i}", "messages": messages}
+        if not coarse_scores:
+            conv["createdAt"] = f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T00:00:00Z"
+        conversations.append(conv)
+    return conversations
+
+
+def _ids(convs):
+    return [c["id"] for c in convs]
+
+
+class TestStreamingSampler:
+    """Equivalence against the original implementation."""
+
+    def test_budget_ignores_token_calibration(self, monkeypatch):
+        counter = token_counter.get_token_counter()
+        monkeypatch.setattr(counter, "scale", 1.0)
+        expected = StreamingSampler(50000).target_chars
+        monkeypatch.setattr(counter, "scale", 2.0)
+        assert StreamingSampler(50000).target_chars == expected
+
+    @pytest.mark.parametrize("seed", range(12))
+    def test_matches_reference_on_random_exports(self, seed):
+        rng = random.Random(seed)
+        conversations = _random_conversations(
+            rng,
+            count=rng.choice([3, 60, 400, 1500]),
+            huge_rate=rng.choice([0.0, 0.002, 0.02]),
+            coarse_scores=seed % 3 == 0,  # many equal scores -> exercises tie order
+        )
+        target_tokens = rng.choice([500, 5000, 50000, 200000])
+
+        assert _ids(sample_conversations(conversations, target_tokens)) == \
+            _ids(_reference_sample(conversations, target_tokens))
+
+    def test_no_eligible_returns_first_conversations(self):
+        conversations = [{"id": f"c{i}", "messages": [{"role": "user", "content": "hi"}]} for i in range(80)]
+        assert _ids(sample_conversations(conversations)) == _ids(conversations[:HARD_CAP])
+
+    def test_candidates_stay_bounded(self):
+        rng = random.Random(99)
+        sampler = StreamingSampler(target_tokens=50000)
+        for conv in _random_conversations(rng, count=5000):
+            sampler.add(conv)
+            assert len(sampler._heap) < max(PRUNE_MIN_CANDIDATES, 1000)
+        assert sampler.total_count == 5000
@@ -0,0 +1,76 @@
+"""
+Tests for offline token counting and calibration
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from . import fact_extractor, token_counter
+from .adaptive_limiter import AdaptiveLimiter
+from .token_counter import TokenCounter, approx_token_count
+
+
+class TestApproxTokenCount:
+    """Tests for the character-class heuristic."""
+
+    def test_english_prose_close_to_four_chars_per_token(self):
+        text = "The quick brown fox jumps over the lazy dog. " * 20
+        assert 3.5 <= len(text) / approx_token_count(text) <= 5
+
+    def test_code_numbers_and_cjk_count_denser_than_prose(self):
+        for text in ['{"date": "2024-05-01", "ids": [1, 2, 3]}', "我喜欢用中文写代码和测试"]:
+            assert approx_token_count(text) > len(text) // 4 * 2
+
+    def test_empty(self):
+        assert approx_token_count("") == 0
+
+
+class TestTokenCounter:
+    """Tests for memoization and calibration."""
+
+    def test_repeated_strings_are_memoized(self):
+        counter = TokenCounter()
+        for _ in range(3):
+            counter.count("same sentence again")
+        assert counter.stats()["memo_hits"] == 2 and counter.stats()["memo_misses"] == 1
+
+    def test_exact_mode_without_tokenizer_falls_back(self):
+        assert TokenCounter("exact", "/nonexistent/tokenizer.json").mode == "approx"
+
+    def test_calibration_scales_counts_after_enough_observations(self):
+        counter = TokenCounter()
+        text = "word " * 2000
+        raw = counter.count(text)
+
+        counter.observe(text, raw * 2)
+        assert counter.scale == 1.0  # below CALIBRATION_MIN_TOKENS
+
+        for _ in range(5):
+            counter.observe(text, int(raw * 1.5))
+        assert 1.5 < counter.scale < 2.0
+        assert counter.count(text) == int(raw * counter.scale + 0.5)
+        assert counter.chars_for_tokens(1000) < 4000
+
+    def test_calibration_is_clamped(self):
+        counter = TokenCounter()
+        counter.observe("tiny", 1_000_000)
+        assert counter.scale == token_counter.CALIBRATION_MAX_SCALE
+
+    def test_haiku_call_feeds_reported_usage(self, monkeypatch):
+        counter = TokenCounter()
+        monkeypatch.setattr(token_counter, "_token_counter", counter)
+        prompt = "Extract facts. " * 4000
+
+        class ReportingHaiku:
+            def __init__(self):
+                self.messages = self
+
+            async def create(self, **kwargs):
+                return SimpleNamespace(content=[], usage=SimpleNamespace(input_tokens=20000))
+
+        asyncio.run(fact_extractor.haiku_call(
+            ReportingHaiku(), limiter=AdaptiveLimiter("haiku-test", 1, 1),
+            messages=[{"role": "user", "content": prompt}]))
+
+        assert counter.stats()["observed_tokens"] == 20000
+        assert counter.scale == 20000 / counter.raw_count(prompt)
@@ -0,0 +1,81 @@
+"""
+Tests for the token-diet extraction rendering
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+from . import chunk_triage, sample, token_diet
+from .cost_tracker import CostTracker
+from .fact_extractor import extract_facts_stream
+from .token_diet import assistant_gist, collapse_code_blocks, render_for_extraction
+
+LONG_ANSWER = "Here is how to do it. " + "This part explains every detail at length. " * 20
+
+
+class TestRendering:
+    """Tests for code collapsing and assistant gists."""
+
+    def test_code_blocks_collapse_to_signature(self):
+        text = "Try this:\n```python\ndef load(path):\n\n    return open(path).read()\n```\nDone."
+        assert collapse_code_blocks(text) == "Try this:\n[code: python, 2 lines] def load(path):\nDone."
+
+    def test_unclosed_fence_runs_to_end(self):
+        assert collapse_code_blocks("See\n```\nx = 1\ny = 2") == "See\n[code: text, 2 lines] x = 1"
+
+    def test_gist_keeps_opening_sentences(self):
+        gist = assistant_gist(LONG_ANSWER, max_chars=100)
+        assert gist.startswith("Here is how to do it. This part")
+        assert gist.endswith(" [...]") and len(gist) <= 106
+        assert assistant_gist("Short answer.", max_chars=100) == "Short answer."
+
+    def test_user_turns_kept_and_assistant_turns_dieted(self):
+        user = "User: I'm building a CRM in Go for my team.\n```go\nfunc main() {}\n```"
+        text = f"# Title\n{user}\nAssistant: {LONG_ANSWER}\n```go\nfunc main() {{\n}}\n```\nUser: thanks"
+
+        rendered = render_for_extraction(text)
+
+        assert rendered.startswith(f"# Title\n{user}\nAssistant: Here is how to do it.")
+        assert "[code: go" not in rendered  # the long answer's gist cut before its code block
+        assert rendered.endswith(" [...]\nUser: thanks")
+        assert len(rendered) < len(text) / 2
+
+
+class EchoHaiku:
+    def __init__(self):
+        self.prompts = []
+        self.messages = self
+
+    async def create(self, **kwargs):
+        self.prompts.append(kwargs["messages"][0]["content"])
+        return SimpleNamespace(content=[SimpleNamespace(text=json.dumps({"preferences": ["x"]}))])
+
+
+class TestStages:
+    """Tests for per-stage selection and savings reporting."""
+
+    def test_fact_prompts_use_diet_and_record_savings(self, monkeypatch):
+        monkeypatch.setattr(token_diet, "TOKEN_DIET_STAGES", ["facts"])
+        monkeypatch.setattr(chunk_triage, "TRIAGE_THRESHOLD", 0)
+        client, tracker = EchoHaiku(), CostTracker()
+        content = f"User: I prefer tabs.\nAssistant: {LONG_ANSWER}"
+
+        asyncio.run(extract_facts_stream([{"content": content}], client, cost_tracker=tracker, pack_token_budget=0))
+
+        assert render_for_extraction(content) in client.prompts[0]
+        assert LONG_ANSWER not in client.prompts[0]
+        diet = tracker.get_summary()["token_diet"]["facts"]
+        assert diet["tokens_saved"] == diet["tokens_before"] - diet["tokens_after"] > 0
+
+    def test_stage_not_selected_keeps_full_text(self, monkeypatch):
+        conversation = {"title": "T", "messages": [
+            {"role": "user", "content": "I prefer tabs."}, {"role": "assistant", "content": LONG_ANSWER},
+        ]}
+
+        monkeypatch.setattr(token_diet, "TOKEN_DIET_STAGES", ["facts"])
+        assert LONG_ANSWER in sample.format_conversations_for_prompt([conversation])
+
+        monkeypatch.setattr(token_diet, "TOKEN_DIET_STAGES", ["facts", "quick_pass"])
+        formatted = sample.format_conversations_for_prompt([conversation])
+        assert LONG_ANSWER not in formatted and "User: I prefer tabs." in formatted
@@ -0,0 +1,198 @@
+"""
+Token Counter
+Offline token counting for chunking, packing, reduction and prompt budgets.
+
+Two modes (TOKEN_COUNTER_MODE):
+- approx (default): character-class heuristic. Counts short letter runs,
+  digit groups, punctuation and non-Latin characters separately, so code,
+  numbers and CJK text are not undercounted the way len(text) // 4 is.
+- exact: a Hugging Face `tokenizers` tokenizer loaded from TOKENIZER_PATH
+  (optional dependency). Falls back to approx if unavailable.
+
+Neither vocabulary is Claude's, so counts are scaled by a calibration
+factor learned from the input_tokens the API reports for prompts we
+counted (see observe()). Raw counts are memoized per string.
+
+The scale drifts within a process and resets on restart, so anything that
+must come out the same on a retry (chunk boundaries, sampling budgets)
+uses the raw count (raw_count_tokens, chars_for_tokens(calibrated=False));
+calibrated counts are for API prompt and cost budgets only.
+"""
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, Optional
+
+TOKEN_COUNTER_MODE = os.getenv("TOKEN_COUNTER_MODE", "approx")
+TOKENIZER_PATH = os.getenv("TOKENIZER_PATH", "")
+# Memoize raw counts for up to this many distinct strings no longer than
+# TOKEN_MEMO_MAX_CHARS (long strings rarely repeat and would pin memory)
+TOKEN_MEMO_SIZE = int(os.getenv("TOKEN_MEMO_SIZE", "16384"))
+TOKEN_MEMO_MAX_CHARS = 32768
+# Calibration applies once this many API-reported input tokens were observed;
+# the scale is clamped so one odd prompt cannot swing budgets wildly
+CALIBRATION_MIN_TOKENS = 10000
+CALIBRATION_MIN_SCALE = 0.5
+CALIBRATION_MAX_SCALE = 2.0
+# Chars per token assumed when converting a token budget with no sample text
+DEFAULT_CHARS_PER_TOKEN = 4.0
+
+_LETTERS = re.compile(r"[A-Za-z]{1,7}")
+_DIGITS = re.compile(r"\d{1,3}")
+_PUNCT = re.compile(r"[!-/:-@\[-`{-~]")
+_SPACE_RUNS = re.compile(r"[ \t]{2,}|\n+")
+_CJK = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]")
+
+
+def approx_token_count(text: str) -> int:
+    """
+    Heuristic token count.
+
+    Letters in runs of up to 7, digits in groups of up to 3, each ASCII
+    punctuation mark, each newline or indentation run, each CJK character
+    and every two other non-ASCII characters count as one token.
+
+    Args:
+        text: Input text
+
+    Returns:
+        Estimated token count
+    """
+    if not text:
+        return 0
+    tokens = (
+        len(_LETTERS.findall(text))
+        + len(_DIGITS.findall(text))
+        + len(_PUNCT.findall(text))
+        + len(_SPACE_RUNS.findall(text))
+    )
+    if not text.isascii():
+        non_ascii = len(text) - len(text.encode("ascii", "ignore"))
+        cjk = len(_CJK.findall(text))
+        tokens += cjk + (non_ascii - cjk + 1) // 2
+    return tokens
+
+
+def _load_tokenizer(path: str):
+    """Load a tokenizers.Tokenizer from a tokenizer.json, or None if unavailable."""
+    try:
+        from tokenizers import Tokenizer
+    except ImportError:
+        print("[TokenCounter] tokenizers not installed, using approx mode")
+        return None
+    if not path or not os.path.exists(path):
+        print(f"[TokenCounter] TOKENIZER_PATH '{path}' not found, using approx mode")
+        return None
+    return Tokenizer.from_file(path)
+
+
+class TokenCounter:
+    """Memoized, calibrated token counter."""
+
+    def __init__(self, mode: str = "approx", tokenizer_path: str = "", memo_size: int = TOKEN_MEMO_SIZE):
+        """
+        Args:
+            mode: "approx" or "exact"
+            tokenizer_path: tokenizer.json for exact mode
+            memo_size: Max distinct strings to memoize raw counts for
+        """
+        tokenizer = _load_tokenizer(tokenizer_path) if mode == "exact" else None
+        if tokenizer is not None:
+            self.mode = "exact"
+            self._raw = lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+        else:
+            self.mode = "approx"
+            self._raw = approx_token_count
+        self._memo = lru_cache(maxsize=memo_size)(self._raw)
+        self._lock = threading.Lock()
+        self._estimated = 0
+        self._actual = 0
+        self.scale = 1.0
+
+    def raw_count(self, text: str) -> int:
+        """Uncalibrated count (memoized for short strings)."""
+        if len(text) <= TOKEN_MEMO_MAX_CHARS:
+            return self._memo(text)
+        return self._raw(text)
+
+    def count(self, text: str) -> int:
+        """Calibrated token count of text."""
+        if not text:
+            return 0
+        raw = self.raw_count(text)
+        return raw if self.scale == 1.0 else int(raw * self.scale + 0.5)
+
+    def chars_for_tokens(self, tokens: int, sample: Optional[str] = None, calibrated: bool = True) -> int:
+        """
+        Character length that holds about `tokens` tokens.
+
+        Args:
+            tokens: Token budget
+            sample: Text the budget applies to; its own chars/token ratio
+                is used when given
+            calibrated: Apply the calibration scale (False: raw counts,
+                independent of earlier API calls)
+
+        Returns:
+            Character budget
+        """
+        if sample:
+            sample_tokens = self.count(sample) if calibrated else self.raw_count(sample)
+            if sample_tokens:
+                return int(tokens * len(sample) / sample_tokens)
+        return int(tokens * DEFAULT_CHARS_PER_TOKEN / (self.scale if calibrated else 1.0))
+
+    def observe(self, text: str, actual_tokens: int) -> None:
+        """
+        Calibrate against a token count reported by the API.
+
+        Args:
+            text: Prompt text that was sent
+            actual_tokens: input_tokens the API reported for it
+        """
+        estimated = self.raw_count(text)
+        if estimated <= 0 or actual_tokens <= 0:
+            return
+        with self._lock:
+            self._estimated += estimated
+            self._actual += actual_tokens
+            if self._actual >= CALIBRATION_MIN_TOKENS:
+                ratio = self._actual / self._estimated
+                self.scale = min(CALIBRATION_MAX_SCALE, max(CALIBRATION_MIN_SCALE, ratio))
+
+    def stats(self) -> Dict[str, object]:
+        memo = self._memo.cache_info()
+        return {
+            "mode": self.mode,
+            "scale": round(self.scale, 4),
+            "observed_tokens": self._actual,
+            "memo_hits": memo.hits,
+            "memo_misses": memo.misses,
+        }
+
+
+# Lazy-init shared counter (one calibration state per process)
+_token_counter: Optional[TokenCounter] = None
+
+
+def get_token_counter() -> TokenCounter:
+    global _token_counter
+    if _token_counter is None:
+        _token_counter = TokenCounter(TOKEN_COUNTER_MODE, TOKENIZER_PATH)
+    return _token_counter
+
+
+def count_tokens(text: str) -> int:
+    """Calibrated token count using the shared counter."""
+    return get_token_counter().count(text)
+
+
+def raw_count_tokens(text: str) -> int:
+    """Uncalibrated token count using the shared counter (stable across processes)."""
+    return get_token_counter().raw_count(text) if text else 0
+
+
+def chars_for_tokens(tokens: int, sample: Optional[str] = None, calibrated: bool = True) -> int:
+    """Character budget for a token budget using the shared counter."""
+    return get_token_counter().chars_for_tokens(tokens, sample, calibrated)
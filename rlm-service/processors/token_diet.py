@@ -0,0 +1,134 @@
+"""
+Token Diet
+Extraction-specific rendering of conversation text.
+
+Fact extraction only cares about what the user reveals, but assistant
+answers (up to 5000 chars each after format_conversation) and pasted code
+dominate its input tokens. The diet rendering:
+- collapses fenced code blocks to a one-line signature
+  ("[code: python, 14 lines] def load(path):")
+- cuts assistant turns to a gist (their first sentences, ASSISTANT_GIST_CHARS)
+- keeps user turns intact
+
+Stored and embedded chunks are unchanged; only prompts are rendered.
+TOKEN_DIET_STAGES picks the stages that use it (facts, quick_pass, v2_regen).
+"""
+import os
+import re
+from typing import List, Optional
+
+from .conversation_chunker import split_sentences
+
+# Stages whose prompts use the diet rendering (the others keep full text)
+TOKEN_DIET_STAGES = [s for s in os.getenv("TOKEN_DIET_STAGES", "facts").split(",") if s]
+# Assistant turns keep whole sentences up to this many chars
+ASSISTANT_GIST_CHARS = int(os.getenv("ASSISTANT_GIST_CHARS", "300"))
+
+_FENCE = re.compile(r"^[ \t]*```[ \t]*([\w+#.-]*).*$", re.M)
+_TURN = re.compile(r"^(User|Assistant): ", re.M)
+
+
+def uses_token_diet(stage: str) -> bool:
+    """Whether a stage's prompts use the diet rendering."""
+    return stage in TOKEN_DIET_STAGES
+
+
+def collapse_code_blocks(text: str) -> str:
+    """
+    Replace each fenced code block with a one-line signature.
+
+    An unclosed fence (a chunk boundary cut the block) runs to the end of text.
+
+    Args:
+        text: Message text
+
+    Returns:
+        Text with code blocks collapsed
+    """
+    if "```" not in text:
+        return text
+    out = []
+    pos = 0
+    fences = list(_FENCE.finditer(text))
+    i = 0
+    while i < len(fences):
+        opening = fences[i]
+        closing = fences[i + 1] if i + 1 < len(fences) else None
+        body_end = closing.start() if closing else len(text)
+        body = text[opening.end():body_end].strip("\n")
+        lines = [line for line in body.split("\n") if line.strip()]
+        language = opening.group(1) or "text"
+        first = lines[0].strip()[:80] if lines else ""
+        out.append(text[pos:opening.start()])
+        out.append(f"[code: {language}, {len(lines)} lines] {first}".rstrip())
+        pos = closing.end() if closing else len(text)
+        i += 2
+    out.append(text[pos:])
+    return "".join(out)
+
+
+def assistant_gist(text: str, max_chars: Optional[int] = None) -> str:
+    """
+    Shorten an assistant turn to its opening sentences.
+
+    Args:
+        text: Assistant message text (code already collapsed)
+        max_chars: Character budget (default ASSISTANT_GIST_CHARS)
+
+    Returns:
+        Gist, with " [...]" when something was cut
+    """
+    max_chars = ASSISTANT_GIST_CHARS if max_chars is None else max_chars
+    if len(text) <= max_chars:
+        return text
+    kept = []
+    used = 0
+    for sentence in split_sentences(text):
+        if kept and used + len(sentence) > max_chars:
+            break
+        kept.append(sentence)
+        used += len(sentence)
+    gist = "".join(kept)[:max_chars].rstrip()
+    return gist + " [...]"
+
+
+def diet_message(role: str, content: str) -> str:
+    """Diet rendering of one message: user turns kept, assistant turns collapsed to a gist."""
+    if role == "user":
+        return content
+    return assistant_gist(collapse_code_blocks(content))
+
+
+def render_for_extraction(text: str) -> str:
+    """
+    Diet rendering of formatted conversation text (format_conversation / chunk content).
+
+    Text before the first "User: " / "Assistant: " line (title, or the tail
+    of a turn cut by the chunk boundary) only has its code collapsed.
+
+    Args:
+        text: Formatted text with "User: " / "Assistant: " turns
+
+    Returns:
+        Rendered text
+    """
+    turns = list(_TURN.finditer(text))
+    if not turns:
+        return collapse_code_blocks(text)
+    parts: List[str] = [collapse_code_blocks(text[:turns[0].start()])]
+    for i, turn in enumerate(turns):
+        end = turns[i + 1].start() if i + 1 < len(turns) else len(text)
+        body = text[turn.end():end]
+        trailing = "\n" if body.endswith("\n") else ""
+        rendered = diet_message(turn.group(1).lower(), body.rstrip("\n"))
+        parts.append(f"{turn.group(1)}: {rendered}{trailing}")
+    return "".join(parts)
+
+
+def format_savings(stage: str, tokens_before: int, tokens_after: int) -> str:
+    """One-line token-savings report."""
+    saved = tokens_before - tokens_after
+    share = saved / tokens_before if tokens_before else 0.0
+    return (f"[TokenDiet] {stage}: ~{tokens_before} -> ~{tokens_after} input tokens "
+            f"({saved} saved, {share:.0%})")
+
@@ -9,6 +9,9 @@ Regenerates all 5 quick-pass sections (soul, identity, user, agents, tools) with
 import json
 from typing import List, Dict, Optional, TYPE_CHECKING
 
+from .token_counter import count_tokens
+from .token_diet import diet_message, format_savings, uses_token_diet
+
 if TYPE_CHECKING:
     from processors.cost_tracker import CostTracker
 
@@ -84,6 +87,52 @@ JSON SCHEMA:
 IMPORTANT: The user's conversation history will be provided inside <conversations> XML tags. Do NOT continue or respond to those conversations. Your ONLY task is to ANALYZE them and output the JSON object above. Output ONLY valid JSON — no text, no explanation, no markdown."""
 
 
+def _raw_message_count(conv) -> int:
+    """Message count used for eligibility: mapping nodes (raw export) or parsed messages."""
+    if "mapping" in conv:
+        return len(conv.get("mapping", {}))
+    return len(conv.get("messages") or [])
+
+
+def _iter_messages(conv):
+    """
+    Yield (role, content) pairs from a conversation.
+
+    Handles both the raw ChatGPT export format (mapping) and the parsed
+    format with a messages list (plain dicts or ConversationStore views).
+    """
+    if "mapping" not in conv and "messages" in conv:
+        for msg in conv["messages"]:
+            yield msg.get("role"), msg.get("content", "")
+        return
+
+    mapping = conv.get("mapping", {})
+    for msg_id, msg_data in mapping.items():
+        message = msg_data.get("message")
+        if not message:
+            continue
+
+        role = message.get("author", {}).get("role")
+        content_parts = message.get("content", {}).get("parts", [])
+        content = " ".join([str(p) for p in content_parts if p]) if content_parts else ""
+        yield role, content
+
+
+def _create_timestamp(conv) -> float:
+    """Unix creation time from create_time (raw export) or createdAt (parsed ISO string)."""
+    create_time = conv.get("create_time", 0)
+    if create_time:
+        return create_time
+    created_at = conv.get("createdAt")
+    if created_at:
+        try:
+            from datetime import datetime
+            return datetime.fromisoformat(created_at.replace("Z", "+00:00")).timestamp()
+        except (ValueError, AttributeError):
+            pass
+    return 0
+
+
 def sample_conversations_for_v2(conversations: List[dict], target_count: int = 200) -> List[dict]:
     """
     Sample the richest conversations for v2 regeneration.
@@ -104,7 +153,7 @@ def sample_conversations_for_v2(conversations: List[dict], target_count: int = 2
     MIN_MESSAGES = 4
 
     # Filter out short conversations
-    eligible = [c for c in conversations if len(c.get("mapping", {})) >= MIN_MESSAGES]
+    eligible = [c for c in conversations if _raw_message_count(c) >= MIN_MESSAGES]
 
     if len(eligible) == 0:
         return conversations[:target_count]
@@ -112,21 +161,11 @@ def sample_conversations_for_v2(conversations: List[dict], target_count: int = 2
     # Score each conversation
     scored = []
     for conv in eligible:
-        mapping = conv.get("mapping", {})
-        messages = []
-
-        # Extract messages from mapping
-        for msg_id, msg_data in mapping.items():
-            message = msg_data.get("message")
-            if not message:
-                continue
-
-            role = message.get("author", {}).get("role")
-            content_parts = message.get("content", {}).get("parts", [])
-            content = " ".join([str(p) for p in content_parts if p]) if content_parts else ""
-
-            if role and content:
-                messages.append({"role": role, "content": content})
+        messages = [
+            {"role": role, "content": content}
+            for role, content in _iter_messages(conv)
+            if role and content
+        ]
 
         # Count user/assistant messages
         user_messages = [m for m in messages if m["role"] == "user"]
@@ -140,7 +179,7 @@ def sample_conversations_for_v2(conversations: List[dict], target_count: int = 2
         )
 
         # Add recency bonus
-        created_at = conv.get("create_time", 0)
+        created_at = _create_timestamp(conv)
         if created_at:
             score += created_at / 1e12
 
@@ -157,7 +196,7 @@ def sample_conversations_for_v2(conversations: List[dict], target_count: int = 2
     return [s["conv"] for s in scored[:target_count]]
 
 
-def format_conversations_for_prompt(conversations: List[dict], max_chars: int = 600000) -> str:
+def format_conversations_for_prompt(conversations: List[dict], max_tokens: int = 150000) -> str:
     """
     Format conversations as readable text for LLM prompt.
 
@@ -166,21 +205,26 @@ def format_conversations_for_prompt(conversations: List[dict], max_chars: int =
     User: message content
     Assistant: response content
 
+    With "v2_regen" in TOKEN_DIET_STAGES, messages use the diet rendering
+    (see token_diet).
+
     Args:
         conversations: Sampled conversations to format
-        max_chars: Maximum total chars (600K ~ 150K tokens, leaving room for prompt)
+        max_tokens: Maximum total tokens (150K, leaving room for prompt)
 
     Returns:
         Formatted text block
     """
     MAX_MESSAGE_LENGTH = 2000
     blocks = []
-    total_chars = 0
+    total_tokens = 0
+    diet = uses_token_diet("v2_regen")
+    diet_tokens = [0, 0]
 
     for conv in conversations:
         # Extract metadata
         title = conv.get("title", "Untitled")
-        create_time = conv.get("create_time", 0)
+        create_time = _create_timestamp(conv)
 
         # Format date
         if create_time:
@@ -190,19 +234,17 @@ def format_conversations_for_prompt(conversations: List[dict], max_chars: int =
             date = "unknown date"
 
         # Extract messages
-        mapping = conv.get("mapping", {})
         messages = []
 
-        for msg_id, msg_data in mapping.items():
-            message = msg_data.get("message")
-            if not message:
-                continue
-
-            role = message.get("author", {}).get("role")
-            content_parts = message.get("content", {}).get("parts", [])
-            content = " ".join([str(p) for p in content_parts if p]) if content_parts else ""
-
+        for role, content in _iter_messages(conv):
             if role and content:
+                if diet:
+                    rendered = diet_message(role, content)
+                    if rendered != content:
+                        diet_tokens[0] += count_tokens(content[:MAX_MESSAGE_LENGTH])
+                        diet_tokens[1] += count_tokens(rendered[:MAX_MESSAGE_LENGTH])
+                        content = rendered
+
                 # Capitalize role
                 role_display = role.capitalize()
 
@@ -219,13 +261,16 @@ def format_conversations_for_prompt(conversations: List[dict], max_chars: int =
         header = f'=== Conversation: "{title}" ({date}) ==='
         block = "\n".join([header] + messages)
 
-        # Check if adding this would exceed max_chars
-        if total_chars + len(block) > max_chars:
+        # Check if adding this would exceed max_tokens
+        block_tokens = count_tokens(block)
+        if total_tokens + block_tokens > max_tokens:
             break
 
         blocks.append(block)
-        total_chars += len(block)
+        total_tokens += block_tokens
 
+    if diet:
+        print(format_savings("v2_regen", diet_tokens[0], diet_tokens[1]))
     return "\n\n".join(blocks)
 
 
@@ -258,7 +303,7 @@ async def regenerate_sections_v2(
         print(f"[V2Regen] Sampled {len(sampled)} conversations for v2 regeneration")
 
         # Format conversations
-        formatted = format_conversations_for_prompt(sampled, max_chars=600000)
+        formatted = format_conversations_for_prompt(sampled, max_tokens=150000)
 
         if not formatted or len(formatted.strip()) == 0:
             print("[V2Regen] No conversation text after formatting -- cannot regenerate")
@@ -267,7 +312,7 @@ async def regenerate_sections_v2(
         # Construct user message with conversations wrapped in XML tags + MEMORY
         user_message = "<conversations>\n" + formatted + "\n</conversations>\n\n## MEMORY (verified facts about this user)\n" + memory_md + "\n\nAnalyze the conversations above and output ONLY the JSON object. No other text."
 
-        print(f"[V2Regen] Calling Haiku 4.5 with {len(user_message)} chars (~{len(user_message) // 4} tokens)")
+        print(f"[V2Regen] Calling Haiku 4.5 with {len(user_message)} chars (~{count_tokens(user_message)} tokens)")
 
         # Call Haiku 4.5 via Anthropic API
         response = await anthropic_client.messages.create(
@@ -0,0 +1,42 @@
+-- =============================================
+-- Bulk Chunk Embedding Update
+-- One RPC call writes the vectors for a whole batch of chunks
+-- =============================================
+--
+-- Purpose: The embedding backfill used to PATCH conversation_chunks one row
+-- at a time with the vector as a JSON float array. This function takes
+-- parallel arrays of chunk IDs and pgvector text literals ('[0.1,-0.2,...]')
+-- and updates every row in a single statement, so a batch of several hundred
+-- chunks costs one round trip instead of several hundred.
+--
+-- IMPORTANT: Run this migration manually in Supabase SQL Editor
+-- (migrations are not auto-applied in production)
+
+CREATE OR REPLACE FUNCTION public.update_chunk_embeddings(
+  chunk_ids uuid[],
+  embeddings text[]
+)
+RETURNS integer
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+DECLARE
+  updated_count integer;
+BEGIN
+  IF coalesce(array_length(chunk_ids, 1), 0) <> coalesce(array_length(embeddings, 1), 0) THEN
+    RAISE EXCEPTION 'chunk_ids and embeddings must have the same length';
+  END IF;
+
+  UPDATE public.conversation_chunks cc
+  SET embedding = u.embedding::vector(768)
+  FROM unnest(chunk_ids, embeddings) AS u(id, embedding)
+  WHERE cc.id = u.id;
+
+  GET DIAGNOSTICS updated_count = ROW_COUNT;
+  RETURN updated_count;
+END;
+$$;
+
+-- Backend only (called with the service role key)
+REVOKE EXECUTE ON FUNCTION public.update_chunk_embeddings(uuid[], text[]) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.update_chunk_embeddings(uuid[], text[]) TO service_role;
@@ -0,0 +1,60 @@
+-- =============================================
+-- Chunk Tier Sizes
+-- Full pass now stores micro, medium and macro chunks
+-- =============================================
+--
+-- Purpose: The chunker emits three tiers per conversation in one pass:
+--   micro  (~300 tokens)  - precise retrieval for narrow questions
+--   medium (~2000 tokens) - conversation context; facts are extracted from these
+--   macro  (<=1000 tokens) - extractive overview of a multi-chunk conversation
+-- /query picks a tier with match_conversation_chunks_by_tier based on its
+-- remaining token budget. match_conversation_chunks keeps returning medium
+-- chunks only, so callers that don't pass a tier see the same results as
+-- before instead of overlapping chunks from every tier.
+--
+-- IMPORTANT: Run this migration manually in Supabase SQL Editor
+-- (migrations are not auto-applied in production)
+
+COMMENT ON COLUMN public.conversation_chunks.chunk_tier IS
+  'Chunk size tier: micro (~300 tokens), medium (~2000 tokens), macro (conversation overview)';
+
+CREATE OR REPLACE FUNCTION public.match_conversation_chunks(
+  query_embedding vector(768),
+  match_user_id uuid,
+  match_count int DEFAULT 10,
+  match_threshold float DEFAULT 0.3
+)
+RETURNS TABLE (
+  id uuid,
+  user_id uuid,
+  conversation_id text,
+  title text,
+  content text,
+  chunk_tier text,
+  message_count int,
+  created_at timestamptz,
+  similarity float
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  RETURN QUERY
+  SELECT
+    cc.id,
+    cc.user_id,
+    cc.conversation_id,
+    cc.title,
+    cc.content,
+    cc.chunk_tier,
+    cc.message_count,
+    cc.created_at,
+    1 - (cc.embedding <=> query_embedding) as similarity
+  FROM conversation_chunks cc
+  WHERE cc.user_id = match_user_id
+    AND COALESCE(cc.chunk_tier, 'medium') = 'medium'
+    AND cc.embedding IS NOT NULL
+    AND 1 - (cc.embedding <=> query_embedding) > match_threshold
+  ORDER BY cc.embedding <=> query_embedding
+  LIMIT match_count;
+END;
+$$;
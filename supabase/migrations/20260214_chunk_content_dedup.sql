@@ -0,0 +1,27 @@
+-- =============================================
+-- Chunk Content Dedup
+-- Repeated content across conversations is stored once
+-- =============================================
+--
+-- Purpose: Users paste the same documents, prompts and error logs into many
+-- conversations. The full pass hashes chunk content (whitespace-normalized)
+-- and stores a chunk that repeats an earlier one as a lightweight reference
+-- row: content is a one-line pointer, embedding stays NULL and duplicate_of
+-- holds the content_hash of the original. Reference rows are not embedded,
+-- not sent to fact extraction and are skipped by the embedding backfill.
+-- Vector search already ignores them (embedding IS NOT NULL).
+--
+-- IMPORTANT: Run this migration manually in Supabase SQL Editor
+-- (migrations are not auto-applied in production)
+
+ALTER TABLE public.conversation_chunks
+  ADD COLUMN IF NOT EXISTS content_hash text,
+  ADD COLUMN IF NOT EXISTS duplicate_of text;
+
+COMMENT ON COLUMN public.conversation_chunks.content_hash IS
+  'Hash of the whitespace-normalized chunk content (of the original, for reference rows)';
+COMMENT ON COLUMN public.conversation_chunks.duplicate_of IS
+  'content_hash of the earlier chunk this row repeats; NULL for original chunks';
+
+CREATE INDEX IF NOT EXISTS idx_conversation_chunks_user_content_hash
+  ON public.conversation_chunks (user_id, content_hash);
@@ -0,0 +1,36 @@
+-- =============================================
+-- Conversation Fingerprints
+-- Index of imported conversations for incremental re-import
+-- =============================================
+--
+-- Purpose: Re-importing an export used to re-chunk, re-embed and re-extract
+-- every conversation. The full pass now stores one row per conversation:
+-- a fingerprint of its title and active-path messages, the facts extracted
+-- from it, and the conversations its dedup references point at. On the next
+-- import only new or changed conversations (and those whose references point
+-- into a changed or deleted one) are processed; chunks of deleted
+-- conversations are removed and stored facts are reused for the rest.
+-- A user with no rows gets a full import, so reset routes delete them.
+--
+-- IMPORTANT: Run this migration manually in Supabase SQL Editor
+-- (migrations are not auto-applied in production)
+
+CREATE TABLE IF NOT EXISTS public.conversation_fingerprints (
+  user_id uuid NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+  conversation_id text NOT NULL,
+  fingerprint text NOT NULL,
+  depends_on text[] NOT NULL DEFAULT '{}',
+  facts jsonb NOT NULL DEFAULT '{}'::jsonb,
+  updated_at timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (user_id, conversation_id)
+);
+
+COMMENT ON COLUMN public.conversation_fingerprints.fingerprint IS
+  'Hash of the conversation title and its active-path message roles/contents';
+COMMENT ON COLUMN public.conversation_fingerprints.depends_on IS
+  'Conversations holding the originals of this conversation''s dedup reference chunks';
+COMMENT ON COLUMN public.conversation_fingerprints.facts IS
+  'Consolidated facts extracted from this conversation, reused while it is unchanged';
+
+-- Only the service role (full pass) reads and writes the index
+ALTER TABLE public.conversation_fingerprints ENABLE ROW LEVEL SECURITY;